@@ -5,6 +5,8 @@ import threading
 
 from execution.notifier import TelegramNotifier
 from execution.hourly_runner import run_hourly, SYMBOLS
+from execution.scheduler import SCHEDULER_MODE, start_scheduler, scheduler_status
+from execution.kline_stream import KLINE_STREAM, start_kline_stream, kline_stream_status
 
 app = Flask(__name__)
 _run_lock = threading.Lock()
@@ -54,6 +56,10 @@ def test_proxy():
 
 @app.route("/")
 def run():
+    # The resident scheduler owns the run loop — a cron hit only reports on it
+    if SCHEDULER_MODE == "resident":
+        return {"status": "resident", "scheduler": scheduler_status(), "kline_stream": kline_stream_status()}, 200
+
     if not _run_lock.acquire(blocking=False):
         print("[RUN] Already running — skipping duplicate trigger")
         return {"status": "already_running"}, 200
@@ -124,6 +130,7 @@ def test_pipeline():
     def run_test():
         from execution.notifier import TelegramNotifier
         from data_pipeline.fetcher import fetch_ohlcv
+        from data_pipeline.updater import candle_store
         from datetime import datetime, timezone, timedelta
         import pandas as pd
         import os
@@ -154,9 +161,9 @@ def test_pipeline():
             df_4h = fetch_ohlcv(symbol, start=warmup_start, end=warmup_end, interval="4h", limit=1000, verbose=False)
             df_5m = fetch_ohlcv(symbol, start=warmup_start, end=warmup_end, interval="5m", limit=1000, verbose=False)
 
-            df_1h.to_parquet(f"data/cache/{symbol}_1h.parquet")
-            df_4h.to_parquet(f"data/cache/{symbol}_4h.parquet")
-            df_5m.to_parquet(f"data/cache/{symbol}_5m.parquet")
+            candle_store.write(symbol, "1h", df_1h)
+            candle_store.write(symbol, "4h", df_4h)
+            candle_store.write(symbol, "5m", df_5m)
 
             notifier.send_text(
                 f"💾 *WARMUP SAVED*\n"
@@ -170,13 +177,10 @@ def test_pipeline():
             for tick in range(1, 201):
                 fake_now += timedelta(hours=1)
 
-                # reload current parquets
-                base_1h = pd.read_parquet(f"data/cache/{symbol}_1h.parquet")
-                base_4h = pd.read_parquet(f"data/cache/{symbol}_4h.parquet")
-                base_5m = pd.read_parquet(f"data/cache/{symbol}_5m.parquet")
-
-                for df in (base_1h, base_4h, base_5m):
-                    df.index = pd.to_datetime(df.index, utc=True)
+                # reload current candles
+                base_1h = candle_store.load(symbol, "1h")
+                base_4h = candle_store.load(symbol, "4h")
+                base_5m = candle_store.load(symbol, "5m")
 
                 cursor_1h = base_1h.index[-1]
                 cursor_4h = base_4h.index[-1]
@@ -199,17 +203,17 @@ def test_pipeline():
                 if added_1h > 0:
                     base_1h = pd.concat([base_1h, new_1h])
                     base_1h = base_1h[~base_1h.index.duplicated(keep="last")]
-                    base_1h.to_parquet(f"data/cache/{symbol}_1h.parquet")
+                    candle_store.append(symbol, "1h", new_1h)
 
                 if added_4h > 0:
                     base_4h = pd.concat([base_4h, new_4h])
                     base_4h = base_4h[~base_4h.index.duplicated(keep="last")]
-                    base_4h.to_parquet(f"data/cache/{symbol}_4h.parquet")
+                    candle_store.append(symbol, "4h", new_4h)
 
                 if added_5m > 0:
                     base_5m = pd.concat([base_5m, new_5m])
                     base_5m = base_5m[~base_5m.index.duplicated(keep="last")]
-                    base_5m.to_parquet(f"data/cache/{symbol}_5m.parquet")
+                    candle_store.append(symbol, "5m", new_5m)
 
                 candle_arrived = added_1h > 0
 
@@ -323,6 +327,7 @@ def debug_full_state():
     if request.args.get("key") != os.getenv("RUN_KEY", "local"):
         abort(403)
 
+    import numpy as np
     import pandas as pd
     from datetime import datetime, timezone
 
@@ -337,14 +342,17 @@ def debug_full_state():
         result["open_positions"] = {}
 
     # ── BAR HISTORY ────────────────────────────────────────
-    bar_history_path = "data/positions/bar_history.json"
+    bar_history_path = "data/positions/bar_history.npz"
     if os.path.exists(bar_history_path):
-        with open(bar_history_path, "r") as f:
-            raw = json.load(f)
-        result["bar_history"] = {
-            sym: {"bar_count": len(bars), "latest_bar": bars[-1] if bars else None}
-            for sym, bars in raw.items()
-        }
+        result["bar_history"] = {}
+        with np.load(bar_history_path) as saved:
+            for sym in saved.files:
+                bars = saved[sym]
+                latest = None
+                if len(bars):
+                    latest = {name: float(bars[-1][name]) for name in bars.dtype.names if name != "ts"}
+                    latest["ts"] = str(pd.Timestamp(int(bars[-1]["ts"]), tz="UTC"))
+                result["bar_history"][sym] = {"bar_count": len(bars), "latest_bar": latest}
     else:
         result["bar_history"] = {}
 
@@ -404,13 +412,19 @@ def debug_full_state():
     cache_summary = {}
     cache_dir = "data/cache"
     if os.path.exists(cache_dir):
+        from data_pipeline.updater import candle_store
         for fname in sorted(os.listdir(cache_dir)):
-            if not fname.endswith(".parquet"):
-                continue
             fpath = os.path.join(cache_dir, fname)
+            is_candles = os.path.isdir(fpath) and "_" in fname
+            if not is_candles and not fname.endswith(".parquet"):
+                continue
             try:
-                df = pd.read_parquet(fpath, columns=["close"])
-                df.index = pd.to_datetime(df.index, utc=True)
+                if is_candles:
+                    # candle store key directory: <symbol>_<tf>/
+                    df = candle_store.load(*fname.rsplit("_", 1), columns=["close"])
+                else:
+                    df = pd.read_parquet(fpath, columns=["close"])
+                    df.index = pd.to_datetime(df.index, utc=True)
                 cache_summary[fname] = {
                     "bars": len(df),
                     "first": str(df.index[0]),
@@ -447,8 +461,8 @@ def debug_signal_audit():
         from datetime import datetime, timezone
         from execution.notifier import TelegramNotifier
         from data_pipeline.updater import update_symbol, CACHE_DIR
-        from indicators.indicators import generate_signal, atr_ema, map_ltf_to_htf
-        from execution.hourly_runner import map_ltf_to_htf
+        from indicators.indicators import generate_signal, atr_ema
+        from indicators.alignment import map_ltf_to_htf
 
         notifier = TelegramNotifier()
 
@@ -688,16 +702,15 @@ def debug_candle_dump():
         "timeframes": {},
     }
 
-    for tf in ("5m", "1h", "4h"):
-        path = f"data/cache/{symbol}_{tf}.parquet"
+    from data_pipeline.updater import candle_store
 
-        if not os.path.exists(path):
-            result["timeframes"][tf] = {"exists": False, "path": path}
+    for tf in ("5m", "1h", "4h"):
+        if not candle_store.exists(symbol, tf):
+            result["timeframes"][tf] = {"exists": False, "path": f"data/cache/{symbol}_{tf}/"}
             continue
 
         try:
-            df = pd.read_parquet(path)
-            df.index = pd.to_datetime(df.index, utc=True)
+            df = candle_store.load(symbol, tf)
             window = df.loc[start_ts:end_ts, ["open", "high", "low", "close", "volume"]]
 
             result["timeframes"][tf] = {
@@ -723,6 +736,16 @@ if os.getenv("BINANCE_API_KEY") and os.getenv("BINANCE_API_SECRET"):
     from execution.ws_listener import start_ws_listener
     start_ws_listener()
 
+# Market-data stream: closed 5m bars go straight into the candle cache
+# and the forming bar is held in memory, so passes rarely poll klines
+if KLINE_STREAM:
+    start_kline_stream(SYMBOLS)
+
+# Resident mode: one in-process loop wakes on every 5m close instead of
+# an external cron hitting "/" every 10 seconds
+if SCHEDULER_MODE == "resident":
+    start_scheduler()
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port)
\ No newline at end of file
@@ -1,6 +1,10 @@
 import pandas as pd
 import numpy as np
 
+from indicators.alignment import htf_open_signal
+from strategy.exit_engine import RING_BARS, ExitState, check_exits, observe, trail_stop
+
+
 class SignalBacktester:
     def __init__(
         self,
@@ -15,6 +19,7 @@ class SignalBacktester:
         be_trigger_r=1.2,
         trailing=False,
         leverage=1,
+        audit=False,
     ):
         self.df = df.copy()
         self.htf_df = htf_df.copy() if htf_df is not None else None
@@ -35,6 +40,9 @@ class SignalBacktester:
 
         self.trades = []
 
+        # per-bar exit audit (row positions, printed after run) — opt-in
+        self.audit = audit
+
         self.atr_period = atr_period
         self.atr_mult = atr_mult
         self.trailing = trailing
@@ -55,52 +63,34 @@ class SignalBacktester:
         # Align datasets to common start date
         # -------------------------------------------------
         if lltf_df is not None:
-            self.lltf_df = lltf_df.copy()
-
             # Find common start timestamp across TFs
-            start_time = max(self.df.index[0], self.lltf_df.index[0])
+            start_time = max(self.df.index[0], lltf_df.index[0])
 
-            # Trim BOTH datasets so they start together
-            self.df = self.df[self.df.index >= start_time]
-            self.lltf_df = self.lltf_df[self.lltf_df.index >= start_time]
-
-            # Reset indices after trimming
-            self.df = self.df.copy()
-            self.lltf_df = self.lltf_df.copy()
+            # Trim BOTH datasets so they start together. lltf_df may be a
+            # multi-year memory-mapped view: slice it first (no copy on a
+            # sorted index) and copy only what the backtest keeps.
+            self.df = self.df[self.df.index >= start_time].copy()
+            self.lltf_df = lltf_df.iloc[lltf_df.index.searchsorted(start_time):].copy()
 
             # -------------------------------------------------
             # Map every 5m candle to its parent 1h candle index
             # -------------------------------------------------
-            self.lltf_df['final_signal'] = np.nan
-            self.lltf_df['ltf_index'] = np.nan
-
-            ltf_times = self.df.index
-
-            for i in range(len(ltf_times)):
-                start = ltf_times[i]
-                end = ltf_times[i+1] if i+1 < len(ltf_times) else self.lltf_df.index[-1] + pd.Timedelta(seconds=1)
-
-                mask = (self.lltf_df.index >= start) & (self.lltf_df.index < end)
-
-                # ltf_index and signal both come from THIS 1H bar (index i).
-                # This matches live: map_ltf_to_htf maps the 13:00 5m bar to
-                # the 13:00 1H bar, and the signal on df at 13:00 is used.
-                # The 13:00 5m bar is the first bar AFTER the 12:00 1H bar closes —
-                # no lookahead, because generate_signal only runs on closed bars.
-                # We zero bars strictly inside (13:05–13:55) — those are mid-bar.
-                # Only the boundary bar (13:00) is a valid entry.
-                self.lltf_df.loc[mask, 'ltf_index'] = i
-                # Boundary bar (start) gets the signal; interior bars are zeroed
-                boundary_mask = self.lltf_df.index == start
-                interior_mask = mask & ~boundary_mask
-                self.lltf_df.loc[boundary_mask & mask, 'final_signal'] = self.df['final_signal'].iloc[i]
-                self.lltf_df.loc[interior_mask, 'final_signal'] = 0
-
-            # Drop any candles that STILL didn't get mapped (safety)
-            self.lltf_df = self.lltf_df.dropna(subset=['ltf_index'])
+            # ltf_index and signal both come from the 1H bar each 5m bar falls in.
+            # This matches live: map_ltf_to_htf maps the 13:00 5m bar to
+            # the 13:00 1H bar, and the signal on df at 13:00 is used.
+            # The 13:00 5m bar is the first bar AFTER the 12:00 1H bar closes —
+            # no lookahead, because generate_signal only runs on closed bars.
+            # We zero bars strictly inside (13:05–13:55) — those are mid-bar.
+            # Only the boundary bar (13:00) is a valid entry.
+            ltf_index, final_signal = htf_open_signal(
+                self.lltf_df.index, self.df.index, self.df['final_signal']
+            )
+            self.lltf_df['final_signal'] = final_signal
+            self.lltf_df['ltf_index'] = ltf_index
 
-            # Now conversion is safe
-            self.lltf_df['ltf_index'] = self.lltf_df['ltf_index'].astype(int)
+            # Drop any candles that didn't get mapped (before the first 1H bar)
+            if (ltf_index < 0).any():
+                self.lltf_df = self.lltf_df[ltf_index >= 0].copy()
 
         self._prepare_indicators()
 
@@ -140,119 +130,6 @@ class SignalBacktester:
     ATR_INIT_MULT = 1.5
     ATR_AFTER_HALF_R = 1.0
 
-    def get_5m_window(self, entry_time, current_time):
-        df = self.lltf_df if hasattr(self, 'lltf_df') else self.df
-        # Exclude the entry bar itself — OIE should only evaluate bars
-        # after entry, matching live where bar_history starts appending
-        # from the first bar AFTER the entry candle.
-        window = df.loc[entry_time:current_time]
-        if len(window) > 1:
-            return window.iloc[1:]  # drop entry bar
-        return window
-    
-    def opposite_impulse_exit(self, window, side, trade=None):
-        if len(window) < 3:
-            return False
-
-        last = window.iloc[-1]
-
-        # ══════════════════════════════════════════
-        # 1. ATR — use 5m ATR for candle body comparison
-        # ══════════════════════════════════════════
-        if "ATR_5M" in window.columns:
-            atr = window["ATR_5M"].iloc[-3:].mean()
-            if pd.isna(atr) or atr <= 0:
-                atr = window["ATR_5M"].iloc[0]
-        else:
-            atr = None
-
-        if atr is None or pd.isna(atr) or atr <= 0:
-            atr_1h = window["ATR"].iloc[-3:].mean() if "ATR" in window.columns else (window['high'] - window['low']).mean()
-            if pd.isna(atr_1h) or atr_1h <= 0:
-                atr_1h = window["ATR"].iloc[0] if "ATR" in window.columns else float("nan")
-            if pd.isna(atr_1h) or atr_1h <= 0:
-                return False
-            atr = atr_1h * 0.20
-
-        if pd.isna(atr) or atr <= 0:
-            return False
-
-        # ══════════════════════════════════════════
-        # 2. BODY SIZE
-        # ══════════════════════════════════════════
-        body = abs(last.close - last.open)
-        # Also check the last 2 bars together — gradual reversals
-        # don't always produce one big candle, but two medium ones
-        # in the wrong direction are equally meaningful.
-        two_bar_move = abs(window.iloc[-1].close - window.iloc[-2].close) if len(window) >= 2 else 0
-        big_candle = (body > atr * 1.2) or (two_bar_move > atr * 1.5 and body > atr * 0.6)
-
-        # ══════════════════════════════════════════
-        # 3. DIRECTION CHECK
-        # ══════════════════════════════════════════
-        if side == 1:
-            wrong_direction = last.close < last.open
-        else:
-            wrong_direction = last.close > last.open
-
-        # ══════════════════════════════════════════
-        # 4. CLOSE LOCATION
-        # ══════════════════════════════════════════
-        location_blocked = False
-        if trade is not None:
-            entry = trade["entry_price"]
-            stop  = trade["stop_loss"]
-            initial_stop = trade.get("initial_stop", stop)
-            # use initial_stop as R anchor — matches lifecycle.py exactly
-            R = abs(entry - initial_stop)
-            if R == 0:
-                R = abs(entry - stop)
-
-            if R > 0:
-                    mfe_r = trade.get("mfe_r", 0.0)
-                    pnl_r_now = trade.get("pnl_r", 0.0)
-
-                    # close_to_initial_stop_r: distance from the ORIGINAL
-                    # stop, not the live (trailing) stop_loss. Previously
-                    # this guard read trade["stop_loss"] directly, which
-                    # moves once update_dynamic_stop's trail activates
-                    # (mfe_r >= 0.5). As the trail tightens, that live
-                    # stop creeps toward price, shrinking close_to_stop_r
-                    # even though the trade's risk position relative to
-                    # its ORIGINAL stop hasn't changed at all — this let
-                    # OIE fire on healthy, well-protected winners purely
-                    # because the trail had moved, not because anything
-                    # about the trade changed. Anchoring to initial_stop
-                    # decouples OIE's guard from any future trailing-stop
-                    # tuning, so trail experiments can no longer silently
-                    # weaken this guard the way the 0.15-0.5R tier did.
-                    #
-                    # Since R = abs(entry - initial_stop), distance from
-                    # initial_stop in R-units is always pnl_r_now + 1.0
-                    # (true for both long and short, since pnl_r_now is
-                    # already side-corrected) — no separate close/stop
-                    # arithmetic needed.
-                    close_to_initial_stop_r = pnl_r_now + 1.0
-
-                    # Block OIE when the trade is comfortably above the
-                    # ORIGINAL stop AND has positive pnl. Same 0.75R
-                    # logic as before, just measured against a fixed
-                    # reference point instead of a moving one.
-                    location_blocked = (close_to_initial_stop_r > 1.75 and pnl_r_now > 0.0)
-
-        # ══════════════════════════════════════════
-        # 5. VOLUME CONFIRMATION
-        # ══════════════════════════════════════════
-        vol_blocked = False
-        if "volume" in window.columns:
-            avg_vol = window["volume"].iloc[-10:].mean()
-            last_vol = last.volume
-            if len(window) >= 10 and not pd.isna(avg_vol) and avg_vol > 0:
-                if last_vol < avg_vol * 0.8:
-                    vol_blocked = True
-
-        return big_candle and wrong_direction and not location_blocked and not vol_blocked
-        
     def stop_pressure_exit(self, window, stop_price, side):
         if len(window) < self.PRESSURE_BARS:
             return False
@@ -313,7 +190,7 @@ class SignalBacktester:
     # reverted — it clipped a much larger population of normal winners
     # that dip through 0.2-0.5R before continuing, costing far more
     # than the bleed-back leak it fixed. See stall_exit in
-    # _check_intrabar for the narrower fix targeting that leak directly.
+    # _trade_path for the narrower fix targeting that leak directly.
     ATR_AFTER_ENTRY   = 1.5   # standard trail before 0.5R
     ATR_AFTER_HALF_R  = 0.55   # tighter once 0.5R secured
     ATR_AFTER_ONE_R   = 0.4   # tight once 1R secured
@@ -325,57 +202,6 @@ class SignalBacktester:
     # keep diverging on exactly which bar a trade exits.
     BINANCE_CALLBACK_FLOOR_PCT = 0.0016
 
-    def update_dynamic_stop(self, trade, current_price, atr):
-        mfe_r = trade.get('mfe_r', 0.0)
-
-        # Activate at 0.3R — gives one to two 5m bars of breathing room
-        # before locking in, while still catching the bar-3 peak.
-        if mfe_r < 0.5:
-            return
-
-        bars = trade.get('bars_in_trade', 0)
-        last_trail_bar = trade.get('last_trail_bar', 0)
-
-        # Once past 0.5R, update every bar to lock in gains quickly.
-        # Before 0.5R, update every 2 bars to avoid instant breakeven stops.
-        cadence = 1 if mfe_r >= 0.5 else 2
-        if bars - last_trail_bar < cadence:
-            return
-        trade['last_trail_bar'] = bars
-
-        entry = trade['entry_price']
-        current_stop = trade['stop_loss']
-        side = trade['side']
-
-        if mfe_r >= 1.0:
-            atr_mult = self.ATR_AFTER_ONE_R
-        elif mfe_r >= 0.5:
-            atr_mult = self.ATR_AFTER_HALF_R
-        else:
-            atr_mult = self.ATR_AFTER_ENTRY
-
-        # Same floor logic as live's PositionManager._update_dynamic_stop —
-        # ATR multipliers unchanged, but the trail distance can never be
-        # tighter than what Binance's amend_stop would allow in practice.
-        floor_distance = current_price * self.BINANCE_CALLBACK_FLOOR_PCT
-        atr_distance    = atr * atr_mult
-        trail_distance  = max(atr_distance, floor_distance)
-
-        if side == 1:
-            trail_candidate = current_price - trail_distance
-            # Only lock to breakeven once 0.5R is secured, not before
-            if mfe_r >= 0.5:
-                trail_candidate = max(trail_candidate, entry)
-            new_stop = max(current_stop, trail_candidate)
-        else:
-            trail_candidate = current_price + trail_distance
-            if mfe_r >= 0.5:
-                trail_candidate = min(trail_candidate, entry)
-            new_stop = min(current_stop, trail_candidate)
-
-        trade['stop_loss'] = new_stop
-        self.stop_loss = new_stop
-
     # ------------------------
     # Position sizing
     # ------------------------
@@ -386,21 +212,181 @@ class SignalBacktester:
         return self.fixed_risk / risk_per_unit
 
     # ------------------------
-    # Entry
+    # Array core
     # ------------------------
-    def _enter(self, side, price, idx):
+    # run() walks the execution frame as contiguous arrays. Flat stretches
+    # are skipped with one searchsorted to the next bar that can enter, and
+    # an open trade is stepped bar by bar through strategy/exit_engine, the
+    # same exit rules PositionManager runs live and in replay —
+    # tests/test_exit_engine.py pins the two together.
+
+    EXIT_REASONS = (
+        "stop_loss", "break_even", "liquidated", "disaster_stop",
+        "dominance_exit", "trap_rejection", "thesis_invalidation_exit",
+        "stop_proximity_exit", "opposite_impulse", "end_of_data",
+    )
+
+    # one row per trade, preallocated for every possible entry
+    TRADE_DTYPE = np.dtype([
+        ("side", "i8"), ("entry_idx", "i8"), ("entry_price", "f8"), ("units", "f8"),
+        ("stop_loss", "f8"), ("initial_stop", "f8"), ("ATR", "f8"),
+        ("MAE", "f8"), ("MFE", "f8"), ("bars_in_trade", "i8"), ("last_trail_bar", "i8"),
+        ("mfe_peak_bar", "i8"), ("mfe_r", "f8"), ("pnl_r", "f8"),
+        ("_price_mfe", "f8"), ("_price_mae", "f8"),
+        ("exit_price", "f8"), ("exit_idx", "i8"), ("bars_held", "i8"),
+        ("hours_held", "f8"), ("pnl", "f8"), ("exit_reason", "i8"),
+    ])
+
+    DISASTER_THRESHOLD = -0.6
+
+    def _core_arrays(self):
+        ex = self._exec_df()
+
+        def col(name):
+            return ex[name].to_numpy(dtype=float) if name in ex.columns else None
+
+        atr_1h = self.df['ATR'].to_numpy(dtype=float)
         if hasattr(self, 'lltf_df'):
-            ltf_idx = self.lltf_df['ltf_index'].iloc[idx]
+            ltf = ex['ltf_index'].to_numpy(dtype=np.int64)
             # ATR for stop placement comes from the bar that generated the signal
             # (the previous closed 1H bar) — matches live where ATR is forward-filled
             # from the last closed 1H bar onto the entry 5m bar.
-            atr_idx = max(0, ltf_idx - 1)
+            atr_entry = atr_1h[np.maximum(ltf - 1, 0)]
         else:
-            ltf_idx = idx
-            atr_idx = idx
-        atr = self.df['ATR'].iloc[atr_idx]
+            ltf = np.arange(len(ex), dtype=np.int64)
+            atr_entry = atr_1h
+
+        atr_5m, atr = col('ATR_5M'), col('ATR')
+
+        a = {
+            "n":       len(ex),
+            "steps":   max(len(ex) - 1, 0),    # the last bar only closes an open trade
+            "index":   ex.index,
+            "ns":      ex.index.as_unit("ns").asi8,
+            "ltf":     ltf,
+            "signal":  ex['final_signal'].to_numpy(dtype=float),
+            "open_a":  ex['open'].to_numpy(dtype=float),
+            "close_a": ex['close'].to_numpy(dtype=float),
+            "high_a":  ex['high'].to_numpy(dtype=float),
+            "low_a":   ex['low'].to_numpy(dtype=float),
+            "volume":  col('volume'),
+            "atr_5m":  atr_5m,
+            "atr":     atr,
+        }
+        # scalar reads in the hot loop are cheapest from lists of floats
+        for key in ("open", "close", "high", "low"):
+            a[key] = a[key + "_a"].tolist()
+        a["atr_entry"] = atr_entry.tolist()
+        return a
+
+    def _trade_path(self, a, t):
+        """
+        Step the trade in buffer row `t` from the bar after entry until an
+        exit fires. The rules are strategy/exit_engine's, the ones live
+        trades with; the OIE window is the last RING_BARS bars from the
+        entry candle on, as in PositionManager's bar history. Fills the
+        row's running state and returns (exit_idx, exit_price, reason), or
+        None if it is still open on the last bar.
+        """
+        highs, lows, closes = a["high"], a["low"], a["close"]
+        atr5, atr1 = a["atr_5m"], a["atr"]
+        bars = {
+            "open": a["open"], "close": closes, "high": a["high_a"], "low": a["low_a"],
+            "volume": a["volume"], "atr_5m": atr5, "atr": atr1,
+        }
+        e     = int(t["entry_idx"])
+        side  = int(t["side"])
+        units = float(t["units"])
+        s = ExitState(
+            side, float(t["entry_price"]), float(t["stop_loss"]),
+            liq=self.liquidation_price if self.leverage > 1 else None,
+        )
+        entry, R, initial_stop = s.entry, s.R, s.initial_stop
+
+        # $ excursions for the report include the entry bar; the exit
+        # state (s.mfe / s.mae, in price) starts on the next bar
+        h, l = highs[e], lows[e]
+        if side == 1:
+            MAE, MFE = min(0.0, (l - entry) * units), max(0.0, (h - entry) * units)
+        else:
+            MAE, MFE = min(0.0, (entry - h) * units), max(0.0, (entry - l) * units)
+
+        disaster = None
+        result = None
+
+        for i in range(e + 1, a["steps"]):
+            h, l, c = highs[i], lows[i], closes[i]
+            if side == 1:
+                MAE, MFE = min(MAE, (l - entry) * units), max(MFE, (h - entry) * units)
+            else:
+                MAE, MFE = min(MAE, (entry - h) * units), max(MFE, (entry - l) * units)
+
+            observe(s, h, l, c)
+            mfe_r, pnl_r = s.mfe_r, s.pnl_r
+
+            if self.audit:
+                atr_5m = atr5[i] if atr5 is not None else np.nan
+                self._audit_log.append({
+                    "idx": i, "entry_idx": e, "side": side, "bars": s.bars,
+                    "mfe_r": mfe_r, "pnl_r": pnl_r, "mae_r": abs(s.mae) / R,
+                    "stop_loss": s.stop, "initial_stop": initial_stop, "R": R,
+                    "atr_5m": atr_5m if atr_5m > 0 else None,
+                })
+
+            new_stop = trail_stop(
+                s, self, c,
+                atr5[i] if atr5 is not None else None,
+                atr1[i] if atr1 is not None else None,
+            )
+            if new_stop is not None:
+                s.stop = new_stop
+
+            # ── DISASTER DIAGNOSTIC (report only) ──
+            if pnl_r <= self.DISASTER_THRESHOLD and mfe_r < 0.5 and disaster is None:
+                disaster = self._disaster_log.setdefault(str(a["index"][e]), {
+                    "entry_time":     str(a["index"][e]),
+                    "side":           side,
+                    "scenario":       "B_violent_rejection" if mfe_r >= 0.15 else "A_pure_loser",
+                    "mfe_r_at_cross": mfe_r,
+                    "pnl_r_at_cross": pnl_r,
+                    "bars_to_cross":  s.bars,
+                    "recovered":      False,
+                    "final_pnl_r":    pnl_r,
+                    "exit_reason":    None,
+                })
+            if disaster is not None:
+                disaster["final_pnl_r"] = pnl_r
+
+            hit = check_exits(s, h, l, c, bars, max(e, i + 1 - RING_BARS), i + 1)
+            if hit is not None:
+                reason, price = hit
+                if reason in ("trap_rejection", "stop_proximity_exit"):
+                    print(f"[{reason.upper()}] {a['index'][e]} | side={side} | "
+                          f"bars={s.bars} mfe_r={mfe_r:.3f} pnl_r={pnl_r:.3f} "
+                          f"mae_r={abs(s.mae) / R:.3f} | exit_price={price:.5f} R={R:.5f}")
+                result = (i, price, reason)
+                break
+
+            # increment AFTER all exit checks — as PositionManager does
+            s.bars += 1
+
+        t["MAE"], t["MFE"] = MAE, MFE
+        t["stop_loss"] = s.stop
+        t["bars_in_trade"], t["last_trail_bar"], t["mfe_peak_bar"] = s.bars, s.last_trail_bar, s.last_mfe_bar
+        t["mfe_r"], t["pnl_r"] = s.mfe_r, s.pnl_r
+        if e + 1 < a["steps"]:
+            t["_price_mfe"], t["_price_mae"] = s.mfe, s.mae
+        else:
+            t["_price_mfe"] = t["_price_mae"] = np.nan    # never reached an exit check
+        self.stop_loss = s.stop
+        return result
+
+    def _core_enter(self, a, t, side, idx):
+        """Open a trade at bar idx into buffer row t. False if ATR/sizing refuse it."""
+        price = a["open"][idx]
+        atr = a["atr_entry"][idx]
         if np.isnan(atr):
-            return
+            return False
 
         if side == 1:
             stop = price - self.atr_mult * atr
@@ -409,52 +395,31 @@ class SignalBacktester:
 
         units = self._calc_units(price, stop)
         if units <= 0:
-            return
+            return False
 
         self.position = side
         self.entry_price = price
         self.stop_loss = stop
-        self.trailing_stop = stop
         self.units = units
         self.be_activated = False
 
-        self.current_trade = {
-            "side": side,
-            "entry_idx": idx,
-            "entry_time": self.lltf_df.index[idx] if hasattr(self, 'lltf_df') else self.df.index[idx],
-            "entry_price": price,
-            "units": units,
-            "stop_loss": stop,
-            "initial_stop": stop,
-            "ATR": atr,
-            "MAE": 0.0,
-            "MFE": 0.0,
-            "bars_in_trade": 1,   # entry bar counts as bar 1, matching live
-            "last_trail_bar": 0,
-            "mfe_peak_bar": 1,    # bar where _price_mfe last made a new high
-            "mfe_r": 0.0,
-            "pnl_r": 0.0,
-        }
+        t["side"], t["entry_idx"], t["entry_price"], t["units"] = side, idx, price, units
+        t["stop_loss"], t["initial_stop"], t["ATR"] = stop, stop, atr
 
         # Fee applies to notional, not margin — so leverage increases fee cost
         self.balance -= abs(units * price) * self.fee
-        
+
         # Liquidation price tracking
         margin_per_unit = price / self.leverage
         if side == 1:
             self.liquidation_price = price - margin_per_unit * 0.9
         else:
             self.liquidation_price = price + margin_per_unit * 0.9
+        return True
 
-    # ------------------------
-    # Exit
-    # ------------------------
-    def _exit(self, price, idx, reason):
-        raw_pnl = (
-            (price - self.entry_price) * self.units
-            if self.position == 1 else
-            (self.entry_price - price) * self.units
-        )
+    def _core_exit(self, a, t, price, idx, reason):
+        entry, units = float(t["entry_price"]), float(t["units"])
+        raw_pnl = (price - entry) * units if self.position == 1 else (entry - price) * units
 
         # Stop loss and liquidation are capped at -1R by definition
         # All other exits (winners, early exits) are amplified by leverage
@@ -467,36 +432,21 @@ class SignalBacktester:
             reason = "break_even"
 
         self.balance += pnl
-        self.balance -= abs(self.units * price) * self.fee * self.leverage
+        self.balance -= abs(units * price) * self.fee * self.leverage
         self.liquidation_price = None
 
-        entry_i = self.current_trade["entry_idx"]
-        bars_held = idx - entry_i
-
-        exit_time = self.lltf_df.index[idx] if hasattr(self, 'lltf_df') else self.df.index[idx]
-        entry_time = self.current_trade["entry_time"]
-
-        hours_held = (exit_time - entry_time).total_seconds() / 3600
-
-        entry  = self.current_trade["entry_price"]
-        stop   = self.current_trade.get("initial_stop", self.current_trade["stop_loss"])
-        R_exit = abs(entry - stop)
-        pnl_r_final = (
+        e = int(t["entry_idx"])
+        R_exit = abs(entry - t["initial_stop"])
+        t["exit_price"] = price
+        t["exit_idx"] = idx
+        t["bars_held"] = idx - e
+        t["hours_held"] = (a["ns"][idx] - a["ns"][e]) / 1e9 / 3600
+        t["pnl"] = pnl
+        t["pnl_r"] = (
             ((price - entry) / R_exit) if self.position == 1
             else ((entry - price) / R_exit)
         ) if R_exit > 0 else 0.0
-
-        self.current_trade.update({
-            "exit_price": price,
-            "exit_idx": idx,
-            "exit_time": exit_time,
-            "bars_held": bars_held,
-            "hours_held": hours_held,
-            "pnl": pnl,
-            "pnl_r": pnl_r_final,
-            "exit_reason": reason
-        })
-        self.trades.append(self.current_trade)
+        t["exit_reason"] = self.EXIT_REASONS.index(reason)
 
         self.position = 0
         self.entry_price = None
@@ -504,20 +454,67 @@ class SignalBacktester:
         self.be_activated = False
         self.trade_taken_this_ltf = True
 
-    # ------------------------
-    # Excursion tracking
-    # ------------------------
-    def _update_excursions(self, high, low):
-        if self.position == 0:
-            return
+    def _trades_frame(self, a, buf):
+        """Trade buffer rows → the trades DataFrame, entry/exit times from the index."""
+        if len(buf) == 0:
+            return pd.DataFrame()
+        cols = {name: buf[name] for name in self.TRADE_DTYPE.names}
+        index = a["index"]
+        cols["entry_time"] = index[buf["entry_idx"]]
+        cols["exit_time"] = index[buf["exit_idx"]]
+        cols["exit_reason"] = np.asarray(self.EXIT_REASONS, dtype=object)[buf["exit_reason"]]
+        order = [
+            "side", "entry_idx", "entry_time", "entry_price", "units", "stop_loss",
+            "initial_stop", "ATR", "MAE", "MFE", "bars_in_trade", "last_trail_bar",
+            "mfe_peak_bar", "mfe_r", "pnl_r", "_price_mfe", "_price_mae",
+            "exit_price", "exit_idx", "exit_time", "bars_held", "hours_held",
+            "pnl", "exit_reason",
+        ]
+        return pd.DataFrame({name: cols[name] for name in order})
+
+    def _run_core(self, a):
+        """Bar loop over the core arrays. Returns (equity array, trade buffer rows)."""
+        steps, ltf, sig = a["steps"], a["ltf"], a["signal"]
+        equity = np.empty(steps)
+
+        # ENTER only on a ±1 signal, one trade per 1H candle
+        candidates = np.flatnonzero((sig == 1) | (sig == -1))
+        candidates = candidates[candidates < steps]
+        buf = np.zeros(len(candidates) + 1, dtype=self.TRADE_DTYPE)
+        count = 0
+
+        start, filled = 0, 0      # next bar that may enter / equity written so far
+        while True:
+            k = int(np.searchsorted(candidates, start))
+            if k >= len(candidates):
+                break
+            i = int(candidates[k])
+            t = buf[count]
+            balance = self.balance
+            if not self._core_enter(a, t, 1 if sig[i] == 1 else -1, i):
+                start = i + 1
+                continue
+
+            equity[filled:i] = balance
+            count += 1
+            result = self._trade_path(a, t)
+            if result is None:
+                equity[i:steps] = self.balance
+                filled = steps
+                self._core_exit(a, t, a["close"][-1], a["n"] - 1, "end_of_data")
+                break
+
+            x, price, reason = result
+            equity[i:x] = self.balance
+            self._core_exit(a, t, price, x, reason)
+            equity[x] = self.balance
+            filled = x + 1
+            # the 1H candle the trade closed in is spent
+            start = int(np.searchsorted(ltf, ltf[x], side="right"))
+
+        equity[filled:] = self.balance
+        return equity, buf[:count]
 
-        if self.position == 1:
-            self.current_trade["MAE"] = min(self.current_trade["MAE"], (low  - self.entry_price) * self.units)
-            self.current_trade["MFE"] = max(self.current_trade["MFE"], (high - self.entry_price) * self.units)
-        else:
-            self.current_trade["MAE"] = min(self.current_trade["MAE"], (self.entry_price - high) * self.units)
-            self.current_trade["MFE"] = max(self.current_trade["MFE"], (self.entry_price - low)  * self.units)
-    
     def _exec_df(self):
         return self.lltf_df if hasattr(self, 'lltf_df') else self.df
         
@@ -613,360 +610,6 @@ class SignalBacktester:
             return False
         return self.lltf_df['ltf_index'].iloc[i] != self.lltf_df['ltf_index'].iloc[i-1]
 
-    # ------------------------
-    # Intrabar management
-    # ------------------------
-    def _check_intrabar(self, high, low, idx):
-        if self.position == 0:
-            return
-
-        trade = self.current_trade
-        side  = trade['side']
-
-        exec_df      = self.lltf_df if hasattr(self, 'lltf_df') else self.df
-        current_time = exec_df.index[idx]
-
-        # Best price this bar (matches lifecycle.py convention)
-        current_price = high if side == 1 else low
-
-        # ── MFE / MAE tracking ──
-        R = abs(trade["entry_price"] - trade.get("initial_stop", trade["stop_loss"]))
-        if R == 0:
-            R = abs(trade["entry_price"] - trade["stop_loss"])
-        self.R = R
-
-        if side == 1:
-            price_mfe = high - trade["entry_price"]
-            price_mae = low  - trade["entry_price"]
-        else:
-            price_mfe = trade["entry_price"] - low
-            price_mae = trade["entry_price"] - high
-
-        _prior_price_mfe = trade.get("_price_mfe", 0.0)
-        _new_price_mfe   = max(_prior_price_mfe, price_mfe)
-        if _new_price_mfe > _prior_price_mfe:
-            trade["mfe_peak_bar"] = trade.get("bars_in_trade", 0)
-        trade["_price_mfe"] = _new_price_mfe
-        trade["_price_mae"] = min(trade.get("_price_mae", 0.0), price_mae)
-
-        # dollar excursions for diagnostics (used by _update_excursions output)
-        if side == 1:
-            trade["MAE"] = min(trade.get("MAE", 0.0), (low  - trade["entry_price"]) * self.units)
-            trade["MFE"] = max(trade.get("MFE", 0.0), (high - trade["entry_price"]) * self.units)
-        else:
-            trade["MAE"] = min(trade.get("MAE", 0.0), (trade["entry_price"] - high) * self.units)
-            trade["MFE"] = max(trade.get("MFE", 0.0), (trade["entry_price"] - low)  * self.units)
-
-        mfe_r = trade["_price_mfe"] / R if R > 0 else 0.0
-        pnl_r = (
-            (current_price - trade["entry_price"]) / R if side == 1
-            else (trade["entry_price"] - current_price) / R
-        ) if R > 0 else 0.0
-
-        trade["pnl_r"] = pnl_r
-        trade["mfe_r"] = mfe_r
-
-        # ── 5m window for exit checks ──────────────────────────
-        window_5m = self.get_5m_window(trade["entry_time"], current_time)
-
-        # ── EXIT AUDIT (last 12 bars = 1h, printed after run) ──
-        _mae_r_for_audit = abs(trade.get("_price_mae", 0.0)) / R if R > 0 else 0.0
-        _exec_row = exec_df.iloc[idx]
-        _atr_5m_val = exec_df["ATR_5M"].iloc[idx] if "ATR_5M" in exec_df.columns else None
-        if not pd.isna(_atr_5m_val) and _atr_5m_val > 0:
-            pass
-        else:
-            _atr_5m_val = None
-        if not hasattr(self, "_audit_log"):
-            self._audit_log = []
-        self._audit_log.append({
-            "ts": current_time,
-            "side": side,
-            "bars": trade.get("bars_in_trade", 0),
-            "mfe_r": mfe_r,
-            "pnl_r": pnl_r,
-            "mae_r": _mae_r_for_audit,
-            "bar_open": float(_exec_row["open"]),
-            "bar_high": float(_exec_row["high"]),
-            "bar_low":  float(_exec_row["low"]),
-            "bar_close": float(_exec_row["close"]),
-            "stop_loss": trade["stop_loss"],
-            "initial_stop": trade.get("initial_stop", trade["stop_loss"]),
-            "R": R,
-            "atr_5m": _atr_5m_val,
-            "window_5m": window_5m.copy(),
-        })
-
-        # ── DYNAMIC TRAILING STOP (mirrors lifecycle.py) ───────
-        if "ATR_5M" in exec_df.columns:
-            atr = exec_df["ATR_5M"].iloc[idx]
-        else:
-            atr = exec_df["ATR"].iloc[idx] * 0.20
-        if pd.isna(atr) or atr <= 0:
-            atr = R * 0.20  # last resort fallback
-
-        self.update_dynamic_stop(trade, current_price, atr)
-
-        # ── DISASTER STOP DIAGNOSTIC ────────────────────────────────────
-        # Tracks two distinct populations that a -0.6R floor would catch:
-        #
-        #   Scenario A (pure loser): mfe_r never reached 0.15R before
-        #   pnl_r crossed -0.6R. Trade went wrong immediately and drifted
-        #   toward the stop without ever showing real edge.
-        #
-        #   Scenario B (violent rejection): mfe_r DID reach 0.15–0.5R
-        #   before pnl_r crossed -0.6R. Trade proved some edge then got
-        #   violently reversed before the trail activated. The more
-        #   dangerous case — felt like a winner until it wasn't.
-        #
-        # For each trade, records the FIRST bar where pnl_r crosses -0.6R
-        # (so we get one row per trade, not one row per bar). Then tracks
-        # whether pnl_r ever recovered above -0.6R after that crossing —
-        # if it did, a hard exit at -0.6R would have been a false positive.
-        # If it didn't, the exit would have saved the difference between
-        # -0.6R and the actual final pnl_r.
-        if not hasattr(self, "_disaster_log"):
-            self._disaster_log = {}   # keyed by entry_time str, one entry per trade
-
-        _entry_key = str(trade.get("entry_time", idx))
-        DISASTER_THRESHOLD = -0.6
-
-        if pnl_r <= DISASTER_THRESHOLD and mfe_r < 0.5:
-            if _entry_key not in self._disaster_log:
-                # First bar this trade crossed the threshold — record it
-                _scenario = (
-                    "B_violent_rejection" if mfe_r >= 0.15
-                    else "A_pure_loser"
-                )
-                self._disaster_log[_entry_key] = {
-                    "entry_time":     _entry_key,
-                    "side":           side,
-                    "scenario":       _scenario,
-                    "mfe_r_at_cross": mfe_r,
-                    "pnl_r_at_cross": pnl_r,
-                    "bars_to_cross":  trade.get("bars_in_trade", 0),
-                    "recovered":      False,   # updated below if price comes back
-                    "final_pnl_r":    pnl_r,  # will be overwritten on exit
-                    "exit_reason":    None,    # will be overwritten on exit
-                }
-            else:
-                # Already crossed — check if price recovered above threshold
-                if pnl_r > DISASTER_THRESHOLD:
-                    self._disaster_log[_entry_key]["recovered"] = True
-
-        # Keep final_pnl_r and exit_reason current on every bar after crossing
-        # so when the trade exits we have accurate final values without needing
-        # a separate hook into _exit().
-        if _entry_key in self._disaster_log:
-            self._disaster_log[_entry_key]["final_pnl_r"] = pnl_r
-            # exit_reason will remain None until we read it from trades_df
-            # in the run() reporting block — no access to it here yet.
-
-        # ── DISASTER STOP — hard floor at -0.6R when trail inactive ────
-        # Two populations this catches, both requiring mfe_r < 0.5 (trail
-        # not yet activated — once trail is live it owns the trade):
-        #
-        #   Scenario A (pure loser): mfe_r stayed below 0.15R the whole
-        #   time. Trade went wrong immediately, grinding toward -1R with
-        #   no evidence of edge. 100% true-positive rate across ICX/FIL/ZEC.
-        #
-        #   Scenario B (violent rejection): mfe_r reached 0.15–0.5R then
-        #   price reversed hard to -0.6R within 12 bars. The 12-bar guard
-        #   is critical — the one false positive in ZEC (2024-10-21) took
-        #   41 bars to reach -0.6R, meaning it was a slow grind, not a
-        #   violent rejection. All genuine violent rejections in the sample
-        #   (FIL: bars 14/14/16/26) crossed within that window.
-        #
-        # Diagnostic log is still running in parallel — exits labeled
-        # "disaster_stop" will appear in the scenario analysis so you can
-        # verify the rule fires only on true positives going forward.
-        #
-        # This check runs BEFORE all other soft exits so the price saved
-        # (difference between -0.6R and the actual hard stop at -1R) is
-        # never eroded by waiting for OIE/thesis_invalid to fire first.
-        if mfe_r < 0.5 and pnl_r <= -0.6:
-            _bars_in = trade.get("bars_in_trade", 0)
-            _scenario_a = mfe_r < 0.15
-            _bars_since_peak = _bars_in - trade.get("mfe_peak_bar", _bars_in)
-            _scenario_b = mfe_r >= 0.15 and _bars_since_peak <= 6
-
-            if _scenario_a or _scenario_b:
-                entry_time_str = trade.get("entry_time", "?")
-                _which = "A_pure_loser" if _scenario_a else "B_violent_rejection"
-                # print(f"[DISASTER_STOP] {entry_time_str} | side={side} | "
-                #       f"scenario={_which} | "
-                #       f"mfe_r={mfe_r:.3f} pnl_r={pnl_r:.3f} bars={_bars_in} | "
-                #       f"exit_price={current_price:.5f} R={R:.5f}")
-                self._exit(current_price, idx, "disaster_stop")
-                return
-
-        # ── STALL EXIT — catches slow bleed trades OIE never sees ──
-        # bars_in_trade = trade.get("bars_in_trade", 0)
-        # if self.stall_exit(trade, bars_in_trade):
-        #     self._exit(current_price, idx, "stall_exit")
-        #     return
-
-        # ── DOMINANCE EXIT ──────────────────────────────────────────────
-        # Fires when adverse movement is clearly dominating favorable
-        # movement — not just when MFE is exactly zero.
-        # Bar 3 (15 min): MAE > 0.30R and ratio > 3.0
-        #   → adverse is 3x the favorable move, trade hasn't proved itself
-        # Bar 6 (30 min): MAE > 0.40R and ratio > 2.5
-        #   → two full 1H candles held, still no evidence of edge
-        _bars = trade.get("bars_in_trade", 0)
-        _mae_r = abs(trade.get("_price_mae", 0.0)) / R if R > 0 else 0.0
-        _pressure_ratio = _mae_r / max(mfe_r, 0.01)
-
-        if _bars == 3 and mfe_r == 0.0 and _mae_r > 0.50:
-            entry_time_str = trade.get("entry_time", "?")
-            # print(f"[DOMINANCE_EXIT BAR3] {entry_time_str} | side={trade['side']} | "
-            #       f"mfe_r={mfe_r:.3f} mae_r={_mae_r:.3f} ratio={_pressure_ratio:.2f} | "
-            #       f"exit_price={current_price:.5f} | "
-            #       f"stop_was={trade['stop_loss']:.5f} R={R:.5f}")
-            self._exit(current_price, idx, "dominance_exit")
-            return
-
-        # ── TRAP REJECTION EXIT ──────────────────────────────────────
-        # Catches bars where the trade had some MFE (so dominance_exit
-        # doesn't fire) but the adverse move is so extreme relative to
-        # the favorable move that the candle is effectively a trap.
-        # Only fires in bars 1–2 to avoid interfering with normal
-        # multi-bar trades that dip before continuing.
-        #
-        # Conditions:
-        #   _mae_r > 1.2R  — adverse move is already larger than the
-        #                     original stop, meaning the bar blew through
-        #                     the stop on a wick (gap/spike scenario)
-        #   ratio > 4.0    — adverse is at least 4× the favorable move
-        #                     (protects volatile winners like MFE=1.5R /
-        #                      MAE=1.6R which have ratio ≈ 1.1 and survive)
-        #
-        # The ratio guard is the key discriminator:
-        #   MFE=0.23R MAE=2.80R → ratio=12.2 → FIRES   (pure rejection)
-        #   MFE=0.60R MAE=1.48R → ratio=2.47 → SURVIVES (had real move)
-        #   MFE=1.50R MAE=1.60R → ratio=1.07 → SURVIVES (volatile winner)
-        if _bars <= 2 and _mae_r > 1.2:
-            _trap_ratio = _mae_r / max(mfe_r, 0.05)
-            if _trap_ratio > 4.0:
-                entry_time_str = trade.get("entry_time", "?")
-                print(f"[TRAP_REJECTION] {entry_time_str} | side={trade['side']} | "
-                      f"bars={_bars} mfe_r={mfe_r:.3f} mae_r={_mae_r:.3f} "
-                      f"trap_ratio={_trap_ratio:.2f} | "
-                      f"exit_price={current_price:.5f} R={R:.5f}")
-                self._exit(current_price, idx, "trap_rejection")
-                return
-
-        # ── THESIS INVALIDATION EXIT ──────────────────────────────────
-        # Replaces time-based slow_bleed_exit with a price-structure exit.
-        #
-        # The old approach used bars_since_peak — a proxy for stagnation
-        # that fires at different points in a trade's life depending on
-        # symbol tempo (ICX reverses in 5 bars, LINK drifts 50-90 bars).
-        # That mismatch is why no single BARS threshold improved all symbols.
-        #
-        # This version asks the question directly:
-        #   "Is this trade underwater AND nearly at the stop?"
-        # which is symbol-agnostic and denominated in R.
-        #
-        # Three conditions must ALL be true:
-        #   1. mfe_r in 0.15–0.5: trade showed real but limited promise
-        #   2. pnl_r < -0.10:     trade is now meaningfully underwater
-        #   3. stop_proximity_r < 0.25: less than 0.25R remains before
-        #      the original stop — thesis is about to be formally proven
-        #      wrong; exit now rather than wait for the stop to confirm it
-        #
-        # Additionally requires drawdown_from_peak > 0.35 to ensure price
-        # has actually reversed from its high, not just entered from a
-        # low base. Prevents firing on trades that were always losing.
-        if 0.15 <= mfe_r < 0.5:
-            if side == 1:
-                stop_proximity_r = (current_price - trade.get("initial_stop", trade["stop_loss"])) / R
-            else:
-                stop_proximity_r = (trade.get("initial_stop", trade["stop_loss"]) - current_price) / R
-
-            drawdown_from_peak = mfe_r - pnl_r
-
-            if pnl_r < -0.10 and stop_proximity_r < 0.25 and drawdown_from_peak > 0.35:
-                entry_time_str = trade.get("entry_time", "?")
-                # print(f"[THESIS_INVALID_EXIT] {entry_time_str} | side={trade['side']} | "
-                #       f"mfe_r={mfe_r:.3f} pnl_r={pnl_r:.3f} | "
-                #       f"stop_proximity_r={stop_proximity_r:.3f} drawdown_from_peak={drawdown_from_peak:.3f} | "
-                #       f"exit_price={current_price:.5f} R={R:.5f}")
-                self._exit(current_price, idx, "thesis_invalidation_exit")
-                return
-
-        # ── STOP PROXIMITY EXIT ──────────────────────────────────────
-        # Fires when the trade is already substantially underwater AND
-        # within a small buffer of the original stop.
-        # Rationale: if pnl_r is already -0.35R and the stop is only
-        # 0.20R away, the stop will confirm the failure within 1-2 bars
-        # anyway — exit now at a marginally better price rather than
-        # waiting for the hard stop.
-        #
-        # Intentionally separate from THESIS_INVALID_EXIT:
-        #   - Thesis invalid targets 0.15–0.5R MFE trades specifically
-        #   - This targets any trade (including mfe_r=0) that is bleeding
-        #     toward the stop slowly without triggering OIE or dominance
-        #
-        # Guards that prevent firing on healthy trades:
-        #   pnl_r < -0.35   — trade must already be meaningfully wrong
-        #   proximity < 0.20 — within 0.20R of the original stop
-        #   mfe_r < 0.5     — trail hasn't activated; once trail is live
-        #                     it owns the trade, this exit steps aside
-        #
-        # Debug: [STOP_PROXIMITY_EXIT] lines show every fire with full
-        # state so you can audit if it's cutting anything it shouldn't.
-        if mfe_r < 0.5 and pnl_r < -0.35:
-            if side == 1:
-                prox_r = (current_price - trade.get("initial_stop", trade["stop_loss"])) / R
-            else:
-                prox_r = (trade.get("initial_stop", trade["stop_loss"]) - current_price) / R
-
-            if prox_r < 0.20:
-                entry_time_str = trade.get("entry_time", "?")
-                print(f"[STOP_PROXIMITY_EXIT] {entry_time_str} | side={trade['side']} | "
-                      f"mfe_r={mfe_r:.3f} pnl_r={pnl_r:.3f} prox_r={prox_r:.3f} | "
-                      f"bars={_bars} exit_price={current_price:.5f} R={R:.5f}")
-                self._exit(current_price, idx, "stop_proximity_exit")
-                return
-
-        # ── OPPOSITE IMPULSE EXIT (matches lifecycle.py exactly)
-        if self.opposite_impulse_exit(window_5m, side, trade=trade):
-            if side == 1:
-                oie_stop_proximity = (current_price - trade.get("initial_stop", trade["stop_loss"])) / R
-            else:
-                oie_stop_proximity = (trade.get("initial_stop", trade["stop_loss"]) - current_price) / R
-            oie_drawdown_from_peak = mfe_r - pnl_r
-            entry_time_str = trade.get("entry_time", "?")
-            # print(f"[OIE_FIRE] {entry_time_str} | side={trade['side']} | "
-            #       f"mfe_r={mfe_r:.3f} pnl_r={pnl_r:.3f} | "
-            #       f"stop_proximity_r={oie_stop_proximity:.3f} drawdown_from_peak={oie_drawdown_from_peak:.3f} | "
-            #       f"bars={_bars} exit_price={current_price:.5f}")
-            self._exit(current_price, idx, "opposite_impulse")
-            return
-
-        # ── LIQUIDATION (leverage only) ─────────────────────────
-        if (self.leverage > 1
-                and hasattr(self, 'liquidation_price')
-                and self.liquidation_price is not None):
-            if side == 1 and low <= self.liquidation_price:
-                self._exit(self.liquidation_price, idx, "liquidated")
-                return
-            elif side == -1 and high >= self.liquidation_price:
-                self._exit(self.liquidation_price, idx, "liquidated")
-                return
-
-        # ── HARD STOP — checked before impulse exit ─────────────
-        if side == 1 and low <= trade["stop_loss"]:
-            self._exit(trade["stop_loss"], idx, "stop_loss")
-            return
-        elif side == -1 and high >= trade["stop_loss"]:
-            self._exit(trade["stop_loss"], idx, "stop_loss")
-            return
-
-        # increment AFTER all exit checks — matches lifecycle.py ordering
-        trade["bars_in_trade"] = trade.get("bars_in_trade", 0) + 1
-
     # ------------------------
     # Run backtest
     # ------------------------
@@ -985,54 +628,19 @@ class SignalBacktester:
         
     
     def run(self):
-        df_5m = self.lltf_df if hasattr(self, 'lltf_df') else self.df
-        equity = []
-        timestamps = []
-
-        for i in range(len(df_5m) - 1):
-            ltf_idx = df_5m['ltf_index'].iloc[i] if hasattr(self, 'lltf_df') else i
-
-            if self.current_ltf_index is None:
-                self.current_ltf_index = ltf_idx
-
-            if ltf_idx != self.current_ltf_index:
-                # New 1H candle = new trading opportunity
-                self.current_ltf_index = ltf_idx
-                self.trade_taken_this_ltf = self.position != 0  # ← fix
-
-            signal = df_5m['final_signal'].iloc[i]
-
-            o = df_5m['open'].iloc[i]
-            h = df_5m['high'].iloc[i]
-            l = df_5m['low'].iloc[i]
-
-            # 2. ENTER (only one trade allowed per 1H candle)
-            if self.position == 0 and not self.trade_taken_this_ltf:
-                if signal == 1:
-                    self._enter(1, o, i)
-                elif signal == -1:
-                    self._enter(-1, o, i)
-
-            # 3. Update excursions
-            if self.position != 0:
-                self._update_excursions(h, l)
-
-            # 4. Intrabar exits (trap, expansion failure, time decay, stops)
-            if self.position != 0 and (i - self.current_trade["entry_idx"]) >= 1:
-                self._check_intrabar(h, l, i)
-
-            equity.append(self.balance)
-            timestamps.append(df_5m.index[i])
-
-        if self.position != 0:
-            self._exit(df_5m['close'].iloc[-1], len(df_5m) - 1, "end_of_data")
+        a = self._core_arrays()
+        self._disaster_log = {}
+        if self.audit:
+            self._audit_log = []
 
+        equity, buf = self._run_core(a)
         equity_df = pd.DataFrame({
-            "timestamp": timestamps,
+            "timestamp": a["index"][:a["steps"]],
             "equity":    equity
         }).set_index("timestamp")
 
-        trades_df = pd.DataFrame(self.trades)
+        trades_df = self._trades_frame(a, buf)
+        self.trades = trades_df.to_dict("records")
         if not trades_df.empty:
             trades_df["direction"] = trades_df["side"].map({1: "LONG", -1: "SHORT"})
             trades_df["pnl_pct"]   = trades_df["pnl"] / self.initial_balance * 100
@@ -1292,7 +900,7 @@ class SignalBacktester:
 
             # Positional alignment: groups and non-"end_of_data" trade rows
             # are both built in strict chronological order within the same
-            # forward pass, one group per trade that reached _check_intrabar.
+            # forward pass, one group per trade that reached _trade_path.
             _trades_aligned = (
                 trades_df[trades_df["exit_reason"] != "end_of_data"].reset_index(drop=True)
                 if not trades_df.empty else pd.DataFrame()
@@ -1468,8 +1076,10 @@ class SignalBacktester:
             # using entry_time as the join key — more reliable than
             # bar index since _disaster_log is also keyed by entry_time.
             _trade_lookup = {
-                str(row["entry_time"]): row
-                for _, row in trades_df.iterrows()
+                str(ts): {"pnl_r": pnl_r, "exit_reason": reason}
+                for ts, pnl_r, reason in zip(
+                    trades_df["entry_time"], trades_df["pnl_r"], trades_df["exit_reason"]
+                )
             }
             for _key, _rec in self._disaster_log.items():
                 if _key in _trade_lookup:
@@ -1584,12 +1194,15 @@ class SignalBacktester:
                 trades_in_log.append(current_group)
 
             # Take the last trade's audit entries, then filter to last hour
+            # entries hold row positions; bars and windows are read back here
+            exec_df = self._exec_df()
             last_trade_log = trades_in_log[-1] if trades_in_log else []
-            cutoff_ts = last_trade_log[-1]["ts"] - pd.Timedelta(hours=1) if last_trade_log else None
-            recent = [e for e in last_trade_log if cutoff_ts is None or e["ts"] >= cutoff_ts]
+            cutoff_ts = exec_df.index[last_trade_log[-1]["idx"]] - pd.Timedelta(hours=1) if last_trade_log else None
+            recent = [e for e in last_trade_log if cutoff_ts is None or exec_df.index[e["idx"]] >= cutoff_ts]
 
             print(f"\n=== EXIT FILTER AUDIT (last hour of most recent trade: {len(recent)} bars) ===")
             for entry in recent:
+                bar = exec_df.iloc[entry["idx"]]
                 print(format_exit_audit(
                     symbol="BACKTEST",
                     side=entry["side"],
@@ -1597,16 +1210,16 @@ class SignalBacktester:
                     mfe_r=entry["mfe_r"],
                     pnl_r=entry["pnl_r"],
                     mae_r=entry["mae_r"],
-                    bar_open=entry["bar_open"],
-                    bar_high=entry["bar_high"],
-                    bar_low=entry["bar_low"],
-                    bar_close=entry["bar_close"],
+                    bar_open=float(bar["open"]),
+                    bar_high=float(bar["high"]),
+                    bar_low=float(bar["low"]),
+                    bar_close=float(bar["close"]),
                     stop_loss=entry["stop_loss"],
                     initial_stop=entry["initial_stop"],
                     R=entry["R"],
                     atr_5m=entry["atr_5m"],
-                    window_5m=entry["window_5m"],
-                    ts=entry["ts"],
+                    window_5m=exec_df.iloc[max(entry["entry_idx"], entry["idx"] + 1 - RING_BARS):entry["idx"] + 1],
+                    ts=exec_df.index[entry["idx"]],
                 ))
             self._audit_log = []
 
@@ -478,6 +478,11 @@ def run_multi_symbol_analysis(symbol_dfs, forward_bars=12, score_threshold=3, si
                         ltf  = generate_signal(ltf.copy(), htf, symbol=sym)
                         symbol_dfs[sym] = ltf
 
+                or, for a large universe, all symbols in one panel pass:
+
+                    from indicators.panel import generate_signals
+                    symbol_dfs = generate_signals(ltf_frames, htf_frames, engine="panel")
+
                     from breakout_health_analysis import run_multi_symbol_analysis
                     combined = run_multi_symbol_analysis(symbol_dfs)
 
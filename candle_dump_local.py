@@ -25,10 +25,13 @@ from datetime import datetime, timezone, timedelta
 
 import pandas as pd
 
+from data_pipeline.candle_store import CandleStore
+
 
 def dump_candles(symbol, source="backtest", hours_back=4, start=None, end=None):
     symbol = symbol.upper()
     cache_dir = "data/backtest_cache" if source == "backtest" else "data/cache"
+    store = CandleStore(cache_dir)
 
     now_utc = datetime.now(timezone.utc)
     end_ts = pd.Timestamp(end, tz="UTC") if end else pd.Timestamp(now_utc)
@@ -45,15 +48,12 @@ def dump_candles(symbol, source="backtest", hours_back=4, start=None, end=None):
     }
 
     for tf in ("5m", "1h", "4h"):
-        path = os.path.join(cache_dir, f"{symbol}_{tf}.parquet")
-
-        if not os.path.exists(path):
-            result["timeframes"][tf] = {"exists": False, "path": path}
+        if not store.exists(symbol, tf):
+            result["timeframes"][tf] = {"exists": False, "path": os.path.join(cache_dir, f"{symbol}_{tf}/")}
             continue
 
         try:
-            df = pd.read_parquet(path)
-            df.index = pd.to_datetime(df.index, utc=True)
+            df = store.load(symbol, tf)
             window = df.loc[start_ts:end_ts, ["open", "high", "low", "close", "volume"]]
 
             result["timeframes"][tf] = {
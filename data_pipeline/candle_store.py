@@ -0,0 +1,358 @@
+# data_pipeline/candle_store.py
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data_pipeline.feature_store import FeatureStore
+
+# ==========================================================
+# PARTITIONED CANDLE STORE
+# ==========================================================
+# Candles for one (symbol, timeframe) live in a directory of parquet
+# segments, one per calendar period:
+#
+#   <root>/<symbol>_<tf>/<period>.parquet
+#
+#   5m      → one segment per UTC week (Monday start, ≤ 2016 rows)
+#   1h / 4h → one segment per UTC month
+#
+# write() makes the stored frame equal to the frame it is given but only
+# rewrites the segments whose rows actually changed — a new 5m bar
+# touches the tail week, a revalidation touches the weeks it corrected,
+# and a lookback trim just unlinks the segments that fell off the front.
+# Every segment is replaced atomically (.tmp + os.replace).
+#
+# Segments read from disk are memoised per process keyed by
+# (mtime, size), so a resident process re-reads only what changed since
+# its last look.
+#
+# A legacy single-file cache (<root>/<symbol>_<tf>.parquet) is split
+# into segments the first time the store touches that key.
+#
+# For multi-year backtests mmap() serves the same candles out of a
+# fixed-width binary mirror (a FeatureStore under <root>/mmap/: int64
+# timestamps plus one float64 file per column) as np.memmap columns, so
+# a frame and its time slices cost no RAM until touched. The mirror is
+# converted from the parquet segments on demand and follows them by
+# appending when only the tail changed.
+
+SEGMENT_SUFFIX = ".parquet"
+MONTHLY_TFS = ("1h", "4h")
+MMAP_DIR = "mmap"
+
+
+class CandleStore:
+    def __init__(self, root: str):
+        self.root = root
+        self._cache = {}
+        self._lock = threading.Lock()
+        # one writer per key at a time — the kline stream appends closed
+        # bars from its own thread while a pass may be rewriting the key
+        self._key_locks = {}
+        self._mirror = FeatureStore(os.path.join(root, MMAP_DIR))
+
+    # --------------------------------------------------
+    # PATHS
+    # --------------------------------------------------
+    def _key_dir(self, symbol: str, tf: str) -> str:
+        return os.path.join(self.root, f"{symbol}_{tf}")
+
+    def legacy_path(self, symbol: str, tf: str) -> str:
+        return os.path.join(self.root, f"{symbol}_{tf}.parquet")
+
+    def _segment_path(self, symbol: str, tf: str, name: str) -> str:
+        return os.path.join(self._key_dir(symbol, tf), name + SEGMENT_SUFFIX)
+
+    def _key_lock(self, symbol: str, tf: str) -> threading.RLock:
+        with self._lock:
+            return self._key_locks.setdefault((symbol, tf), threading.RLock())
+
+    @staticmethod
+    def segment_names(index: pd.DatetimeIndex, tf: str) -> np.ndarray:
+        """Segment name for every timestamp of a UTC DatetimeIndex."""
+        values = index.tz_convert("UTC").tz_localize(None).values
+        if tf in MONTHLY_TFS:
+            return np.datetime_as_string(values.astype("datetime64[M]"), unit="M")
+        # 1970-01-01 was a Thursday: shift by 3 days so weeks start Monday
+        days = values.astype("datetime64[D]").astype(np.int64)
+        monday = (days + 3) // 7 * 7 - 3
+        return np.datetime_as_string(monday.astype("datetime64[D]"), unit="D")
+
+    def segments(self, symbol: str, tf: str) -> list:
+        self._migrate(symbol, tf)
+        key_dir = self._key_dir(symbol, tf)
+        if not os.path.isdir(key_dir):
+            return []
+        return sorted(
+            f[:-len(SEGMENT_SUFFIX)] for f in os.listdir(key_dir)
+            if f.endswith(SEGMENT_SUFFIX)
+        )
+
+    def exists(self, symbol: str, tf: str) -> bool:
+        return bool(self.segments(symbol, tf))
+
+    # --------------------------------------------------
+    # READ
+    # --------------------------------------------------
+    @staticmethod
+    def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+        index = df.index
+        if not (isinstance(index, pd.DatetimeIndex) and str(index.tz) == "UTC"):
+            index = pd.to_datetime(index, utc=True)
+        if index.name is None and index.freq is None and index is df.index:
+            return df
+        return df.set_axis(pd.DatetimeIndex(index, name=None, freq=None), axis=0)
+
+    @staticmethod
+    def _same(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+        return (
+            len(a) == len(b)
+            and list(a.columns) == list(b.columns)
+            and a.index.equals(b.index)
+            and all(np.array_equal(a[c].to_numpy(), b[c].to_numpy(),
+                                   equal_nan=a[c].dtype.kind == "f")
+                    for c in a.columns)
+        )
+
+    def _read_segment(self, path: str):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        key = os.path.abspath(path)
+
+        with self._lock:
+            hit = self._cache.get(key)
+        if hit is not None and hit[0] == stamp:
+            return hit[1]
+
+        df = self._normalize(pd.read_parquet(path))
+        with self._lock:
+            self._cache[key] = (stamp, df)
+        return df
+
+    def read(self, symbol: str, tf: str, columns=None, start=None):
+        """
+        Stored candles as one sorted DataFrame with a UTC DatetimeIndex,
+        or None when nothing is stored. `start` skips whole segments that
+        end before it (rows before `start` are dropped as well).
+        """
+        names = self.segments(symbol, tf)
+        if start is not None and names:
+            start = pd.Timestamp(start)
+            start = start.tz_localize("UTC") if start.tzinfo is None else start.tz_convert("UTC")
+            first = self.segment_names(pd.DatetimeIndex([start]), tf)[0]
+            names = [n for n in names if n >= first]
+
+        parts = [self._read_segment(self._segment_path(symbol, tf, n)) for n in names]
+        parts = [p for p in parts if p is not None and not p.empty]
+        if not parts:
+            return None
+
+        df = pd.concat(parts) if len(parts) > 1 else parts[0].copy()
+        if start is not None:
+            df = df[df.index >= start]
+        if columns is not None:
+            df = df[list(columns)]
+        return df
+
+    def load(self, symbol: str, tf: str, columns=None, start=None) -> pd.DataFrame:
+        """read(), raising FileNotFoundError instead of returning None."""
+        df = self.read(symbol, tf, columns=columns, start=start)
+        if df is None:
+            raise FileNotFoundError(f"no {tf} candles stored for {symbol} under {self.root}")
+        return df
+
+    def last_index(self, symbol: str, tf: str):
+        """Timestamp of the newest stored bar — reads the tail segment only."""
+        for name in reversed(self.segments(symbol, tf)):
+            df = self._read_segment(self._segment_path(symbol, tf, name))
+            if df is not None and not df.empty:
+                return df.index[-1]
+        return None
+
+    # --------------------------------------------------
+    # WRITE
+    # --------------------------------------------------
+    def _write_segment(self, path: str, df: pd.DataFrame):
+        df.to_parquet(path + ".tmp")
+        os.replace(path + ".tmp", path)
+        st = os.stat(path)
+        with self._lock:
+            self._cache[os.path.abspath(path)] = ((st.st_mtime_ns, st.st_size), df)
+
+    def write(self, symbol: str, tf: str, df: pd.DataFrame) -> int:
+        """
+        Make the stored candles equal to `df`. Only segments whose rows
+        differ from what is on disk are rewritten; segments with no rows
+        left in `df` are removed. Returns the number of segments written.
+        """
+        with self._key_lock(symbol, tf):
+            df = self._normalize(df)
+            df = df[~df.index.duplicated(keep="last")].sort_index()
+
+            names = self.segment_names(df.index, tf)
+            old_names = self.segments(symbol, tf)
+
+            # index is sorted, so each segment is one contiguous run
+            cuts = np.flatnonzero(names[1:] != names[:-1]) + 1
+            starts, ends = np.r_[0, cuts], np.r_[cuts, len(names)]
+            new_names = [str(names[i]) for i in starts] if len(names) else []
+
+            key_dir = self._key_dir(symbol, tf)
+            os.makedirs(key_dir, exist_ok=True)
+
+            for name in set(old_names) - set(new_names):
+                path = self._segment_path(symbol, tf, name)
+                os.remove(path)
+                with self._lock:
+                    self._cache.pop(os.path.abspath(path), None)
+
+            written = 0
+            for name, a, b in zip(new_names, starts, ends):
+                seg = df.iloc[a:b]
+                path = self._segment_path(symbol, tf, name)
+                old = self._read_segment(path) if name in old_names else None
+                if old is not None and self._same(old, seg):
+                    continue
+                self._write_segment(path, seg)
+                written += 1
+            return written
+
+    def append(self, symbol: str, tf: str, new: pd.DataFrame) -> int:
+        """
+        Merge `new` bars into the store (new rows win on duplicate
+        timestamps). Reads and rewrites only the segments `new` falls in.
+        """
+        with self._key_lock(symbol, tf):
+            if new is None or new.empty:
+                return 0
+            new = self._normalize(new)
+            new = new[~new.index.duplicated(keep="last")].sort_index()
+
+            self._migrate(symbol, tf)
+            names = self.segment_names(new.index, tf)
+            os.makedirs(self._key_dir(symbol, tf), exist_ok=True)
+
+            written = 0
+            for name in dict.fromkeys(names):
+                path = self._segment_path(symbol, tf, name)
+                part = new[names == name]
+                old = self._read_segment(path)
+                if old is not None and not old.empty:
+                    merged = pd.concat([old, part])
+                    merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+                    if self._same(merged, old):
+                        continue
+                    part = merged
+                self._write_segment(path, part)
+                written += 1
+            return written
+
+    def extend(self, symbol: str, tf: str, new: pd.DataFrame, step: pd.Timedelta):
+        """
+        append() for bars that must continue the stored tail: returns None
+        without writing when the first new bar is more than `step` past
+        the last stored one (it would leave a hole a tail check can't see).
+        """
+        with self._key_lock(symbol, tf):
+            last = self.last_index(symbol, tf)
+            if last is None or new.index[0] - last > step:
+                return None
+            return self.append(symbol, tf, new)
+
+    def delete(self, symbol: str, tf: str):
+        key_dir = os.path.abspath(self._key_dir(symbol, tf))
+        shutil.rmtree(key_dir, ignore_errors=True)
+        self._mirror.delete(f"{symbol}_{tf}")
+        legacy = self.legacy_path(symbol, tf)
+        if os.path.exists(legacy):
+            os.remove(legacy)
+        with self._lock:
+            for path in [p for p in self._cache if p.startswith(key_dir + os.sep)]:
+                del self._cache[path]
+
+    # --------------------------------------------------
+    # MEMORY-MAPPED MIRROR
+    # --------------------------------------------------
+    def _signature(self, symbol: str, tf: str) -> list:
+        sig = []
+        for name in self.segments(symbol, tf):
+            try:
+                st = os.stat(self._segment_path(symbol, tf, name))
+            except FileNotFoundError:
+                continue
+            sig.append([name, st.st_mtime_ns, st.st_size])
+        return sig
+
+    def _sync_mirror(self, symbol: str, tf: str, sig: list, meta):
+        key = f"{symbol}_{tf}"
+        old = [] if meta is None else meta["extra"].get("segments", [])
+
+        # segments before the first changed one must be untouched,
+        # otherwise rows in the middle moved and the mirror is rebuilt;
+        # so is a mirror whose newest segment is gone (nothing to append)
+        n_same = 0
+        while n_same < min(len(old), len(sig)) and old[n_same] == sig[n_same]:
+            n_same += 1
+        changed = [name for name, _, _ in sig[n_same:]]
+        if meta is not None and old and n_same >= len(old) - 1 and meta["rows"] \
+                and changed and len(sig) >= len(old):
+            fresh = pd.concat([
+                self._read_segment(self._segment_path(symbol, tf, name)) for name in changed
+            ])
+            last = self._mirror.last_index(key)
+            overlap = fresh[fresh.index <= last]
+            stored = self._mirror.read(key, tail=len(overlap))
+            if (
+                list(fresh.columns) == [c for c, _ in meta["columns"]]
+                and len(stored) == len(overlap)
+                and self._same(stored, overlap)
+                and self._mirror.append(key, fresh[fresh.index > last], segments=sig)
+            ):
+                return
+
+        df = self.read(symbol, tf)
+        self._mirror.write(key, df, segments=sig)
+        print(f"[CANDLE STORE] {key} → memmap mirror ({len(df)} rows)")
+
+    def mmap(self, symbol: str, tf: str, columns=None, start=None, end=None):
+        """
+        Stored candles as a DataFrame of copy-on-write np.memmap columns
+        (see FeatureStore.view), bringing the binary mirror up to date
+        with the parquet segments first. start / end are inclusive and
+        slice without copying. Returns None when nothing is stored.
+        """
+        sig = self._signature(symbol, tf)
+        if not sig:
+            return None
+        key = f"{symbol}_{tf}"
+        meta = self._mirror.meta(key)
+        if meta is None or meta["extra"].get("segments") != sig:
+            self._sync_mirror(symbol, tf, sig, meta)
+        return self._mirror.view(key, columns=columns, start=start, end=end)
+
+    # --------------------------------------------------
+    # LEGACY SINGLE-FILE CACHE
+    # --------------------------------------------------
+    def _migrate(self, symbol: str, tf: str):
+        legacy = self.legacy_path(symbol, tf)
+        if not os.path.exists(legacy):
+            return
+        # claim the file first: append() below comes back through here,
+        # and so may another thread touching the same key
+        claimed = legacy + ".migrating"
+        try:
+            os.replace(legacy, claimed)
+        except FileNotFoundError:
+            return
+        if os.path.getsize(claimed) > 0:
+            df = pd.read_parquet(claimed)
+            if not df.empty:
+                self.append(symbol, tf, df)
+        os.remove(claimed)
+        print(f"[CANDLE STORE] migrated {legacy} → {self._key_dir(symbol, tf)}/")
@@ -0,0 +1,260 @@
+# data_pipeline/feature_store.py
+import os
+import json
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# ==========================================================
+# COLUMNAR FEATURE STORE
+# ==========================================================
+# One directory per key (symbol). Every column is a flat binary file of
+# its NumPy dtype, plus one int64 file for the DatetimeIndex, so a
+# reader can pull a column subset or just the last row by seeking,
+# and a writer can append rows without touching the rest.
+#
+#   <root>/<key>/meta.json       — generation, row count, schema, extras
+#   <root>/<key>/g<N>/index.bin
+#   <root>/<key>/g<N>/c0000.bin  — columns by position in meta["columns"]
+#
+# meta.json is the commit point: it is replaced atomically after the
+# data files are written, and readers never look past meta["rows"]. A
+# full rewrite goes to a fresh generation directory, so a crash mid-write
+# leaves the previous generation readable.
+
+META_FILE  = "meta.json"
+INDEX_FILE = "index.bin"
+
+SUPPORTED_KINDS = "biuf"    # bool, int, uint, float
+
+
+class FeatureStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    # --------------------------------------------------
+    # PATHS / META
+    # --------------------------------------------------
+    def _key_dir(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def _gen_dir(self, key: str, gen: int) -> str:
+        return os.path.join(self._key_dir(key), f"g{gen}")
+
+    def meta(self, key: str):
+        path = os.path.join(self._key_dir(key), META_FILE)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def _save_meta(self, key: str, meta: dict):
+        path = os.path.join(self._key_dir(key), META_FILE)
+        tmp = f"{path}.{os.getpid()}.tmp"     # processes may share a key (cache hits in sweep workers)
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
+
+    def columns(self, key: str) -> list:
+        meta = self.meta(key)
+        return [] if meta is None else [name for name, _ in meta["columns"]]
+
+    def last_index(self, key: str):
+        meta = self.meta(key)
+        if meta is None or meta["rows"] == 0:
+            return None
+        return self._read_index(key, meta, meta["rows"] - 1, 1)[0]
+
+    # --------------------------------------------------
+    # WRITE
+    # --------------------------------------------------
+    @staticmethod
+    def _schema(df: pd.DataFrame) -> list:
+        if not isinstance(df.index, pd.DatetimeIndex):
+            raise TypeError("FeatureStore needs a DatetimeIndex")
+        schema = []
+        for name, dtype in df.dtypes.items():
+            if not isinstance(name, str):
+                raise TypeError(f"FeatureStore column names must be str, got {name!r}")
+            if dtype.kind not in SUPPORTED_KINDS:
+                raise TypeError(f"FeatureStore cannot store column {name!r} of dtype {dtype}")
+            schema.append([name, dtype.str])
+        return schema
+
+    def write(self, key: str, df: pd.DataFrame, **extra):
+        """Replaces everything stored under key with df."""
+        schema = self._schema(df)
+
+        old = self.meta(key)
+        gen = 0 if old is None else old["gen"] + 1
+        gen_dir = self._gen_dir(key, gen)
+        if os.path.exists(gen_dir):
+            shutil.rmtree(gen_dir)
+        os.makedirs(gen_dir)
+
+        df.index.asi8.astype("<i8").tofile(os.path.join(gen_dir, INDEX_FILE))
+        for i, (name, dtype) in enumerate(schema):
+            df[name].to_numpy(dtype=dtype).tofile(os.path.join(gen_dir, f"c{i:04d}.bin"))
+
+        self._save_meta(key, {
+            "gen":        gen,
+            "rows":       len(df),
+            "columns":    schema,
+            "index_unit": df.index.unit,
+            "index_tz":   None if df.index.tz is None else str(df.index.tz),
+            "extra":      extra,
+        })
+
+        if old is not None:
+            shutil.rmtree(self._gen_dir(key, old["gen"]), ignore_errors=True)
+
+    def append(self, key: str, df: pd.DataFrame, **extra) -> bool:
+        """
+        Appends rows after the last stored row. Returns False (and writes
+        nothing) when there is nothing to append to, the schema differs
+        or the rows do not start after the stored tail — callers then
+        fall back to write().
+        """
+        meta = self.meta(key)
+        if meta is None or self._schema(df) != meta["columns"]:
+            return False
+        if meta["index_unit"] != df.index.unit:
+            return False
+
+        rows = meta["rows"]
+        if rows and len(df) and df.index.asi8[0] <= self._read_index(key, meta, rows - 1, 1).asi8[0]:
+            return False
+
+        gen_dir = self._gen_dir(key, meta["gen"])
+        items = [(INDEX_FILE, "<i8", df.index.asi8)]
+        items += [
+            (f"c{i:04d}.bin", dtype, df[name].to_numpy(dtype=dtype))
+            for i, (name, dtype) in enumerate(meta["columns"])
+        ]
+        for fname, dtype, values in items:
+            # seek to the committed end — anything past it is debris
+            # from an interrupted append
+            with open(os.path.join(gen_dir, fname), "r+b") as f:
+                f.seek(rows * np.dtype(dtype).itemsize)
+                f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+                f.truncate()
+
+        meta["rows"] = rows + len(df)
+        meta["extra"].update(extra)
+        self._save_meta(key, meta)
+        return True
+
+    def update_extra(self, key: str, **extra):
+        meta = self.meta(key)
+        if meta is not None:
+            meta["extra"].update(extra)
+            self._save_meta(key, meta)
+
+    # --------------------------------------------------
+    # READ
+    # --------------------------------------------------
+    def _read_index(self, key, meta, start, count) -> pd.DatetimeIndex:
+        path = os.path.join(self._gen_dir(key, meta["gen"]), INDEX_FILE)
+        with open(path, "rb") as f:
+            f.seek(start * 8)
+            raw = np.fromfile(f, dtype="<i8", count=count)
+        idx = pd.DatetimeIndex(raw.view(f"datetime64[{meta['index_unit']}]"))
+        # asi8 is always UTC epoch — localize to UTC, then convert back
+        return idx if meta["index_tz"] is None else idx.tz_localize("UTC").tz_convert(meta["index_tz"])
+
+    def read(self, key: str, columns=None, tail=None):
+        """
+        Reads key back as a DataFrame. columns limits the read to a subset
+        (names not in the store are skipped); tail limits it to the last
+        N rows. Returns None when nothing is stored under key.
+        """
+        meta = self.meta(key)
+        if meta is None:
+            return None
+
+        rows  = meta["rows"]
+        count = rows if tail is None else min(int(tail), rows)
+        start = rows - count
+
+        gen_dir = self._gen_dir(key, meta["gen"])
+        wanted  = None if columns is None else set(columns)
+
+        data = {}
+        for i, (name, dtype) in enumerate(meta["columns"]):
+            if wanted is not None and name not in wanted:
+                continue
+            dt = np.dtype(dtype)
+            with open(os.path.join(gen_dir, f"c{i:04d}.bin"), "rb") as f:
+                f.seek(start * dt.itemsize)
+                data[name] = np.fromfile(f, dtype=dt, count=count)
+
+        return pd.DataFrame(data, index=self._read_index(key, meta, start, count))
+
+    def _index_value(self, ts, meta) -> int:
+        ts = pd.Timestamp(ts)
+        if meta["index_tz"] is not None:
+            ts = ts.tz_localize(meta["index_tz"]) if ts.tzinfo is None else ts
+            ts = ts.tz_convert("UTC").tz_localize(None)
+        elif ts.tzinfo is not None:
+            ts = ts.tz_convert("UTC").tz_localize(None)
+        return ts.as_unit(meta["index_unit"])._value
+
+    def view(self, key: str, columns=None, start=None, end=None):
+        """
+        Like read(), but every column is a copy-on-write np.memmap of its
+        file: nothing is loaded until it is touched, writes to the frame
+        stay private to the process, and start / end (inclusive index
+        values) slice without copying. Returns None when nothing is stored.
+        """
+        meta = self.meta(key)
+        if meta is None:
+            return None
+        rows = meta["rows"]
+        if rows == 0:
+            return self.read(key, columns=columns)
+
+        gen_dir = self._gen_dir(key, meta["gen"])
+        raw = np.memmap(os.path.join(gen_dir, INDEX_FILE), dtype="<i8", mode="r", shape=(rows,))
+
+        lo = 0 if start is None else int(np.searchsorted(raw, self._index_value(start, meta), "left"))
+        hi = rows if end is None else int(np.searchsorted(raw, self._index_value(end, meta), "right"))
+        hi = max(lo, hi)
+
+        wanted = None if columns is None else set(columns)
+        data = {}
+        for i, (name, dtype) in enumerate(meta["columns"]):
+            if wanted is not None and name not in wanted:
+                continue
+            path = os.path.join(gen_dir, f"c{i:04d}.bin")
+            data[name] = np.memmap(path, dtype=np.dtype(dtype), mode="c", shape=(rows,))[lo:hi]
+
+        idx = pd.DatetimeIndex(np.asarray(raw[lo:hi]).view(f"datetime64[{meta['index_unit']}]"))
+        if meta["index_tz"] is not None:
+            idx = idx.tz_localize("UTC").tz_convert(meta["index_tz"])
+        # copy=False keeps one block per memmap instead of consolidating
+        return pd.DataFrame(data, index=idx, copy=False)
+
+    # --------------------------------------------------
+    # MAINTENANCE
+    # --------------------------------------------------
+    def compact(self, key: str, keep: int):
+        """Rewrites key keeping only its last `keep` rows."""
+        meta = self.meta(key)
+        if meta is None or meta["rows"] <= keep:
+            return
+        self.write(key, self.read(key, tail=keep), **meta["extra"])
+
+    def delete(self, key: str):
+        shutil.rmtree(self._key_dir(key), ignore_errors=True)
+
+    def wipe(self):
+        if not os.path.exists(self.root):
+            return
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
@@ -1,11 +1,15 @@
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
 import time
 
 import os as _os
 _PROXY_URL    = _os.getenv("PROXY_URL", "").strip()
-_BINANCE_BASE = "https://fapi.binance.com"
+# BINANCE_FAPI_BASE points the fetcher at a local fake server for tests
+_BINANCE_BASE = _os.getenv("BINANCE_FAPI_BASE", "https://fapi.binance.com").rstrip("/")
 BASE_URL = f"{_BINANCE_BASE}/fapi/v1/klines"
 PING_URL = f"{_BINANCE_BASE}/fapi/v1/ping"
 
@@ -13,6 +17,20 @@ PING_URL = f"{_BINANCE_BASE}/fapi/v1/ping"
 # requests handles user:pass@host:port auth correctly this way.
 _PROXIES = {"http": _PROXY_URL, "https": _PROXY_URL} if _PROXY_URL else None
 
+# Parallel range fetches in fetch_ohlcv_many(), and the pause between
+# pages of one paginated fetch. Throttling is the rate limiter's job
+# (check() before every request), so the pause defaults to none.
+FETCH_CONCURRENCY = max(1, int(_os.getenv("FETCH_CONCURRENCY", "4")))
+FETCH_PAGE_PAUSE  = float(_os.getenv("FETCH_PAGE_PAUSE", "0"))
+
+# One keep-alive session for every Binance call in the process, so pages,
+# symbols and worker threads reuse open TCP/TLS connections (and the
+# proxy tunnel) instead of handshaking per request. Sized for the symbol
+# pool in hourly_runner times FETCH_CONCURRENCY.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+_SESSION.mount("http://",  HTTPAdapter(pool_connections=4, pool_maxsize=32))
+
 print(f"[FETCHER] Using {'proxy: ' + _PROXY_URL if _PROXY_URL else 'direct Binance connection'}")
 from data_pipeline.rate_limiter import rate_limiter
 
@@ -22,7 +40,7 @@ def check_current_weight() -> int:
     Returns current weight, or -1 if banned/unreachable.
     """
     try:
-        r = requests.get(PING_URL, timeout=5, proxies=_PROXIES)
+        r = _SESSION.get(PING_URL, timeout=5, proxies=_PROXIES)
         if r.status_code == 418:
             retry_after = r.headers.get("Retry-After")
             retry_after_int = int(retry_after) if retry_after else None
@@ -73,12 +91,13 @@ def fetch_ohlcv(
 
     def safe_request(params, _request_counter=[0], _last_weight=[0]):
         try:
-            rate_limiter.check()  # blocks if banned, rate-limited, or weight-throttled
+            # blocks if banned, rate-limited, or the bucket is short for this priority
+            rate_limiter.check(weight=rate_limiter.klines_weight(params["limit"]))
 
             _request_counter[0] += 1
             req_num = _request_counter[0]
 
-            r = requests.get(BASE_URL, params=params, timeout=10, proxies=_PROXIES)
+            r = _SESSION.get(BASE_URL, params=params, timeout=10, proxies=_PROXIES)
 
             used_weight_raw = r.headers.get("X-MBX-USED-WEIGHT-1M", "0")
             used_weight = int(used_weight_raw) if used_weight_raw.isdigit() else 0
@@ -173,7 +192,8 @@ def fetch_ohlcv(
                 if len(data) < 1000:
                     break
 
-                time.sleep(1)
+                if FETCH_PAGE_PAUSE:
+                    time.sleep(FETCH_PAGE_PAUSE)
 
             if not all_data:
                 return pd.DataFrame()
@@ -219,4 +239,39 @@ def fetch_ohlcv(
             else:
                 time.sleep(2 ** attempt)
 
-    raise RuntimeError(f"Failed to fetch data for {symbol} — all {retries} attempts exhausted")
\ No newline at end of file
+    raise RuntimeError(f"Failed to fetch data for {symbol} — all {retries} attempts exhausted")
+
+
+def fetch_ohlcv_many(jobs, max_workers: int = None, verbose: bool = False) -> list:
+    """
+    Fetches independent ranges concurrently over the shared session.
+    jobs is a list of dicts of fetch_ohlcv() keyword arguments (symbol,
+    interval, start, end, ...). Returns one DataFrame per job, in job
+    order. Every request still goes through the rate limiter, under the
+    caller's request_priority(); if any job fails, the first failure is
+    raised once all jobs have finished.
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return []
+
+    def _run(job):
+        kwargs = {"verbose": verbose, **job}
+        try:
+            return fetch_ohlcv(**kwargs), None
+        except Exception as e:
+            return None, e
+
+    workers = min(max_workers or FETCH_CONCURRENCY, len(jobs))
+    if workers == 1:
+        results = [_run(job) for job in jobs]
+    else:
+        # workers inherit the caller's context (its request priority)
+        contexts = [contextvars.copy_context() for _ in jobs]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="klines") as pool:
+            results = list(pool.map(lambda ctx, job: ctx.run(_run, job), contexts, jobs))
+
+    for _, err in results:
+        if err is not None:
+            raise err
+    return [df for df, _ in results]
@@ -1,17 +1,204 @@
 # data_pipeline/rate_limiter.py
+import atexit
+import contextvars
+import mmap
+import struct
 import time
 import json
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:     # not POSIX — only the in-memory backend is available
+    fcntl = None
+
 STATE_FILE = "data/rate_limiter_state.json"
 
+# The limiter state lives in memory behind a lock. STATE_FILE is only a
+# snapshot for restarts: routine weight updates are written by a
+# background thread at most every RATE_LIMITER_FLUSH_SECONDS, while 429s,
+# 418s and the ghost-ban heal are written immediately (as is the ban
+# sentinel).
+#
+# RATE_LIMITER_BACKEND=shared lets several worker processes on one host
+# share one weight budget: the state fields live in a few bytes of a
+# memory-mapped file (STATE_FILE + ".shm") that every call reads and
+# updates under an exclusive flock.
+RATE_LIMITER_BACKEND       = os.getenv("RATE_LIMITER_BACKEND", "memory").strip().lower()
+RATE_LIMITER_FLUSH_SECONDS = float(os.getenv("RATE_LIMITER_FLUSH_SECONDS", "5"))
+
+# (attribute, type) in shared-memory order
+STATE_FIELDS = (
+    ("banned_until",         float),
+    ("rate_limited_until",   float),
+    ("current_weight",       int),
+    ("_weight_window_start", float),
+    ("_tokens",              float),
+    ("_tokens_at",           float),
+)
+
+# ── REQUEST PRIORITIES ───────────────────────────────────────────────────────
+# Every request is taken from a token bucket modelling Binance's 1-minute
+# weight window, under the priority class in effect (request_priority()).
+# A class may only spend the bucket down to its reserve, and waits while a
+# more urgent request in this process is waiting, so background refetches
+# yield first as headroom shrinks and an open position's stop check never
+# queues behind a continuity refetch storm.
+PRIORITY_EXIT       = 0   # symbols with an open position, order calls
+PRIORITY_SIGNAL     = 1   # regular per-symbol signal fetches (default)
+PRIORITY_REVALIDATE = 2   # continuity / revalidation / reconcile refetches
+PRIORITY_BACKFILL   = 3   # cold lookback extension, backtest downloads
+
+PRIORITY_NAMES = {
+    PRIORITY_EXIT:       "exit",
+    PRIORITY_SIGNAL:     "signal",
+    PRIORITY_REVALIDATE: "revalidate",
+    PRIORITY_BACKFILL:   "backfill",
+}
+
+# share of the bucket each class leaves untouched for the classes above it
+PRIORITY_RESERVE = {
+    PRIORITY_EXIT:       0.0,
+    PRIORITY_SIGNAL:     0.10,
+    PRIORITY_REVALIDATE: 0.30,
+    PRIORITY_BACKFILL:   0.50,
+}
+
+_priority = contextvars.ContextVar("rate_limiter_priority", default=PRIORITY_SIGNAL)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+@contextmanager
+def request_priority(priority: int):
+    """
+    Run the block's Binance requests under `priority`. Nested blocks
+    override the outer class, except that work done under PRIORITY_EXIT
+    stays exit-critical (a continuity refetch for a symbol with an open
+    position is part of its stop check).
+    """
+    outer = _priority.get()
+    token = _priority.set(PRIORITY_EXIT if outer == PRIORITY_EXIT else priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class _MemoryBackend:
+    """Single process: the limiter's own attributes are the state."""
+
+    @contextmanager
+    def locked(self):
+        yield
+
+    def attach(self, limiter):
+        pass
+
+    def pull(self, limiter):
+        pass
+
+    def push(self, limiter):
+        pass
+
+
+class _SharedBackend:
+    """
+    Worker processes on one host: an initialised flag and the state
+    fields as little-endian float64s in a memory-mapped file, read and
+    written under flock.
+    """
+    LAYOUT = struct.Struct("<%dd" % (1 + len(STATE_FIELDS)))
+
+    def __init__(self, path: str):
+        if fcntl is None:
+            raise RuntimeError("RATE_LIMITER_BACKEND=shared needs fcntl (POSIX)")
+        self.path = path
+        self._depth = 0
+        self._open()
+
+    def _open(self):
+        # flock belongs to the open file description, which a forked
+        # child would share with its parent — each process opens its own
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._pid = os.getpid()
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < self.LAYOUT.size:
+                os.ftruncate(self._fd, self.LAYOUT.size)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._fd, self.LAYOUT.size)
+
+    @contextmanager
+    def locked(self):
+        # re-entrant: callers hold the limiter's thread lock, and one
+        # limiter method may call another (headroom() inside the gate)
+        if self._depth == 0:
+            if os.getpid() != self._pid:
+                self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def attach(self, limiter):
+        """
+        Join the shared state. The first process seeds it from its own
+        (state file + sentinel) view; later ones keep the live weight
+        window and the later of the two ban / 429 deadlines.
+        """
+        ready, *values = self.LAYOUT.unpack_from(self._map)
+        if ready:
+            shared = {name: cast(v) for (name, cast), v in zip(STATE_FIELDS, values)}
+            for name in ("banned_until", "rate_limited_until"):
+                shared[name] = max(shared[name], getattr(limiter, name))
+            for name, value in shared.items():
+                setattr(limiter, name, value)
+        self.push(limiter)
+
+    def pull(self, limiter):
+        ready, *values = self.LAYOUT.unpack_from(self._map)
+        if ready:
+            for (name, cast), v in zip(STATE_FIELDS, values):
+                setattr(limiter, name, cast(v))
+
+    def push(self, limiter):
+        self.LAYOUT.pack_into(self._map, 0, 1.0, *(float(getattr(limiter, name)) for name, _ in STATE_FIELDS))
+
+
 class BinanceRateLimiter:
-    def __init__(self):
+    def __init__(self, backend: str = RATE_LIMITER_BACKEND):
         self.banned_until = 0
         self.rate_limited_until = 0
         self.current_weight = 0
         self._weight_window_start = time.time()
+        self._tokens = float(self.BUCKET_CAPACITY)
+        self._tokens_at = time.time()
+        # symbols run on a thread pool share this instance: _lock guards
+        # the state fields, _io_lock serialises state-file writes,
+        # _admission guards the weight reserved by symbols still in flight
+        self._lock = threading.RLock()
+        self._io_lock = threading.RLock()
+        self._admission = threading.Condition()
+        self._reserved = 0
+        # _bucket wakes waiters; _waiting counts them per priority class
+        self._bucket = threading.Condition()
+        self._waiting = {p: 0 for p in PRIORITY_RESERVE}
+        self._backend = _MemoryBackend()
+        self._dirty = False
+        self._flush_path = None
+        self._flusher = None
         self._load()
         # Restore ban from sentinel file in case state file was wiped on redeploy
         sentinel = STATE_FILE + ".ban_sentinel"
@@ -24,7 +211,7 @@ class BinanceRateLimiter:
                     if sentinel_banned_until > self.banned_until:
                         self.banned_until = sentinel_banned_until
                         print(f"[RATE LIMITER] ⚠️  Ban restored from sentinel — expires {s.get('banned_until_human')}")
-                        self._save()
+                        self._persist()
                 else:
                     os.remove(sentinel)
                     print(f"[RATE LIMITER] Stale ban sentinel cleared (expired {s.get('banned_until_human')})")
@@ -44,7 +231,21 @@ class BinanceRateLimiter:
             )
             self.banned_until = 0
             self.rate_limited_until = 0
-            self._save()
+            self._persist()
+
+        if backend == "shared":
+            self._backend = _SharedBackend(STATE_FILE + ".shm")
+            with self._lock, self._backend.locked():
+                self._backend.attach(self)
+
+    # ── STATE ────────────────────────────────────────────────────────────────
+    @contextmanager
+    def _state(self):
+        """The state fields, current and exclusively held for the block."""
+        with self._lock, self._backend.locked():
+            self._backend.pull(self)
+            yield
+            self._backend.push(self)
 
     def _load(self):
         if os.path.exists(STATE_FILE):
@@ -59,23 +260,49 @@ class BinanceRateLimiter:
                 pass
 
     def _save(self):
-        os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
-        with open(STATE_FILE + ".tmp", "w") as f:
-            json.dump({
+        """Routine change — the flusher thread writes the state file."""
+        self._dirty = True
+        # resolved now, so a later chdir does not move the snapshot
+        self._flush_path = os.path.abspath(STATE_FILE)
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True, name="rate-limiter-flush")
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(RATE_LIMITER_FLUSH_SECONDS)
+            self.flush()
+
+    def flush(self):
+        """Write the state file now if anything changed since the last write."""
+        if self._dirty:
+            self._persist()
+
+    def _persist(self):
+        with self._lock:
+            self._dirty = False
+            path = self._flush_path or os.path.abspath(STATE_FILE)
+            state = {
                 "banned_until": self.banned_until,
                 "rate_limited_until": self.rate_limited_until,
                 "current_weight": self.current_weight,
                 "weight_window_start": self._weight_window_start,
-            }, f)
-        os.replace(STATE_FILE + ".tmp", STATE_FILE)
+            }
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with self._io_lock:
+            with open(tmp, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp, path)
 
     def is_banned(self, buffer_secs=900) -> bool:
-        self._load()
-        currently_banned = time.time() < self.banned_until + buffer_secs
+        with self._state():
+            banned_until = self.banned_until
+        currently_banned = time.time() < banned_until + buffer_secs
 
         # Write ban-end marker the first time we transition to unbanned.
         # hourly_runner reads this to apply a post-ban stagger on first run.
-        if not currently_banned and self.banned_until > 0:
+        if not currently_banned and banned_until > 0:
             _marker = STATE_FILE.replace("rate_limiter_state.json", "last_ban_end.json")
             try:
                 if not os.path.exists(_marker):
@@ -87,76 +314,130 @@ class BinanceRateLimiter:
 
         return currently_banned
 
-    def check(self):
-        self._load()
-        now = time.time()
+    def check(self, weight: int = None, priority: int = None):
+        """
+        Call before every Binance request. Raises while banned, sleeps out
+        a 429 block, then takes `weight` (default: one klines page) from
+        the token bucket under `priority` (default: current_priority()).
+        """
+        # sleeps happen outside the state lock so other threads keep going
+        with self._state():
+            now = time.time()
+            ban_expires = self.banned_until + 900
+            rate_limit_expires = self.rate_limited_until + 60
 
         # --- ban check ---
-        ban_expires = self.banned_until + 900
         if now < ban_expires:
             raise RuntimeError(f"IP_BANNED — wait {int(ban_expires - now)}s")
 
         # --- rate limit check ---
-        rate_limit_expires = self.rate_limited_until + 60
         if now < rate_limit_expires:
             wait = rate_limit_expires - now
             print(f"[RATE LIMITER] sleeping {wait:.1f}s before next request")
             time.sleep(wait)
 
-        # --- weight guard: reset window if >60s old ---
+        self.acquire(self.WEIGHT_PER_KLINES_REQUEST if weight is None else weight, priority)
+
+    # ── TOKEN BUCKET ─────────────────────────────────────────────────────────
+    def _roll_window(self, now: float) -> None:
+        # caller holds _state()
         if now - self._weight_window_start > 60:
             self.current_weight = 0
             self._weight_window_start = now
             self._save()
 
-        # --- preemptive throttle before Binance pulls the trigger ---
-        if self.current_weight >= 1100:
-            # hard block until the weight window resets
-            window_remaining = 60 - (now - self._weight_window_start)
-            wait = max(window_remaining, 1)
-            print(f"[RATE LIMITER] weight={self.current_weight} >= 1100 — sleeping {wait:.1f}s for window reset")
-            time.sleep(wait)
-            # reset after sleeping
-            self.current_weight = 0
-            self._weight_window_start = time.time()
-            self._save()
-        elif self.current_weight >= 900:
-            # progressive back-off: scale 0→10s as weight goes 900→1100
-            wait = (self.current_weight - 900) / 200 * 10
-            print(f"[RATE LIMITER] weight={self.current_weight} — throttling {wait:.1f}s")
-            time.sleep(wait)
+    def _refill(self, now: float) -> None:
+        # caller holds _state()
+        elapsed = max(0.0, now - self._tokens_at)
+        self._tokens = min(float(self.BUCKET_CAPACITY), self._tokens + elapsed * self.BUCKET_REFILL_PER_SEC)
+        self._tokens_at = now
+
+    def _available(self) -> float:
+        # caller holds _state(): the bucket, capped by what Binance
+        # reported for the live window
+        return min(self._tokens, self.BUCKET_CAPACITY - self.current_weight)
+
+    def acquire(self, weight: int, priority: int = None, take: bool = True) -> float:
+        """
+        Wait until the bucket holds `weight` above the reserve of
+        `priority` and no more urgent request is waiting, then take it
+        (take=False only waits). Returns the seconds waited.
+        """
+        priority = current_priority() if priority is None else priority
+        floor = PRIORITY_RESERVE[priority] * self.BUCKET_CAPACITY
+        # a request bigger than the class may ever hold waits for a full bucket
+        weight = min(weight, self.BUCKET_CAPACITY - floor)
+        t0 = time.time()
+        logged = False
+
+        with self._bucket:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    with self._state():
+                        now = time.time()
+                        self._roll_window(now)
+                        self._refill(now)
+                        yielding = any(self._waiting[p] for p in range(priority))
+                        deficit = weight + floor - self._available()
+                        if not yielding and deficit <= 0:
+                            if take:
+                                self._tokens -= weight
+                            return time.time() - t0
+                        if self.BUCKET_CAPACITY - self.current_weight < weight + floor:
+                            # the reported window is spent — refill cannot help
+                            wait = max(60.0 - (now - self._weight_window_start), 0.0) + 0.1
+                        else:
+                            wait = max(deficit, 0.0) / self.BUCKET_REFILL_PER_SEC + 0.01
+
+                    if not logged and not yielding:
+                        print(
+                            f"[RATE LIMITER] {PRIORITY_NAMES[priority]} request waiting ~{wait:.1f}s "
+                            f"(need {weight}, reserve {floor:.0f}, weight={self.current_weight})"
+                        )
+                        logged = True
+                    # woken early when another request takes or gives up its turn
+                    self._bucket.wait(wait if not yielding else min(wait, 1.0))
+            finally:
+                self._waiting[priority] -= 1
+                self._bucket.notify_all()
 
     def on_response(self, used_weight: int):
         """Call this after every successful Binance response."""
-        self._load()
-        now = time.time()
+        with self._state():
+            now = time.time()
 
-        # reset window if stale
-        if now - self._weight_window_start > 60:
-            self.current_weight = 0
-            self._weight_window_start = now
+            # reset window if stale
+            if now - self._weight_window_start > 60:
+                self.current_weight = 0
+                self._weight_window_start = now
 
-        self.current_weight = max(self.current_weight, used_weight)
-        self._save()
+            self.current_weight = max(self.current_weight, used_weight)
+            # Binance's count includes requests from outside this limiter
+            self._refill(now)
+            self._tokens = min(self._tokens, float(self.BUCKET_CAPACITY - used_weight))
+            self._save()
 
         # log when climbing into danger zone
         if used_weight >= 900:
             print(f"[RATE LIMITER] ⚠️  weight={used_weight} — approaching limit")
 
     def on_429(self, retry_after=None):
-        self._load()
-        self.rate_limited_until = time.time() + (retry_after or 60)
-        self.current_weight = 1200  # assume maxed
+        with self._state():
+            self.rate_limited_until = time.time() + (retry_after or 60)
+            self.current_weight = 1200  # assume maxed
+            self._tokens = 0.0
         print(f"[RATE LIMITER] 429 — blocking all requests for {retry_after or 60}s")
-        self._save()
+        self._persist()
 
     def on_418(self, retry_after=None):
-        self._load()
         ban_duration = retry_after or 7200
-        self.banned_until = time.time() + ban_duration
-        self.current_weight = 1200
+        with self._state():
+            self.banned_until = time.time() + ban_duration
+            self.current_weight = 1200
+            self._tokens = 0.0
         print(f"[RATE LIMITER] 418 — IP banned until {datetime.utcfromtimestamp(self.banned_until).isoformat()}Z (duration={ban_duration}s)")
-        self._save()
+        self._persist()
         sentinel = STATE_FILE + ".ban_sentinel"
         os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
         with open(sentinel + ".tmp", "w") as f:
@@ -171,19 +452,33 @@ class BinanceRateLimiter:
     WEIGHT_PER_KLINES_REQUEST = 2   # each /api/v3/klines call costs 2 units
     WEIGHT_SOFT_LIMIT         = 1100
     WEIGHT_SAFETY_BUFFER      = 50
+    # the bucket holds one window's budget and refills it over 60s
+    BUCKET_CAPACITY           = WEIGHT_SOFT_LIMIT - WEIGHT_SAFETY_BUFFER
+    BUCKET_REFILL_PER_SEC     = BUCKET_CAPACITY / 60.0
+
+    @staticmethod
+    def klines_weight(limit: int) -> int:
+        """Request weight of one /fapi/v1/klines call for `limit` rows."""
+        if limit < 100:
+            return 1
+        if limit < 500:
+            return 2
+        if limit <= 1000:
+            return 5
+        return 10
 
     def headroom(self) -> int:
         """Available weight units before the soft limit, in the current window."""
-        self._load()
-        now = time.time()
-        if now - self._weight_window_start > 60:
-            return self.WEIGHT_SOFT_LIMIT - self.WEIGHT_SAFETY_BUFFER
-        return max(0, self.WEIGHT_SOFT_LIMIT - self.WEIGHT_SAFETY_BUFFER - self.current_weight)
+        with self._state():
+            now = time.time()
+            if now - self._weight_window_start > 60:
+                return self.WEIGHT_SOFT_LIMIT - self.WEIGHT_SAFETY_BUFFER
+            return max(0, self.WEIGHT_SOFT_LIMIT - self.WEIGHT_SAFETY_BUFFER - self.current_weight)
 
     def seconds_until_window_reset(self) -> float:
         """Seconds remaining in the current 1-minute weight window."""
-        self._load()
-        elapsed = time.time() - self._weight_window_start
+        with self._state():
+            elapsed = time.time() - self._weight_window_start
         return max(0.0, 60.0 - elapsed)
 
     def estimate_symbol_weight(self, n_timeframes: int = 3, pages_per_tf: int = 2) -> int:
@@ -200,44 +495,92 @@ class BinanceRateLimiter:
         symbol: str,
         n_timeframes: int = 3,
         pages_per_tf: int = 2,
+        priority: int = None,
     ) -> None:
         """
         Call this once per symbol BEFORE fetching.
-        If the estimated cost of fetching this symbol would push weight over the
-        soft limit within the current minute window, sleeps until the window resets.
+        Waits until the token bucket holds the estimated cost of fetching
+        this symbol above the reserve of its priority class (the requests
+        themselves still take their weight one by one in check()).
+        Exit-critical work never waits here.
         """
-        self._load()
-        now = time.time()
-
-        # If window already expired, reset it — we have full headroom
-        if now - self._weight_window_start > 60:
-            self.current_weight       = 0
-            self._weight_window_start = now
-            self._save()
-
+        priority = current_priority() if priority is None else priority
         estimated_cost = self.estimate_symbol_weight(n_timeframes, pages_per_tf)
-        available      = self.headroom()
+
+        with self._state():
+            now = time.time()
+            self._roll_window(now)
+            self._refill(now)
+            available      = int(self._available())
+            current_weight = self.current_weight
+            resets_in      = max(0.0, 60.0 - (now - self._weight_window_start))
 
         print(
             f"[WEIGHT GATE] {symbol} | "
-            f"current_weight={self.current_weight} "
+            f"priority={PRIORITY_NAMES[priority]} "
+            f"current_weight={current_weight} "
             f"estimated_cost={estimated_cost} "
             f"headroom={available} "
-            f"window_resets_in={self.seconds_until_window_reset():.1f}s"
+            f"window_resets_in={resets_in:.1f}s"
         )
 
-        if estimated_cost > available:
-            wait = self.seconds_until_window_reset() + 1.0  # +1s grace
-            print(
-                f"[WEIGHT GATE] ⏳ {symbol} — cost {estimated_cost} > headroom {available}. "
-                f"Waiting {wait:.1f}s for window reset."
-            )
-            time.sleep(wait)
-            self.current_weight       = 0
-            self._weight_window_start = time.time()
-            self._save()
-            print(f"[WEIGHT GATE] ✅ {symbol} — window reset, proceeding")
+        if priority == PRIORITY_EXIT:
+            print(f"[WEIGHT GATE] ✅ {symbol} — exit-critical, proceeding immediately")
+            return
+
+        waited = self.acquire(estimated_cost, priority, take=False)
+        if waited > 0.05:
+            print(f"[WEIGHT GATE] ✅ {symbol} — waited {waited:.1f}s for headroom, proceeding")
         else:
             print(f"[WEIGHT GATE] ✅ {symbol} — headroom OK, proceeding immediately")
 
-rate_limiter = BinanceRateLimiter()
\ No newline at end of file
+    # ── ADMISSION (concurrent symbol pool) ───────────────────────────────────
+    def reserve_symbol_weight(
+        self,
+        symbol: str,
+        n_timeframes: int = 3,
+        pages_per_tf: int = 2,
+        priority: int = None,
+    ) -> int:
+        """
+        Pool-safe wait_if_needed_for_symbol(). Blocks until the estimated
+        cost fits in the headroom left after the weight already reserved by
+        symbols still in flight and the reserve of the symbol's priority
+        class, then reserves it. Exit-critical symbols reserve without
+        waiting. Returns the reserved cost — hand it back to
+        release_symbol_weight() when the symbol is done. A symbol's
+        reservation overlaps with the weight its own requests add to
+        current_weight, which errs on the safe side.
+        """
+        priority = current_priority() if priority is None else priority
+        floor = int(PRIORITY_RESERVE[priority] * self.BUCKET_CAPACITY)
+        cost = self.estimate_symbol_weight(n_timeframes, pages_per_tf)
+
+        with self._admission:
+            while priority != PRIORITY_EXIT:
+                available = self.headroom() - self._reserved - floor
+                if cost <= available:
+                    break
+                # woken early by a release, or by the window reset at the latest
+                wait = self.seconds_until_window_reset() + 1.0
+                print(
+                    f"[WEIGHT GATE] ⏳ {symbol} — cost {cost} > headroom {available} "
+                    f"({self._reserved} reserved in flight). Waiting up to {wait:.1f}s."
+                )
+                self._admission.wait(wait)
+
+            self._reserved += cost
+            print(
+                f"[WEIGHT GATE] ✅ {symbol} — reserved {cost} "
+                f"(in flight={self._reserved}, current_weight={self.current_weight})"
+            )
+        return cost
+
+    def release_symbol_weight(self, cost: int) -> None:
+        with self._admission:
+            self._reserved = max(0, self._reserved - cost)
+            self._admission.notify_all()
+
+rate_limiter = BinanceRateLimiter()
+# last routine update still pending in the flusher
+atexit.register(rate_limiter.flush)
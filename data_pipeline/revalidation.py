@@ -0,0 +1,222 @@
+# data_pipeline/revalidation.py
+"""
+Revalidation planner — decides which recently closed bars still need a
+refetch, instead of blindly refetching a trailing window every time.
+
+Binance keeps revising a bar's high/low/close/volume for a while after
+it closes (see continuity_fix_5m), so a cached bar is only trusted once
+it has SETTLED. Per bar the planner tracks
+
+  - the checksum of the last observed OHLCV values,
+  - confirmations — consecutive observations with that same checksum,
+  - the bar's age (seconds since close) at the last observation.
+
+A bar is settled once it is older than the settle horizon, or once it
+has `confirmations` matching observations, the last one at least
+`min_age` after close. Only unsettled bars older than min_age are
+refetched, plus any bar flagged suspicious (continuity gap) or whose
+last refetch changed it. With `slack` set (the live tick interval) the
+routine refetch waits until the oldest due bar is about to leave the
+horizon and confirms everything due in the same request, rather than
+refetching every tick.
+
+Due bars are packed into the fewest 1000-bar kline pages. A klines
+request covers one symbol, so pages are per symbol; callers send all of
+a tick's windows as one concurrent batch.
+
+State is a small JSON file per symbol/timeframe under <root>/settle/,
+holding only bars still inside the horizon.
+"""
+
+import json
+import os
+import threading
+import zlib
+
+import numpy as np
+import pandas as pd
+
+SETTLE_DIR      = "settle"
+KLINES_PER_PAGE = 1000
+OHLCV_COLUMNS   = ["open", "high", "low", "close", "volume"]
+
+INTERVAL_SECONDS = {"5m": 5 * 60, "1h": 60 * 60, "4h": 4 * 60 * 60}
+
+
+def bar_checksums(df: pd.DataFrame) -> list:
+    """crc32 of each row's float64 OHLCV values."""
+    values = np.ascontiguousarray(df[OHLCV_COLUMNS].to_numpy(dtype=np.float64))
+    return [zlib.crc32(row.tobytes()) for row in values]
+
+
+class RevalidationPlanner:
+    def __init__(
+        self,
+        root: str,
+        horizon: pd.Timedelta,
+        min_age: pd.Timedelta,
+        confirmations: int = 2,
+        slack: pd.Timedelta = None,
+        page_weight: int = 5,
+    ):
+        self.root          = os.path.join(root, SETTLE_DIR)
+        self.horizon       = pd.Timedelta(horizon).total_seconds()
+        self.min_age       = pd.Timedelta(min_age).total_seconds()
+        self.confirmations = confirmations
+        self.slack         = None if slack is None else pd.Timedelta(slack).total_seconds()
+        self.page_weight   = page_weight
+
+        self._lock   = threading.Lock()
+        self._states = {}
+        self.stats   = {"plans": 0, "bars_due": 0, "pages": 0, "blind_pages": 0, "weight_saved": 0}
+        self._tick   = dict(self.stats)
+
+    # --------------------------------------------------
+    # STATE
+    # --------------------------------------------------
+    def _path(self, symbol: str, tf: str) -> str:
+        return os.path.join(self.root, f"{symbol}_{tf}.json")
+
+    def _state(self, symbol: str, tf: str) -> dict:
+        """{open_ms: [checksum, confirmations, age_at_last_observation, flagged]}"""
+        key = (symbol, tf)
+        with self._lock:
+            state = self._states.get(key)
+        if state is None:
+            state = {}
+            try:
+                with open(self._path(symbol, tf)) as f:
+                    state = {int(k): v for k, v in json.load(f).items()}
+            except (OSError, ValueError):
+                pass
+            with self._lock:
+                state = self._states.setdefault(key, state)
+        return state
+
+    def _save(self, symbol: str, tf: str, state: dict):
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(symbol, tf)
+        with open(path + ".tmp", "w") as f:
+            json.dump({str(k): v for k, v in state.items()}, f)
+        os.replace(path + ".tmp", path)
+
+    def _ages(self, index: pd.DatetimeIndex, tf: str, now: pd.Timestamp) -> np.ndarray:
+        """Seconds since each bar closed."""
+        close_ns = index.as_unit("ns").asi8 + INTERVAL_SECONDS[tf] * 1_000_000_000
+        return (pd.Timestamp(now).as_unit("ns").value - close_ns) / 1e9
+
+    def _settled(self, entry, age: float) -> bool:
+        if age >= self.horizon:
+            return True
+        _, confirmations, seen_age, flagged = entry
+        return not flagged and confirmations >= self.confirmations and seen_age >= self.min_age
+
+    # --------------------------------------------------
+    # PLAN
+    # --------------------------------------------------
+    def due(self, symbol: str, tf: str, df: pd.DataFrame, now, suspicious=()) -> pd.DatetimeIndex:
+        """
+        Bars of `df` to refetch now. Cached bars inside the horizon the
+        planner has not seen yet are recorded as a first observation.
+        """
+        now = pd.Timestamp(now)
+        state = self._state(symbol, tf)
+        suspicious = pd.DatetimeIndex(suspicious)
+
+        recent = df.iloc[df.index.searchsorted(now - pd.Timedelta(seconds=self.horizon + INTERVAL_SECONDS[tf])):]
+        recent = recent[~recent.index.isin(suspicious)]
+        ages = self._ages(recent.index, tf, now)
+        keys = recent.index.as_unit("ms").asi8
+
+        unseen = [i for i, k in enumerate(keys) if int(k) not in state and 0 <= ages[i] < self.horizon]
+        if unseen:
+            for i, crc in zip(unseen, bar_checksums(recent.iloc[unseen])):
+                state[int(keys[i])] = [crc, 1, float(ages[i]), False]
+            self._save(symbol, tf, state)
+
+        candidates, trigger = [], False
+        for k, age, ts in zip(keys, ages, recent.index):
+            entry = state.get(int(k))
+            if entry is None or age < self.min_age or self._settled(entry, age):
+                continue
+            candidates.append(ts)
+            if entry[3] or self.slack is None or age >= self.horizon - self.slack:
+                trigger = True
+
+        return pd.DatetimeIndex(sorted(set(suspicious) | set(candidates if trigger else [])))
+
+    def pages(self, due: pd.DatetimeIndex, tf: str) -> list:
+        """(start, end) windows of at most one kline page each, covering `due`."""
+        if len(due) == 0:
+            return []
+        due = due.sort_values()
+        step = pd.Timedelta(seconds=INTERVAL_SECONDS[tf])
+        span = step * (KLINES_PER_PAGE - 1)
+        windows = [[due[0], due[0]]]
+        for ts in due[1:]:
+            if ts - windows[-1][0] <= span:
+                windows[-1][1] = ts
+            else:
+                windows.append([ts, ts])
+        return [tuple(w) for w in windows]
+
+    def plan(self, symbol: str, tf: str, df: pd.DataFrame, now, suspicious=(), blind_pages: int = 1):
+        """
+        due() + pages(), with the weight saved against the blind refetch
+        it replaces (blind_pages requests) logged and added to stats.
+        """
+        due = self.due(symbol, tf, df, now, suspicious)
+        windows = self.pages(due, tf)
+        saved = max(0, blind_pages - len(windows)) * self.page_weight
+        with self._lock:
+            for counters in (self.stats, self._tick):
+                counters["plans"]        += 1
+                counters["bars_due"]     += len(due)
+                counters["pages"]        += len(windows)
+                counters["blind_pages"]  += blind_pages
+                counters["weight_saved"] += saved
+        print(
+            f"[REVALIDATE PLAN] {symbol} {tf} — due={len(due)} "
+            f"(suspicious={len(suspicious)}) pages={len(windows)} blind={blind_pages} "
+            f"weight_saved={saved}"
+        )
+        return due, windows
+
+    def tick_stats(self) -> dict:
+        """Counters since the last call (one pass), then reset."""
+        with self._lock:
+            tick, self._tick = self._tick, dict.fromkeys(self._tick, 0)
+        return tick
+
+    # --------------------------------------------------
+    # OBSERVE
+    # --------------------------------------------------
+    def observe(self, symbol: str, tf: str, fresh: pd.DataFrame, now) -> pd.DatetimeIndex:
+        """
+        Record refetched bars. A matching checksum adds a confirmation, a
+        changed one restarts the count and flags the bar for the next
+        plan. Bars past the horizon are dropped from the state. Returns
+        the bars whose values changed.
+        """
+        now = pd.Timestamp(now)
+        state = self._state(symbol, tf)
+        changed = []
+        if fresh is not None and not fresh.empty:
+            ages = self._ages(fresh.index, tf, now)
+            keys = fresh.index.as_unit("ms").asi8
+            for k, age, crc, ts in zip(keys, ages, bar_checksums(fresh), fresh.index):
+                if age < 0:
+                    continue                # still forming
+                entry = state.get(int(k))
+                if entry is not None and entry[0] == crc:
+                    state[int(k)] = [crc, entry[1] + 1, float(age), False]
+                else:
+                    if entry is not None:
+                        changed.append(ts)
+                    state[int(k)] = [crc, 1, float(age), entry is not None]
+
+        cutoff = int((now - pd.Timedelta(seconds=self.horizon + INTERVAL_SECONDS[tf])).value // 1_000_000)
+        for k in [k for k in state if k < cutoff]:
+            del state[k]
+        self._save(symbol, tf, state)
+        return pd.DatetimeIndex(changed)
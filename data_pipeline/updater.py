@@ -1,21 +1,55 @@
 import os
+import numpy as np
 import pandas as pd
 import time
 from datetime import datetime, timezone, timedelta
 
-from data_pipeline.fetcher import fetch_ohlcv
+from data_pipeline.candle_store import CandleStore
+from data_pipeline.revalidation import RevalidationPlanner
+from data_pipeline.fetcher import fetch_ohlcv, fetch_ohlcv_many
+from data_pipeline.rate_limiter import request_priority, PRIORITY_REVALIDATE
 from data_pipeline.validators import validate_ohlcv
 from execution.notifier import TelegramNotifier
 
 
 CACHE_DIR = "data/cache"
 
+# 5m / 1h / 4h candles — partitioned segments under CACHE_DIR, see
+# data_pipeline/candle_store.py. _cache_path() is for everything else
+# (htf_scores, meta and sentinel files).
+candle_store = CandleStore(CACHE_DIR)
+
 HOURS_LOOKBACK = 900
 
 LLTF_INTERVAL = "5m"
 LTF_INTERVAL = "1h"
 HTF_INTERVAL = "4h"
 
+# Derived-timeframe mode: build 1H/4H from the validated 5m cache
+# instead of fetching them, and check a sample of recent bars against
+# the exchange every DERIVED_RECONCILE_HOURS.
+DERIVED_TIMEFRAMES      = os.getenv("DERIVED_TIMEFRAMES", "0") == "1"
+DERIVED_RECONCILE_HOURS = float(os.getenv("DERIVED_RECONCILE_HOURS", "6"))
+DERIVED_RECONCILE_BARS  = {"1h": 24, "4h": 6}
+DERIVED_RECONCILE_RTOL  = 1e-6     # volume sums differ from the exchange in the last bits
+
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+# continuity_fix_5m's trailing revalidation: a 5m bar is refetched until
+# a copy taken at least REVALIDATE_SETTLE_MINUTES after its close matches
+# the one before it, and never once it is REVALIDATE_WINDOW_MINUTES old
+# (shortened from 1h — confirmed cache-consistent at this window). The
+# refetch is held back until the oldest unsettled bar is one tick from
+# leaving the window, so one request confirms several bars.
+REVALIDATE_WINDOW_MINUTES = 45
+REVALIDATE_SETTLE_MINUTES = float(os.getenv("REVALIDATE_SETTLE_MINUTES", "30"))
+revalidation_planner = RevalidationPlanner(
+    CACHE_DIR,
+    horizon=pd.Timedelta(minutes=REVALIDATE_WINDOW_MINUTES),
+    min_age=pd.Timedelta(minutes=REVALIDATE_SETTLE_MINUTES),
+    slack=pd.Timedelta(minutes=5),
+)
+
 
 def _now_utc_hour():
     return datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
@@ -74,6 +108,112 @@ def _fetch_all(symbol: str, interval: str, start: datetime, end: datetime) -> pd
     return result
 
 
+def _fetch_all_many(symbol: str, interval: str, windows: list) -> list:
+    """
+    _fetch_all() over several independent (start, end) windows, fetched
+    concurrently. Returns one DataFrame per window, in window order.
+    """
+    firsts = fetch_ohlcv_many([
+        {"symbol": symbol, "interval": interval, "start": start, "end": end, "limit": 1000}
+        for start, end in windows
+    ])
+
+    results = []
+    for (start, end), df in zip(windows, firsts):
+        # fetch_ohlcv paginates back to start itself; finish serially
+        # in the rare case it stopped short
+        if not df.empty and df.index[0] > start:
+            rest = _fetch_all(symbol, interval, start, df.index[0] - pd.Timedelta(milliseconds=1))
+            df = pd.concat([rest, df])
+            df = df[~df.index.duplicated(keep="last")].sort_index()
+        results.append(df)
+    return results
+
+
+# --------------------------------------------------
+# BATCH MERGE
+# --------------------------------------------------
+BAR_DIFF_COLUMNS = ["old_close", "new_close", "old_volume", "new_volume"]
+
+
+def coalesce_windows(timestamps, step: pd.Timedelta, pad: int = 1) -> list:
+    """
+    (start, end) fetch windows covering each timestamp ± pad bars, with
+    overlapping or adjacent windows merged into one contiguous range.
+    """
+    ts = pd.DatetimeIndex(timestamps).unique().sort_values()
+    if not len(ts):
+        return []
+    starts, ends = ts - pad * step, ts + pad * step
+    breaks = np.flatnonzero(starts[1:] > ends[:-1] + step) + 1
+    first, last = np.r_[0, breaks], np.r_[breaks - 1, len(ts) - 1]
+    return list(zip(starts[first], ends[last]))
+
+
+def upsert_bars(df: pd.DataFrame, fresh: pd.DataFrame):
+    """
+    Merge refetched bars into `df` (fresh rows win) in one vectorized
+    step: existing timestamps are overwritten in place by position, new
+    ones appended with a single sort. Returns (merged, diff) — diff has
+    one row per existing bar whose values changed, with BAR_DIFF_COLUMNS.
+    `df` itself is returned untouched when nothing changed.
+    """
+    empty_diff = pd.DataFrame(columns=BAR_DIFF_COLUMNS, index=pd.DatetimeIndex([], tz="UTC"), dtype=float)
+    if fresh is None or fresh.empty:
+        return df, empty_diff
+    if df is None or df.empty:
+        return fresh[~fresh.index.duplicated(keep="last")].sort_index(), empty_diff
+
+    if df.index.has_duplicates:
+        df = df[~df.index.duplicated(keep="last")]
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+    fresh = fresh[~fresh.index.duplicated(keep="last")]
+
+    cols = [c for c in fresh.columns if c in df.columns]
+    pos = df.index.get_indexer(fresh.index)
+    hit = pos >= 0
+    rows = pos[hit]
+
+    old = df[cols].to_numpy()[rows]
+    new = fresh[cols].to_numpy()[hit]
+    changed = ~((old == new) | (pd.isna(old) & pd.isna(new))).all(axis=1)
+
+    ic, iv = df.columns.get_loc("close"), df.columns.get_loc("volume")
+    oc, nc = df.iloc[rows[changed], ic].to_numpy(float), fresh["close"].to_numpy(float)[hit][changed]
+    ov, nv = df.iloc[rows[changed], iv].to_numpy(float), fresh["volume"].to_numpy(float)[hit][changed]
+    diff = pd.DataFrame(
+        {"old_close": oc, "new_close": nc, "old_volume": ov, "new_volume": nv},
+        index=fresh.index[hit][changed],
+    )
+
+    merged = df
+    if changed.any():
+        merged = df.copy()
+        upd = rows[changed]
+        for c in cols:
+            values = merged[c].to_numpy(copy=True)
+            values[upd] = fresh[c].to_numpy()[hit][changed]
+            merged[c] = values
+    if not hit.all():
+        merged = pd.concat([merged, fresh[~hit]])
+        if not merged.index.is_monotonic_increasing:
+            merged = merged.sort_index()
+    return merged, diff
+
+
+def changed_bars(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Rows of `after` that are new or differ from `before` (NaN equals NaN)."""
+    if after is before or after is None or after.empty:
+        return after.iloc[:0] if after is not None else None
+    cols = [c for c in after.columns if c in before.columns]
+    old = before[cols].reindex(after.index).to_numpy()
+    new = after[cols].to_numpy()
+    same = ((old == new) | (pd.isna(old) & pd.isna(new))).all(axis=1) & after.index.isin(before.index)
+    return after[~same]
+
+
+@request_priority(PRIORITY_REVALIDATE)
 def continuity_fix_5m(symbol: str, df_lltf: pd.DataFrame, start_required: datetime) -> pd.DataFrame:
     """
     Two independent passes to catch two different staleness failure modes:
@@ -82,15 +222,18 @@ def continuity_fix_5m(symbol: str, df_lltf: pd.DataFrame, start_required: dateti
        Catches candles cached mid-formation (the original bug: 16:45/20:10
        style corruption where the WHOLE bar was wrong).
 
-    2. BLIND TRAILING REVALIDATION — unconditionally refetches every bar
-       in the last REVALIDATE_WINDOW_MINUTES, regardless of continuity.
-       Catches a second failure mode: Binance keeps revising a bar's
-       high/low/close/volume for HOURS after it closes, while `open`
-       stays untouched. Since open never changes, the continuity check
-       is structurally blind to this — a stale bar with a correct open
-       but wrong close/volume passes the continuity check every time.
+    2. TRAILING REVALIDATION — refetches bars in the last
+       REVALIDATE_WINDOW_MINUTES that have not settled yet, regardless of
+       continuity. Catches a second failure mode: Binance keeps revising
+       a bar's high/low/close/volume for HOURS after it closes, while
+       `open` stays untouched. Since open never changes, the continuity
+       check is structurally blind to this — a stale bar with a correct
+       open but wrong close/volume passes the continuity check every time.
        This is why LLTF_REVALIDATE_BARS's 30-minute window wasn't enough:
        Binance settlement can lag well past 30 minutes on volatile bars.
+       Which bars are still unsettled is revalidation_planner's call
+       (data_pipeline/revalidation.py); the gap bars from pass 1 go into
+       the same kline pages.
     """
     if df_lltf is None or df_lltf.empty or len(df_lltf) < 3:
         return df_lltf
@@ -120,61 +263,390 @@ def continuity_fix_5m(symbol: str, df_lltf: pd.DataFrame, start_required: dateti
 
     for ts in suspicious_ts:
         print(f"[CONTINUITY GAP] {symbol} {ts} — open vs prev close diverged >{CONTINUITY_TOLERANCE_PCT*100:.2f}%, refetching")
-        win_start = ts - timedelta(minutes=5)
-        win_end   = ts + timedelta(minutes=5)
+
+    # ── PASS 2: TRAILING REVALIDATION (open-invisible drift) ──────────
+    now_ts = pd.Timestamp.now(tz="UTC")
+    reval_start = max(now_ts - timedelta(minutes=REVALIDATE_WINDOW_MINUTES), start_required)
+
+    # gap bars and their neighbours (the prev close may be the stale one)
+    # are always due; the planner adds the trailing bars not yet settled
+    # and packs everything into the fewest kline pages. blind_pages is
+    # what the old per-gap + trailing-window refetch cost, for the log.
+    step = timedelta(minutes=5)
+    flagged = df_sorted.index[df_sorted.index.isin(
+        [t for ts in suspicious_ts for t in (ts - step, ts, ts + step)]
+    )]
+    blind_pages = len(suspicious_ts) + int((df_sorted.index >= reval_start).any())
+    due, windows = revalidation_planner.plan(
+        symbol, LLTF_INTERVAL, df_sorted, now_ts, suspicious=flagged, blind_pages=blind_pages
+    )
+
+    if windows:
         rate_limiter.wait_if_needed_for_symbol(
-            symbol       = f"{symbol}/5m_continuity",
+            symbol       = f"{symbol}/5m_revalidate",
             n_timeframes = 1,
-            pages_per_tf = 1,
+            pages_per_tf = len(windows),
         )
-        revalidated = _fetch_all(symbol, LLTF_INTERVAL, win_start, win_end)
-        if not revalidated.empty:
-            before = df_lltf.loc[df_lltf.index.isin(revalidated.index)]
-            for rts in revalidated.index:
-                if rts in before.index:
-                    old_close = before.loc[rts, "close"]
-                    new_close = revalidated.loc[rts, "close"]
-                    if abs(old_close - new_close) > 1e-12:
-                        print(f"[CONTINUITY FIX] {symbol} {rts} close corrected {old_close} → {new_close}")
-            df_lltf = pd.concat([df_lltf, revalidated])
-            df_lltf = df_lltf[~df_lltf.index.duplicated(keep="last")]
-
-        # ── PASS 2: BLIND TRAILING REVALIDATION (open-invisible drift) ────
-    REVALIDATE_WINDOW_MINUTES = 45  # shortened from 1h — confirmed cache-consistent at this window
-    now_ts = pd.Timestamp.now(tz="UTC")
-    reval_start = now_ts - timedelta(minutes=REVALIDATE_WINDOW_MINUTES)
+        fresh = [f for f in _fetch_all_many(symbol, LLTF_INTERVAL, windows) if not f.empty]
+        if fresh:
+            revalidated = pd.concat(fresh)
+            revalidated = revalidated[~revalidated.index.duplicated(keep="last")]
+            df_lltf, diff = upsert_bars(df_sorted, revalidated)
+
+            in_gap = diff.index.isin(flagged)
+            gap_fix = diff[in_gap & ((diff["old_close"] - diff["new_close"]).abs() > 1e-12)]
+            for rts, row in gap_fix.iterrows():
+                print(f"[CONTINUITY FIX] {symbol} {rts} close corrected {row['old_close']} → {row['new_close']}")
+            drift = diff[~in_gap]
+            drift = drift[
+                ((drift["old_close"] - drift["new_close"]).abs() > 1e-12)
+                | ((drift["old_volume"] - drift["new_volume"]).abs() > 1e-6)
+            ]
+            if len(drift):
+                print(
+                    f"[REVALIDATE] {symbol} — {len(drift)} unsettled bar(s) in trailing "
+                    f"{REVALIDATE_WINDOW_MINUTES}m had stale close/volume (open-invisible drift), corrected"
+                )
+            revalidation_planner.observe(symbol, LLTF_INTERVAL, revalidated, now_ts)
+            return df_lltf
 
-    df_sorted = df_lltf.sort_index()
-    reval_start = max(reval_start, start_required)
-    window_df = df_sorted[df_sorted.index >= reval_start]
+    return df_sorted
+
+# --------------------------------------------------
+# DERIVED TIMEFRAMES
+# --------------------------------------------------
+def resample_ohlcv(df_lltf: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """
+    Aggregates 5m bars into `interval` bars (left-labelled, epoch-aligned
+    like Binance). Only bins with every 5m bar present are returned.
+    """
+    bars_per_bin = int(pd.Timedelta(interval) / pd.Timedelta(LLTF_INTERVAL))
+    grouped = df_lltf[OHLCV_COLUMNS].resample(interval, label="left", closed="left", origin="epoch")
+    out = grouped.agg({"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"})
+    out = out[grouped["close"].count() == bars_per_bin]
+    out.index.freq = None
+    return out
+
+
+def _missing_windows(missing: pd.DatetimeIndex, interval: str) -> list:
+    """Contiguous (start, end) runs of missing bar timestamps."""
+    ts = missing.sort_values().to_series()
+    runs = (ts.diff() != pd.Timedelta(interval)).cumsum()
+    return [(g.index[0], g.index[-1]) for _, g in ts.groupby(runs)]
 
-    if not window_df.empty:
+
+def _reconcile_meta(symbol: str) -> dict:
+    """
+    The derived-reconcile sentinel: {"last_reconcile": iso time,
+    "exchange_bins": {interval: [iso bin, ...]}} — the bins reconcile
+    had to take from the exchange because their 5m bars stay off.
+    """
+    import json as _json
+
+    try:
+        with open(_cache_path(symbol, "derived_reconcile_meta")) as f:
+            return _json.load(f)
+    except Exception:
+        return {}
+
+
+def _exchange_bins(symbol: str, interval: str) -> pd.DatetimeIndex:
+    bins = _reconcile_meta(symbol).get("exchange_bins", {}).get(interval, [])
+    return pd.DatetimeIndex(pd.to_datetime(bins, utc=True))
+
+
+def _derive_frame(symbol: str, df_lltf: pd.DataFrame, interval: str,
+                  expected: pd.DatetimeIndex) -> pd.DataFrame:
+    """
+    The `interval` frame in derived mode: complete 5m aggregates laid over
+    the cached frame, with exchange bars fetched only for expected bins
+    neither has (the bin the 5m window starts inside, 5m outages). Bins
+    reconcile replaced with exchange bars keep the cached bar — their 5m
+    bars would only re-derive the mismatched aggregate.
+    """
+    df = candle_store.read(symbol, interval)
+
+    derived = resample_ohlcv(df_lltf, interval)
+    if df is not None:
+        derived = derived.drop(df.index.intersection(_exchange_bins(symbol, interval)), errors="ignore")
+    df = derived if df is None else pd.concat([df[OHLCV_COLUMNS], derived])
+    df = df[~df.index.duplicated(keep="last")]
+
+    missing = expected.difference(df.index)
+    if len(missing):
+        windows = _missing_windows(missing, interval)
+        print(f"[DERIVED {interval}] {symbol} — {len(missing)} bar(s) not derivable, fetching {len(windows)} window(s)")
+        from data_pipeline.rate_limiter import rate_limiter
         rate_limiter.wait_if_needed_for_symbol(
-            symbol       = f"{symbol}/5m_blind_revalidate",
+            symbol       = f"{symbol}/{interval}_derived_fill",
             n_timeframes = 1,
-            pages_per_tf = _estimate_pages(reval_start, now_ts, LLTF_INTERVAL),
+            pages_per_tf = len(windows),
         )
-        blind_revalidated = _fetch_all(symbol, LLTF_INTERVAL, reval_start, now_ts)
-        if not blind_revalidated.empty:
-            before = df_lltf.loc[df_lltf.index.isin(blind_revalidated.index)]
-            changed_count = 0
-            for rts in blind_revalidated.index:
-                if rts in before.index:
-                    old_close = before.loc[rts, "close"]
-                    new_close = blind_revalidated.loc[rts, "close"]
-                    old_vol   = before.loc[rts, "volume"]
-                    new_vol   = blind_revalidated.loc[rts, "volume"]
-                    if abs(old_close - new_close) > 1e-12 or abs(old_vol - new_vol) > 1e-6:
-                        changed_count += 1
-            if changed_count:
-                print(
-                    f"[BLIND REVALIDATE] {symbol} — {changed_count} bar(s) in trailing "
-                    f"{REVALIDATE_WINDOW_MINUTES}h had stale close/volume (open-invisible drift), corrected"
-                )
-            df_lltf = pd.concat([df_lltf, blind_revalidated])
-            df_lltf = df_lltf[~df_lltf.index.duplicated(keep="last")]
+        fetched = [f for f in _fetch_all_many(symbol, interval, windows) if not f.empty]
+        if fetched:
+            df = pd.concat([df, *fetched])
+            df = df[~df.index.duplicated(keep="first")]
+
+    print(f"[DERIVED {interval}] {symbol} — {len(derived)} bars from 5m cache")
+    return df.sort_index()
+
+
+@request_priority(PRIORITY_REVALIDATE)
+def _reconcile_derived(symbol: str, df_lltf: pd.DataFrame, df: pd.DataFrame,
+                       df_htf: pd.DataFrame, now_full: datetime):
+    """
+    Sampled check of derived bars against the exchange, at most once per
+    DERIVED_RECONCILE_HOURS per symbol. A mismatch means the 5m cache
+    under that bin is stale: its 5m bars are refetched and the bin
+    re-derived, and whatever still disagrees takes the exchange bar.
+    Those bins are recorded in the sentinel so _derive_frame keeps them.
+    Returns (df_lltf, df, df_htf).
+    """
+    import json as _json
+
+    sentinel = _cache_path(symbol, "derived_reconcile_meta")
+    meta = _reconcile_meta(symbol)
+    try:
+        last = datetime.fromisoformat(meta["last_reconcile"])
+        if (now_full - last).total_seconds() < DERIVED_RECONCILE_HOURS * 3600:
+            return df_lltf, df, df_htf
+    except Exception:
+        pass
+
+    frames = {LTF_INTERVAL: df, HTF_INTERVAL: df_htf}
+    samples = {tf: frames[tf].iloc[-DERIVED_RECONCILE_BARS[tf]:] for tf in frames}
+
+    from data_pipeline.rate_limiter import rate_limiter
+    rate_limiter.wait_if_needed_for_symbol(symbol=f"{symbol}/derived_reconcile", n_timeframes=2, pages_per_tf=1)
+    exchange = dict(zip(samples, fetch_ohlcv_many([
+        {"symbol": symbol, "interval": tf, "start": sample.index[0], "end": sample.index[-1]}
+        for tf, sample in samples.items()
+    ])))
+
+    def _mismatched(tf):
+        sample = frames[tf].loc[samples[tf].index]
+        ex = exchange[tf].reindex(sample.index)[OHLCV_COLUMNS]
+        ok = np.isclose(sample[OHLCV_COLUMNS].to_numpy(), ex.to_numpy(), rtol=DERIVED_RECONCILE_RTOL, atol=0)
+        return sample.index[~ok.all(axis=1) & ex.notna().all(axis=1).to_numpy()]
+
+    bad = {tf: _mismatched(tf) for tf in frames}
+    exchange_bins = {tf: _exchange_bins(symbol, tf) for tf in frames}
+    if any(len(b) for b in bad.values()):
+        # refetch the 5m bars under every mismatched bin, then re-derive
+        windows = sorted({
+            (ts, ts + pd.Timedelta(tf) - pd.Timedelta(LLTF_INTERVAL))
+            for tf, b in bad.items() for ts in b
+        })
+        print(
+            f"[DERIVED DRIFT] {symbol} — {len(bad[LTF_INTERVAL])} 1H / {len(bad[HTF_INTERVAL])} 4H "
+            f"bin(s) off the exchange, refetching their 5m bars"
+        )
+        fresh = [f for f in _fetch_all_many(symbol, LLTF_INTERVAL, windows) if not f.empty]
+        if fresh:
+            df_lltf, _ = upsert_bars(df_lltf, pd.concat(fresh))
+            candle_store.write(symbol, LLTF_INTERVAL, df_lltf)
+
+        for tf in frames:
+            if not len(bad[tf]):
+                continue
+            rederived = resample_ohlcv(df_lltf, tf).reindex(bad[tf]).dropna()
+            frame = frames[tf].copy()
+            frame.loc[rederived.index, OHLCV_COLUMNS] = rederived
+            frames[tf] = frame
+            still = _mismatched(tf)
+            if len(still):
+                print(f"[DERIVED DRIFT] {symbol} {tf} — {len(still)} bin(s) still off after 5m refetch, taking exchange bars")
+                frame.loc[still, OHLCV_COLUMNS] = exchange[tf].loc[still, OHLCV_COLUMNS]
+                exchange_bins[tf] = exchange_bins[tf].union(still)
+    else:
+        print(f"[DERIVED RECONCILE] {symbol} — sampled 1H/4H bars match the exchange")
+
+    try:
+        with open(sentinel + ".tmp", "w") as f:
+            _json.dump({
+                "last_reconcile": now_full.isoformat(),
+                # bins that have scrolled out of the frame are dropped
+                "exchange_bins": {
+                    tf: [ts.isoformat() for ts in bins[bins >= frames[tf].index[0]]]
+                    for tf, bins in exchange_bins.items()
+                },
+            }, f)
+        os.replace(sentinel + ".tmp", sentinel)
+    except Exception:
+        pass
+
+    return df_lltf, frames[LTF_INTERVAL], frames[HTF_INTERVAL]
+
+
+def _build_lltf(symbol: str, start_required: datetime, now_full: datetime) -> pd.DataFrame:
+    """
+    BUILD LLTF (5M) — same pattern as HTF: load the cache, fetch what is
+    missing, revalidate, save. Returns the 5m frame.
+    """
+    import json as _json
+
+    df_lltf      = candle_store.read(symbol, LLTF_INTERVAL)
+    last_lltf_ts = None
+
+    if df_lltf is not None:
+        print("[CACHE] Loading LLTF cache")
+        last_lltf_ts = df_lltf.index[-1]
+
+    lltf_fetch_start = start_required if df_lltf is None else last_lltf_ts + timedelta(minutes=5)
+
+    # Only ever fetch/cache CLOSED 5m candles. Using unfloored `now_full`
+    # here let Binance return the still-forming candle (openTime <= endTime
+    # is always true for the current bar), which then got written into the
+    # persistent parquet cache as if it were final — with a partial
+    # high/low/volume that undercounts the real bar. Once current_5m_boundary
+    # advanced past it, the FAST EARLY-EXIT path above saw
+    # last_5m_ts >= current_5m_boundary and returned early on every
+    # subsequent tick, skipping the revalidation block below entirely — so
+    # the corrupted partial bar was never corrected.
+    _minutes_floored_now = (now_full.minute // 5) * 5
+    _current_5m_boundary_full = now_full.replace(minute=_minutes_floored_now, second=0, microsecond=0)
+    lltf_fetch_end = _current_5m_boundary_full - timedelta(milliseconds=1)
+
+    print("[FETCH LLTF WINDOW]")
+    print("start:", lltf_fetch_start)
+    print("end:  ", lltf_fetch_end)
+
+    if lltf_fetch_start <= lltf_fetch_end:
+        from data_pipeline.rate_limiter import rate_limiter
+        rate_limiter.wait_if_needed_for_symbol(
+            symbol       = f"{symbol}/5m",
+            n_timeframes = 1,
+            pages_per_tf = _estimate_pages(lltf_fetch_start, lltf_fetch_end, LLTF_INTERVAL),
+        )
+        new_lltf = _fetch_all(symbol, LLTF_INTERVAL, lltf_fetch_start, lltf_fetch_end)
+        
+        if not new_lltf.empty:
+            print("[MERGE LLTF] merging new candles")
+            df_lltf, _ = upsert_bars(df_lltf, new_lltf)
+
+    if df_lltf is None or df_lltf.empty:
+        raise RuntimeError(f"[{symbol}] No LLTF data available after fetch")
+
+    # --------------------------------------------------
+    # REVALIDATE LAST CLOSED 5M BARS — same reasoning as the 1H block:
+    # Binance can revise a bar's high/low/close/volume for a short window
+    # after it closes (or even while it's still forming, if fetched too
+    # early). Without this, a bar fetched moments after opening gets
+    # permanently frozen at that near-empty snapshot.
+    # --------------------------------------------------
+    LLTF_REVALIDATE_BARS = 6  # 30 minutes — normal recent-bar settle window
+    lltf_revalidate_end   = now_full - timedelta(minutes=5)
+    lltf_revalidate_start = lltf_revalidate_end - timedelta(minutes=5 * (LLTF_REVALIDATE_BARS - 1))
+
+    # ── CONTINUITY SCAN — catch bars cached mid-formation, no matter how
+    # old they are. A real candle's open must equal the previous candle's
+    # close (within float tolerance). Any bar that breaks continuity was
+    # almost certainly frozen at a partial snapshot and never corrected.
+    #
+    # GATED TO ONCE PER 24H PER SYMBOL. This scan reads the full 900-hour
+    # (10800-bar) lookback and can find hundreds/thousands of suspicious
+    # bars on a dirty cache, each capped refetch being a real Binance call
+    # with a rate-limiter wait attached. Running it every single xx:00
+    # tick — forever, even after the cache is clean — was burning 10-20+
+    # seconds PER SYMBOL on every hourly run, which cascaded past the
+    # 5-minute window and delayed/dropped xx:05+ reports and entries for
+    # every symbol queued behind it. This is a one-time data-repair pass;
+    # once a day is enough to catch anything new without blocking the
+    # hourly cycle.
+    CONTINUITY_TOLERANCE_PCT = 0.001  # 0.1% — real ticks never gap more than this on 5m closes
+    MAX_CONTINUITY_REFETCHES_PER_RUN = 20  # safety cap — avoid runaway refetch storms
+    CONTINUITY_SCAN_INTERVAL_HOURS = 24
+
+    _continuity_sentinel = _cache_path(symbol, "continuity_scan_meta")
+    _last_scan_ts = None
+    if os.path.exists(_continuity_sentinel):
+        try:
+            with open(_continuity_sentinel) as _f:
+                _last_scan_ts = datetime.fromisoformat(_json.load(_f).get("last_scan"))
+                if _last_scan_ts.tzinfo is None:
+                    _last_scan_ts = _last_scan_ts.replace(tzinfo=timezone.utc)
+        except Exception:
+            pass
+
+    _scan_due = (
+        _last_scan_ts is None
+        or (now_full - _last_scan_ts).total_seconds() >= CONTINUITY_SCAN_INTERVAL_HOURS * 3600
+    )
+
+    if _scan_due:
+        df_lltf_sorted = df_lltf.sort_index()
+        prev_close = df_lltf_sorted["close"].shift(1)
+        prev_ts    = df_lltf_sorted.index.to_series().shift(1)
+        gap_pct = (df_lltf_sorted["open"] - prev_close).abs() / prev_close.replace(0, pd.NA)
+
+        is_adjacent = (df_lltf_sorted.index.to_series() - prev_ts) == pd.Timedelta(minutes=5)
+        suspicious_mask = (gap_pct > CONTINUITY_TOLERANCE_PCT) & is_adjacent
+        suspicious_ts = df_lltf_sorted.index[suspicious_mask.fillna(False)]
+
+        if len(suspicious_ts) > MAX_CONTINUITY_REFETCHES_PER_RUN:
+            print(
+                f"[CONTINUITY SCAN] {symbol} — {len(suspicious_ts)} suspicious bars found, "
+                f"capping refetch to oldest {MAX_CONTINUITY_REFETCHES_PER_RUN} this run "
+                f"(remainder will be caught on subsequent daily scans)"
+            )
+            suspicious_ts = suspicious_ts[:MAX_CONTINUITY_REFETCHES_PER_RUN]
+
+        try:
+            with open(_continuity_sentinel + ".tmp", "w") as _f:
+                _json.dump({"last_scan": now_full.isoformat()}, _f)
+            os.replace(_continuity_sentinel + ".tmp", _continuity_sentinel)
+        except Exception:
+            pass
+    else:
+        print(
+            f"[CONTINUITY SCAN] {symbol} — skipped, last ran "
+            f"{(now_full - _last_scan_ts).total_seconds()/3600:.1f}h ago "
+            f"(runs every {CONTINUITY_SCAN_INTERVAL_HOURS}h)"
+        )
+        suspicious_ts = pd.DatetimeIndex([])
+
+    # Trailing revalidation window — mirrors continuity_fix_5m's Pass 2.
+    # 30 minutes was proven insufficient (see continuity_fix_5m comments):
+    # Binance can revise close/high/low/volume for hours after a bar closes.
+    # Reuse the same 3-hour blind-revalidation logic here so the slow path
+    # (restarts, new-hour boundaries, cache gaps) gets the same protection
+    # as the fast-exit path, instead of a separate, shorter window.
+    df_lltf = continuity_fix_5m(symbol, df_lltf, start_required)
+
+    for ts in suspicious_ts:
+        print(f"[CONTINUITY GAP] {symbol} {ts} — open vs prev close diverged >{CONTINUITY_TOLERANCE_PCT*100:.2f}%, flagging for refetch")
+
+    # adjacent gaps share one contiguous window, all windows in one batch
+    revalidate_windows = coalesce_windows(suspicious_ts, pd.Timedelta(minutes=5))
+    if revalidate_windows:
+        from data_pipeline.rate_limiter import rate_limiter
+        with request_priority(PRIORITY_REVALIDATE):
+            rate_limiter.wait_if_needed_for_symbol(
+                symbol       = f"{symbol}/5m_revalidate",
+                n_timeframes = 1,
+                pages_per_tf = len(revalidate_windows),
+            )
+            fresh = [f for f in _fetch_all_many(symbol, LLTF_INTERVAL, revalidate_windows) if not f.empty]
+        if fresh:
+            df_lltf, diff = upsert_bars(df_lltf, pd.concat(fresh))
+            diff = diff[(diff["old_close"] - diff["new_close"]).abs() > 1e-12]
+            for ts, row in diff.iterrows():
+                print(f"[REVALIDATE LLTF] {symbol} {ts} close corrected {row['old_close']} → {row['new_close']}")
+
+    df_lltf = df_lltf.sort_index()
+    df_lltf = df_lltf[df_lltf.index >= start_required]
+    df_lltf = df_lltf.iloc[-(HOURS_LOOKBACK * 12):]
+    try:
+        validate_ohlcv(df_lltf, symbol, freq=LLTF_INTERVAL)
+    except RuntimeError as e:
+        print(f"[WARN] LLTF validation failed for {symbol} (non-fatal): {e}")
+
+    written = candle_store.write(symbol, LLTF_INTERVAL, df_lltf)
+
+    print(f"[SAVE] LLTF cache updated | candles: {len(df_lltf)} | segments rewritten: {written}")
+
+    return df_lltf
 
-    return df_lltf.sort_index()
 
 def update_symbol(symbol: str):
 
@@ -188,11 +660,14 @@ def update_symbol(symbol: str):
     # --------------------------------------------------
     _purge_sentinel = os.path.join(CACHE_DIR, f"{symbol}_revalidate_purge.done")
     if not os.path.exists(_purge_sentinel):
-        for _tf in (LTF_INTERVAL, HTF_INTERVAL, LLTF_INTERVAL, "htf_scores"):
-            _p = _cache_path(symbol, _tf)
-            if os.path.exists(_p):
-                os.remove(_p)
-                print(f"[ONE-TIME PURGE] {symbol} — removed {_p}")
+        for _tf in (LTF_INTERVAL, HTF_INTERVAL, LLTF_INTERVAL):
+            if candle_store.exists(symbol, _tf):
+                candle_store.delete(symbol, _tf)
+                print(f"[ONE-TIME PURGE] {symbol} — removed {_tf} candles")
+        _p = _cache_path(symbol, "htf_scores")
+        if os.path.exists(_p):
+            os.remove(_p)
+            print(f"[ONE-TIME PURGE] {symbol} — removed {_p}")
         with open(_purge_sentinel, "w") as f:
             f.write("done")
         print(f"[ONE-TIME PURGE] {symbol} — complete, will rebuild from scratch")
@@ -212,10 +687,6 @@ def update_symbol(symbol: str):
         except Exception:
             pass
 
-    path_ltf  = _cache_path(symbol, LTF_INTERVAL)
-    path_htf  = _cache_path(symbol, HTF_INTERVAL)
-    path_lltf = _cache_path(symbol, LLTF_INTERVAL)
-
     now = datetime.now(timezone.utc)  # full timestamp for boundary check
     now_hour = now.replace(minute=0, second=0, microsecond=0)
     start_required = now_hour - timedelta(hours=HOURS_LOOKBACK)
@@ -227,11 +698,11 @@ def update_symbol(symbol: str):
     # --------------------------------------------------
     # FAST EARLY-EXIT — nothing new to fetch
     # --------------------------------------------------
-    if os.path.exists(path_lltf) and os.path.getsize(path_lltf) > 0:
+    if candle_store.exists(symbol, LLTF_INTERVAL):
         try:
-            df_check = pd.read_parquet(path_lltf, columns=["close"])
-            df_check.index = pd.to_datetime(df_check.index, utc=True)
-            last_5m_ts = df_check.index[-1]
+            last_5m_ts = candle_store.last_index(symbol, LLTF_INTERVAL)
+            if last_5m_ts is None:
+                raise IndexError("5m cache has no rows")
 
             minutes_floored = (now.minute // 5) * 5
             current_5m_boundary = now.replace(minute=minutes_floored, second=0, microsecond=0)
@@ -246,8 +717,9 @@ def update_symbol(symbol: str):
                     print(f"[CANDLE FRESH] {symbol} — {candle_age_seconds:.0f}s since close, waiting for propagation")
 
                 # check if 1H cache has the latest closed candle
-                ltf_check = pd.read_parquet(path_ltf)
-                ltf_check.index = pd.to_datetime(ltf_check.index, utc=True)
+                ltf_check = candle_store.read(symbol, LTF_INTERVAL)
+                if ltf_check is None:
+                    raise KeyError("1H cache missing")
                 if ltf_check.index[-1] < now_hour - timedelta(hours=1):
                     print(f"[SKIP BYPASSED] {symbol} — 1H cache behind ({ltf_check.index[-1]} < {now_hour - timedelta(hours=1)}), fetching")
                     raise Exception("1H cache stale — force full fetch")
@@ -259,21 +731,22 @@ def update_symbol(symbol: str):
                     print(f"[SKIP BYPASSED] {symbol} — 5m cache stale by {(expected_5m - actual_5m).total_seconds()/60:.0f}m, fetching")
                     raise Exception("5m cache stale — force full fetch")
 
-                df_lltf = pd.read_parquet(path_lltf)
-                df_lltf.index = pd.to_datetime(df_lltf.index, utc=True)
+                df_cached = candle_store.read(symbol, LLTF_INTERVAL)
 
                 # Continuity scan runs on EVERY fast-exit tick, not just
                 # full rebuilds — this path serves ~99% of ticks, so this
                 # is where corrupted mid-formation bars actually get caught.
                 _fix_start_required = now_hour - timedelta(hours=HOURS_LOOKBACK)
-                df_lltf = continuity_fix_5m(symbol, df_lltf, _fix_start_required)
-                tmp_fix = path_lltf + ".tmp"
-                df_lltf.to_parquet(tmp_fix)
-                os.replace(tmp_fix, path_lltf)
+                df_lltf = continuity_fix_5m(symbol, df_cached, _fix_start_required)
+                # merge only the bars the scan corrected — write() would make
+                # the store equal to the frame read before the scan's fetches
+                # and drop a bar the kline stream closed in the meantime
+                candle_store.append(symbol, LLTF_INTERVAL, changed_bars(df_cached, df_lltf))
 
                 df = ltf_check
-                df_htf  = pd.read_parquet(path_htf)
-                df_htf.index  = pd.to_datetime(df_htf.index,  utc=True)
+                df_htf  = candle_store.read(symbol, HTF_INTERVAL)
+                if df_htf is None:
+                    raise KeyError("4H cache missing")
                 df = df[df.index <= now_hour - timedelta(hours=1)]
                 hours_into_cycle = now_hour.hour % 4
                 _last_closed_4h = now_hour - timedelta(hours=hours_into_cycle) - timedelta(hours=4)
@@ -319,11 +792,10 @@ def update_symbol(symbol: str):
             )
             if _is_file_error:
                 print(f"[CACHE CORRUPT] {symbol} — {type(e).__name__}: {e}")
-                for _p in [path_lltf, path_ltf]:
+                for _tf in (LLTF_INTERVAL, LTF_INTERVAL):
                     try:
-                        if os.path.exists(_p):
-                            os.remove(_p)
-                            print(f"[CACHE CORRUPT] deleted {_p}")
+                        candle_store.delete(symbol, _tf)
+                        print(f"[CACHE CORRUPT] deleted {symbol} {_tf} candles")
                     except Exception:
                         pass
                 try:
@@ -343,91 +815,91 @@ def update_symbol(symbol: str):
     now_full = now   # preserve full-precision timestamp for 5m fetch
     now = now_hour   # 1H and 4H fetches use top-of-hour only
 
-    df = None
-    last_ts = None
-
-    # --------------------------------------------------
-    # LOAD CACHE
-    # --------------------------------------------------
-
-    if os.path.exists(path_ltf):
-        if os.path.getsize(path_ltf) == 0:
-            print(f"[WARN] LTF cache is 0 bytes, discarding: {path_ltf}")
-            os.remove(path_ltf)
-        else:
-            print("[CACHE] Loading LTF cache")
-            df = pd.read_parquet(path_ltf)
-            df.index = pd.to_datetime(df.index, utc=True)
-            df = df.sort_index()
-            if not df.empty:
-                last_ts = df.index[-1]
-
-    # --------------------------------------------------
-    # DETERMINE FETCH WINDOW
-    # --------------------------------------------------
-
-    fetch_start = start_required if df is None else last_ts + timedelta(hours=1)
-    fetch_end = now_hour  # fetch up to current hour boundary, trim after
+    if DERIVED_TIMEFRAMES:
+        # 5m first — 1H and 4H are aggregates of it
+        df_lltf = _build_lltf(symbol, start_required, now_full)
+        df = _derive_frame(
+            symbol, df_lltf, LTF_INTERVAL,
+            pd.date_range(start_required, now_hour - timedelta(hours=1), freq=LTF_INTERVAL),
+        )
+        df_htf = _derive_frame(
+            symbol, df_lltf, HTF_INTERVAL,
+            pd.date_range(pd.Timestamp(start_required).ceil(HTF_INTERVAL),
+                          current_4h_open - timedelta(hours=4), freq=HTF_INTERVAL),
+        )
+        df_lltf, df, df_htf = _reconcile_derived(symbol, df_lltf, df, df_htf, now_full)
 
-    print("[FETCH WINDOW]")
-    print("start:", fetch_start)
-    print("end:", fetch_end)
+        if df.empty or df_htf.empty:
+            raise RuntimeError(f"[{symbol}] No derived LTF/HTF data from the 5m cache")
+    else:
+        last_ts = None
 
-    # --------------------------------------------------
-    # FETCH NEW DATA
-    # --------------------------------------------------
+        # --------------------------------------------------
+        # LOAD CACHE
+        # --------------------------------------------------
 
-    if fetch_start <= fetch_end:
-        from data_pipeline.rate_limiter import rate_limiter
-        rate_limiter.wait_if_needed_for_symbol(
-            symbol       = f"{symbol}/1h",
-            n_timeframes = 1,
-            pages_per_tf = _estimate_pages(fetch_start, fetch_end, LTF_INTERVAL),
-        )
-        new_data = _fetch_all(symbol, LTF_INTERVAL, fetch_start, fetch_end)
+        df = candle_store.read(symbol, LTF_INTERVAL)
+        if df is not None:
+            print("[CACHE] Loading LTF cache")
+            last_ts = df.index[-1]
 
-        if not new_data.empty:
+        # --------------------------------------------------
+        # DETERMINE FETCH WINDOW
+        # --------------------------------------------------
 
-            print("[MERGE] merging new candles")
+        fetch_start = start_required if df is None else last_ts + timedelta(hours=1)
+        fetch_end = now_hour  # fetch up to current hour boundary, trim after
 
-            df = pd.concat([df, new_data]) if df is not None else new_data
-            df = df[~df.index.duplicated(keep="last")]
+        print("[FETCH WINDOW]")
+        print("start:", fetch_start)
+        print("end:", fetch_end)
 
-    if df is None or df.empty:
-        raise RuntimeError(f"[{symbol}] No LTF data available after fetch")
+        # --------------------------------------------------
+        # FETCH NEW DATA
+        # --------------------------------------------------
 
-    # --------------------------------------------------
-    # REVALIDATE LAST CLOSED BARS — Binance can revise/finalize
-    # a bar's close/volume shortly after it closes, and a previous
-    # cron tick may have cached it mid-formation. Always refetch
-    # the last few closed bars and overwrite the cache copies.
-    # --------------------------------------------------
-    REVALIDATE_BARS = 1
-    revalidate_start = (now_hour - timedelta(hours=1)) - timedelta(hours=REVALIDATE_BARS - 1)
-    revalidate_end   = now_hour - timedelta(hours=1)
-
-    if revalidate_start in df.index or revalidate_end in df.index:
-        from data_pipeline.rate_limiter import rate_limiter
-        rate_limiter.wait_if_needed_for_symbol(
-            symbol       = f"{symbol}/1h_revalidate",
-            n_timeframes = 1,
-            pages_per_tf = 1,
-        )
-        revalidated = _fetch_all(symbol, LTF_INTERVAL, revalidate_start, revalidate_end)
-        if not revalidated.empty:
-            before = df.loc[df.index.isin(revalidated.index)]
-            changed = []
-            for ts in revalidated.index:
-                if ts in before.index:
-                    old_close = before.loc[ts, "close"]
-                    new_close = revalidated.loc[ts, "close"]
-                    if abs(old_close - new_close) > 1e-12:
-                        changed.append((ts, old_close, new_close))
-            df = pd.concat([df, revalidated])
-            df = df[~df.index.duplicated(keep="last")]
-            if changed:
-                for ts, old_c, new_c in changed:
-                    print(f"[REVALIDATE] {symbol} {ts} close corrected {old_c} → {new_c}")
+        if fetch_start <= fetch_end:
+            from data_pipeline.rate_limiter import rate_limiter
+            rate_limiter.wait_if_needed_for_symbol(
+                symbol       = f"{symbol}/1h",
+                n_timeframes = 1,
+                pages_per_tf = _estimate_pages(fetch_start, fetch_end, LTF_INTERVAL),
+            )
+            new_data = _fetch_all(symbol, LTF_INTERVAL, fetch_start, fetch_end)
+
+            if not new_data.empty:
+
+                print("[MERGE] merging new candles")
+
+                df, _ = upsert_bars(df, new_data)
+
+        if df is None or df.empty:
+            raise RuntimeError(f"[{symbol}] No LTF data available after fetch")
+
+        # --------------------------------------------------
+        # REVALIDATE LAST CLOSED BARS — Binance can revise/finalize
+        # a bar's close/volume shortly after it closes, and a previous
+        # cron tick may have cached it mid-formation. Always refetch
+        # the last few closed bars and overwrite the cache copies.
+        # --------------------------------------------------
+        REVALIDATE_BARS = 1
+        revalidate_start = (now_hour - timedelta(hours=1)) - timedelta(hours=REVALIDATE_BARS - 1)
+        revalidate_end   = now_hour - timedelta(hours=1)
+
+        if revalidate_start in df.index or revalidate_end in df.index:
+            from data_pipeline.rate_limiter import rate_limiter
+            with request_priority(PRIORITY_REVALIDATE):
+                rate_limiter.wait_if_needed_for_symbol(
+                    symbol       = f"{symbol}/1h_revalidate",
+                    n_timeframes = 1,
+                    pages_per_tf = 1,
+                )
+                revalidated = _fetch_all(symbol, LTF_INTERVAL, revalidate_start, revalidate_end)
+            if not revalidated.empty:
+                df, diff = upsert_bars(df, revalidated)
+                diff = diff[(diff["old_close"] - diff["new_close"]).abs() > 1e-12]
+                for ts, row in diff.iterrows():
+                    print(f"[REVALIDATE] {symbol} {ts} close corrected {row['old_close']} → {row['new_close']}")
 
     # --------------------------------------------------
     # FINAL CLEAN
@@ -477,47 +949,39 @@ def update_symbol(symbol: str):
     # BUILD HTF (incremental, cache-aware)
     # --------------------------------------------------
 
-    df_htf = None
-    last_htf_ts = None
+    if not DERIVED_TIMEFRAMES:
+        last_htf_ts = None
 
-    # Load HTF cache if exists
-    if os.path.exists(path_htf):
-        if os.path.getsize(path_htf) == 0:
-            print(f"[WARN] HTF cache is 0 bytes, discarding: {path_htf}")
-            os.remove(path_htf)
-        else:
+        # Load HTF cache if exists
+        df_htf = candle_store.read(symbol, HTF_INTERVAL)
+        if df_htf is not None:
             print("[CACHE] Loading HTF cache")
-            df_htf = pd.read_parquet(path_htf)
-            df_htf.index = pd.to_datetime(df_htf.index, utc=True)
-            df_htf = df_htf.sort_index()
-            if not df_htf.empty:
-                last_htf_ts = df_htf.index[-1]
-
-    # Determine fetch window
-    htf_fetch_start = start_required if df_htf is None else last_htf_ts + timedelta(hours=4)
-    htf_fetch_end = current_4h_open  # fetch up to but not including the open bar
-
-    print("[FETCH HTF WINDOW]")
-    print("start:", htf_fetch_start)
-    print("end:", htf_fetch_end)
-
-    # Fetch only missing HTF candles
-    if htf_fetch_start <= htf_fetch_end:
-        from data_pipeline.rate_limiter import rate_limiter
-        rate_limiter.wait_if_needed_for_symbol(
-            symbol       = f"{symbol}/4h",
-            n_timeframes = 1,
-            pages_per_tf = _estimate_pages(htf_fetch_start, htf_fetch_end, HTF_INTERVAL),
-        )
-        new_htf = _fetch_all(symbol, HTF_INTERVAL, htf_fetch_start, htf_fetch_end)
+            last_htf_ts = df_htf.index[-1]
+
+        # Determine fetch window
+        htf_fetch_start = start_required if df_htf is None else last_htf_ts + timedelta(hours=4)
+        htf_fetch_end = current_4h_open  # fetch up to but not including the open bar
+
+        print("[FETCH HTF WINDOW]")
+        print("start:", htf_fetch_start)
+        print("end:", htf_fetch_end)
 
-        if not new_htf.empty:
-            print("[MERGE HTF] merging new candles")
-            df_htf = pd.concat([df_htf, new_htf]) if df_htf is not None else new_htf
-            df_htf = df_htf[~df_htf.index.duplicated(keep="last")]
+        # Fetch only missing HTF candles
+        if htf_fetch_start <= htf_fetch_end:
+            from data_pipeline.rate_limiter import rate_limiter
+            rate_limiter.wait_if_needed_for_symbol(
+                symbol       = f"{symbol}/4h",
+                n_timeframes = 1,
+                pages_per_tf = _estimate_pages(htf_fetch_start, htf_fetch_end, HTF_INTERVAL),
+            )
+            new_htf = _fetch_all(symbol, HTF_INTERVAL, htf_fetch_start, htf_fetch_end)
+
+            if not new_htf.empty:
+                print("[MERGE HTF] merging new candles")
+                df_htf, _ = upsert_bars(df_htf, new_htf)
     
-    if df_htf is None or df_htf.empty:
-        raise RuntimeError(f"[{symbol}] No HTF data available after fetch")
+        if df_htf is None or df_htf.empty:
+            raise RuntimeError(f"[{symbol}] No HTF data available after fetch")
 
     # Only keep closed 4H bars.
     # A 4H bar that opened at T is closed when now >= T + 4h.
@@ -603,208 +1067,14 @@ def update_symbol(symbol: str):
         print(f"[HTF SCORES] cache current — last={last_scores_ts} checksum={_htf_checksum[:8]}")
 
     # --------------------------------------------------
-    # SAVE ATOMIC
+    # SAVE — changed segments only, each replaced atomically
     # --------------------------------------------------
-    os.makedirs(CACHE_DIR, exist_ok=True)
-
-    tmp_ltf = path_ltf + ".tmp"
-    tmp_htf = path_htf + ".tmp"
-
-    df.to_parquet(tmp_ltf)
-    df_htf.to_parquet(tmp_htf)
-
-    os.makedirs(os.path.dirname(path_ltf), exist_ok=True)
-    os.replace(tmp_ltf, path_ltf)
-    os.makedirs(os.path.dirname(path_htf), exist_ok=True)
-    os.replace(tmp_htf, path_htf)
+    candle_store.write(symbol, LTF_INTERVAL, df)
+    candle_store.write(symbol, HTF_INTERVAL, df_htf)
 
     print("[SAVE] LTF + HTF cache updated")
 
-    # --------------------------------------------------
-    # BUILD LLTF (5M) — same pattern as HTF
-    # --------------------------------------------------
-    path_lltf    = _cache_path(symbol, LLTF_INTERVAL)
-    df_lltf      = None
-    last_lltf_ts = None
-
-    if os.path.exists(path_lltf):
-        if os.path.getsize(path_lltf) == 0:
-            print(f"[WARN] LLTF cache is 0 bytes, discarding: {path_lltf}")
-            os.remove(path_lltf)
-        else:
-            print("[CACHE] Loading LLTF cache")
-            df_lltf = pd.read_parquet(path_lltf)
-            df_lltf.index = pd.to_datetime(df_lltf.index, utc=True)
-            df_lltf = df_lltf.sort_index()
-            if not df_lltf.empty:
-                last_lltf_ts = df_lltf.index[-1]
-
-    lltf_fetch_start = start_required if df_lltf is None else last_lltf_ts + timedelta(minutes=5)
-
-    # Only ever fetch/cache CLOSED 5m candles. Using unfloored `now_full`
-    # here let Binance return the still-forming candle (openTime <= endTime
-    # is always true for the current bar), which then got written into the
-    # persistent parquet cache as if it were final — with a partial
-    # high/low/volume that undercounts the real bar. Once current_5m_boundary
-    # advanced past it, the FAST EARLY-EXIT path above saw
-    # last_5m_ts >= current_5m_boundary and returned early on every
-    # subsequent tick, skipping the revalidation block below entirely — so
-    # the corrupted partial bar was never corrected.
-    _minutes_floored_now = (now_full.minute // 5) * 5
-    _current_5m_boundary_full = now_full.replace(minute=_minutes_floored_now, second=0, microsecond=0)
-    lltf_fetch_end = _current_5m_boundary_full - timedelta(milliseconds=1)
-
-    print("[FETCH LLTF WINDOW]")
-    print("start:", lltf_fetch_start)
-    print("end:  ", lltf_fetch_end)
-
-    if lltf_fetch_start <= lltf_fetch_end:
-        from data_pipeline.rate_limiter import rate_limiter
-        rate_limiter.wait_if_needed_for_symbol(
-            symbol       = f"{symbol}/5m",
-            n_timeframes = 1,
-            pages_per_tf = _estimate_pages(lltf_fetch_start, lltf_fetch_end, LLTF_INTERVAL),
-        )
-        new_lltf = _fetch_all(symbol, LLTF_INTERVAL, lltf_fetch_start, lltf_fetch_end)
-        
-        if not new_lltf.empty:
-            print("[MERGE LLTF] merging new candles")
-            df_lltf = pd.concat([df_lltf, new_lltf]) if df_lltf is not None else new_lltf
-            df_lltf = df_lltf[~df_lltf.index.duplicated(keep="last")]
-
-    if df_lltf is None or df_lltf.empty:
-        raise RuntimeError(f"[{symbol}] No LLTF data available after fetch")
-
-    # --------------------------------------------------
-    # REVALIDATE LAST CLOSED 5M BARS — same reasoning as the 1H block:
-    # Binance can revise a bar's high/low/close/volume for a short window
-    # after it closes (or even while it's still forming, if fetched too
-    # early). Without this, a bar fetched moments after opening gets
-    # permanently frozen at that near-empty snapshot.
-    # --------------------------------------------------
-    LLTF_REVALIDATE_BARS = 6  # 30 minutes — normal recent-bar settle window
-    lltf_revalidate_end   = now_full - timedelta(minutes=5)
-    lltf_revalidate_start = lltf_revalidate_end - timedelta(minutes=5 * (LLTF_REVALIDATE_BARS - 1))
-
-    # ── CONTINUITY SCAN — catch bars cached mid-formation, no matter how
-    # old they are. A real candle's open must equal the previous candle's
-    # close (within float tolerance). Any bar that breaks continuity was
-    # almost certainly frozen at a partial snapshot and never corrected.
-    #
-    # GATED TO ONCE PER 24H PER SYMBOL. This scan reads the full 900-hour
-    # (10800-bar) lookback and can find hundreds/thousands of suspicious
-    # bars on a dirty cache, each capped refetch being a real Binance call
-    # with a rate-limiter wait attached. Running it every single xx:00
-    # tick — forever, even after the cache is clean — was burning 10-20+
-    # seconds PER SYMBOL on every hourly run, which cascaded past the
-    # 5-minute window and delayed/dropped xx:05+ reports and entries for
-    # every symbol queued behind it. This is a one-time data-repair pass;
-    # once a day is enough to catch anything new without blocking the
-    # hourly cycle.
-    CONTINUITY_TOLERANCE_PCT = 0.001  # 0.1% — real ticks never gap more than this on 5m closes
-    MAX_CONTINUITY_REFETCHES_PER_RUN = 20  # safety cap — avoid runaway refetch storms
-    CONTINUITY_SCAN_INTERVAL_HOURS = 24
-
-    _continuity_sentinel = _cache_path(symbol, "continuity_scan_meta")
-    _last_scan_ts = None
-    if os.path.exists(_continuity_sentinel):
-        try:
-            with open(_continuity_sentinel) as _f:
-                _last_scan_ts = datetime.fromisoformat(_json.load(_f).get("last_scan"))
-                if _last_scan_ts.tzinfo is None:
-                    _last_scan_ts = _last_scan_ts.replace(tzinfo=timezone.utc)
-        except Exception:
-            pass
-
-    _scan_due = (
-        _last_scan_ts is None
-        or (now_full - _last_scan_ts).total_seconds() >= CONTINUITY_SCAN_INTERVAL_HOURS * 3600
-    )
-
-    if _scan_due:
-        df_lltf_sorted = df_lltf.sort_index()
-        prev_close = df_lltf_sorted["close"].shift(1)
-        prev_ts    = df_lltf_sorted.index.to_series().shift(1)
-        gap_pct = (df_lltf_sorted["open"] - prev_close).abs() / prev_close.replace(0, pd.NA)
-
-        is_adjacent = (df_lltf_sorted.index.to_series() - prev_ts) == pd.Timedelta(minutes=5)
-        suspicious_mask = (gap_pct > CONTINUITY_TOLERANCE_PCT) & is_adjacent
-        suspicious_ts = df_lltf_sorted.index[suspicious_mask.fillna(False)]
-
-        if len(suspicious_ts) > MAX_CONTINUITY_REFETCHES_PER_RUN:
-            print(
-                f"[CONTINUITY SCAN] {symbol} — {len(suspicious_ts)} suspicious bars found, "
-                f"capping refetch to oldest {MAX_CONTINUITY_REFETCHES_PER_RUN} this run "
-                f"(remainder will be caught on subsequent daily scans)"
-            )
-            suspicious_ts = suspicious_ts[:MAX_CONTINUITY_REFETCHES_PER_RUN]
-
-        try:
-            with open(_continuity_sentinel + ".tmp", "w") as _f:
-                _json.dump({"last_scan": now_full.isoformat()}, _f)
-            os.replace(_continuity_sentinel + ".tmp", _continuity_sentinel)
-        except Exception:
-            pass
-    else:
-        print(
-            f"[CONTINUITY SCAN] {symbol} — skipped, last ran "
-            f"{(now_full - _last_scan_ts).total_seconds()/3600:.1f}h ago "
-            f"(runs every {CONTINUITY_SCAN_INTERVAL_HOURS}h)"
-        )
-        suspicious_ts = pd.DatetimeIndex([])
-
-    # Trailing revalidation window — mirrors continuity_fix_5m's Pass 2.
-    # 30 minutes was proven insufficient (see continuity_fix_5m comments):
-    # Binance can revise close/high/low/volume for hours after a bar closes.
-    # Reuse the same 3-hour blind-revalidation logic here so the slow path
-    # (restarts, new-hour boundaries, cache gaps) gets the same protection
-    # as the fast-exit path, instead of a separate, shorter window.
-    df_lltf = continuity_fix_5m(symbol, df_lltf, start_required)
-    revalidate_targets = set()
-
-    for ts in suspicious_ts:
-        win_start = ts - timedelta(minutes=5)
-        win_end   = ts + timedelta(minutes=5)
-        revalidate_targets.add((win_start, win_end))
-        print(f"[CONTINUITY GAP] {symbol} {ts} — open vs prev close diverged >{CONTINUITY_TOLERANCE_PCT*100:.2f}%, flagging for refetch")
-
-    if revalidate_targets:
-        from data_pipeline.rate_limiter import rate_limiter
-        for r_start, r_end in revalidate_targets:
-            rate_limiter.wait_if_needed_for_symbol(
-                symbol       = f"{symbol}/5m_revalidate",
-                n_timeframes = 1,
-                pages_per_tf = 1,
-            )
-            lltf_revalidated = _fetch_all(symbol, LLTF_INTERVAL, r_start, r_end)
-            if not lltf_revalidated.empty:
-                before = df_lltf.loc[df_lltf.index.isin(lltf_revalidated.index)]
-                for ts in lltf_revalidated.index:
-                    if ts in before.index:
-                        old_close = before.loc[ts, "close"]
-                        new_close = lltf_revalidated.loc[ts, "close"]
-                        if abs(old_close - new_close) > 1e-12:
-                            print(f"[REVALIDATE LLTF] {symbol} {ts} close corrected {old_close} → {new_close}")
-                df_lltf = pd.concat([df_lltf, lltf_revalidated])
-                df_lltf = df_lltf[~df_lltf.index.duplicated(keep="last")]
-
-        df_lltf = df_lltf.sort_index()
-
-    df_lltf = df_lltf.sort_index()
-    df_lltf = df_lltf[df_lltf.index >= start_required]
-    df_lltf = df_lltf.iloc[-(HOURS_LOOKBACK * 12):]
-    try:
-        validate_ohlcv(df_lltf, symbol, freq=LLTF_INTERVAL)
-    except RuntimeError as e:
-        print(f"[WARN] LLTF validation failed for {symbol} (non-fatal): {e}")
-
-    os.makedirs(CACHE_DIR, exist_ok=True)
-
-    tmp_lltf = path_lltf + ".tmp"
-    df_lltf.to_parquet(tmp_lltf)
-    os.makedirs(os.path.dirname(path_lltf), exist_ok=True)
-    os.replace(tmp_lltf, path_lltf)
-
-    print("[SAVE] LLTF cache updated | candles:", len(df_lltf))
+    if not DERIVED_TIMEFRAMES:
+        df_lltf = _build_lltf(symbol, start_required, now_full)
 
     return df, df_htf, df_lltf, htf_scores
\ No newline at end of file
@@ -110,11 +110,12 @@ def _request(method: str, path: str, params: dict = None, signed: bool = True) -
     Low-level HTTP call. Adds timestamp + signature for signed endpoints.
     Raises BinanceExecutionError on any non-200 or Binance error code.
     """
-    from data_pipeline.rate_limiter import rate_limiter
+    from data_pipeline.rate_limiter import rate_limiter, PRIORITY_EXIT
 
-    # Block if currently banned or rate-limited
+    # Block if currently banned or rate-limited. Account and order calls
+    # manage live positions, so they never yield to data fetches.
     try:
-        rate_limiter.check()
+        rate_limiter.check(weight=1, priority=PRIORITY_EXIT)
     except RuntimeError as e:
         raise BinanceExecutionError(f"Rate limiter blocked request: {e}") from e
 
@@ -2,12 +2,18 @@
 import os
 import json
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone, timedelta
 from utils.log import debug, info, trade, error
 from utils.logger import log
 
-from data_pipeline.updater import update_symbol, _cache_path
-from indicators.indicators import generate_signal, atr_ema
+from data_pipeline.updater import update_symbol, _cache_path, candle_store
+from data_pipeline.feature_store import FeatureStore
+from indicators.indicators import generate_signal, atr_ema, compute_htf_scores
+from indicators.signal_state import SignalState
+from indicators.panel import generate_signal_panel
+from indicators.alignment import map_ltf_to_htf, inside_htf_bar
 from strategy.lifecycle import PositionManager
 from execution.notifier import TelegramNotifier
 import pandas as pd
@@ -33,17 +39,20 @@ SYMBOLS = [
 # --------------------------------------------------------------
 # SYMBOL RUN-ORDER PRIORITY
 # --------------------------------------------------------------
-# Scores each symbol from its cached signal state (data/signal_cache/<symbol>_signals.parquet)
+# Scores each symbol from the last row of its cached signal frame
+# (feature store under data/signal_cache/<symbol>/) — only the three
+# columns below are read, not the whole frame.
+PRIORITY_COLUMNS = ["DISPLACEMENT_SCORE", "close_location_bias", "FLOW_STRENGTH"]
 
 def _symbol_priority_score(symbol: str) -> float:
-    cache_path = os.path.join("data/signal_cache", f"{symbol}_signals.parquet")
-    if not os.path.exists(cache_path):
-        return 1.0
-
     try:
-        row = pd.read_parquet(cache_path).iloc[-1]
+        tail = _SIGNAL_STORE.read(symbol, columns=PRIORITY_COLUMNS, tail=1)
     except Exception:
         return 1.0
+    if tail is None or tail.empty:
+        return 1.0
+
+    row = tail.iloc[-1]
 
     score = 1.0
 
@@ -67,6 +76,12 @@ def _symbol_priority_score(symbol: str) -> float:
 
 SIGNAL_STORE       = "data/signals.json"
 HOUR_MEMORY_FILE = "data/last_hour_seen.json"
+_HOUR_MEMORY_LOCK = threading.Lock()
+
+# Worker threads for the non-open symbols in run_hourly. Open positions
+# always run first, one at a time, before the pool starts; 1 restores the
+# fully sequential pass.
+SYMBOL_POOL_SIZE = max(1, int(os.getenv("SYMBOL_POOL_SIZE", "4")))
 
 # Interval constants
 LLTF_INTERVAL = "5m"
@@ -97,7 +112,29 @@ def _check_ip_change():
     except Exception:
         pass
 
-def run_hourly():
+def _run_symbol_admitted(symbol: str, external_pm=None, priority=None):
+    """
+    run_hourly_for_symbol() behind the shared weight admission gate, so
+    concurrent workers never overrun the Binance weight window between
+    them. Every request the symbol makes is scheduled under `priority`
+    (PRIORITY_EXIT for open positions, else PRIORITY_SIGNAL). Returns the
+    symbol summary.
+    """
+    from data_pipeline.rate_limiter import rate_limiter as _rl, request_priority, PRIORITY_SIGNAL
+    with request_priority(PRIORITY_SIGNAL if priority is None else priority):
+        cost = _rl.reserve_symbol_weight(symbol, n_timeframes=3, pages_per_tf=2)
+        try:
+            result = run_hourly_for_symbol(symbol, external_pm=external_pm)
+        finally:
+            _rl.release_symbol_weight(cost)
+    return result[0] if isinstance(result, tuple) else result
+
+def run_hourly(pm=None):
+    """
+    One pass over SYMBOLS. pm is a resident PositionManager kept alive by
+    the scheduler daemon (execution/scheduler.py); without it the pass
+    loads positions from disk like a cron-triggered run always has.
+    """
     _check_ip_change()
     print("\n==============================")
     print("CRYPTO MARKET PROJECT EXECUTION")
@@ -107,7 +144,7 @@ def run_hourly():
 
     notifier = TelegramNotifier()
 
-    from data_pipeline.rate_limiter import rate_limiter
+    from data_pipeline.rate_limiter import rate_limiter, PRIORITY_EXIT, PRIORITY_SIGNAL
     from data_pipeline.fetcher import check_current_weight
 
     # Only ping Binance once per 5m boundary — not every 10s cron tick
@@ -171,6 +208,8 @@ def run_hourly():
         notifier.send_text("🔒 *LIVE SKIPPED*\nReplay lock active — skipping live execution")
         return
 
+    pm_check = pm
+
     if os.getenv("BINANCE_API_KEY") and os.getenv("BINANCE_API_SECRET"):
         from execution.binance_client import reconcile_positions, get_open_positions, get_open_orders, get_open_algo_orders, get_account_balance
         from strategy.account_state import account_state as _account_state
@@ -239,7 +278,7 @@ def run_hourly():
 
         # Create pm_check FIRST — _should_recon needs to read its
         # .positions, so the instance must exist before that check.
-        pm_check = PositionManager(persist=True, notify=False)
+        pm_check = pm if pm is not None else PositionManager(persist=True, notify=False)
 
         # Always recon if positions are open locally — catches manual closes
         # on Binance that the system would otherwise never discover until the
@@ -289,7 +328,7 @@ def run_hourly():
                                 ghost_entry = ghost_pos.get("entry_price", 0)
                                 pm_check.positions.pop(ghost_sym, None)
                                 pm_check._dirty = True
-                                pm_check.flush()
+                                pm_check.flush(force=True)
                                 notifier.send_text(
                                     f"🧹 *GHOST CLEANED*\n"
                                     f"`{ghost_sym}` removed from local tracking\n"
@@ -327,9 +366,8 @@ def run_hourly():
                                 # Use an ATR-based estimate instead so R stays meaningful.
                                 _fallback_atr = None
                                 try:
-                                    import pandas as _pd
                                     from indicators.indicators import atr_ema
-                                    _cached_1h = _pd.read_parquet(f"data/cache/{symbol}_1h.parquet")
+                                    _cached_1h = candle_store.load(symbol, "1h")
                                     _fallback_atr = float(atr_ema(_cached_1h).iloc[-1])
                                 except Exception as _atr_err:
                                     _tg_debug(f"[RECON] ATR fallback failed for {symbol}: {_atr_err}")
@@ -369,7 +407,7 @@ def run_hourly():
                             _seed_mfe_r, _seed_pnl_r = 0.0, 0.0
                             _seed_mfe, _seed_mae = 0.0, 0.0
                             try:
-                                _last_price_cache = pd.read_parquet(f"data/cache/{symbol}_5m.parquet")
+                                _last_price_cache = candle_store.load(symbol, "5m", columns=["close"])
                                 _current_price = float(_last_price_cache["close"].iloc[-1])
                                 _move = (
                                     _current_price - entry_price if direction == 1
@@ -416,7 +454,7 @@ def run_hourly():
 
                             pm_check.positions[symbol] = recovered
                             pm_check._dirty = True
-                            pm_check.flush()
+                            pm_check.flush(force=True)
 
                             notifier.send_text(
                                 f"♻️ *ORPHAN RECOVERED*\n"
@@ -450,10 +488,25 @@ def run_hourly():
             indent=2
         )
 
+    if SIGNAL_ENGINE == "panel":
+        _prime_signal_panel(SYMBOLS)
+
+    # One PositionManager for the whole pass. Without API keys nothing
+    # above built one, and per-worker instances would each rewrite
+    # open_positions.json and check MAX_SIMULTANEOUS against a private
+    # copy. If it cannot be loaded, the pool runs one symbol at a time.
+    pool_size = SYMBOL_POOL_SIZE
+    if pm_check is None:
+        try:
+            pm_check = PositionManager(persist=True, notify=True)
+        except Exception as pm_err:
+            print(f"[POSITION MANAGER] shared load failed ({pm_err}) — running symbols sequentially")
+            pool_size = 1
+
     # Load open positions once — symbols with open trades run first
     # so exit checks are never delayed by unrelated symbol processing.
     try:
-        _pm_peek = PositionManager(persist=True, notify=False)
+        _pm_peek = pm_check if pm_check is not None else PositionManager(persist=True, notify=False)
         _open_symbols = set(_pm_peek.positions.keys())
     except Exception:
         _open_symbols = set()
@@ -486,37 +539,68 @@ def run_hourly():
     _priority = _open_priority + _score_priority
     _normal_sorted = _candidates_sorted[TOP_SCORE_PRIORITY_COUNT:]
 
-    # Must be initialized BEFORE the priority pass loop below, since
-    # that loop appends to all three on every iteration.
+    # Must be initialized BEFORE the priority pass below, since every
+    # symbol run appends to all three.
     symbol_summaries = []
     failed_symbols = []
     ip_ban_wait = None
 
+    def _record_failure(symbol, sym_err, alert):
+        nonlocal ip_ban_wait
+        err_str = str(sym_err)
+        if "IP_BANNED" in err_str:
+            import re
+            match = re.search(r"wait (\d+)s", err_str)
+            if match and ip_ban_wait is None:
+                ip_ban_wait = int(match.group(1))
+        elif alert:
+            import traceback
+            tb = "".join(traceback.format_exception(sym_err))
+            notifier.send_text(
+                f"💥 *SYMBOL CRASH*\n"
+                f"Symbol: `{symbol}`\n"
+                f"Error: `{err_str[:300]}`\n"
+                f"Traceback:\n`{tb[:600]}`"
+            )
+        failed_symbols.append(symbol)
+        symbol_summaries.append((symbol, None))
+
+    def _run_pool(symbols, alert, on_done=None):
+        """Runs symbols on the worker pool, starting them in list order.
+        on_done(symbol) runs on this thread as each one finishes."""
+        # SYMBOLS lists a few pairs twice — never run one symbol on two workers
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return
+        workers = min(pool_size, len(symbols))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="symbol") as pool:
+            futures = {pool.submit(_run_symbol_admitted, s, pm_check): s for s in symbols}
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    symbol_summaries.append((symbol, future.result()))
+                except Exception as sym_err:
+                    _record_failure(symbol, sym_err, alert)
+                if on_done is not None:
+                    on_done(symbol)
+
     # Process all priority symbols FIRST in their own pass before any
     # normal symbol runs. This guarantees open positions AND top-scored
     # symbols get their current-bar update even if the low-priority
     # symbol loop (with its continuity-scan overhead) takes minutes.
+    # Open positions go strictly one at a time ahead of everything else
+    # so exit checks never queue behind a worker; the top-scored symbols
+    # then share the pool.
     print(f"[PRIORITY PASS] processing {len(_priority)} symbols first "
-          f"({len(_open_priority)} open positions + {len(_score_priority)} top-scored): {_priority}")
-    for symbol in _priority:
-        from data_pipeline.rate_limiter import rate_limiter as _rl
-        _rl.wait_if_needed_for_symbol(symbol, n_timeframes=3, pages_per_tf=2)
+          f"({len(_open_priority)} open positions + {len(_score_priority)} top-scored): {_priority} "
+          f"| pool={pool_size}")
+    for symbol in _open_priority:
         try:
-            result = run_hourly_for_symbol(symbol, external_pm=pm_check)
-            if isinstance(result, tuple):
-                summary, _ = result
-            else:
-                summary = result
-            symbol_summaries.append((symbol, summary))
+            symbol_summaries.append((symbol, _run_symbol_admitted(symbol, pm_check, PRIORITY_EXIT)))
         except Exception as sym_err:
-            err_str = str(sym_err)
-            if "IP_BANNED" in err_str:
-                import re
-                match = re.search(r"wait (\d+)s", err_str)
-                if match and ip_ban_wait is None:
-                    ip_ban_wait = int(match.group(1))
-            failed_symbols.append(symbol)
-            symbol_summaries.append((symbol, None))
+            _record_failure(symbol, sym_err, alert=False)
+
+    _run_pool(_score_priority, alert=False)
 
     _run_order = _priority + _normal_sorted
 
@@ -556,11 +640,10 @@ def run_hourly():
         if _ts is not None and (_max_cursor_seen is None or _ts > _max_cursor_seen):
             _max_cursor_seen = _ts
 
-    def _resync_lagging_priority():
+    def _resync_lagging_priority(trigger_symbol):
         """Reprocess every priority symbol whose on-disk cursor is behind
         _max_cursor_seen. Mutates symbol_summaries in place."""
         nonlocal _max_cursor_seen
-        from data_pipeline.rate_limiter import rate_limiter as _rl
         for open_symbol in _priority:
             cur_ts = _cursor_ts(_read_5m_cursor(open_symbol))
             if cur_ts is not None and _max_cursor_seen is not None and cur_ts >= _max_cursor_seen:
@@ -570,16 +653,14 @@ def run_hourly():
             # that triggered the resync — means it was processed this tick
             # and reprocessing would just replay the same bars again,
             # causing the alternating-timestamp / double-increment bug.
-            _triggering_cursor = _cursor_ts(_read_5m_cursor(symbol))
+            _triggering_cursor = _cursor_ts(_read_5m_cursor(trigger_symbol))
             if cur_ts is not None and _triggering_cursor is not None and cur_ts >= _triggering_cursor:
                 continue
 
-            _rl.wait_if_needed_for_symbol(open_symbol, n_timeframes=3, pages_per_tf=2)
             try:
-                resync_result = run_hourly_for_symbol(open_symbol, external_pm=pm_check)
-                resync_summary = (
-                    resync_result[0] if isinstance(resync_result, tuple)
-                    else resync_result
+                resync_summary = _run_symbol_admitted(
+                    open_symbol, pm_check,
+                    PRIORITY_EXIT if open_symbol in _open_priority else PRIORITY_SIGNAL,
                 )
                 for i, (s2, _old) in enumerate(symbol_summaries):
                     if s2 == open_symbol:
@@ -595,40 +676,10 @@ def run_hourly():
                     f"Error: `{str(resync_err)[:300]}`"
                 )
 
-    for symbol in _run_order:
-        if symbol in _priority:
-            continue  # already processed in priority pass above
-        from data_pipeline.rate_limiter import rate_limiter as _rl
-        _rl.wait_if_needed_for_symbol(symbol, n_timeframes=3, pages_per_tf=2)
-
-        try:
-            result = run_hourly_for_symbol(symbol, external_pm=pm_check)
-            if isinstance(result, tuple):
-                summary, _ = result
-            else:
-                summary = result
-            symbol_summaries.append((symbol, summary))
-        except Exception as sym_err:
-            err_str = str(sym_err)
-            if "IP_BANNED" in err_str:
-                import re
-                match = re.search(r"wait (\d+)s", err_str)
-                if match and ip_ban_wait is None:
-                    ip_ban_wait = int(match.group(1))
-                failed_symbols.append(symbol)
-                symbol_summaries.append((symbol, None))
-            else:
-                import traceback
-                tb = traceback.format_exc()
-                failed_symbols.append(symbol)
-                notifier.send_text(
-                    f"💥 *SYMBOL CRASH*\n"
-                    f"Symbol: `{symbol}`\n"
-                    f"Error: `{str(sym_err)[:300]}`\n"
-                    f"Traceback:\n`{tb[:600]}`"
-                )
-                symbol_summaries.append((symbol, None))
-
+    def _after_normal_symbol(symbol):
+        # Runs on this thread between pool completions, so priority
+        # resyncs never race the pass that triggered them.
+        nonlocal _max_cursor_seen
         _this_cursor = _cursor_ts(_read_5m_cursor(symbol))
         if (
             _priority
@@ -637,18 +688,36 @@ def run_hourly():
         ):
             _max_cursor_seen = _this_cursor
 
-            if symbol not in _priority:
-                _needs_resync = [
-                    s for s in _priority
-                    if (lambda t: t is None or t < _max_cursor_seen)(_cursor_ts(_read_5m_cursor(s)))
-                ]
-                if _needs_resync:
-                    print(
-                        f"[OPEN RESYNC] {symbol} confirmed newer bar "
-                        f"({_max_cursor_seen}) — reprocessing lagging "
-                        f"open positions: {_needs_resync}"
-                    )
-                    _resync_lagging_priority()
+            _needs_resync = [
+                s for s in _priority
+                if (lambda t: t is None or t < _max_cursor_seen)(_cursor_ts(_read_5m_cursor(s)))
+            ]
+            if _needs_resync:
+                print(
+                    f"[OPEN RESYNC] {symbol} confirmed newer bar "
+                    f"({_max_cursor_seen}) — reprocessing lagging "
+                    f"open positions: {_needs_resync}"
+                )
+                _resync_lagging_priority(symbol)
+
+    _run_pool(
+        [s for s in _run_order if s not in _priority],
+        alert=True,
+        on_done=_after_normal_symbol,
+    )
+
+    # completion order depends on the pool — report in run order
+    _order = {s: i for i, s in enumerate(_run_order)}
+    symbol_summaries.sort(key=lambda item: _order.get(item[0], len(_order)))
+
+    from data_pipeline.updater import revalidation_planner
+    _reval = revalidation_planner.tick_stats()
+    if _reval["plans"]:
+        print(
+            f"[REVALIDATE PLAN] pass: {_reval['plans']} symbols, {_reval['bars_due']} bars due, "
+            f"{_reval['pages']} pages vs {_reval['blind_pages']} blind — "
+            f"weight saved={_reval['weight_saved']}"
+        )
 
     if ip_ban_wait is not None:
         ban_notif_file = "data/last_ban_notif.json"
@@ -726,49 +795,204 @@ def run_hourly():
     print("\n=== EXECUTION COMPLETE ===\n")
 
 SIGNAL_CACHE_DIR = "data/signal_cache"
+_SIGNAL_STORE = FeatureStore(SIGNAL_CACHE_DIR)
+
+# Appended rows accumulate past the 1H window; once the store holds
+# this many windows' worth it is rewritten down to one window.
+SIGNAL_STORE_COMPACT_FACTOR = 2
 
 def _wipe_signal_cache():
     if os.path.exists(SIGNAL_CACHE_DIR):
         import glob
+        # legacy single-file cache
         for f in glob.glob(os.path.join(SIGNAL_CACHE_DIR, "*.parquet")):
             os.remove(f)
         for f in glob.glob(os.path.join(SIGNAL_CACHE_DIR, "*.json")):
             os.remove(f)
+        _SIGNAL_STORE.wipe()
         print("[SIGNAL CACHE] wiped on restart")
 
 _wipe_signal_cache()
 
+# --------------------------------------------------------------
+# INCREMENTAL SIGNAL STATE (per symbol, in-process)
+# --------------------------------------------------------------
+# A full generate_signal() pass over 900 1H bars is the single largest
+# CPU cost of a symbol run. Once a SignalState has been bootstrapped,
+# each newly closed 1H bar is folded in with an O(1) update instead.
+#
+# The state freezes the batch path's whole-window seeds at bootstrap,
+# so it is re-bootstrapped every SIGNAL_STATE_RESEED_BARS bars to keep
+# it within a day of what a fresh generate_signal() on the sliding
+# window would produce. In between, only the entry columns are held to
+# that (see the divergence note in indicators/signal_state.py). Any
+# revised/missing bar also forces a bootstrap.
+SIGNAL_STATE_RESEED_BARS = 24
+_SIGNAL_STATES = {}
+
+def _signal_df_from_state(symbol, df, htf_df, is_live, htf_scores):
+    if htf_scores is None:
+        htf_scores = compute_htf_scores(htf_df)
+
+    state = _SIGNAL_STATES.get(symbol)
+    out = None
+    incremental = False
+    if (
+        state is not None
+        and state.live == is_live
+        and state.bars_since_bootstrap < SIGNAL_STATE_RESEED_BARS
+    ):
+        n_before = state.bars_since_bootstrap
+        out = state.extend(df, htf_scores=htf_scores)
+        if out is not None:
+            incremental = True
+            print(
+                f"[SIGNAL STATE] {symbol} — +{state.bars_since_bootstrap - n_before} bar(s) "
+                f"incremental ({state.bars_since_bootstrap}/{SIGNAL_STATE_RESEED_BARS} since bootstrap)"
+            )
+
+    if out is None:
+        state = SignalState(live=is_live, symbol=symbol, max_rows=len(df))
+        out = state.bootstrap(df, htf_df=htf_df, htf_scores=htf_scores)
+        _SIGNAL_STATES[symbol] = state
+        print(f"[SIGNAL STATE] {symbol} — bootstrapped on {len(df)} bars")
+
+    out = out[out.index >= df.index[0]]
+    if not out.index.equals(df.index):
+        raise RuntimeError(f"signal state index drifted from 1H window (last={out.index[-1]} vs {df.index[-1]})")
+
+    return out.copy(), incremental
+
+def _latest_hour_key(df):
+    # Signal cache key: last closed 1H bar's time plus its OHLCV, so a
+    # revised candle invalidates the cached frame as well.
+    return (
+        f"{df.index[-1].isoformat()}_"
+        f"{df['close'].iloc[-1]:.8f}_"
+        f"{df['high'].iloc[-1]:.8f}_"
+        f"{df['low'].iloc[-1]:.8f}_"
+        f"{df['volume'].iloc[-1]:.2f}"
+    )
+
+def _save_signal_df(symbol, df, latest_hour_ts, incremental):
+    # Incremental updates leave every earlier row untouched, so only the
+    # new tail is appended — onto rows this symbol's state wrote, never
+    # onto a panel-written frame. Anything else rewrites the symbol.
+    if incremental:
+        meta = _SIGNAL_STORE.meta(symbol)
+        last = _SIGNAL_STORE.last_index(symbol)
+        new_rows = df if last is None else df[df.index > last]
+        if (
+            meta is not None
+            and meta["extra"].get("source") == "state"
+            and _SIGNAL_STORE.append(symbol, new_rows, hour=latest_hour_ts, window=len(df))
+        ):
+            meta = _SIGNAL_STORE.meta(symbol)
+            if meta["rows"] > SIGNAL_STORE_COMPACT_FACTOR * len(df):
+                _SIGNAL_STORE.compact(symbol, keep=len(df))
+            return
+    _SIGNAL_STORE.write(symbol, df, hour=latest_hour_ts, window=len(df), source="state")
+
 def _get_signal_df(symbol, df, htf_df, is_live, htf_scores, latest_hour_ts):
     os.makedirs(SIGNAL_CACHE_DIR, exist_ok=True)
-    cache_path = os.path.join(SIGNAL_CACHE_DIR, f"{symbol}_signals.parquet")
-    meta_path  = os.path.join(SIGNAL_CACHE_DIR, f"{symbol}_meta.json")
 
-    if os.path.exists(cache_path) and os.path.exists(meta_path):
-        try:
-            with open(meta_path) as f:
-                meta = json.load(f)
-            if meta.get("hour") == latest_hour_ts:
-                cached = pd.read_parquet(cache_path)
-                cached.index = pd.to_datetime(cached.index, utc=True)
-                print(f"[SIGNAL CACHE HIT] {symbol} — skipping generate_signal")
-                return cached
-        except Exception:
-            pass
+    try:
+        meta = _SIGNAL_STORE.meta(symbol)
+        if meta is not None and meta["extra"].get("hour") == latest_hour_ts:
+            cached = _SIGNAL_STORE.read(symbol, tail=meta["extra"].get("window"))
+            print(f"[SIGNAL CACHE HIT] {symbol} — skipping generate_signal")
+            return cached
+    except Exception:
+        pass
 
-    print(f"[SIGNAL CACHE MISS] {symbol} — running generate_signal")
-    df = generate_signal(df.copy(), htf_df.copy(), live=is_live, symbol=symbol, htf_stack_cache=htf_scores)
+    print(f"[SIGNAL CACHE MISS] {symbol} — updating signal state")
+    incremental = False
+    try:
+        df, incremental = _signal_df_from_state(symbol, df, htf_df, is_live, htf_scores)
+    except Exception as e:
+        print(f"[SIGNAL STATE FAILED] {symbol} — {type(e).__name__}: {e}, running generate_signal")
+        _SIGNAL_STATES.pop(symbol, None)
+        df = generate_signal(df.copy(), htf_df.copy(), live=is_live, symbol=symbol, htf_stack_cache=htf_scores)
 
     try:
-        df.to_parquet(cache_path + ".tmp")
-        os.replace(cache_path + ".tmp", cache_path)
-        with open(meta_path + ".tmp", "w") as f:
-            json.dump({"hour": latest_hour_ts}, f)
-        os.replace(meta_path + ".tmp", meta_path)
+        _save_signal_df(symbol, df, latest_hour_ts, incremental)
     except Exception as e:
         print(f"[SIGNAL CACHE SAVE FAILED] {symbol} — {e}")
+        _SIGNAL_STORE.delete(symbol)
 
     return df
 
+# --------------------------------------------------------------
+# MULTI-SYMBOL SIGNAL PANEL
+# --------------------------------------------------------------
+# SIGNAL_ENGINE=panel primes the signal store for the whole universe
+# with one generate_signal_panel() pass over the cached 1H/4H data
+# before any symbol runs, instead of one generate_signal()/bootstrap
+# per symbol. Each frame is stored under the same hour key
+# _get_signal_df() checks, so a symbol whose 1H window is unchanged
+# by the time it runs is a cache hit; one that fetches a fresh 1H bar
+# inside its own run falls through to the SignalState path as usual.
+SIGNAL_ENGINE = os.getenv("SIGNAL_ENGINE", "state").strip().lower()
+
+def _load_cached_signal_inputs(symbol, now_hour):
+    """1H / 4H / HTF scores from the on-disk caches, trimmed the way the
+    cache-serve branch of run_hourly_for_symbol trims them."""
+    df = candle_store.load(symbol, "1h")
+    df = df[df.index <= now_hour - timedelta(hours=1)]
+
+    htf_df = candle_store.load(symbol, "4h")
+
+    htf_scores = None
+    if os.path.exists(_cache_path(symbol, "htf_scores")):
+        htf_scores = pd.read_parquet(_cache_path(symbol, "htf_scores"))
+        htf_scores.index = pd.to_datetime(htf_scores.index, utc=True)
+        htf_df = htf_df[htf_df.index <= htf_scores.index[-1]]
+    else:
+        current_4h_open = now_hour - timedelta(hours=now_hour.hour % 4)
+        htf_df = htf_df[htf_df.index < current_4h_open]
+        htf_scores = compute_htf_scores(htf_df)
+
+    return df, htf_df, htf_scores
+
+def _prime_signal_panel(symbols, is_live=True):
+    now_hour = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+    frames, scores, keys = {}, {}, {}
+    for symbol in dict.fromkeys(symbols):
+        try:
+            df, htf_df, htf_scores = _load_cached_signal_inputs(symbol, now_hour)
+        except Exception as e:
+            print(f"[SIGNAL PANEL] {symbol} — cache unreadable ({type(e).__name__}: {e}), skipping")
+            continue
+        if df.empty or htf_df.empty:
+            continue
+
+        key = _latest_hour_key(df)
+        meta = _SIGNAL_STORE.meta(symbol)
+        if meta is not None and meta["extra"].get("hour") == key:
+            continue
+
+        frames[symbol], scores[symbol], keys[symbol] = df, htf_scores, key
+
+    if not frames:
+        return
+
+    t0 = time.time()
+    try:
+        panel = generate_signal_panel(frames, scores, live=is_live)
+    except Exception as e:
+        print(f"[SIGNAL PANEL FAILED] {type(e).__name__}: {e} — symbols fall back to per-symbol signals")
+        return
+
+    for symbol, out in panel.items():
+        try:
+            _SIGNAL_STORE.write(symbol, out, hour=keys[symbol], window=len(out), source="panel")
+        except Exception as e:
+            print(f"[SIGNAL PANEL] {symbol} — save failed ({e})")
+            _SIGNAL_STORE.delete(symbol)
+
+    print(f"[SIGNAL PANEL] {len(panel)} symbols in {time.time() - t0:.2f}s")
+
 # ==========================================================
 # SINGLE SYMBOL ENGINE (UNIFIED LIVE + REPLAY)
 # ==========================================================
@@ -917,7 +1141,7 @@ def run_hourly_for_symbol(
                 # instead of once per 5m close — that's what was delaying entry
                 # notifications, collapsing xx:05/xx:10/xx:15 reports into one, and
                 # burning rate-limiter weight ahead of other priority symbols.
-                if _is_new_hour or not os.path.exists(_cache_path(symbol, "5m")):
+                if _is_new_hour or not candle_store.exists(symbol, "5m"):
                     df, htf_df, lltf_df, htf_scores = update_symbol(symbol)
                 else:
                     # between 5m boundaries — serve 1H/4H from cache.
@@ -930,12 +1154,10 @@ def run_hourly_for_symbol(
                         hours_into_cycle_c = now_hour_c.hour % 4
                         current_4h_open_c = now_hour_c - timedelta(hours=hours_into_cycle_c)
 
-                        df = pd.read_parquet(_cache_path(symbol, "1h"))
-                        df.index = pd.to_datetime(df.index, utc=True)
+                        df = candle_store.load(symbol, "1h")
                         df = df[df.index <= now_hour_c - timedelta(hours=1)]
 
-                        htf_df = pd.read_parquet(_cache_path(symbol, "4h"))
-                        htf_df.index = pd.to_datetime(htf_df.index, utc=True)
+                        htf_df = candle_store.load(symbol, "4h")
 
                         # Load scores FIRST under a fresh name, then trim htf_df —
                         # avoids the UnboundLocalError from reading and reassigning
@@ -958,8 +1180,7 @@ def run_hourly_for_symbol(
 
                         # Only hit Binance if 5m cache is genuinely behind the
                         # current boundary — not on every cron tick.
-                        lltf_df = pd.read_parquet(_cache_path(symbol, "5m"))
-                        lltf_df.index = pd.to_datetime(lltf_df.index, utc=True)
+                        lltf_df = candle_store.load(symbol, "5m")
 
                         _minutes_floored = (now_utc_c.minute // 5) * 5
                         _current_5m_boundary = pd.Timestamp(
@@ -1019,21 +1240,17 @@ def run_hourly_for_symbol(
                                         except Exception:
                                             pass
                             else:
-                                from data_pipeline.updater import _fetch_all, continuity_fix_5m, HOURS_LOOKBACK
+                                from data_pipeline.updater import _fetch_all, continuity_fix_5m, upsert_bars, HOURS_LOOKBACK
                                 lltf_fetch_start = lltf_df.index[-1] + pd.Timedelta(minutes=5)
                                 lltf_fetch_end = pd.Timestamp(now_utc_c).tz_localize("UTC") if now_utc_c.tzinfo is None else pd.Timestamp(now_utc_c)
                                 new_lltf = _fetch_all(symbol, "5m", lltf_fetch_start, lltf_fetch_end)
                                 if not new_lltf.empty:
-                                    lltf_df = pd.concat([lltf_df, new_lltf])
-                                    lltf_df = lltf_df[~lltf_df.index.duplicated(keep="last")]
-                                    lltf_df = lltf_df.sort_index()
+                                    lltf_df, _ = upsert_bars(lltf_df, new_lltf)
                                     # Same corruption source as update_symbol's fast-exit path —
                                     # this append can also write a mid-formation bar. Scan it too.
                                     _fix_start_required = now_hour_c - timedelta(hours=HOURS_LOOKBACK)
                                     lltf_df = continuity_fix_5m(symbol, lltf_df, _fix_start_required)
-                                    tmp = _cache_path(symbol, "5m") + ".tmp"
-                                    lltf_df.to_parquet(tmp)
-                                    os.replace(tmp, _cache_path(symbol, "5m"))
+                                    candle_store.write(symbol, "5m", lltf_df)
                                 # Feed recovered — clear any stale alert throttle state
                                 _stale_alert_file = f"data/cursors/stale_alert_{symbol}.json"
                                 try:
@@ -1106,17 +1323,26 @@ def run_hourly_for_symbol(
         # produce real closed 5m candles with zero trades that look
         # identical to the synthetic placeholder under a shape-based test.
         try:
-            from data_pipeline.fetcher import fetch_ohlcv
-            forming = fetch_ohlcv(
-                symbol=symbol,
-                interval="5m",
-                start=current_5m_boundary,
-                end=current_5m_boundary,
-                limit=1,
-                verbose=False,
-            )
-            if not forming.empty and current_5m_boundary in forming.index:
-                forming_open = float(forming.loc[current_5m_boundary, "open"])
+            # The kline stream already holds the forming bar; REST only
+            # when it is not running or has not seen this bar yet.
+            from execution.kline_stream import forming_bar
+            forming = forming_bar(symbol, current_5m_boundary)
+            _forming_src = "stream"
+            if forming is None:
+                from data_pipeline.fetcher import fetch_ohlcv
+                _forming_df = fetch_ohlcv(
+                    symbol=symbol,
+                    interval="5m",
+                    start=current_5m_boundary,
+                    end=current_5m_boundary,
+                    limit=1,
+                    verbose=False,
+                )
+                if not _forming_df.empty and current_5m_boundary in _forming_df.index:
+                    forming = _forming_df.loc[current_5m_boundary]
+                _forming_src = "rest"
+            if forming is not None:
+                forming_open = float(forming["open"])
                 placeholder = pd.DataFrame(
                     [{
                         "open":          forming_open,
@@ -1125,14 +1351,14 @@ def run_hourly_for_symbol(
                         "close":         forming_open,
                         "volume":        0.0,
                         "taker_buy_base": 0.0,
-                        "intrabar_high": float(forming.loc[current_5m_boundary, "high"]),
-                        "intrabar_low":  float(forming.loc[current_5m_boundary, "low"]),
+                        "intrabar_high": float(forming["high"]),
+                        "intrabar_low":  float(forming["low"]),
                         "is_placeholder": True,
                     }],
                     index=pd.DatetimeIndex([current_5m_boundary], tz="UTC"),
                 )
                 lltf_df = pd.concat([lltf_df, placeholder])
-                print(f"[PLACEHOLDER 5M] {symbol} — injected forming bar @ {current_5m_boundary} open={forming_open}")
+                print(f"[PLACEHOLDER 5M] {symbol} — injected forming bar @ {current_5m_boundary} open={forming_open} ({_forming_src})")
         except Exception as e:
             print(f"[PLACEHOLDER 5M FAILED] {symbol} — {e}, proceeding without it")
 
@@ -1153,17 +1379,7 @@ def run_hourly_for_symbol(
         # -------------------
         # GENERATE & MAP SIGNALS
         # -------------------
-        latest_bar_close  = f"{df['close'].iloc[-1]:.8f}"
-        latest_bar_high   = f"{df['high'].iloc[-1]:.8f}"
-        latest_bar_low    = f"{df['low'].iloc[-1]:.8f}"
-        latest_bar_volume = f"{df['volume'].iloc[-1]:.2f}"
-        latest_hour_ts = (
-            f"{df.index[-1].isoformat()}_"
-            f"{latest_bar_close}_"
-            f"{latest_bar_high}_"
-            f"{latest_bar_low}_"
-            f"{latest_bar_volume}"
-        )
+        latest_hour_ts = _latest_hour_key(df)
         df = _get_signal_df(symbol, df, htf_df, is_live, htf_scores, latest_hour_ts)
 
         # DEBUG — HTF_QUALITY alignment audit
@@ -1230,41 +1446,15 @@ def run_hourly_for_symbol(
         # map_ltf_to_htf (searchsorted right - 1 gives the new bar), so it is safe.
 
         if 'final_signal' in lltf_df.columns:
-            # Floor each 5m timestamp to its 1H bar open
-            ts_1h_floor = lltf_df.index.floor('h')
-            # Get the 1H bar open each 5m bar maps to via ltf_index
-            ltf_opens = df.index
-            mapped_1h_open = lltf_df['ltf_index'].apply(
-                lambda i: ltf_opens[int(i)] if 0 <= int(i) < len(ltf_opens) else pd.NaT
-            )
-            # A 5m bar is INSIDE its generating 1H bar when its timestamp floor equals
-            # its mapped 1H open — meaning the 1H bar hasn't closed yet at this 5m bar.
-            # (The 13:00 5m bar maps to the 13:00 1H bar, floor is 13:00, equals — so
-            #  it WOULD be blocked. But 13:00 is a valid entry. We want to allow it.)
-            # 
-            # Correct rule: block if ts is STRICTLY BETWEEN origin and origin+1H (exclusive both ends
-            # means we allow the boundary). Actually: block if origin <= ts < origin+1H
-            # but ts != origin (don't block the open of the new bar).
-            # Since the new 1H bar opens AT origin, and that IS a valid entry bar,
-            # we block: origin < ts < origin+1H  (strictly inside, not at boundary).
+            # A 5m bar is INSIDE its generating 1H bar when origin <= ts < origin + 1H,
+            # origin being the 1H open its ltf_index maps to — the 1H bar hasn't
+            # closed yet at this 5m bar.
             #
-            # But ts AT origin: that's the very first 5m bar of the new hour. That bar's
-            # ltf_index maps to the 1H bar that just closed (index N-1), not the new one,
-            # because map_ltf_to_htf uses searchsorted('right') - 1. So origin for that
-            # bar = the PREVIOUS 1H bar open. So it WILL be blocked correctly.
-            # The 5m bar at 13:00 maps to 1H bar at 12:00 (last closed bar). origin=12:00.
-            # 12:00 <= 13:00 < 13:00 → False (13:00 < 13:00 is False). NOT blocked. ✓
-            
-            block_mask = pd.Series(False, index=lltf_df.index)
-            for ts, ltf_idx in zip(lltf_df.index, lltf_df['ltf_index']):
-                idx = int(ltf_idx)
-                if idx < 0 or idx >= len(ltf_opens):
-                    continue
-                origin = ltf_opens[idx]
-                origin_end = origin + pd.Timedelta(hours=1)
-                if origin <= ts < origin_end:
-                    block_mask[ts] = True
-            
+            # The 5m bar at 13:00 while the 13:00 1H bar is still forming maps to
+            # the 12:00 bar (the last closed one, searchsorted('right') - 1), so
+            # origin=12:00 and 12:00 <= 13:00 < 13:00 is False. NOT blocked. ✓
+            block_mask = inside_htf_bar(lltf_df.index, df.index, lltf_df['ltf_index'].to_numpy())
+
             lltf_df.loc[block_mask, 'final_signal'] = 0
 
         # notifier.debug(
@@ -1475,14 +1665,15 @@ def run_hourly_for_symbol(
                     f"executed_count={len(pm._executed_signals)}"
                 )
 
-            result = pm.update(
-                df=df,
-                symbol=symbol,
-                lltf_df=lltf_frozen,
-                external_signal=bar_signal,
-                external_row=signal_birth_row,
-                current_5m_row=row_5m
-            )
+            with pm._lock:
+                result = pm.update(
+                    df=df,
+                    symbol=symbol,
+                    lltf_df=lltf_frozen,
+                    external_signal=bar_signal,
+                    external_row=signal_birth_row,
+                    current_5m_row=row_5m
+                )
 
             if bar_signal != 0:
                 print(
@@ -1596,10 +1787,16 @@ def run_hourly_for_symbol(
                 new_hour = True
 
             if new_hour:
-                last_hour_seen[symbol] = latest_hour_ts
-                with open(HOUR_MEMORY_FILE + ".tmp", "w") as f:
-                    json.dump(last_hour_seen, f, indent=2)
-                os.replace(HOUR_MEMORY_FILE + ".tmp", HOUR_MEMORY_FILE)
+                # re-read under the lock — pool workers update other
+                # symbols' entries in the same file
+                with _HOUR_MEMORY_LOCK:
+                    if os.path.exists(HOUR_MEMORY_FILE):
+                        with open(HOUR_MEMORY_FILE, "r") as f:
+                            last_hour_seen = json.load(f)
+                    last_hour_seen[symbol] = latest_hour_ts
+                    with open(HOUR_MEMORY_FILE + ".tmp", "w") as f:
+                        json.dump(last_hour_seen, f, indent=2)
+                    os.replace(HOUR_MEMORY_FILE + ".tmp", HOUR_MEMORY_FILE)
                 print(f"[HOUR MEMORY UPDATED] {symbol} — {latest_hour_ts}")
             else:
                 print(f"[HOUR MEMORY UNCHANGED] {symbol} — already at {latest_hour_ts}")
@@ -1640,38 +1837,3 @@ def run_hourly_for_symbol(
         error(f"[ERROR] {symbol} → {e}")
         traceback.print_exc()
         return None
-
-def map_ltf_to_htf(lltf_df: pd.DataFrame, ltf_df: pd.DataFrame):
-    """
-    Maps each 5m bar to its parent 1H candle index.
-    ltf_df MUST be the 1H dataframe.
-    Passing 4H data silently corrupts every ltf_index, ATR, and entry price.
-    This assertion catches that immediately instead of trading on wrong data.
-    """
-    if len(ltf_df) >= 3:
-        _inferred = pd.infer_freq(ltf_df.index[:min(10, len(ltf_df))])
-        if _inferred not in (None, "h", "1h", "H", "1H", "60min", "60T", "T60"):
-            raise ValueError(
-                f"map_ltf_to_htf: expected 1H dataframe, "
-                f"got inferred freq='{_inferred}'. "
-                f"Pass the 1H df, not the 4H df."
-            )
-
-    ltf_times = ltf_df.index
-
-    ltf_index = []
-
-    for ts in lltf_df.index:
-
-        # find correct 1H candle start
-        idx = ltf_times.searchsorted(ts, side="right") - 1
-
-        if idx < 0:
-            idx = 0
-
-        ltf_index.append(idx)
-
-    lltf_df = lltf_df.copy()
-    lltf_df["ltf_index"] = ltf_index
-
-    return lltf_df
\ No newline at end of file
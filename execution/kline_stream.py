@@ -0,0 +1,263 @@
+# execution/kline_stream.py
+"""
+Binance market-data kline stream.
+
+The market-data counterpart of execution/ws_listener.py. Subscribes to
+the combined <symbol>@kline_5m streams for every traded symbol so the 5m
+candle cache stays current without REST polling:
+
+  - closed bars (k.x = true) are appended to the candle store as they
+    arrive, as long as they continue the cached tail. A bar that would
+    leave a hole is skipped — the cache-serve branch in hourly_runner
+    sees the stale tail and refetches the range over REST as before.
+  - the forming bar's open/high/low is kept in memory for the placeholder
+    in hourly_runner (instead of a fetch_ohlcv(limit=1) per symbol per
+    tick).
+
+No API key is needed. While a connection is down, forming_bar() returns
+None for its symbols and the runner falls back to REST. Reconnects
+automatically with exponential backoff.
+
+Usage (app.py and run.py --resident start it unless KLINE_STREAM=0):
+    from execution.kline_stream import start_kline_stream
+    start_kline_stream(SYMBOLS)
+"""
+
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+import websocket  # websocket-client
+
+KLINE_STREAM = os.getenv("KLINE_STREAM", "1") == "1"
+
+_TESTNET = os.getenv("BINANCE_TESTNET", "0") == "1"
+
+# BINANCE_FSTREAM_BASE points the stream at a local stand-in for tests
+_WS_BASE = os.getenv(
+    "BINANCE_FSTREAM_BASE",
+    "wss://stream.binancefuture.com" if _TESTNET else "wss://fstream.binance.com",
+).rstrip("/")
+
+KLINE_INTERVAL = "5m"
+
+# Binance caps one combined-stream connection at 200 streams
+MAX_STREAMS_PER_CONNECTION = 200
+
+
+class KlineStream:
+    def __init__(self, symbols, store=None, base_url: str = _WS_BASE, interval: str = KLINE_INTERVAL):
+        if store is None:
+            from data_pipeline.updater import candle_store as store
+
+        self.symbols  = list(dict.fromkeys(s.replace("-", "").upper() for s in symbols))
+        self.store    = store
+        self.base_url = base_url.rstrip("/")
+        self.interval = interval
+        self._step    = pd.Timedelta(interval)
+
+        self._lock      = threading.Lock()
+        self._stop      = threading.Event()
+        self._forming   = {}      # symbol -> forming bar dict
+        self._connected = set()   # urls with an open socket
+        self._apps      = {}
+        self._threads   = []
+
+        self.messages      = 0
+        self.closed_bars   = 0
+        self.gaps          = 0
+        self.last_closed   = {}   # symbol -> open time of the last bar written
+
+    # --------------------------------------------------
+    # CONNECTIONS
+    # --------------------------------------------------
+    def chunks(self) -> list:
+        """(url, symbols) per connection."""
+        out = []
+        for i in range(0, len(self.symbols), MAX_STREAMS_PER_CONNECTION):
+            chunk = self.symbols[i:i + MAX_STREAMS_PER_CONNECTION]
+            streams = "/".join(f"{s.lower()}@kline_{self.interval}" for s in chunk)
+            out.append((f"{self.base_url}/stream?streams={streams}", chunk))
+        return out
+
+    def start(self):
+        self._stop.clear()
+        for n, (url, chunk) in enumerate(self.chunks()):
+            t = threading.Thread(
+                target=self._connect_loop, args=(url, chunk), daemon=True, name=f"kline-stream-{n}"
+            )
+            t.start()
+            self._threads.append(t)
+        print(f"[KLINE STREAM] {len(self.symbols)} symbols over {len(self._threads)} connection(s)")
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        for app in list(self._apps.values()):
+            try:
+                app.close()
+            except Exception:
+                pass
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def _connect_loop(self, url: str, chunk: list):
+        """Connect and reconnect with exponential backoff."""
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                app = websocket.WebSocketApp(
+                    url,
+                    on_open=lambda ws: self._on_open(url),
+                    on_message=lambda ws, raw: self.handle(raw),
+                    on_error=lambda ws, err: print(f"[KLINE STREAM] error: {err}"),
+                    on_close=lambda ws, code, msg: self._on_close(url, chunk),
+                )
+                self._apps[url] = app
+                # run_forever blocks until disconnected
+                app.run_forever(ping_interval=30, ping_timeout=10)
+                backoff = 1  # reset on clean disconnect
+            except Exception as e:
+                print(f"[KLINE STREAM] connect failed: {e}")
+            finally:
+                self._on_close(url, chunk)
+
+            if self._stop.is_set():
+                break
+            print(f"[KLINE STREAM] reconnecting in {backoff}s...")
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 60)
+
+    def _on_open(self, url: str):
+        with self._lock:
+            self._connected.add(url)
+        print(f"[KLINE STREAM] connected ({url[:70]}...)")
+
+    def _on_close(self, url: str, chunk: list):
+        # updates missed while down would leave high/low stale
+        with self._lock:
+            self._connected.discard(url)
+            for s in chunk:
+                self._forming.pop(s, None)
+
+    # --------------------------------------------------
+    # MESSAGES
+    # --------------------------------------------------
+    def handle(self, raw: str) -> None:
+        try:
+            msg = json.loads(raw)
+        except Exception:
+            return
+        data = msg.get("data", msg)   # combined streams wrap the event
+        if data.get("e") != "kline":
+            return
+
+        k = data["k"]
+        symbol = data.get("s") or k.get("s")
+        open_time = pd.Timestamp(int(k["t"]), unit="ms", tz="UTC")
+        bar = {
+            "open":   float(k["o"]),
+            "high":   float(k["h"]),
+            "low":    float(k["l"]),
+            "close":  float(k["c"]),
+            "volume": float(k["v"]),
+        }
+        self.messages += 1
+
+        if k.get("x"):
+            with self._lock:
+                forming = self._forming.get(symbol)
+                if forming is not None and forming["t"] <= open_time:
+                    del self._forming[symbol]
+            self._write_closed(symbol, open_time, bar)
+        else:
+            with self._lock:
+                self._forming[symbol] = {"t": open_time, **bar, "received": time.time()}
+
+    def _write_closed(self, symbol: str, open_time: pd.Timestamp, bar: dict):
+        df = pd.DataFrame([bar], index=pd.DatetimeIndex([open_time], name="timestamp"))
+        try:
+            written = self.store.extend(symbol, self.interval, df, self._step)
+        except Exception as e:
+            print(f"[KLINE STREAM] {symbol} {open_time} — cache write failed: {e}")
+            return
+        if written is None:
+            self.gaps += 1
+            print(f"[KLINE STREAM] {symbol} {open_time} — cache tail behind, leaving the gap to REST")
+            return
+        self.closed_bars += 1
+        self.last_closed[symbol] = open_time
+
+    # --------------------------------------------------
+    # READERS
+    # --------------------------------------------------
+    def forming_bar(self, symbol: str, open_time: pd.Timestamp):
+        """
+        The forming bar opened at `open_time` as last pushed, or None when
+        the stream has not seen it (or its connection is down).
+        """
+        with self._lock:
+            bar = self._forming.get(symbol)
+            if bar is None or bar["t"] != open_time:
+                return None
+            return dict(bar)
+
+    def status(self) -> dict:
+        with self._lock:
+            connected = len(self._connected)
+            forming = len(self._forming)
+        return {
+            "symbols":     len(self.symbols),
+            "connections": len(self.chunks()),
+            "connected":   connected,
+            "forming":     forming,
+            "messages":    self.messages,
+            "closed_bars": self.closed_bars,
+            "gaps":        self.gaps,
+        }
+
+
+# ==================================================
+# MODULE-LEVEL STREAM
+# ==================================================
+_stream = None
+_lock = threading.Lock()
+
+
+def start_kline_stream(symbols) -> None:
+    """
+    Start the kline stream in background threads.
+    Safe to call multiple times — only starts once.
+    """
+    global _stream
+
+    with _lock:
+        if _stream is not None:
+            print("[KLINE STREAM] already running")
+            return
+        _stream = KlineStream(symbols)
+
+    _stream.start()
+
+
+def stop_kline_stream() -> None:
+    global _stream
+    with _lock:
+        stream, _stream = _stream, None
+    if stream is not None:
+        stream.stop()
+    print("[KLINE STREAM] stopped")
+
+
+def forming_bar(symbol: str, open_time: pd.Timestamp):
+    """Forming bar from the running stream, or None (not running / not seen)."""
+    stream = _stream
+    return None if stream is None else stream.forming_bar(symbol, open_time)
+
+
+def kline_stream_status():
+    """Status dict of the running stream, or None when it is not running."""
+    stream = _stream
+    return None if stream is None else stream.status()
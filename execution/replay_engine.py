@@ -2,7 +2,9 @@
 
 import os
 import json
+import shutil
 import pandas as pd
+from data_pipeline.updater import candle_store
 from execution.hourly_runner import run_hourly_for_symbol, SYMBOLS
 from strategy.lifecycle import PositionManager
 from execution.notifier import TelegramNotifier
@@ -11,6 +13,7 @@ def _get_state_files():
     files = [
         "data/last_hour_seen.json",
         "data/positions/open_positions.json",
+        "data/positions/bar_history.npz",
         "data/positions/bar_history.json",
         "data/positions/executed_signals.json",
         "data/positions/reentry_lock.json",
@@ -28,6 +31,7 @@ def reset_replay_state(symbols=None):
     files = [
         "data/last_hour_seen.json",
         "data/positions/open_positions.json",
+        "data/positions/bar_history.npz",
         "data/positions/bar_history.json",
         "data/positions/executed_signals.json",
         "data/positions/reentry_lock.json",
@@ -52,7 +56,9 @@ def reset_replay_state(symbols=None):
         for fname in os.listdir("data/cache"):
             if any(sym in fname for sym in symbols):
                 full_path = os.path.join("data/cache", fname)
-                if os.path.exists(full_path):
+                if os.path.isdir(full_path):        # candle store segments
+                    shutil.rmtree(full_path, ignore_errors=True)
+                elif os.path.exists(full_path):
                     os.remove(full_path)
 
     # FIX: also wipe live cursor files for targeted symbols so hour memory
@@ -67,19 +73,48 @@ def reset_replay_state(symbols=None):
                     print(f"[RESET] Wiping live cursor: {fname}")
                     os.remove(full_path)
 
+def replay_signal_frame(df_1h: pd.DataFrame, df_4h: pd.DataFrame, warmup_bars: int):
+    """
+    Signals for every 1H bar of a replay, computed in one pass.
+
+    Row k depends only on 1H bars <= k and on 4H bars closed by then:
+    the warm-start seeds of both the 4H scorer and the signal stack are
+    frozen on the warmup window, and every later bar is streamed through
+    SignalState. So frame.iloc[:k+1] is exactly what a replay that only
+    knew history up to bar k would have computed.
+    """
+    from indicators.indicators import compute_htf_scores
+    from indicators.signal_state import SignalState, htf_score_seeds
+
+    df_1h_warmup = df_1h.iloc[:warmup_bars]
+    warmup_close = df_1h_warmup.index[-1] + pd.Timedelta(hours=1)
+
+    df_4h_warmup = df_4h[df_4h.index + pd.Timedelta(hours=4) <= warmup_close]
+    if len(df_4h_warmup) < 2:
+        df_4h_warmup = df_4h[df_4h.index <= df_1h_warmup.index[-1]]
+
+    htf_scores = compute_htf_scores(df_4h.copy(), seeds=htf_score_seeds(df_4h_warmup))
+
+    state = SignalState(live=False)
+    state.bootstrap(df_1h_warmup.copy(), htf_scores=htf_scores)
+    for ts, bar in df_1h.iloc[warmup_bars:].iterrows():
+        state.update(ts, bar)
+
+    return state.frame
+
+
 def fast_replay_symbol(symbol: str, from_ts=None, to_ts=None, notify_trades=True):
     notifier = TelegramNotifier()
 
     # ==================================================
     # LOAD FULL CACHED DATA (already fetched by fast_replay_all)
     # ==================================================
-    df_1h_full   = pd.read_parquet(f"data/cache/{symbol}_1h.parquet")
-    df_4h_full   = pd.read_parquet(f"data/cache/{symbol}_4h.parquet")
-    df_5m_full   = pd.read_parquet(f"data/cache/{symbol}_5m.parquet")
-
-    df_1h_full.index = pd.to_datetime(df_1h_full.index, utc=True)
-    df_4h_full.index = pd.to_datetime(df_4h_full.index, utc=True)
-    df_5m_full.index = pd.to_datetime(df_5m_full.index, utc=True)
+    df_1h_full   = candle_store.load(symbol, "1h")
+    df_4h_full   = candle_store.load(symbol, "4h")
+    # 5m is memory-mapped: the per-hour slices below are views into it
+    df_5m_full   = candle_store.mmap(symbol, "5m")
+    if df_5m_full is None:
+        raise FileNotFoundError(f"no 5m candles stored for {symbol}")
 
     # ==================================================
     # APPLY TIME BOUNDS
@@ -88,7 +123,7 @@ def fast_replay_symbol(symbol: str, from_ts=None, to_ts=None, notify_trades=True
         to_ts_parsed = pd.Timestamp(to_ts, tz="UTC")
         df_1h_full = df_1h_full[df_1h_full.index <= to_ts_parsed]
         df_4h_full = df_4h_full[df_4h_full.index <= to_ts_parsed]
-        df_5m_full = df_5m_full[df_5m_full.index <= to_ts_parsed]
+        df_5m_full = df_5m_full.loc[:to_ts_parsed]
 
     if from_ts:
         from_ts_parsed = pd.Timestamp(from_ts, tz="UTC")
@@ -124,11 +159,22 @@ def fast_replay_symbol(symbol: str, from_ts=None, to_ts=None, notify_trades=True
     )
 
     # ==================================================
-    # PRE-GENERATE SIGNALS ON WARMUP (once, frozen)
+    # GENERATE SIGNALS ONCE (causal, see replay_signal_frame)
     # ==================================================
-    from indicators.indicators import generate_signal
+    from indicators.alignment import map_ltf_to_htf
+
+    df_signals_full = replay_signal_frame(df_1h_full, df_4h_full, WARMUP_BARS)
+
+    # 1H ATR for the 5m bars — a trailing rolling mean, so computing it
+    # over the full frame gives every prefix the same values
+    tr_1h = pd.concat([
+        df_signals_full["high"] - df_signals_full["low"],
+        (df_signals_full["high"] - df_signals_full["close"].shift()).abs(),
+        (df_signals_full["low"]  - df_signals_full["close"].shift()).abs(),
+    ], axis=1).max(axis=1)
+    atr_1h_full = tr_1h.rolling(14).mean()
 
-    df_warmup_with_signals = generate_signal(df_1h_warmup.copy(), df_4h_full.copy())
+    _5m_index = df_5m_full.index
 
     # ==================================================
     # POSITION MANAGER — single instance, in-memory
@@ -139,21 +185,13 @@ def fast_replay_symbol(symbol: str, from_ts=None, to_ts=None, notify_trades=True
     trade_closes = 0
 
     # ==================================================
-    # INCREMENTAL LOOP OVER ACTIVE 200 1H BARS
+    # LOOP OVER ACTIVE 1H BARS
     # ==================================================
     for i, (ts_1h, _) in enumerate(df_1h_active.iterrows()):
 
-        # Build growing 1H slice: warmup + active bars seen so far
-        # (i=0 → warmup only, i=1 → warmup + first active bar, etc.)
-        df_1h_slice = pd.concat([df_1h_warmup, df_1h_active.iloc[:i+1]])
-        df_1h_slice.index = pd.to_datetime(df_1h_slice.index, utc=True)
-        df_4h_slice = df_4h_full[df_4h_full.index <= df_1h_slice.index[-1]]
-
-        if len(df_1h_slice) < 2:
-            continue
-
-        # Generate signals on the growing slice
-        df_signals = generate_signal(df_1h_slice.copy(), df_4h_slice.copy())
+        # Signals as of this bar: warmup + active bars seen so far
+        # (i=0 → warmup + first active bar, etc.)
+        df_signals = df_signals_full.iloc[:WARMUP_BARS + i + 1]
 
         # 5m bars that belong to the current 1H candle
         next_1h_ts = df_1h_active.index[i + 1] if i + 1 < len(df_1h_active) else None
@@ -167,8 +205,9 @@ def fast_replay_symbol(symbol: str, from_ts=None, to_ts=None, notify_trades=True
             break  # no next bar to execute on
 
         # slice: 5m bars from current 1H open up to (but not including) next 1H open
-        mask_5m = (df_5m_full.index >= ts_1h) & (df_5m_full.index < next_1h_ts)
-        df_5m_slice = df_5m_full[mask_5m]
+        lo = _5m_index.searchsorted(ts_1h, side="left")
+        hi = _5m_index.searchsorted(next_1h_ts, side="left")
+        df_5m_slice = df_5m_full.iloc[lo:hi]
 
         if df_5m_slice.empty:
             notifier.send_text(
@@ -180,8 +219,6 @@ def fast_replay_symbol(symbol: str, from_ts=None, to_ts=None, notify_trades=True
             continue
 
         # ── map 5m bars to their parent 1H index ──────────────────
-        from execution.hourly_runner import map_ltf_to_htf
-
         lltf = df_5m_slice.copy()
         lltf = map_ltf_to_htf(lltf, df_signals)
 
@@ -194,13 +231,7 @@ def fast_replay_symbol(symbol: str, from_ts=None, to_ts=None, notify_trades=True
         lltf["ATR"] = df_signals["ATR"].reindex(lltf.index, method='ffill')
 
         # forward-fill 1H ATR onto 5m
-        tr_1h = pd.concat([
-            df_signals["high"] - df_signals["low"],
-            (df_signals["high"] - df_signals["close"].shift()).abs(),
-            (df_signals["low"]  - df_signals["close"].shift()).abs(),
-        ], axis=1).max(axis=1)
-        atr_1h = tr_1h.rolling(14).mean()
-        lltf["ATR_1H"] = atr_1h.reindex(lltf.index, method="ffill")
+        lltf["ATR_1H"] = atr_1h_full.iloc[:WARMUP_BARS + i + 1].reindex(lltf.index, method="ffill")
 
         lltf = lltf.dropna(subset=["ltf_index"])
         lltf["ltf_index"] = lltf["ltf_index"].astype(int)
@@ -0,0 +1,252 @@
+# execution/scheduler.py
+"""
+Resident scheduler daemon.
+
+Replaces the external 10-second cron hitting "/" with one long-lived
+thread that sleeps until the next 5m close (plus a short settle delay so
+Binance has published the bar) and runs run_hourly() there. Between
+passes the process keeps its state in memory:
+
+  - one PositionManager, handed to every pass (no reload from disk per
+    tick, bar history and ATR state stay warm)
+  - the SignalState engines and signal store in hourly_runner
+  - the rate limiter singleton
+
+Routine PositionManager writes are coalesced into a snapshot every
+SCHEDULER_SNAPSHOT_SECONDS; opens, closes and stop amends still hit disk
+immediately. If a pass leaves symbols behind the boundary (bar not
+published yet, fetch failed) it is retried a few times before the next
+boundary.
+
+Run a single worker — each process starts its own daemon.
+
+Usage (app.py starts it when SCHEDULER_MODE=resident):
+    from execution.scheduler import start_scheduler
+    start_scheduler()
+
+or in the foreground:
+    python run.py --resident
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+SCHEDULER_MODE             = os.getenv("SCHEDULER_MODE", "cron").strip().lower()
+SCHEDULER_SETTLE_SECONDS   = float(os.getenv("SCHEDULER_SETTLE_SECONDS", "3"))
+SCHEDULER_RETRY_SECONDS    = float(os.getenv("SCHEDULER_RETRY_SECONDS", "10"))
+SCHEDULER_MAX_RETRIES      = int(os.getenv("SCHEDULER_MAX_RETRIES", "3"))
+SCHEDULER_SNAPSHOT_SECONDS = float(os.getenv("SCHEDULER_SNAPSHOT_SECONDS", "60"))
+
+SCHEDULER_STATE_FILE = "data/scheduler_state.json"
+
+BAR_MINUTES = 5
+
+
+def next_boundary(now: datetime, settle_seconds: float = SCHEDULER_SETTLE_SECONDS):
+    """
+    Next 5m close strictly after `now` (UTC). Returns
+    (wake_at, boundary, frames) where wake_at = boundary + settle and
+    frames lists every timeframe that closes there ("5m", "1h", "4h").
+    A wake time still ahead of `now` (inside the settle window of the
+    boundary just passed) is returned as is.
+    """
+    now = now.astimezone(timezone.utc)
+    floored = now.replace(minute=(now.minute // BAR_MINUTES) * BAR_MINUTES, second=0, microsecond=0)
+
+    boundary = floored
+    if boundary + timedelta(seconds=settle_seconds) <= now:
+        boundary = floored + timedelta(minutes=BAR_MINUTES)
+
+    frames = ["5m"]
+    if boundary.minute == 0:
+        frames.append("1h")
+        if boundary.hour % 4 == 0:
+            frames.append("4h")
+
+    return boundary + timedelta(seconds=settle_seconds), boundary, frames
+
+
+class ResidentScheduler:
+    def __init__(
+        self,
+        settle_seconds: float = SCHEDULER_SETTLE_SECONDS,
+        retry_seconds: float = SCHEDULER_RETRY_SECONDS,
+        max_retries: int = SCHEDULER_MAX_RETRIES,
+        snapshot_seconds: float = SCHEDULER_SNAPSHOT_SECONDS,
+    ):
+        self.settle_seconds   = settle_seconds
+        self.retry_seconds    = retry_seconds
+        self.max_retries      = max_retries
+        self.snapshot_seconds = snapshot_seconds
+
+        self.pm = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_snapshot = 0.0
+
+        self.passes        = 0
+        self.last_boundary = None
+        self.last_frames   = []
+        self.last_duration = None
+        self.lagging       = []
+
+    # --------------------------------------------------
+    # LIFECYCLE
+    # --------------------------------------------------
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, daemon=True, name="scheduler")
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._snapshot(force=True)
+
+    def run_forever(self):
+        # imported here so importing this module has none of
+        # hourly_runner's start-up side effects
+        from strategy.lifecycle import PositionManager
+
+        self.pm = PositionManager(persist=True, notify=False)
+        self.pm.snapshot_interval = self.snapshot_seconds
+        print(
+            f"[SCHEDULER] resident — settle={self.settle_seconds}s "
+            f"snapshot={self.snapshot_seconds}s open={list(self.pm.positions)}"
+        )
+
+        while not self._stop.is_set():
+            now = datetime.now(timezone.utc)
+            wake_at, boundary, frames = next_boundary(now, self.settle_seconds)
+            if self._stop.wait(max(0.0, (wake_at - now).total_seconds())):
+                break
+            self._run_boundary(boundary, frames)
+
+        print("[SCHEDULER] stopped")
+
+    # --------------------------------------------------
+    # ONE BOUNDARY
+    # --------------------------------------------------
+    def _run_boundary(self, boundary: datetime, frames: list):
+        from execution.hourly_runner import run_hourly
+
+        print(f"[SCHEDULER] boundary {boundary.isoformat()} {'/'.join(frames)}")
+        t0 = time.time()
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                run_hourly(pm=self.pm)
+            except Exception as e:
+                print(f"[SCHEDULER] pass failed: {e}")
+
+            self.lagging = self._lagging_symbols(boundary)
+            if not self.lagging or attempt == self.max_retries:
+                break
+            print(
+                f"[SCHEDULER] {len(self.lagging)} symbol(s) behind {boundary.isoformat()} — "
+                f"retry {attempt + 1}/{self.max_retries} in {self.retry_seconds}s"
+            )
+            if self._stop.wait(self.retry_seconds):
+                break
+
+        self.passes       += 1
+        self.last_boundary = boundary
+        self.last_frames   = frames
+        self.last_duration = round(time.time() - t0, 2)
+        self._snapshot()
+
+    def _lagging_symbols(self, boundary: datetime) -> list:
+        from execution.hourly_runner import SYMBOLS, _last_5m_file
+
+        target = boundary.replace(tzinfo=None)
+        # run_hourly_for_symbol holds an open position's cursor on the
+        # last closed bar instead of the forming one (see [CURSOR HELD]),
+        # so those are current one bar earlier
+        held_target = target - timedelta(minutes=BAR_MINUTES)
+        open_symbols = set() if self.pm is None else set(self.pm.positions)
+        behind = []
+        for symbol in SYMBOLS:
+            path = _last_5m_file(symbol, True)
+            try:
+                with open(path) as f:
+                    raw = json.load(f)
+                ts = datetime.fromisoformat(raw if isinstance(raw, str) else list(raw.values())[0])
+                if ts.tzinfo is not None:
+                    ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+            except Exception:
+                ts = None
+            # same test as the fast gate in run_hourly_for_symbol
+            if ts is None or ts < (held_target if symbol in open_symbols else target):
+                behind.append(symbol)
+        return behind
+
+    # --------------------------------------------------
+    # SNAPSHOT
+    # --------------------------------------------------
+    def _snapshot(self, force: bool = False):
+        now = time.time()
+        if not force and now - self._last_snapshot < self.snapshot_seconds:
+            return
+        self._last_snapshot = now
+
+        if self.pm is not None:
+            self.pm.flush(force=True)
+
+        os.makedirs("data", exist_ok=True)
+        with open(SCHEDULER_STATE_FILE + ".tmp", "w") as f:
+            json.dump(self.status(), f, indent=2)
+        os.replace(SCHEDULER_STATE_FILE + ".tmp", SCHEDULER_STATE_FILE)
+
+    def status(self) -> dict:
+        return {
+            "running":       self._thread is not None and self._thread.is_alive(),
+            "passes":        self.passes,
+            "last_boundary": None if self.last_boundary is None else self.last_boundary.isoformat(),
+            "last_frames":   self.last_frames,
+            "last_duration": self.last_duration,
+            "lagging":       self.lagging,
+            "open":          [] if self.pm is None else list(self.pm.positions),
+            "snapshot_at":   datetime.now(timezone.utc).isoformat(),
+        }
+
+
+# ==================================================
+# MODULE-LEVEL DAEMON
+# ==================================================
+_scheduler = None
+_lock = threading.Lock()
+
+
+def start_scheduler() -> None:
+    """
+    Start the resident scheduler in a background thread.
+    Safe to call multiple times — only starts once.
+    """
+    global _scheduler
+
+    with _lock:
+        if _scheduler is not None:
+            print("[SCHEDULER] already running")
+            return
+        _scheduler = ResidentScheduler()
+
+    _scheduler.start()
+    print("[SCHEDULER] daemon thread started")
+
+
+def stop_scheduler() -> None:
+    global _scheduler
+    with _lock:
+        sched, _scheduler = _scheduler, None
+    if sched is not None:
+        sched.stop(timeout=30)
+
+
+def scheduler_status():
+    """Status dict of the running daemon, or None when it is not running."""
+    sched = _scheduler
+    return None if sched is None else sched.status()
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================================
+# 5M → 1H ALIGNMENT
+# ==========================================================
+# Every consumer of the 5m execution frame needs the same two facts per
+# 5m bar: which 1H bar it belongs to, and whether that 1H bar had closed
+# by the time the 5m bar opened. Live (hourly_runner), replay and the
+# backtester used to answer them with per-bar Python loops; here both
+# are one searchsorted over int64 timestamps plus array comparisons.
+#
+# Mapping rule (all callers): a 5m bar at ts belongs to the last 1H bar
+# that opened at or before ts — searchsorted(side="right") - 1. The 13:00
+# 5m bar therefore maps to the 13:00 1H bar when the frame has one.
+#
+# tests/test_alignment.py pins both helpers against the loops they
+# replaced.
+
+HTF_BAR = pd.Timedelta(hours=1)
+
+_HOURLY_FREQS = (None, "h", "1h", "H", "1H", "60min", "60T", "T60")
+
+
+def _ns(index) -> np.ndarray:
+    return pd.DatetimeIndex(index).as_unit("ns").asi8
+
+
+def htf_positions(index, htf_index) -> np.ndarray:
+    """
+    Position in `htf_index` of the bar each timestamp in `index` falls
+    in, or -1 for timestamps before the first bar. Both must be sorted.
+    """
+    return np.searchsorted(_ns(htf_index), _ns(index), side="right") - 1
+
+
+def map_ltf_to_htf(lltf_df: pd.DataFrame, ltf_df: pd.DataFrame):
+    """
+    Maps each 5m bar to its parent 1H candle index.
+    ltf_df MUST be the 1H dataframe.
+    Passing 4H data silently corrupts every ltf_index, ATR, and entry price.
+    This assertion catches that immediately instead of trading on wrong data.
+    """
+    if len(ltf_df) >= 3:
+        _inferred = pd.infer_freq(ltf_df.index[:min(10, len(ltf_df))])
+        if _inferred not in _HOURLY_FREQS:
+            raise ValueError(
+                f"map_ltf_to_htf: expected 1H dataframe, "
+                f"got inferred freq='{_inferred}'. "
+                f"Pass the 1H df, not the 4H df."
+            )
+
+    lltf_df = lltf_df.copy()
+    # bars before the first 1H candle are clamped onto it
+    lltf_df["ltf_index"] = np.maximum(htf_positions(lltf_df.index, ltf_df.index), 0)
+    return lltf_df
+
+
+def inside_htf_bar(index, htf_index, positions, bar: pd.Timedelta = HTF_BAR) -> np.ndarray:
+    """
+    True where a 5m bar lies inside the 1H bar at `positions` (its
+    mapped ltf_index): origin <= ts < origin + bar. The signal of that
+    1H bar is not known yet on those 5m bars. Out-of-range positions
+    are never inside.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    htf_ns = _ns(htf_index)
+    valid = (positions >= 0) & (positions < len(htf_ns))
+    if not valid.any():
+        return valid
+
+    ts = _ns(index)
+    origin = htf_ns[np.where(valid, positions, 0)]
+    return valid & (origin <= ts) & (ts < origin + bar.value)
+
+
+def htf_open_signal(index, htf_index, signal):
+    """
+    Backtest alignment. Returns (positions, values): each 5m bar's 1H
+    position (-1 before the first bar) and the 1H `signal` on the 5m
+    bar opening exactly at its 1H bar's open, 0 on the bars inside it
+    and NaN where unmapped.
+    """
+    positions = htf_positions(index, htf_index)
+    signal = np.asarray(signal, dtype=float)
+    mapped = positions >= 0
+    safe = np.where(mapped, positions, 0)
+
+    values = np.full(len(positions), np.nan)
+    if len(signal):
+        at_open = mapped & (_ns(htf_index)[safe] == _ns(index))
+        values[mapped] = 0.0
+        values[at_open] = signal[safe[at_open]]
+    return positions, values
@@ -1,18 +1,46 @@
 import pandas as pd
 import numpy as np
+from indicators.kernels import (
+    streak_count, bars_since, supertrend_bands, supertrend_bands_2d, ewma_zscore, ewma_zscore_2d,
+)
 
 # ==========================================================
 # CORE UTILITIES
 # ==========================================================
+# Every indicator below is column-wise: a column is a Series for one
+# symbol, or a (time × symbols) DataFrame when indicators.panel runs the
+# same functions over a whole universe at once. Helpers that leave
+# pandas (kernels, seeded EWMs) go through the two functions here so
+# both shapes come back the way they went in.
+def _like(values, ref):
+    """A kernel's output array as a Series / DataFrame shaped like ref."""
+    if isinstance(ref, pd.DataFrame):
+        return pd.DataFrame(values, index=ref.index, columns=ref.columns)
+    return pd.Series(values, index=ref.index)
+
+def seeded_ewm(series, seed, span):
+    """
+    ewm(span, adjust=True) with `seed` counted as one observation before
+    bar 0. For a DataFrame, seed holds one value per column.
+    """
+    if isinstance(series, pd.DataFrame):
+        head = pd.DataFrame([np.asarray(seed, dtype=float)], columns=series.columns)
+    else:
+        head = pd.Series([seed])
+    seeded = pd.concat([head, series]).reset_index(drop=True)
+    out = seeded.ewm(span=span, adjust=True).mean().iloc[1:]
+    out.index = series.index
+    return out
+
 def EMA(series, period):
     return series.ewm(span=period, adjust=False).mean()
 
 def atr_ema(df, period=14):
-    tr = pd.concat([
-        df['high'] - df['low'],
-        (df['high'] - df['close'].shift()).abs(),
-        (df['low'] - df['close'].shift()).abs()
-    ], axis=1).max(axis=1)
+    prev_close = df['close'].shift()
+    tr = np.fmax(
+        np.fmax(df['high'] - df['low'], (df['high'] - prev_close).abs()),
+        (df['low'] - prev_close).abs(),
+    )
     return tr.ewm(span=period, adjust=False).mean()
 
 # ==========================================================
@@ -142,7 +170,7 @@ def support_resistance(df, lookback=20):
 # ==========================================================
 # BREAKOUT LOGIC
 # ==========================================================
-def liquidity_displacement(df, vol_lookback=20, accel_threshold=1.4):
+def liquidity_displacement(df, vol_lookback=20, accel_threshold=1.4, seeds=None):
     """
     Replaces breakout_logic() / BREAK_RESISTANCE / BREAK_SUPPORT.
 
@@ -165,6 +193,9 @@ def liquidity_displacement(df, vol_lookback=20, accel_threshold=1.4):
         DISPLACEMENT_SCORE  — continuous 0-1 quality of the event
         ABSORBED_LONG       — price cleared but was absorbed (bearish)
         ABSORBED_SHORT      — price cleared but was absorbed (bullish)
+
+    seeds: optional pinned warm-start means (see SignalState) — when
+    omitted they are taken from this window, as before.
     """
 
     if 'ATR' not in df.columns:
@@ -190,10 +221,8 @@ def liquidity_displacement(df, vol_lookback=20, accel_threshold=1.4):
     # (causal: current and prior bar only, no lookahead).
     # --------------------------------------------------
     candle_size     = (df['high'] - df['low'])
-    _cs_seed = candle_size.mean()
-    _cs_seeded = pd.concat([pd.Series([_cs_seed]), candle_size]).reset_index(drop=True)
-    avg_candle_size = _cs_seeded.ewm(span=vol_lookback, adjust=True).mean().iloc[1:]
-    avg_candle_size.index = df.index
+    _cs_seed = candle_size.mean() if seeds is None else seeds['candle_size_mean']
+    avg_candle_size = seeded_ewm(candle_size, _cs_seed, vol_lookback)
     candle_accel    = candle_size / (avg_candle_size + 1e-9)
 
     # Peak acceleration within a 2-bar causal window
@@ -207,19 +236,16 @@ def liquidity_displacement(df, vol_lookback=20, accel_threshold=1.4):
     # Institutional accumulation often builds across
     # multiple bars before structure gives way.
     # --------------------------------------------------
-    _volb_seed = df['volume'].mean()
-    _volb_seeded = pd.concat([pd.Series([_volb_seed]), df['volume']]).reset_index(drop=True)
-    vol_baseline = _volb_seeded.ewm(span=vol_lookback, adjust=True).mean().iloc[1:]
-    vol_baseline.index = df.index
+    _volb_seed = df['volume'].mean() if seeds is None else seeds['volume_mean']
+    vol_baseline = seeded_ewm(df['volume'], _volb_seed, vol_lookback)
     vol_spike          = df['volume'] / (vol_baseline + 1e-9)
 
     # Seed the span=500 baseline with the series' own mean instead of
     # cold-starting at bar 0 — same fix as HTF_QUALITY's EWM seed, so
     # short (live) windows converge toward the same baseline as long
     # (backtest) windows for the same symbol.
-    _vs_seeded = pd.concat([pd.Series([vol_spike.mean()]), vol_spike]).reset_index(drop=True)
-    vol_spike_baseline = _vs_seeded.ewm(span=500, adjust=True).mean().iloc[1:]
-    vol_spike_baseline.index = df.index
+    _vs_seed = vol_spike.mean() if seeds is None else seeds['vol_spike_mean']
+    vol_spike_baseline = seeded_ewm(vol_spike, _vs_seed, 500)
 
     # Peak volume within a 3-bar causal window
     vol_window    = vol_spike.rolling(3).max()
@@ -355,7 +381,7 @@ def pressure_state(df):
 # ==========================================================
 # INSTITUTIONAL PARTICIPATION (SIGNED DOLLAR FLOW MODEL)
 # ==========================================================
-def participation_state(df, lookback=20, threshold=0.5):
+def participation_state(df, lookback=20, threshold=0.5, seeds=None):
 
     # ── 1. Signed institutional flow ─────────────────────────────
     df['FLOW'] = df['volume'] * (df['close'] - df['open'])
@@ -371,7 +397,7 @@ def participation_state(df, lookback=20, threshold=0.5):
         min_periods=20,
         adaptive=False,
         seed_mean=0.0,
-        seed_var=df['FLOW'].iloc[-1000:].var(ddof=0),
+        seed_var=df['FLOW'].iloc[-1000:].var(ddof=0) if seeds is None else seeds['flow_var'],
     )
 
     # ── 3. Capital accumulation — EWM instead of rolling mean ────
@@ -395,9 +421,8 @@ def participation_state(df, lookback=20, threshold=0.5):
     )
 
     # ── 5. Flow strength ──────────────────────────────────────────
-    df['FLOW_STRENGTH'] = df['FLOW_ROLL']
-    df.loc[df['STEALTH_ACCUM'],   'FLOW_STRENGTH'] += 0.5
-    df.loc[df['STEALTH_DISTRIB'], 'FLOW_STRENGTH'] -= 0.5
+    flow_strength = df['FLOW_ROLL'].mask(df['STEALTH_ACCUM'], df['FLOW_ROLL'] + 0.5)
+    df['FLOW_STRENGTH'] = flow_strength.mask(df['STEALTH_DISTRIB'], flow_strength - 0.5)
 
     # ── 6. Classification ─────────────────────────────────────────
     df['PARTICIPATION'] = np.select(
@@ -413,8 +438,6 @@ def participation_state(df, lookback=20, threshold=0.5):
 
 def classify_phase(df):
 
-    df['PHASE'] = 0
-
     pre_breakout = (
         (df['VOL_STATE'] == -1) &
         (df['STRUCT_STATE'] == -1) &
@@ -435,9 +458,8 @@ def classify_phase(df):
         (df['PARTICIPATION'] == -1)
     )
 
-    df.loc[pre_breakout, 'PHASE'] = 1
-    df.loc[trend, 'PHASE'] = 2
-    df.loc[exhaustion, 'PHASE'] = 3
+    # later phases win where they overlap
+    df['PHASE'] = np.select([exhaustion, trend, pre_breakout], [3, 2, 1], default=0)
 
     return df
 
@@ -461,9 +483,11 @@ def transition_detector(df):
         (df['VOL_COMPRESS'])
     )
     
-    df['TRANSITION_SIGNAL'] = 0
-    df.loc[df['TRANSITION_LONG'], 'TRANSITION_SIGNAL'] = 1
-    df.loc[df['TRANSITION_SHORT'], 'TRANSITION_SIGNAL'] = -1
+    df['TRANSITION_SIGNAL'] = np.select(
+        [df['TRANSITION_SHORT'], df['TRANSITION_LONG']],
+        [-1, 1],
+        default=0
+    )
 
     return df
 
@@ -569,7 +593,7 @@ def expansion_continuation(df):
 
     return df
 
-def validated_breakouts(df, body_ratio=0.6, atr_mult=1.2):
+def validated_breakouts(df, body_ratio=0.6, atr_mult=1.2, seeds=None):
     body = (df['close'] - df['open']).abs()
     range_ = df['high'] - df['low']
 
@@ -594,9 +618,8 @@ def validated_breakouts(df, body_ratio=0.6, atr_mult=1.2):
 
     compression_ok = df['COMPRESSION_BARS'] >= 3
 
-    _vb_seeded = pd.concat([pd.Series([df['VOL_RATIO'].iloc[-1000:].mean()]), df['VOL_RATIO']]).reset_index(drop=True)
-    vol_baseline = _vb_seeded.ewm(span=500, adjust=True).mean().iloc[1:]
-    vol_baseline.index = df.index
+    _vb_seed = df['VOL_RATIO'].iloc[-1000:].mean() if seeds is None else seeds['vol_ratio_mean']
+    vol_baseline = seeded_ewm(df['VOL_RATIO'], _vb_seed, 500)
     volume_confirmed = df['VOL_RATIO'] > vol_baseline * 1.15
     
     displacement_ok = df['DISPLACEMENT_SCORE'] > 0.15
@@ -683,13 +706,7 @@ def compression_detector(df, er_window=20):
     # ------------------------------------------------------
     comp = df['IS_COMPRESSION'].astype(int)
 
-    compression_bars = pd.Series(0, index=df.index)
-    for idx in range(1, len(df)):
-        if comp.iloc[idx] == 1:
-            compression_bars.iloc[idx] = compression_bars.iloc[idx - 1] + 1
-        else:
-            compression_bars.iloc[idx] = 0
-    df['COMPRESSION_BARS'] = compression_bars
+    df['COMPRESSION_BARS'] = _like(streak_count(comp.values == 1), comp)
 
     return df
 
@@ -761,43 +778,13 @@ def supertrend(df, period=10, multiplier=3, eps=1e-6,
     upper_raw = (hl2 + multiplier * atr_series).values
     lower_raw = (hl2 - multiplier * atr_series).values
     close     = df['close'].values
-    n         = len(df)
-
-    final_upper = upper_raw.copy()
-    final_lower = lower_raw.copy()
-    trend       = np.ones(n, dtype=np.int8)
-
-    bars_since_flip = 0
-
-    for i in range(1, n):
-
-        # ── Ratchet bands (unchanged — this part is correct) ──
-        final_upper[i] = (
-            min(upper_raw[i], final_upper[i-1])
-            if close[i-1] <= final_upper[i-1] + eps
-            else upper_raw[i]
-        )
-        final_lower[i] = (
-            max(lower_raw[i], final_lower[i-1])
-            if close[i-1] >= final_lower[i-1] - eps
-            else lower_raw[i]
-        )
-
-        # ── Flip logic with margin + minimum holding period ──
-        flip_margin = atr_vals[i] * flip_margin_atr
 
-        bull_flip = close[i] > final_upper[i-1] + flip_margin
-        bear_flip = close[i] < final_lower[i-1] - flip_margin
-
-        if bull_flip and trend[i-1] == -1 and bars_since_flip >= min_flip_bars:
-            trend[i]        = 1
-            bars_since_flip = 0
-        elif bear_flip and trend[i-1] == 1 and bars_since_flip >= min_flip_bars:
-            trend[i]        = -1
-            bars_since_flip = 0
-        else:
-            trend[i]        = trend[i-1]
-            bars_since_flip += 1
+    # Ratchet bands + flip logic with margin and minimum holding period
+    bands = supertrend_bands_2d if close.ndim == 2 else supertrend_bands
+    trend, final_upper, final_lower = bands(
+        upper_raw, lower_raw, close, atr_vals,
+        eps=eps, flip_margin_atr=flip_margin_atr, min_flip_bars=min_flip_bars,
+    )
 
     df['SUPERTREND'] = trend
     df['ST_UPPER']   = final_upper
@@ -841,7 +828,7 @@ def momentum_continuity(df, window=20, min_move=0.001):
     # ignore tiny moves (noise)
     ret = ret.where(ret.abs() >= min_move, 0)
 
-    sign_ret = ret.apply(np.sign)
+    sign_ret = np.sign(ret)
 
     persistence = (
         (sign_ret * sign_ret.shift(1)) > 0
@@ -941,38 +928,54 @@ def dynamic_state_engine(df, window=10):
 # TREND QUALITY UTILITIES (Slope + R²)
 # ==========================================================
 
-def rolling_slope(series, window=50):
-    x = np.arange(window, dtype=float)
-    x_mean = x.mean()
-    x_var = ((x - x_mean) ** 2).sum()
+def _rolling_ols_sums(series, window):
+    """
+    Sliding-window sums for an OLS fit of y on x = 0..window-1.
+
+    Returns (sxy, syy, sum_yy, x_var): sum((x - x_mean) * y), the centred
+    sum of squares of y, the raw sum of y**2 (its rounding scale) and the
+    (constant) centred sum of squares of x. Built
+    from three O(n) rolling sums of y, j*y and y**2 (j = global bar
+    number) instead of a Python callback per window. A window that holds
+    any NaN comes out NaN, same as the old rolling().apply() versions.
+    """
+    x_mean = (window - 1) / 2.0
+    x_var = window * (window * window - 1) / 12.0
 
-    def _slope(y):
-        if np.any(np.isnan(y)):
-            return np.nan
-        return ((x - x_mean) * (y - y.mean())).sum() / x_var
+    y = series.astype(float)
+    # slope and R² are shift-invariant — centring on the first valid
+    # value keeps the sums small on high-priced series
+    _first = y.first_valid_index()
+    if _first is not None:
+        y = y - y.loc[_first]
 
-    return series.rolling(window).apply(_slope, raw=True)
+    j = pd.Series(np.arange(len(y), dtype=float), index=y.index)
+
+    sum_y  = y.rolling(window).sum()
+    sum_jy = (j * y).rolling(window).sum()
+    sum_yy = (y * y).rolling(window).sum()
+
+    # sum(x_k * y_k) with x_k = j - (t - window + 1)
+    start = j - (window - 1)
+    sxy = sum_jy - (start + x_mean) * sum_y
+    syy = sum_yy - sum_y * sum_y / window
+
+    return sxy, syy, sum_yy, x_var
+
+
+def rolling_slope(series, window=50):
+    sxy, _, _, x_var = _rolling_ols_sums(series, window)
+    return sxy / x_var
 
 
 def rolling_r2(series, window=50):
-    x = np.arange(window, dtype=float)
-    x_mean = x.mean()
-    x_var = ((x - x_mean) ** 2).sum()
-
-    def _r2(y):
-        if np.any(np.isnan(y)):
-            return np.nan
-        y_mean = y.mean()
-        ss_tot = ((y - y_mean) ** 2).sum()
-        if ss_tot < 1e-12:
-            return 0.0
-        slope = ((x - x_mean) * (y - y_mean)).sum() / x_var
-        intercept = y_mean - slope * x_mean
-        y_hat = slope * x + intercept
-        ss_res = ((y - y_hat) ** 2).sum()
-        return 1.0 - ss_res / ss_tot
-
-    return series.rolling(window).apply(_r2, raw=True)
+    sxy, syy, sum_yy, x_var = _rolling_ols_sums(series, window)
+
+    # R² = explained / total. A flat window (ss_tot under the 1e-12
+    # floor, or lost to rounding) reads as 0, as before.
+    flat = syy < np.maximum(1e-12, 1e-12 * sum_yy)
+    r2 = (sxy * sxy / (x_var * syy.where(~flat))).clip(0.0, 1.0)
+    return r2.mask(flat, 0.0)
 
 def efficiency_ratio(series, window=50):
 
@@ -1004,11 +1007,15 @@ def pressure_volatility(df, period=20, alpha=0.2):
 def compute_htf_scores(htf_df,
                        part_lookback=50,
                        regime_window=10,
-                       er_window=20):
+                       er_window=20,
+                       seeds=None):
     """
     Fully recursive HTF quality scorer.
     All components use EWM or causal online estimators.
     No rolling windows → identical backtest/live output.
+
+    seeds: optional pinned warm-start means (see htf_score_seeds) — when
+    omitted they are taken from this window, as before.
     """
     htf = htf_df.copy()
 
@@ -1025,14 +1032,14 @@ def compute_htf_scores(htf_df,
 
     # ── 3. PARTICIPATION SCORE — seeded EWM, so short (live) and
     # long (backtest) windows converge to the same baseline ─────────
-    _vol_seed = htf['volume'].mean()
+    _vol_seed = htf['volume'].mean() if seeds is None else seeds['volume_mean']
     _vol_seeded = pd.concat([pd.Series([_vol_seed]), htf['volume']]).reset_index(drop=True)
     htf['HTF_VOL_EWM'] = _vol_seeded.ewm(span=part_lookback, adjust=True, min_periods=5).mean().iloc[1:].values
     htf['HTF_VOL_RATIO'] = htf['volume'] / (htf['HTF_VOL_EWM'] + 1e-9)
     htf['PART_SCORE']    = ((htf['HTF_VOL_RATIO'] - 1) / 1).clip(0, 1)
 
     # ── 4. REGIME PERSISTENCE — seeded recursive directional memory ─
-    _dir_seed = htf['HTF_DIRECTION'].mean()
+    _dir_seed = htf['HTF_DIRECTION'].mean() if seeds is None else seeds['direction_mean']
     _dir_seeded = pd.concat([pd.Series([_dir_seed]), htf['HTF_DIRECTION']]).reset_index(drop=True)
     _regime_raw = _dir_seeded.ewm(span=regime_window, adjust=True, min_periods=3).mean().iloc[1:]
     _regime_raw.index = htf.index
@@ -1041,7 +1048,7 @@ def compute_htf_scores(htf_df,
     # ── 5. STRUCTURE QUALITY — seeded path_length EWM ────────────────
     direction_move = (htf['close'] - htf['close'].shift(er_window)).abs()
     _diff_abs = htf['close'].diff().abs()
-    _diff_seed = _diff_abs.mean()
+    _diff_seed = _diff_abs.mean() if seeds is None else seeds['diff_abs_mean']
     _diff_seeded = pd.concat([pd.Series([_diff_seed]), _diff_abs]).reset_index(drop=True)
     _path_length = _diff_seeded.ewm(span=er_window, adjust=True, min_periods=3).mean().iloc[1:] * er_window
     _path_length.index = htf.index
@@ -1208,7 +1215,7 @@ def post_breakout_event_window(signal, window=3):
     Creates a forward event window after a breakout signal.
     Marks the next N candles where entry is allowed.
     """
-    future_window = signal.shift(1).rolling(window).max().fillna(0).astype(bool)
+    future_window = signal.astype(float).shift(1).rolling(window).max().fillna(0).astype(bool)
     return future_window.fillna(False)
 
 def breakout_pullback_metrics(df):
@@ -1247,8 +1254,8 @@ def pullback_entry(df):
     # Instead require: body is positive (bull close) for longs,
     # negative (bear close) for shorts — momentum resuming after retrace.
 
-    ideal_pullback_long = df['PULLBACK_LONG'].between(0.3, 1.5)
-    ideal_pullback_short = df['PULLBACK_SHORT'].between(0.3, 1.5)
+    ideal_pullback_long = (df['PULLBACK_LONG'] >= 0.3) & (df['PULLBACK_LONG'] <= 1.5)
+    ideal_pullback_short = (df['PULLBACK_SHORT'] >= 0.3) & (df['PULLBACK_SHORT'] <= 1.5)
 
     bull_close = df['close'] > df['open']
     bear_close = df['close'] < df['open']
@@ -1286,13 +1293,13 @@ def delayed_continuation(df):
     strong_momentum = df['MOMENTUM_CONTINUITY'] > 0.6
 
     df['PBPE_DELAY_LONG'] = (
-        df['VALID_BREAK_LONG'].shift(2) &
+        df['VALID_BREAK_LONG'].shift(2, fill_value=False) &
         strong_momentum &
         (df['close'] > df['close'].shift(1))
     )
 
     df['PBPE_DELAY_SHORT'] = (
-        df['VALID_BREAK_SHORT'].shift(2) &
+        df['VALID_BREAK_SHORT'].shift(2, fill_value=False) &
         strong_momentum &
         (df['close'] < df['close'].shift(1))
     )
@@ -1352,15 +1359,7 @@ def compression_context(df, lookback=7, memory=6):
 
     # 2️⃣ How long since last compression?
     # Causal forward counter — same fix as bars_since_event
-    bars_since_compression = pd.Series(999, index=df.index, dtype=int)
-    counter = 999
-    for idx in range(len(df)):
-        if df['VOL_COMPRESS'].iloc[idx]:
-            counter = 0
-        else:
-            if counter < 999:
-                counter += 1
-        bars_since_compression.iloc[idx] = counter
+    bars_since_compression = bars_since_event(df['VOL_COMPRESS'])
 
     # Normalize time since compression
     freshness = 1 - (bars_since_compression / memory).clip(0,1)
@@ -1379,7 +1378,7 @@ def compression_context(df, lookback=7, memory=6):
         0.5 * recent_compression.astype(float) +
         0.5 * freshness
     ) * expansion_ok.astype(float)
-    df['COMPRESSION_SCORE'] *= df[['FRESHNESS_LONG', 'FRESHNESS_SHORT']].max(axis=1)
+    df['COMPRESSION_SCORE'] *= np.fmax(df['FRESHNESS_LONG'], df['FRESHNESS_SHORT'])
 
     # 5️⃣ Convert to permission (like HTF_OK)
     df['COMPRESSION_OK'] = df['COMPRESSION_SCORE'] > 0.50
@@ -1417,64 +1416,21 @@ def _ewma_zscore_series(series: pd.Series,
     same fix as the HTF_QUALITY EWM seed, applied to the recursive
     z-score estimator.
     """
-    values = series.to_numpy(dtype=float)
-    n = len(values)
-    out = np.empty(n)
-    out[:] = np.nan
-
-    mu  = seed_mean if seed_mean is not None else np.nan
-    var = seed_var if seed_var is not None else np.nan
-
-    # short-term variance tracker for adaptive alpha
-    recent_var = var
-    alpha_fast = alpha * 4.0  # faster EWM for recent vol estimate
-
-    # bias-correction weight accumulator — adjust=True analog for a
-    # hand-rolled recursion. Starts at 1.0 when a seed is supplied (the
-    # seed counts as one pseudo-observation), so early real bars aren't
-    # held hostage to a seed that a short (live) window never accumulates
-    # enough weight to outweigh, while a long (backtest) window does.
-    # This is the piece the seed alone didn't fix.
-    weight = 1.0 if seed_mean is not None else 0.0
-
-    for i, x in enumerate(values):
-        if np.isnan(x):
-            continue
-
-        if np.isnan(mu):
-            mu  = x
-            var = 0.0
-            recent_var = 0.0
-            weight = 1.0
-            continue
-
-        # ── adaptive alpha ────────────────────────────────────
-        if adaptive and not np.isnan(recent_var) and var > 1e-12:
-            # how much does recent volatility differ from long-run vol?
-            vol_ratio = np.sqrt(recent_var / var) if var > 1e-12 else 1.0
-            vol_ratio = np.clip(vol_ratio, 0.5, 3.0)
-            effective_alpha = np.clip(alpha * vol_ratio, alpha * 0.5, alpha * 3.0)
-        else:
-            effective_alpha = alpha
-
-        # ── update long-run state (bias-corrected, adjust=True analog) ─
-        # weight accumulates toward 1/effective_alpha as more bars arrive;
-        # 1/weight starts large (trust real data fast, discount the seed)
-        # and decays to effective_alpha at steady state — same shape as
-        # pandas' adjust=True correction, just applied to a manual seed.
-        weight = (1.0 - effective_alpha) * weight + 1.0
-        bias_corrected_alpha = min(1.0 / weight, 1.0)
-        mu  = mu  + bias_corrected_alpha * (x - mu)
-        var = (1.0 - bias_corrected_alpha) * var + bias_corrected_alpha * (x - mu) ** 2
-
-        # ── update short-run variance (for next bar's alpha) ──
-        recent_var = (1.0 - alpha_fast) * recent_var + alpha_fast * (x - mu) ** 2
-
-        if i >= min_periods:
-            std = np.sqrt(var) if var > 1e-12 else 1e-6
-            out[i] = (x - mu) / std
-
-    return pd.Series(out, index=series.index)
+    # The recursion itself lives in kernels._ewma_zscore_loop:
+    #   - short-term variance tracker (alpha * 4) drives the adaptive alpha
+    #   - bias-correction weight accumulator — adjust=True analog for a
+    #     hand-rolled recursion. Starts at 1.0 when a seed is supplied (the
+    #     seed counts as one pseudo-observation), so early real bars aren't
+    #     held hostage to a seed that a short (live) window never
+    #     accumulates enough weight to outweigh, while a long (backtest)
+    #     window does.
+    zscore = ewma_zscore_2d if isinstance(series, pd.DataFrame) else ewma_zscore
+    out = zscore(
+        series.to_numpy(dtype=float),
+        alpha=alpha, min_periods=min_periods, adaptive=adaptive,
+        seed_mean=seed_mean, seed_var=seed_var,
+    )
+    return _like(out, series)
 
 
 def anchored_zscore(series, min_periods=200):
@@ -1520,16 +1476,7 @@ def sanitize_features_for_signals(df: pd.DataFrame) -> pd.DataFrame:
 # EVENT AGE TRACKER (NEW)
 # ==========================================================
 def bars_since_event(event_series: pd.Series) -> pd.Series:
-    age = pd.Series(999, index=event_series.index, dtype=int)
-    counter = 999
-    for idx in range(len(event_series)):
-        if event_series.iloc[idx]:
-            counter = 0
-        else:
-            if counter < 999:
-                counter += 1
-        age.iloc[idx] = counter
-    return age
+    return _like(bars_since(event_series.values, cap=999), event_series)
 
 # ==========================================================
 # ENTRY FRESHNESS ENGINE (NEW)
@@ -1648,13 +1595,7 @@ def expansion_maturity(df, lookback=20):
     # Count consecutive bars of expansion — simple forward counter.
     # Same pattern as COMPRESSION_BARS, which already works.
     expanding = ver_expanding.astype(int)
-    expansion_bars = pd.Series(0, index=df.index)
-    for idx in range(1, len(df)):
-        if expanding.iloc[idx] == 1:
-            expansion_bars.iloc[idx] = expansion_bars.iloc[idx - 1] + 1
-        else:
-            expansion_bars.iloc[idx] = 0
-    df['EXPANSION_BARS'] = expansion_bars
+    df['EXPANSION_BARS'] = _like(streak_count(expanding.values == 1), expanding)
 
     # --------------------------------------------------
     # 2. DIRECT FLOW CONFIRMATION
@@ -1746,27 +1687,15 @@ def entry_location_filter(df, lookback=20):
 # ==========================================================
 # INTEGRATE INTO SIGNAL GENERATION
 # ==========================================================
-def generate_signal(df, htf_df, atr_mult=1.5, live=False, as_of=None, symbol="?", htf_stack_cache=None):
-    if df.empty:
-        return df
-
-    if as_of is not None:
-        cutoff = pd.Timestamp(as_of).tz_convert("UTC") if pd.Timestamp(as_of).tzinfo else pd.Timestamp(as_of).tz_localize("UTC")
-        htf_df = htf_df[htf_df.index < cutoff].copy()
-    # else: trust the caller — htf_df is already correctly clipped
-
-    print(f"[DEBUG] generate_signal htf_df last={htf_df.index[-1] if not htf_df.empty else 'EMPTY'} len={len(htf_df)}")
-
-    if df.empty or htf_df.empty:
-        return df
-
-    # =========================
-    # Core processing
-    # =========================
+# generate_signal() runs three stages around the HTF stack. They are
+# split out so indicators.panel can run the very same stages over a
+# (time × symbols) panel instead of keeping its own copy of them.
+def signal_features(df, seeds=None):
+    """1H feature columns: everything before the HTF stack."""
     df = positioning_pressure(df)
     df = volume_confirmation(df)
     df = support_resistance(df)
-    df = liquidity_displacement(df)
+    df = liquidity_displacement(df, seeds=seeds)
 
     df['ATR'] = atr_ema(df, period=14)
 
@@ -1784,19 +1713,90 @@ def generate_signal(df, htf_df, atr_mult=1.5, live=False, as_of=None, symbol="?"
     df = volatility_state(df)
     df = trend_efficiency_state(df)
     df = pressure_state(df)
-    df = participation_state(df)
+    df = participation_state(df, seeds=seeds)
     df = classify_phase(df)
     df = composite_pressure(df)  # 🔹 generate COMPOSITE_PRESSURE metric
     df = pressure_elasticity_divergence(df)
     df = vol_compression_slope(df, lookback=50, rv_period=20)
     df = micro_consolidation(df)
-    df = validated_breakouts(df)
+    df = validated_breakouts(df, seeds=seeds)   # runs dynamic_state_engine
     df = entry_freshness(df)
     df = compression_context(df)
     df = temporal_phase_asymmetry(df)
-    # --- Dynamic state analytics
-    df = dynamic_state_engine(df)
     df = entry_location_filter(df, lookback=20)
+    return df
+
+def htf_quality_threshold(htf_quality, seed=None):
+    """
+    HTF_QUALITY_TH. Seeds the baseline EWM with the series' own mean
+    instead of its first value — removes cold-start bias so short (live)
+    and long (backtest) windows converge to similar thresholds for the
+    same symbol.
+    """
+    seed = htf_quality.mean() if seed is None else seed
+    return (seeded_ewm(htf_quality, seed, 200) * 1.05).clip(lower=0.30)
+
+def signal_entries(df, live=False):
+    """Predictive modules and the signal itself, after the HTF stack."""
+    df = transition_detector(df)
+    df = momentum_continuity(df)
+    df = post_breakout_entry(df)
+
+    LONG_CONDITION = (df['VALID_BREAK_LONG'])
+    SHORT_CONDITION = (df['VALID_BREAK_SHORT'])
+
+    df['ENTRY_LONG'] = (
+        # df['ENTRY_LONG'] 
+        df['COMPRESSION_OK'] 
+    )
+
+    df['ENTRY_SHORT'] = (
+        # df['ENTRY_SHORT'] 
+        df['COMPRESSION_OK'] 
+    )
+
+    # LONG_CONDITION &= df['ENTRY_LONG']
+    # SHORT_CONDITION &= df['ENTRY_SHORT']
+
+    # LONG_CONDITION &= HTF_LONG_OK
+    # SHORT_CONDITION &= HTF_SHORT_OK
+
+    # LONG_CONDITION  &= df['LOCATION_LONG_OK']
+    # SHORT_CONDITION &= df['LOCATION_SHORT_OK']
+
+    # short wins where both fire
+    df['signal'] = np.select([SHORT_CONDITION, LONG_CONDITION], [-1, 1], default=0)
+    # df['signal'] = -1
+
+    if live:
+        df['final_signal'] = df['signal'].fillna(0).astype(int)
+    else:
+        df['final_signal'] = df['signal'].shift(1).fillna(0).astype(int)
+
+    return df
+
+def generate_signal(df, htf_df, atr_mult=1.5, live=False, as_of=None, symbol="?", htf_stack_cache=None, seeds=None):
+    # seeds: optional dict of the whole-window warm-start statistics
+    # (see indicators.signal_state.signal_seeds). Passing the values a
+    # SignalState froze at bootstrap makes this batch run reproduce the
+    # incremental engine exactly; None keeps the per-window behaviour.
+    if df.empty:
+        return df
+
+    if as_of is not None:
+        cutoff = pd.Timestamp(as_of).tz_convert("UTC") if pd.Timestamp(as_of).tzinfo else pd.Timestamp(as_of).tz_localize("UTC")
+        htf_df = htf_df[htf_df.index < cutoff].copy()
+    # else: trust the caller — htf_df is already correctly clipped
+
+    print(f"[DEBUG] generate_signal htf_df last={htf_df.index[-1] if not htf_df.empty else 'EMPTY'} len={len(htf_df)}")
+
+    if df.empty or htf_df.empty:
+        return df
+
+    # =========================
+    # Core processing
+    # =========================
+    df = signal_features(df, seeds=seeds)
 
     # =========================
     # NEW HTF STRUCTURAL STACK
@@ -1811,15 +1811,7 @@ def generate_signal(df, htf_df, atr_mult=1.5, live=False, as_of=None, symbol="?"
 
     df = pd.concat([df, htf_stack], axis=1)
 
-    # Seed the baseline EWM with the series' own mean instead of its first
-    # value — removes cold-start bias so short (live) and long (backtest)
-    # windows converge to similar thresholds for the same symbol.
-    _hq = df['HTF_QUALITY']
-    _seed = _hq.mean()
-    _hq_seeded = pd.concat([pd.Series([_seed]), _hq]).reset_index(drop=True)
-    htf_quality_baseline = _hq_seeded.ewm(span=200, adjust=True).mean().iloc[1:]
-    htf_quality_baseline.index = df.index
-    htf_quality_th       = (htf_quality_baseline * 1.05).clip(lower=0.30)
+    htf_quality_th = htf_quality_threshold(df['HTF_QUALITY'], None if seeds is None else seeds['htf_quality_mean'])
     df['HTF_QUALITY_TH'] = htf_quality_th
 
     # ── HTF COMPRESSION GATE ──────────────────────────────────────────
@@ -1864,37 +1856,10 @@ def generate_signal(df, htf_df, atr_mult=1.5, live=False, as_of=None, symbol="?"
     # =========================
     # PREDICTIVE MODULES
     # =========================
-    df = transition_detector(df)
-    df = momentum_continuity(df)
-    df = post_breakout_entry(df)
-    
+    df = signal_entries(df, live=live)
     LONG_CONDITION = (df['VALID_BREAK_LONG'])
     SHORT_CONDITION = (df['VALID_BREAK_SHORT'])
 
-    df['ENTRY_LONG'] = (
-        # df['ENTRY_LONG'] 
-        df['COMPRESSION_OK'] 
-    )
-
-    df['ENTRY_SHORT'] = (
-        # df['ENTRY_SHORT'] 
-        df['COMPRESSION_OK'] 
-    )
-
-    # LONG_CONDITION &= df['ENTRY_LONG']
-    # SHORT_CONDITION &= df['ENTRY_SHORT']
-
-    # LONG_CONDITION &= HTF_LONG_OK
-    # SHORT_CONDITION &= HTF_SHORT_OK
-
-    # LONG_CONDITION  &= df['LOCATION_LONG_OK']
-    # SHORT_CONDITION &= df['LOCATION_SHORT_OK']
-
-    df['signal'] = 0
-    df.loc[LONG_CONDITION, 'signal'] = 1
-    df.loc[SHORT_CONDITION, 'signal'] = -1
-    # df['signal'] = -1
-
     # ── FILTER AUDIT ──────────────────────────────────────────────
     # try:
     #     from execution.notifier import TelegramNotifier
@@ -1912,11 +1877,6 @@ def generate_signal(df, htf_df, atr_mult=1.5, live=False, as_of=None, symbol="?"
     #     pass
     # ── END FILTER AUDIT ──────────────────────────────────────────
 
-    if live:
-        df['final_signal'] = df['signal'].fillna(0).astype(int)
-    else:
-        df['final_signal'] = df['signal'].shift(1).fillna(0).astype(int)
-
     _l = df.iloc[-1]
     print(
         f"[SIGNAL GATE] {symbol} | "
@@ -0,0 +1,305 @@
+import numpy as np
+
+# ==========================================================
+# ARRAY KERNELS
+# ==========================================================
+# Array versions of the per-bar loops in indicators.py. Counters are
+# pure NumPy; the two genuinely recursive filters (SuperTrend bands and
+# the adaptive z-score) are plain loops over ndarrays that get compiled
+# with numba when it is installed. Every kernel reproduces the loop it
+# replaced exactly — tests/test_kernels.py pins that.
+#
+# The *_2d variants run the same recursions over (bars × symbols)
+# arrays for the multi-symbol panel (indicators/panel.py): each column
+# is an independent series.
+
+try:
+    from numba import njit as _njit
+except ImportError:
+    _njit = None
+
+
+def _jit(fn):
+    return _njit(cache=True)(fn) if _njit is not None else fn
+
+
+HAS_NUMBA = _njit is not None
+
+
+def _bar_positions(arr):
+    # bar number along axis 0, shaped to broadcast against arr
+    n = len(arr)
+    return np.arange(n, dtype=np.int64).reshape((n,) + (1,) * (arr.ndim - 1))
+
+
+def streak_count(flags):
+    """
+    Consecutive-true counter: out[i] = out[i-1] + 1 while flags[i] is
+    set, else 0. Bar 0 is always 0 (the loops started at index 1).
+    Counts along axis 0, so a 2-D array gets one counter per column.
+    """
+    on = np.asarray(flags).astype(bool)
+    n = len(on)
+    out = np.zeros(on.shape, dtype=np.int64)
+    if n < 2:
+        return out
+
+    on[0] = False
+    pos = _bar_positions(on)
+    last_off = np.maximum.accumulate(np.where(on, 0, pos), axis=0)
+    out[...] = pos - last_off
+    return out
+
+
+def bars_since(flags, cap=999):
+    """
+    Bars since the last truthy flag, capped at `cap`; `cap` before the
+    first event. Truthiness follows Python's (NaN counts as an event).
+    Counts along axis 0, like streak_count().
+    """
+    hit = np.asarray(flags).astype(bool)
+    n = len(hit)
+    pos = _bar_positions(hit)
+    last_hit = np.maximum.accumulate(np.where(hit, pos, -1), axis=0) if n else np.zeros(hit.shape, np.int64)
+
+    out = np.minimum(pos - last_hit, cap)
+    out[last_hit < 0] = cap
+    return out
+
+
+@_jit
+def _supertrend_loop(upper_raw, lower_raw, close, atr, eps,
+                     flip_margin_atr, min_flip_bars):
+    n = len(close)
+    final_upper = upper_raw.copy()
+    final_lower = lower_raw.copy()
+    trend = np.ones(n, dtype=np.int8)
+
+    bars_since_flip = 0
+
+    for i in range(1, n):
+        # Ratchet bands. Comparisons are spelled out to keep Python's
+        # min()/max() NaN behaviour under numba as well.
+        final_upper[i] = upper_raw[i]
+        if close[i-1] <= final_upper[i-1] + eps and final_upper[i-1] < upper_raw[i]:
+            final_upper[i] = final_upper[i-1]
+
+        final_lower[i] = lower_raw[i]
+        if close[i-1] >= final_lower[i-1] - eps and final_lower[i-1] > lower_raw[i]:
+            final_lower[i] = final_lower[i-1]
+
+        flip_margin = atr[i] * flip_margin_atr
+
+        bull_flip = close[i] > final_upper[i-1] + flip_margin
+        bear_flip = close[i] < final_lower[i-1] - flip_margin
+
+        if bull_flip and trend[i-1] == -1 and bars_since_flip >= min_flip_bars:
+            trend[i] = 1
+            bars_since_flip = 0
+        elif bear_flip and trend[i-1] == 1 and bars_since_flip >= min_flip_bars:
+            trend[i] = -1
+            bars_since_flip = 0
+        else:
+            trend[i] = trend[i-1]
+            bars_since_flip += 1
+
+    return trend, final_upper, final_lower
+
+
+def supertrend_bands(upper_raw, lower_raw, close, atr, eps=1e-6,
+                     flip_margin_atr=0.10, min_flip_bars=2):
+    """
+    Ratcheted SuperTrend bands and trend state (see supertrend()).
+    Returns (trend int8, final_upper, final_lower).
+    """
+    return _supertrend_loop(
+        np.asarray(upper_raw, dtype=np.float64),
+        np.asarray(lower_raw, dtype=np.float64),
+        np.asarray(close, dtype=np.float64),
+        np.asarray(atr, dtype=np.float64),
+        float(eps), float(flip_margin_atr), int(min_flip_bars),
+    )
+
+
+@_jit
+def _ewma_zscore_loop(values, alpha, min_periods, adaptive,
+                      mu, var, seeded):
+    n = len(values)
+    out = np.full(n, np.nan)
+
+    recent_var = var
+    alpha_fast = alpha * 4.0
+
+    weight = 1.0 if seeded else 0.0
+
+    for i in range(n):
+        x = values[i]
+        if np.isnan(x):
+            continue
+
+        if np.isnan(mu):
+            mu = x
+            var = 0.0
+            recent_var = 0.0
+            weight = 1.0
+            continue
+
+        if adaptive and not np.isnan(recent_var) and var > 1e-12:
+            vol_ratio = np.sqrt(recent_var / var)
+            vol_ratio = min(max(vol_ratio, 0.5), 3.0)
+            effective_alpha = min(max(alpha * vol_ratio, alpha * 0.5), alpha * 3.0)
+        else:
+            effective_alpha = alpha
+
+        weight = (1.0 - effective_alpha) * weight + 1.0
+        bias_corrected_alpha = min(1.0 / weight, 1.0)
+        mu = mu + bias_corrected_alpha * (x - mu)
+        var = (1.0 - bias_corrected_alpha) * var + bias_corrected_alpha * (x - mu) ** 2
+
+        recent_var = (1.0 - alpha_fast) * recent_var + alpha_fast * (x - mu) ** 2
+
+        if i >= min_periods:
+            std = np.sqrt(var) if var > 1e-12 else 1e-6
+            out[i] = (x - mu) / std
+
+    return out
+
+
+def ewma_zscore(values, alpha=0.05, min_periods=30, adaptive=True,
+                seed_mean=None, seed_var=None):
+    """
+    Adaptive recursive z-score over a float array
+    (see _ewma_zscore_series for the model).
+    """
+    return _ewma_zscore_loop(
+        np.asarray(values, dtype=np.float64),
+        float(alpha), int(min_periods), bool(adaptive),
+        np.nan if seed_mean is None else float(seed_mean),
+        np.nan if seed_var is None else float(seed_var),
+        seed_mean is not None,
+    )
+
+
+# ==========================================================
+# 2-D (bars × symbols) VARIANTS
+# ==========================================================
+# With numba the per-column loops above are already compiled, so the
+# 2-D entry points just run them column by column. Without it, one
+# Python-level pass over time with NumPy ops across all columns is far
+# cheaper than a scalar pass per column. The z-score agrees with the
+# scalar loop to the last bit or two (array ** 2 squares exactly, a
+# scalar ** 2 goes through pow()); everything else is exact.
+
+def _supertrend_loop_2d(upper_raw, lower_raw, close, atr, eps,
+                        flip_margin_atr, min_flip_bars):
+    n, m = close.shape
+    final_upper = upper_raw.copy()
+    final_lower = lower_raw.copy()
+    trend = np.ones((n, m), dtype=np.int8)
+
+    bars_since_flip = np.zeros(m, dtype=np.int64)
+
+    for i in range(1, n):
+        keep = (close[i-1] <= final_upper[i-1] + eps) & (final_upper[i-1] < upper_raw[i])
+        final_upper[i] = np.where(keep, final_upper[i-1], upper_raw[i])
+
+        keep = (close[i-1] >= final_lower[i-1] - eps) & (final_lower[i-1] > lower_raw[i])
+        final_lower[i] = np.where(keep, final_lower[i-1], lower_raw[i])
+
+        flip_margin = atr[i] * flip_margin_atr
+
+        bull_flip = close[i] > final_upper[i-1] + flip_margin
+        bear_flip = close[i] < final_lower[i-1] - flip_margin
+
+        ready = bars_since_flip >= min_flip_bars
+        to_bull = bull_flip & (trend[i-1] == -1) & ready
+        to_bear = ~to_bull & bear_flip & (trend[i-1] == 1) & ready
+
+        trend[i] = np.where(to_bull, 1, np.where(to_bear, -1, trend[i-1]))
+        bars_since_flip = np.where(to_bull | to_bear, 0, bars_since_flip + 1)
+
+    return trend, final_upper, final_lower
+
+
+def supertrend_bands_2d(upper_raw, lower_raw, close, atr, eps=1e-6,
+                        flip_margin_atr=0.10, min_flip_bars=2):
+    """Column-wise supertrend_bands() over (bars × symbols) arrays."""
+    args = [np.asarray(a, dtype=np.float64) for a in (upper_raw, lower_raw, close, atr)]
+    if HAS_NUMBA:
+        cols = [
+            supertrend_bands(*(a[:, j] for a in args), eps, flip_margin_atr, min_flip_bars)
+            for j in range(args[2].shape[1])
+        ]
+        return tuple(np.column_stack(part) for part in zip(*cols))
+    return _supertrend_loop_2d(*args, float(eps), float(flip_margin_atr), int(min_flip_bars))
+
+
+def _ewma_zscore_loop_2d(values, alpha, min_periods, adaptive,
+                         mu, var, seeded):
+    n, m = values.shape
+    out = np.full((n, m), np.nan)
+
+    recent_var = var.copy()
+    alpha_fast = alpha * 4.0
+
+    weight = np.full(m, 1.0 if seeded else 0.0)
+
+    for i in range(n):
+        x = values[i]
+        seen = ~np.isnan(x)
+        start = seen & np.isnan(mu)     # first observation: initialise only
+        step = seen & ~start
+
+        if adaptive:
+            ok = ~np.isnan(recent_var) & (var > 1e-12)
+            vol_ratio = np.sqrt(np.where(ok, recent_var, 1.0) / np.where(ok, var, 1.0))
+            vol_ratio = np.minimum(np.maximum(vol_ratio, 0.5), 3.0)
+            effective_alpha = np.where(
+                ok, np.minimum(np.maximum(alpha * vol_ratio, alpha * 0.5), alpha * 3.0), alpha,
+            )
+        else:
+            effective_alpha = alpha
+
+        new_weight = (1.0 - effective_alpha) * weight + 1.0
+        bias_corrected_alpha = np.minimum(1.0 / new_weight, 1.0)
+        new_mu = mu + bias_corrected_alpha * (x - mu)
+        new_var = (1.0 - bias_corrected_alpha) * var + bias_corrected_alpha * (x - new_mu) ** 2
+        new_recent = (1.0 - alpha_fast) * recent_var + alpha_fast * (x - new_mu) ** 2
+
+        weight     = np.where(step, new_weight, np.where(start, 1.0, weight))
+        mu         = np.where(step, new_mu, np.where(start, x, mu))
+        var        = np.where(step, new_var, np.where(start, 0.0, var))
+        recent_var = np.where(step, new_recent, np.where(start, 0.0, recent_var))
+
+        if i >= min_periods:
+            std = np.where(var > 1e-12, np.sqrt(np.where(var > 1e-12, var, 1.0)), 1e-6)
+            out[i] = np.where(step, (x - mu) / std, np.nan)
+
+    return out
+
+
+def ewma_zscore_2d(values, alpha=0.05, min_periods=30, adaptive=True,
+                   seed_mean=None, seed_var=None):
+    """
+    Column-wise ewma_zscore() over a (bars × symbols) array. seed_mean /
+    seed_var may be scalars or one value per column.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    m = values.shape[1]
+    mu  = np.full(m, np.nan) if seed_mean is None else np.broadcast_to(np.asarray(seed_mean, dtype=np.float64), m).copy()
+    var = np.full(m, np.nan) if seed_var is None else np.broadcast_to(np.asarray(seed_var, dtype=np.float64), m).copy()
+
+    if HAS_NUMBA:
+        out = np.empty_like(values)
+        for j in range(m):
+            out[:, j] = _ewma_zscore_loop(
+                np.ascontiguousarray(values[:, j]), float(alpha), int(min_periods),
+                bool(adaptive), mu[j], var[j], seed_mean is not None,
+            )
+        return out
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return _ewma_zscore_loop_2d(
+            values, float(alpha), int(min_periods), bool(adaptive),
+            mu, var, seed_mean is not None,
+        )
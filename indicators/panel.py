@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+
+from indicators.indicators import (
+    generate_signal, compute_htf_scores, align_htf_scores,
+    signal_features, htf_quality_threshold, signal_entries,
+)
+from indicators.signal_state import signal_seeds
+
+# ==========================================================
+# MULTI-SYMBOL SIGNAL PANEL
+# ==========================================================
+# generate_signal() runs ~40 indicator passes per symbol, and every one
+# of them is a column-wise operation: rolling windows, EWMs, shifts,
+# clips, recursive z-scores. Stacking the universe into (time × symbols)
+# frames lets each pass run once over every symbol at the same time.
+#
+# The panel runs generate_signal's own stages (signal_features,
+# htf_quality_threshold, signal_entries) over a _Panel, whose columns
+# are (time × symbols) DataFrames instead of Series — there is no second
+# copy of the indicator logic to keep in step with indicators.py.
+#
+# Parity contract: for every symbol s,
+#
+#     generate_signal_panel(frames, htf_scores)[s]
+#
+# equals (same columns, dtypes and values to float rounding)
+#
+#     generate_signal(frames[s], htf_df, htf_stack_cache=htf_scores[s])
+#
+# Symbols are only stacked with others that share the exact same 1H
+# index — padding a short history with NaN would shift the seeded EWMs
+# and bar-0 counters — so a freshly listed coin simply forms its own
+# group. The HTF compression gate only feeds a local flag no output
+# column reads (see SignalState), so it is skipped here as well.
+
+
+def generate_signal_panel(frames, htf_scores, live=False, seeds=None):
+    """
+    frames:     {symbol: 1H OHLCV DataFrame}
+    htf_scores: {symbol: compute_htf_scores() output for that symbol}
+    seeds:      optional {symbol: signal_seeds() dict}, as generate_signal(seeds=)
+
+    Returns {symbol: signal frame}. Empty frames are returned unchanged,
+    like generate_signal() does.
+    """
+    out = {}
+    groups = {}
+    for symbol, df in frames.items():
+        if df.empty:
+            out[symbol] = df
+            continue
+        key = (str(df.index.dtype), df.index.asi8.tobytes())
+        groups.setdefault(key, []).append(symbol)
+
+    for symbols in groups.values():
+        group_seeds = None
+        if seeds is not None:
+            per_symbol = [
+                seeds[s] if s in seeds else signal_seeds(frames[s], htf_scores[s]) for s in symbols
+            ]
+            # one value per column, the shape the indicators take seeds in on a panel
+            group_seeds = {name: [seed[name] for seed in per_symbol] for name in per_symbol[0]}
+        out.update(_panel_group(symbols, frames, htf_scores, live, group_seeds))
+
+    return {symbol: out[symbol] for symbol in frames}
+
+
+def generate_signals(frames, htf_frames, engine="panel", live=False):
+    """
+    Signal frames for a whole universe, for backtest / research drivers.
+
+    frames:     {symbol: 1H OHLCV DataFrame}
+    htf_frames: {symbol: closed 4H OHLCV DataFrame}
+    engine:     "panel"  — one generate_signal_panel() pass
+                "serial" — generate_signal() per symbol (reference path)
+    """
+    scores = {s: compute_htf_scores(htf_frames[s]) for s in frames}
+
+    if engine == "panel":
+        return generate_signal_panel(frames, scores, live=live)
+    if engine == "serial":
+        return {
+            s: generate_signal(df.copy(), htf_frames[s], live=live, symbol=s, htf_stack_cache=scores[s])
+            for s, df in frames.items()
+        }
+    raise ValueError(f"unknown signal engine {engine!r} (expected 'panel' or 'serial')")
+
+
+# ==========================================================
+# PANEL FRAME
+# ==========================================================
+class _Panel:
+    """
+    The slice of the DataFrame interface the indicator functions use,
+    over a group of symbols sharing one index: panel[name] is a
+    (time × symbols) DataFrame. Input columns are stacked on first read;
+    assigned columns keep their assignment order, like DataFrame columns.
+    """
+
+    def __init__(self, symbols, frames):
+        self.symbols = symbols
+        self.frames = frames
+        self.index = frames[symbols[0]].index
+        self.inputs = [c for c in frames[symbols[0]].columns if all(c in frames[s] for s in symbols)]
+        self._stacked = {}
+        self.data = {}
+
+    @property
+    def columns(self):
+        return self.inputs + [c for c in self.data if c not in self.inputs]
+
+    def __contains__(self, name):
+        return name in self.data or name in self.inputs
+
+    def __getitem__(self, name):
+        if name in self.data:
+            return self.data[name]
+        if name not in self._stacked:
+            if name not in self.inputs:
+                raise KeyError(name)
+            self._stacked[name] = pd.DataFrame(
+                {s: self.frames[s][name].to_numpy() for s in self.symbols}, index=self.index,
+            )
+        return self._stacked[name]
+
+    def __setitem__(self, name, value):
+        if not isinstance(value, pd.DataFrame):
+            value = pd.DataFrame(np.asarray(value), index=self.index, columns=self.symbols)
+        self.data[name] = value
+
+
+# ==========================================================
+# PANEL PIPELINE
+# ==========================================================
+def _panel_group(symbols, frames, htf_scores, live, seeds):
+    panel = signal_features(_Panel(symbols, frames), seeds=seeds)
+
+    # HTF stack per symbol — each has its own 4H clock
+    htf_stack = {s: align_htf_scores(htf_scores[s], frames[s], is_live=live) for s in symbols}
+    for col in ('HTF_DIRECTION', 'HTF_QUALITY'):
+        panel[col] = pd.DataFrame({s: htf_stack[s][col].to_numpy() for s in symbols}, index=panel.index)
+    panel['HTF_QUALITY_TH'] = htf_quality_threshold(
+        panel['HTF_QUALITY'], None if seeds is None else seeds['htf_quality_mean'],
+    )
+
+    panel = signal_entries(panel, live=live)
+    return _split(panel)
+
+
+def _sanitize(values):
+    # sanitize_features_for_signals() on one (time × symbols) block:
+    # inf → NaN, forward fill down each column, then zero-fill
+    if values.dtype.kind != "f":
+        return values
+    frame = pd.DataFrame(np.where(np.isinf(values), np.nan, values))
+    return frame.ffill().fillna(0).to_numpy()
+
+
+def _split(panel):
+    blocks = {col: _sanitize(values.to_numpy()) for col, values in panel.data.items()}
+
+    out = {}
+    for j, s in enumerate(panel.symbols):
+        df = panel.frames[s]
+        inputs = df.replace([np.inf, -np.inf], np.nan).ffill().fillna(0)
+        data = {c: inputs[c].to_numpy() for c in df.columns}
+        for col, block in blocks.items():
+            data[col] = block[:, j]
+        out[s] = pd.DataFrame(data, index=df.index)
+    return out
@@ -0,0 +1,252 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_pipeline.feature_store import FeatureStore
+from indicators.indicators import generate_signal
+
+# ==========================================================
+# CONTENT-ADDRESSED SIGNAL CACHE
+# ==========================================================
+# generate_signal() is a pure function of its inputs: the 1H frame, the
+# 4H frame and a handful of parameters. Iterating on exit rules in
+# backtest.py never changes any of those, yet main.py used to rebuild
+# the whole indicator stack on every run (twice, for the live and the
+# frozen backtest frame). This cache stores each output frame under a
+# hash of exactly what produced it:
+#
+#     key = sha1(1H frame bytes, 4H frame bytes, parameters, indicator source)
+#
+# so a hit is always the frame generate_signal would have returned, and
+# any change to a candle, a parameter or indicators.py / kernels.py
+# lands on a new key by construction. Nothing is ever stale — old keys
+# simply stop being asked for, and prune() / the CLI below clear them.
+#
+# Output frames are all bool / int / float columns and go into a
+# FeatureStore (one key per entry); meta extras carry the symbol, bar
+# range, compute time and last use. Hit / miss counters accumulate in
+# <root>/stats.json.
+#
+# The root is its own directory: data/signal_cache belongs to the live
+# per-symbol store in execution/hourly_runner.py, which is wiped on every
+# restart. Keys without this cache's meta extras are never listed, so
+# --clear / --keep / prune() cannot reach anything the cache did not write.
+#
+# USAGE:
+#     python -m indicators.signal_cache --stats
+#     python -m indicators.signal_cache --list
+#     python -m indicators.signal_cache --drop SLPUSDT
+#     python -m indicators.signal_cache --older-than 7
+#     python -m indicators.signal_cache --keep 50
+#     python -m indicators.signal_cache --clear
+
+DEFAULT_ROOT = "data/backtest_signal_cache"
+STATS_FILE   = "stats.json"
+
+# meta extras every entry this cache writes carries
+_ENTRY_EXTRAS = ("symbol", "compute_s", "last_used")
+
+_SOURCES = ("indicators.py", "kernels.py")
+_code_fingerprint = None
+
+
+def code_fingerprint() -> str:
+    """Hash of the indicator sources generate_signal runs."""
+    global _code_fingerprint
+    if _code_fingerprint is None:
+        h = hashlib.sha1()
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in _SOURCES:
+            with open(os.path.join(here, name), "rb") as f:
+                h.update(f.read())
+        _code_fingerprint = h.hexdigest()
+    return _code_fingerprint
+
+
+def _hash_frame(h, df: pd.DataFrame):
+    h.update(np.ascontiguousarray(pd.DatetimeIndex(df.index).as_unit("ns").asi8).tobytes())
+    for name in df.columns:
+        values = df[name].to_numpy()
+        h.update(f"{name}:{values.dtype.str}".encode())
+        if values.dtype == object:
+            h.update(repr(values.tolist()).encode())
+        else:
+            h.update(np.ascontiguousarray(values).tobytes())
+
+
+def signal_key(df: pd.DataFrame, htf_df: pd.DataFrame, **params) -> str:
+    """
+    Cache key of generate_signal(df, htf_df, **params). `symbol` only
+    labels debug output and is not part of the key.
+    """
+    h = hashlib.sha1(code_fingerprint().encode())
+    _hash_frame(h, df)
+    _hash_frame(h, htf_df)
+
+    stack = params.pop("htf_stack_cache", None)
+    if stack is not None:
+        h.update(b"htf_stack_cache")
+        _hash_frame(h, stack)
+    if params.get("as_of") is not None:
+        params["as_of"] = str(pd.Timestamp(params["as_of"]))
+    h.update(json.dumps(params, sort_keys=True, default=float).encode())
+    return h.hexdigest()[:20]
+
+
+class SignalCache:
+    def __init__(self, root: str = DEFAULT_ROOT):
+        self.root = root
+        self.store = FeatureStore(root)
+        self.hits = 0
+        self.misses = 0
+        self.saved_s = 0.0
+
+    def generate_signal(self, df, htf_df, atr_mult=1.5, live=False, as_of=None, symbol="?",
+                        htf_stack_cache=None, seeds=None):
+        """Drop-in for indicators.generate_signal, served from disk when possible."""
+        if df.empty or htf_df.empty:
+            return generate_signal(df, htf_df, atr_mult=atr_mult, live=live, as_of=as_of, symbol=symbol,
+                                   htf_stack_cache=htf_stack_cache, seeds=seeds)
+
+        key = signal_key(df, htf_df, atr_mult=atr_mult, live=live, as_of=as_of,
+                         htf_stack_cache=htf_stack_cache, seeds=seeds)
+        meta = self.store.meta(key)
+        if meta is not None:
+            out = self.store.read(key)
+            if out is not None:
+                extra = meta["extra"]
+                self.hits += 1
+                self.saved_s += extra.get("compute_s", 0.0)
+                self.store.update_extra(key, last_used=time.time())
+                self._record(hit=True, saved_s=extra.get("compute_s", 0.0))
+                print(f"[SIGNAL CACHE] {symbol} hit {key} ({len(out)} bars, "
+                      f"saved {extra.get('compute_s', 0.0):.1f}s)")
+                return out
+
+        started = time.perf_counter()
+        out = generate_signal(df, htf_df, atr_mult=atr_mult, live=live, as_of=as_of, symbol=symbol,
+                              htf_stack_cache=htf_stack_cache, seeds=seeds)
+        compute_s = round(time.perf_counter() - started, 3)
+        self.misses += 1
+        self._record(hit=False)
+        try:
+            self.store.write(key, out, symbol=symbol, first=str(out.index[0]), last=str(out.index[-1]),
+                             compute_s=compute_s, created=time.time(), last_used=time.time())
+        except (TypeError, ValueError) as e:
+            # a column FeatureStore cannot hold — serve uncached
+            self.store.delete(key)
+            print(f"[SIGNAL CACHE] {symbol} not cached: {e}")
+        print(f"[SIGNAL CACHE] {symbol} miss {key} ({len(out)} bars, {compute_s:.1f}s)")
+        return out
+
+    # --------------------------------------------------
+    # STATS
+    # --------------------------------------------------
+    def _stats_path(self) -> str:
+        return os.path.join(self.root, STATS_FILE)
+
+    def stats(self) -> dict:
+        """Lifetime counters across runs (this instance's are .hits / .misses)."""
+        try:
+            with open(self._stats_path()) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"hits": 0, "misses": 0, "saved_s": 0.0}
+
+    def _record(self, hit: bool, saved_s: float = 0.0):
+        stats = self.stats()
+        stats["hits" if hit else "misses"] += 1
+        stats["saved_s"] = round(stats["saved_s"] + saved_s, 3)
+        os.makedirs(self.root, exist_ok=True)
+        # sweep / walk-forward workers record concurrently: each writes its
+        # own tmp file, the last replace wins (a lost increment is harmless)
+        tmp = f"{self._stats_path()}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(stats, f)
+        os.replace(tmp, self._stats_path())
+
+    # --------------------------------------------------
+    # INVALIDATION
+    # --------------------------------------------------
+    def entries(self) -> pd.DataFrame:
+        rows = []
+        if os.path.isdir(self.root):
+            for key in sorted(os.listdir(self.root)):
+                meta = self.store.meta(key)
+                if meta is not None and all(k in meta["extra"] for k in _ENTRY_EXTRAS):
+                    rows.append({"key": key, "rows": meta["rows"], **meta["extra"]})
+        return pd.DataFrame(rows)
+
+    def invalidate(self, symbol: str = None, older_than: pd.Timedelta = None) -> int:
+        """
+        Drops entries for `symbol` and/or entries unused for longer than
+        `older_than`. With neither, drops everything. Returns the count.
+        """
+        entries = self.entries()
+        if entries.empty:
+            return 0
+        drop = pd.Series(True, index=entries.index)
+        if symbol is not None:
+            drop &= entries["symbol"] == symbol
+        if older_than is not None:
+            drop &= entries["last_used"] < time.time() - older_than.total_seconds()
+        for key in entries.loc[drop, "key"]:
+            self.store.delete(key)
+        return int(drop.sum())
+
+    def prune(self, keep: int) -> int:
+        """Keeps the `keep` most recently used entries."""
+        entries = self.entries()
+        if len(entries) <= keep:
+            return 0
+        stale = entries.sort_values("last_used", ascending=False)["key"].iloc[keep:]
+        for key in stale:
+            self.store.delete(key)
+        return len(stale)
+
+    def clear(self) -> int:
+        entries = self.entries()
+        for key in entries.get("key", []):
+            self.store.delete(key)
+        return len(entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and invalidate the generate_signal cache")
+    parser.add_argument("--root", default=DEFAULT_ROOT)
+    parser.add_argument("--stats", action="store_true")
+    parser.add_argument("--list", action="store_true")
+    parser.add_argument("--drop", metavar="SYMBOL", help="drop every entry for SYMBOL")
+    parser.add_argument("--older-than", type=float, metavar="DAYS", help="drop entries unused for DAYS")
+    parser.add_argument("--keep", type=int, metavar="N", help="keep the N most recently used entries")
+    parser.add_argument("--clear", action="store_true")
+    args = parser.parse_args(argv)
+
+    cache = SignalCache(args.root)
+    if args.clear:
+        print(f"[SIGNAL CACHE] cleared {cache.clear()} entries")
+    if args.drop or args.older_than is not None:
+        older = None if args.older_than is None else pd.Timedelta(days=args.older_than)
+        print(f"[SIGNAL CACHE] dropped {cache.invalidate(symbol=args.drop, older_than=older)} entries")
+    if args.keep is not None:
+        print(f"[SIGNAL CACHE] pruned {cache.prune(args.keep)} entries")
+    if args.list:
+        entries = cache.entries()
+        print(entries.to_string(index=False) if not entries.empty else "[SIGNAL CACHE] empty")
+    if args.stats or not any((args.clear, args.drop, args.older_than is not None, args.keep is not None, args.list)):
+        stats = cache.stats()
+        total = stats["hits"] + stats["misses"]
+        rate = stats["hits"] / total * 100 if total else 0.0
+        print(f"[SIGNAL CACHE] {len(cache.entries())} entries | {stats['hits']} hits / "
+              f"{stats['misses']} misses ({rate:.0f}% hit) | {stats['saved_s']:.0f}s of indicator time saved")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1033 @@
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from indicators.indicators import compute_htf_scores, align_htf_scores, supertrend, seeded_ewm
+
+# ==========================================================
+# INCREMENTAL SIGNAL ENGINE
+# ==========================================================
+# generate_signal() rebuilds ~40 indicator passes over the full 1H
+# history every time a bar closes. SignalState carries the recursive
+# state of every one of those passes (EWMs, ATR, SuperTrend bands,
+# recursive z-scores, streak counters, short rolling windows) and
+# emits the newest row in O(1) per bar.
+#
+# Parity contract: bootstrap(df[:n0]) followed by update() for every
+# bar in df[n0:] produces the same frame, column for column, as
+#
+#     generate_signal(df, htf_df, seeds=state.seeds, htf_stack_cache=...)
+#
+# The seeds are the handful of whole-window statistics the batch path
+# uses to warm-start its EWMs (candle size mean, volume mean, FLOW
+# variance, ...). They are not causal — a batch run over a longer
+# window computes slightly different ones — so the state freezes them
+# at bootstrap and the batch path accepts them back through `seeds=`.
+# Callers that want the batch numbers to track the sliding window
+# simply re-bootstrap periodically (see hourly_runner).
+#
+# Between re-bootstraps the frame is therefore NOT what an unseeded
+# generate_signal() over the current sliding window returns: besides
+# the seeds, every recursive pass still starts at the bootstrap
+# window's first bar rather than the slid window's. The EWM-driven
+# columns converge quickly towards the window's tail (ATR,
+# HTF_QUALITY_TH agree to ~1e-4 there), but the regime labels built on
+# recursive z-scores and rolling thresholds (VOL_STATE, STRUCT_STATE,
+# STATE_*, EXPANSION_*) can differ on any row, including the newest.
+# The entry columns (ENTRY_LONG/SHORT, signal, final_signal) are
+# expected to agree; test_signal_state bounds all of this over one
+# SIGNAL_STATE_RESEED_BARS interval.
+
+
+def _alpha(span=None, alpha=None):
+    # Same derivation pandas uses internally (span → com → alpha) so the
+    # recursions below are bit-for-bit identical to Series.ewm().
+    if span is not None:
+        com = (span - 1) / 2.0
+    else:
+        com = 1.0 / alpha - 1.0
+    return 1.0 / (1.0 + com)
+
+
+class _Ewm:
+    """Streaming Series.ewm(...).mean() — pandas recursion, ignore_na=False."""
+
+    __slots__ = ("old_wt_factor", "new_wt", "adjust", "min_periods",
+                 "weighted", "old_wt", "nobs", "started")
+
+    def __init__(self, span=None, alpha=None, adjust=True, min_periods=0):
+        a = _alpha(span, alpha)
+        self.old_wt_factor = 1.0 - a
+        self.new_wt = 1.0 if adjust else a
+        self.adjust = adjust
+        self.min_periods = max(int(min_periods), 1)
+        self.weighted = math.nan
+        self.old_wt = 1.0
+        self.nobs = 0
+        self.started = False
+
+    def update(self, cur):
+        is_obs = cur == cur
+        if not self.started:
+            self.started = True
+            self.weighted = cur
+            self.nobs = int(is_obs)
+            self.old_wt = 1.0
+        else:
+            self.nobs += is_obs
+            weighted = self.weighted
+            if weighted == weighted:
+                self.old_wt *= self.old_wt_factor
+                if is_obs:
+                    if weighted != cur:
+                        weighted = self.old_wt * weighted + self.new_wt * cur
+                        weighted /= (self.old_wt + self.new_wt)
+                        self.weighted = weighted
+                    if self.adjust:
+                        self.old_wt += self.new_wt
+                    else:
+                        self.old_wt = 1.0
+            elif is_obs:
+                self.weighted = cur
+        return self.weighted if self.nobs >= self.min_periods else math.nan
+
+
+class _EwmStd:
+    """Streaming Series.ewm(...).std() (bias=False) — pandas ewmcov recursion."""
+
+    __slots__ = ("old_wt_factor", "new_wt", "adjust", "mean", "cov",
+                 "sum_wt", "sum_wt2", "old_wt", "nobs", "started")
+
+    def __init__(self, span=None, alpha=None, adjust=True):
+        a = _alpha(span, alpha)
+        self.old_wt_factor = 1.0 - a
+        self.new_wt = 1.0 if adjust else a
+        self.adjust = adjust
+        self.mean = math.nan
+        self.cov = 0.0
+        self.sum_wt = 1.0
+        self.sum_wt2 = 1.0
+        self.old_wt = 1.0
+        self.nobs = 0
+        self.started = False
+
+    def update(self, cur):
+        is_obs = cur == cur
+        if not self.started:
+            self.started = True
+            self.nobs = int(is_obs)
+            self.mean = cur if is_obs else math.nan
+        else:
+            self.nobs += is_obs
+            if self.mean == self.mean:
+                f = self.old_wt_factor
+                self.sum_wt *= f
+                self.sum_wt2 *= (f * f)
+                self.old_wt *= f
+                if is_obs:
+                    old_mean = self.mean
+                    old_wt, new_wt = self.old_wt, self.new_wt
+                    if old_mean != cur:
+                        self.mean = ((old_wt * old_mean) + (new_wt * cur)) / (old_wt + new_wt)
+                    mean = self.mean
+                    self.cov = (
+                        (old_wt * (self.cov + ((old_mean - mean) * (old_mean - mean))))
+                        + (new_wt * ((cur - mean) * (cur - mean)))
+                    ) / (old_wt + new_wt)
+                    self.sum_wt += new_wt
+                    self.sum_wt2 += (new_wt * new_wt)
+                    self.old_wt += new_wt
+                    if not self.adjust:
+                        self.sum_wt /= self.old_wt
+                        self.sum_wt2 /= (self.old_wt * self.old_wt)
+                        self.old_wt = 1.0
+            elif is_obs:
+                self.mean = cur
+
+        if self.nobs < 1:
+            return math.nan
+        numerator = self.sum_wt * self.sum_wt
+        denominator = numerator - self.sum_wt2
+        if denominator <= 0:
+            return math.nan
+        var = (numerator / denominator) * self.cov
+        return math.sqrt(var) if var > 0 else 0.0
+
+
+class _Window:
+    """Fixed-length causal window — Series.rolling(n) with min_periods=n."""
+
+    __slots__ = ("n", "buf", "nans")
+
+    def __init__(self, n):
+        self.n = n
+        self.buf = deque(maxlen=n)
+        self.nans = 0
+
+    def push(self, x):
+        if len(self.buf) == self.n and self.buf[0] != self.buf[0]:
+            self.nans -= 1
+        if x != x:
+            self.nans += 1
+        self.buf.append(x)
+        return self
+
+    @property
+    def ready(self):
+        return len(self.buf) == self.n and self.nans == 0
+
+    def sum(self):
+        return sum(self.buf) if self.ready else math.nan
+
+    def mean(self):
+        return sum(self.buf) / self.n if self.ready else math.nan
+
+    def max(self):
+        return max(self.buf) if self.ready else math.nan
+
+    def min(self):
+        return min(self.buf) if self.ready else math.nan
+
+    def std(self):
+        if not self.ready:
+            return math.nan
+        m = sum(self.buf) / self.n
+        ss = sum((x - m) * (x - m) for x in self.buf)
+        return math.sqrt(ss / (self.n - 1))
+
+
+class _ZScore:
+    """One step of _ewma_zscore_series() — see indicators.py for the maths."""
+
+    __slots__ = ("alpha", "alpha_fast", "min_periods", "adaptive",
+                 "mu", "var", "recent_var", "weight", "i")
+
+    def __init__(self, alpha=0.05, min_periods=30, adaptive=True,
+                 seed_mean=None, seed_var=None):
+        self.alpha = alpha
+        self.alpha_fast = alpha * 4.0
+        self.min_periods = min_periods
+        self.adaptive = adaptive
+        self.mu = seed_mean if seed_mean is not None else math.nan
+        self.var = seed_var if seed_var is not None else math.nan
+        self.recent_var = self.var
+        self.weight = 1.0 if seed_mean is not None else 0.0
+        self.i = -1
+
+    def update(self, x):
+        self.i += 1
+        if x != x:
+            return math.nan
+
+        if self.mu != self.mu:
+            self.mu = x
+            self.var = 0.0
+            self.recent_var = 0.0
+            self.weight = 1.0
+            return math.nan
+
+        alpha, var = self.alpha, self.var
+        if self.adaptive and self.recent_var == self.recent_var and var > 1e-12:
+            vol_ratio = min(max(math.sqrt(self.recent_var / var), 0.5), 3.0)
+            effective_alpha = min(max(alpha * vol_ratio, alpha * 0.5), alpha * 3.0)
+        else:
+            effective_alpha = alpha
+
+        self.weight = (1.0 - effective_alpha) * self.weight + 1.0
+        bias_corrected_alpha = min(1.0 / self.weight, 1.0)
+        self.mu = self.mu + bias_corrected_alpha * (x - self.mu)
+        self.var = (1.0 - bias_corrected_alpha) * var + bias_corrected_alpha * (x - self.mu) ** 2
+        self.recent_var = (1.0 - self.alpha_fast) * self.recent_var + self.alpha_fast * (x - self.mu) ** 2
+
+        if self.i >= self.min_periods:
+            std = math.sqrt(self.var) if self.var > 1e-12 else 1e-6
+            return (x - self.mu) / std
+        return math.nan
+
+
+class _Streak:
+    """Consecutive-true counter (COMPRESSION_BARS / EXPANSION_BARS) — bar 0 is always 0."""
+
+    __slots__ = ("count", "started")
+
+    def __init__(self):
+        self.count = 0
+        self.started = False
+
+    def update(self, flag):
+        if not self.started:
+            self.started = True
+            return 0
+        self.count = self.count + 1 if flag else 0
+        return self.count
+
+
+class _BarsSince:
+    """bars_since_event() — 999 until the first event, capped at 999."""
+
+    __slots__ = ("counter",)
+
+    def __init__(self):
+        self.counter = 999
+
+    def update(self, flag):
+        if flag:
+            self.counter = 0
+        elif self.counter < 999:
+            self.counter += 1
+        return self.counter
+
+
+class _SuperTrend:
+    """Streaming supertrend() — ratcheting bands, flip margin, min flip bars."""
+
+    __slots__ = ("atr", "multiplier", "eps", "flip_margin_atr", "min_flip_bars",
+                 "upper", "lower", "trend", "prev_close", "bars_since_flip")
+
+    def __init__(self, period=10, multiplier=3, eps=1e-6,
+                 flip_margin_atr=0.10, min_flip_bars=2):
+        self.atr = _Ewm(span=period, adjust=False)
+        self.multiplier = multiplier
+        self.eps = eps
+        self.flip_margin_atr = flip_margin_atr
+        self.min_flip_bars = min_flip_bars
+        self.upper = None
+        self.lower = None
+        self.trend = 1
+        self.prev_close = None
+        self.bars_since_flip = 0
+
+    def update(self, tr, high, low, close):
+        atr = round(self.atr.update(tr), 6)
+        hl2 = (high + low) / 2
+        upper_raw = hl2 + self.multiplier * atr
+        lower_raw = hl2 - self.multiplier * atr
+
+        if self.upper is None:
+            self.upper, self.lower, self.prev_close = upper_raw, lower_raw, close
+            return self.trend, self.upper, self.lower
+
+        prev_upper, prev_lower, prev_close = self.upper, self.lower, self.prev_close
+        eps = self.eps
+        self.upper = min(upper_raw, prev_upper) if prev_close <= prev_upper + eps else upper_raw
+        self.lower = max(lower_raw, prev_lower) if prev_close >= prev_lower - eps else lower_raw
+
+        flip_margin = atr * self.flip_margin_atr
+        bull_flip = close > prev_upper + flip_margin
+        bear_flip = close < prev_lower - flip_margin
+
+        if bull_flip and self.trend == -1 and self.bars_since_flip >= self.min_flip_bars:
+            self.trend = 1
+            self.bars_since_flip = 0
+        elif bear_flip and self.trend == 1 and self.bars_since_flip >= self.min_flip_bars:
+            self.trend = -1
+            self.bars_since_flip = 0
+        else:
+            self.bars_since_flip += 1
+
+        self.prev_close = close
+        return self.trend, self.upper, self.lower
+
+
+def _sign(x):
+    if x != x:
+        return math.nan
+    return 1.0 if x > 0 else (-1.0 if x < 0 else 0.0)
+
+
+def _clip(x, lo=None, hi=None):
+    if x != x:
+        return x
+    if lo is not None and x < lo:
+        x = lo
+    if hi is not None and x > hi:
+        x = hi
+    return x
+
+
+def _gt(a, b):
+    # NaN comparisons are False, same as the vectorised path
+    return bool(a > b)
+
+
+def signal_seeds(df, htf_scores):
+    """
+    Whole-window warm-start statistics used by generate_signal, computed
+    exactly the way the batch path computes them for this window.
+    """
+    candle_size = df['high'] - df['low']
+    volume = df['volume']
+
+    vol_baseline = seeded_ewm(volume, volume.mean(), 20)
+    vol_spike = volume / (vol_baseline + 1e-9)
+
+    vol_ratio = volume / (volume.rolling(20).mean() + 1e-9)
+    flow = volume * (df['close'] - df['open'])
+
+    return {
+        "candle_size_mean": candle_size.mean(),
+        "volume_mean":      volume.mean(),
+        "vol_spike_mean":   vol_spike.mean(),
+        "flow_var":         flow.iloc[-1000:].var(ddof=0),
+        "vol_ratio_mean":   vol_ratio.iloc[-1000:].mean(),
+        "htf_quality_mean": align_htf_scores(htf_scores, df)['HTF_QUALITY'].mean(),
+    }
+
+
+def htf_score_seeds(htf_df):
+    """
+    Whole-window warm-start statistics used by compute_htf_scores for
+    this 4H window. Pinning them makes every score row causal, so one
+    pass over a long 4H history matches scoring each prefix separately.
+    """
+    htf = supertrend(htf_df.copy(), period=20, multiplier=3,
+                     flip_margin_atr=0.15, min_flip_bars=3)
+
+    return {
+        "volume_mean":    htf['volume'].mean(),
+        "direction_mean": htf['SUPERTREND'].mean(),
+        "diff_abs_mean":  htf['close'].diff().abs().mean(),
+    }
+
+
+# Output column order of generate_signal() after the input columns.
+SIGNAL_COLUMNS = [
+    'ELAST_RATIO', 'POSITION_DIVERGENCE', 'POSITION_STRESS', 'POSITION_DIRECTION',
+    'TREND_QUALITY', 'VOL_MA', 'VOL_RATIO', 'RESISTANCE', 'SUPPORT', 'ATR',
+    'DISPLACEMENT_SCORE', 'ABSORBED_LONG', 'ABSORBED_SHORT', 'BREAK_RESISTANCE',
+    'BREAK_SUPPORT', 'ATR_FAST', 'ATR_SLOW', 'ATR_ACCEL', 'ATR_ACCEL_NORM',
+    'VOL_SHOCK', 'VOL_SHOCK_INTENSITY', 'ATR_Z', 'DECAY_SPEED', 'SUPERTREND',
+    'ST_UPPER', 'ST_LOWER', 'LTF_DIRECTION', 'VER', 'VOL_COMPRESS_TH',
+    'VOL_EXPAND_TH', 'VOL_STATE', 'ER', 'ER_COMPRESS_TH', 'ER_TREND_TH',
+    'STRUCT_STATE', 'PRESSURE', 'FLOW', 'FLOW_Z', 'FLOW_ROLL', 'ACCUMULATION',
+    'PRICE_DRIFT_NORM', 'STEALTH_ACCUM', 'STEALTH_DISTRIB', 'FLOW_STRENGTH',
+    'PARTICIPATION', 'PHASE', 'COMPOSITE_PRESSURE', 'PRESS_ELAST_DIV',
+    'PRESS_ELAST_DIV_NORM', 'REALIZED_VOL', 'RV_SLOPE', 'VOL_COMPRESS', 'MICRO_BOX',
+    'MICRO_HIGH', 'MICRO_LOW', 'MICRO_BREAK_LONG', 'MICRO_BREAK_SHORT',
+    'MICRO_BREAK_SCORE', 'STATE_SCORE', 'STATE_VELOCITY', 'STATE_ACCEL',
+    'STATE_INFLECT', 'PRESSURE_VOL', 'PRESSURE_VOL_NORM', 'STATE_STABILITY',
+    'STABILITY_DECAY', 'TRANSITION_FORCE', 'EXPANSION_BARS', 'EARLY_EXPANSION',
+    'EXPANSION_STATE', 'EXPANSION_MATURITY', 'IS_COMPRESSION', 'COMPRESSION_BARS',
+    'ATR_EXPAND', 'PRESSURE_ELEVATED_LONG', 'PRESSURE_ELEVATED_SHORT',
+    'displacement_long_ok', 'displacement_short_ok', 'close_location_bias',
+    'VALID_BREAK_LONG', 'VALID_BREAK_SHORT', 'BARS_SINCE_LONG_BREAK',
+    'BARS_SINCE_SHORT_BREAK', 'FRESHNESS_LONG', 'FRESHNESS_SHORT',
+    'COMPRESSION_SCORE', 'COMPRESSION_OK', 'TIME_ASYMM', 'TIME_ASYMM_NORM',
+    'ENTRY_PERCENTILE', 'LOCATION_LONG_OK', 'LOCATION_SHORT_OK', 'HTF_DIRECTION',
+    'HTF_QUALITY', 'HTF_QUALITY_TH', 'TRANSITION_LONG', 'TRANSITION_SHORT',
+    'TRANSITION_SIGNAL', 'MOMENTUM_CONTINUITY', 'BREAKOUT_WINDOW_LONG',
+    'BREAKOUT_WINDOW_SHORT', 'PULLBACK_LONG', 'PULLBACK_SHORT', 'BULL_CONT',
+    'BEAR_CONT', 'PBPE_PULLBACK_LONG', 'PBPE_PULLBACK_SHORT', 'PBPE_MICRO_LONG',
+    'PBPE_MICRO_SHORT', 'PBPE_DELAY_LONG', 'PBPE_DELAY_SHORT', 'ENTRY_LONG',
+    'ENTRY_SHORT', 'signal', 'final_signal',
+]
+
+_INT8_COLUMNS = ('SUPERTREND', 'LTF_DIRECTION')
+
+
+class SignalState:
+    """
+    Per-symbol streaming generate_signal().
+
+    state = SignalState(live=True, symbol="ETHUSDT")
+    state.bootstrap(df_1h, htf_df, htf_scores=scores)   # once, O(N)
+    row = state.update(ts, bar)                          # per closed 1H bar, O(1)
+    frame = state.frame                                  # same shape as generate_signal()
+
+    The HTF compression gate inside generate_signal() only feeds the
+    local HTF_OK flag, which no output column reads, so it is not
+    tracked here.
+    """
+
+    def __init__(self, live=False, symbol="?", max_rows=None):
+        self.live = live
+        self.symbol = symbol
+        self.max_rows = max_rows
+        self.seeds = None
+        self.htf_scores = None
+        self.last_ts = None
+        self.bars_since_bootstrap = 0
+        self._rows = deque()
+        self._index = deque()
+        self._input_columns = None
+        self._frame = None
+        self._last_clean = None
+
+    # ------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------
+    def bootstrap(self, df, htf_df=None, htf_scores=None, seeds=None):
+        """Reset and stream the whole of `df` through the engine."""
+        if htf_scores is None:
+            htf_scores = compute_htf_scores(htf_df)
+        self.htf_scores = htf_scores
+        self.seeds = dict(seeds) if seeds is not None else signal_seeds(df, htf_scores)
+        self._reset()
+        self._input_columns = list(df.columns)
+
+        for ts, bar in zip(df.index, df.to_dict("records")):
+            self._append(ts, bar)
+
+        self.bars_since_bootstrap = 0
+        return self.frame
+
+    def update(self, ts, bar, htf_scores=None):
+        """Advance by one closed 1H bar and return its (sanitized) row."""
+        if self.seeds is None:
+            raise RuntimeError("SignalState.update() called before bootstrap()")
+        ts = pd.Timestamp(ts)
+        if self.last_ts is not None and ts <= self.last_ts:
+            raise ValueError(f"[{self.symbol}] bar {ts} is not after last bar {self.last_ts}")
+        if htf_scores is not None:
+            self.htf_scores = htf_scores
+            self._set_htf(htf_scores)
+        row = self._append(ts, dict(bar))
+        self.bars_since_bootstrap += 1
+        return pd.Series(row, name=ts)
+
+    def extend(self, df, htf_scores=None):
+        """
+        Feed every bar of `df` newer than the last processed one.
+        Returns the frame, or None when `df` no longer agrees with the
+        bars already consumed (revised candle, gap, different window) —
+        the caller should bootstrap() again in that case.
+        """
+        if self.last_ts is None or self.last_ts not in df.index:
+            return None
+        seen = df.loc[self.last_ts, ["open", "high", "low", "close", "volume"]]
+        last = self._last_clean
+        if any(abs(float(seen[c]) - float(last[c])) > 1e-12 for c in seen.index):
+            return None
+
+        new = df[df.index > self.last_ts]
+        if htf_scores is not None:
+            self.htf_scores = htf_scores
+            self._set_htf(htf_scores)
+        for ts, bar in zip(new.index, new.to_dict("records")):
+            self._append(ts, bar)
+            self.bars_since_bootstrap += 1
+        return self.frame
+
+    @property
+    def frame(self):
+        # Only the rows appended since the last read are turned into a
+        # DataFrame; they are concatenated onto the cached frame, which
+        # is then trimmed to max_rows.
+        if self._rows:
+            new = pd.DataFrame(list(self._rows), index=pd.DatetimeIndex(list(self._index)))
+            for col in _INT8_COLUMNS:
+                if col in new.columns:
+                    new[col] = new[col].astype(np.int8)
+            frame = new if self._frame is None else pd.concat([self._frame, new])
+            if self.max_rows is not None and len(frame) > self.max_rows:
+                frame = frame.iloc[-self.max_rows:]
+            self._frame = frame
+            self._rows.clear()
+            self._index.clear()
+        return self._frame
+
+    # ------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------
+    def _set_htf(self, htf_scores):
+        close_times = htf_scores.index + pd.Timedelta(hours=4)
+        self._htf_close_ns = close_times.as_unit("ns").asi8
+        self._htf_dir = htf_scores['HTF_DIRECTION'].to_numpy(dtype=float)
+        self._htf_quality = htf_scores['HTF_QUALITY'].to_numpy(dtype=float)
+
+    def _htf_at(self, ts):
+        pos = np.searchsorted(self._htf_close_ns, pd.Timestamp(ts).as_unit("ns").value, side="right") - 1
+        if pos < 0:
+            return 0.0, 0.0
+        d, q = self._htf_dir[pos], self._htf_quality[pos]
+        return (0.0 if d != d else float(d)), (0.0 if q != q else float(q))
+
+    def _reset(self):
+        s = self.seeds
+        self._rows.clear()
+        self._index.clear()
+        self._frame = None
+        self._last_clean = None
+        self.last_ts = None
+        self._set_htf(self.htf_scores)
+
+        # positioning_pressure
+        self.e_flow_200 = _Ewm(span=200, adjust=False)   # flow baseline (kept for parity, unused downstream)
+        self.e_flow_fast = _Ewm(span=10, adjust=False)
+        self.e_flow_slow = _Ewm(span=50, adjust=False)
+        self.e_price_fast = _Ewm(span=10, adjust=False)
+        self.e_price_slow = _Ewm(span=50, adjust=False)
+        self.e_pos_div = _Ewm(span=5, adjust=False)
+        self.e_pos_stress = _Ewm(span=3, adjust=False)
+        self.z_flow_imb = _ZScore()
+        self.z_pos_dir = _ZScore()
+
+        # volume_confirmation / support_resistance
+        self.w_vol20 = _Window(20)
+        self.w_high20 = _Window(20)
+        self.w_low20 = _Window(20)
+
+        # liquidity_displacement (seeded EWMs)
+        self.e_candle = _Ewm(span=20, adjust=True)
+        self.e_candle.update(s["candle_size_mean"])
+        self.e_volb = _Ewm(span=20, adjust=True)
+        self.e_volb.update(s["volume_mean"])
+        self.e_vspike = _Ewm(span=500, adjust=True)
+        self.e_vspike.update(s["vol_spike_mean"])
+        self.w_accel2 = _Window(2)
+        self.w_vspike3 = _Window(3)
+        self.e_disp = _Ewm(span=2, adjust=False)
+
+        # ATR / atr_acceleration / volatility_shock
+        self.e_atr14 = _Ewm(span=14, adjust=False)
+        self.e_atr50 = _Ewm(span=50, adjust=False)
+        self.e_atr_fast = _Ewm(span=5, adjust=True)
+        self.e_atr_slow = _Ewm(span=20, adjust=True)
+        self.z_atr_accel = _ZScore()
+        self.w_atr20 = _Window(20)
+        self.z_atr = _ZScore()
+
+        # supertrend(10, 3)
+        self.st = _SuperTrend(period=10, multiplier=3)
+
+        # volatility_expansion / volatility_state / trend_efficiency_state
+        self.e_ver = _Ewm(span=3, adjust=True)
+        self.e_ver_base = _Ewm(span=1000, adjust=False)
+        self.w_close21 = _Window(21)
+        self.w_absdiff20 = _Window(20)
+        self.e_er_base = _Ewm(span=800, adjust=False)
+
+        # participation_state
+        self.z_flow = _ZScore(alpha=0.05, min_periods=20, adaptive=False,
+                              seed_mean=0.0, seed_var=s["flow_var"])
+        self.e_flow_roll = _Ewm(span=20, adjust=False)
+        self.e_accum = _Ewm(span=10, adjust=False)
+        self.w_close11 = _Window(11)
+        self.es_ret50 = _EwmStd(span=50, adjust=False)
+
+        # pressure_elasticity_divergence
+        self.w_ret50 = _Window(50)
+        self.w_ped5 = _Window(5)
+        self.z_ped = _ZScore()
+
+        # vol_compression_slope
+        self.e_rv = _Ewm(alpha=0.2, adjust=False)
+        self.w_rv_slope50 = _Window(50)
+
+        # micro_consolidation
+        self.w_high12 = _Window(12)
+        self.w_low12 = _Window(12)
+        self.z_width = _ZScore()
+
+        # dynamic_state_engine
+        self.es_cp = _EwmStd(alpha=0.2, adjust=False)
+        self.z_pv = _ZScore()
+        self.w_state10 = _Window(10)
+        self.z_stab = _ZScore()
+
+        # validated_breakouts / expansion_maturity / compression_detector
+        self.sk_expansion = _Streak()
+        self.sk_compression = _Streak()
+        self.z_press = _ZScore()
+        self.w_press20 = _Window(20)
+        self.e_vr_base = _Ewm(span=500, adjust=True)      # volume_confirmed (unused downstream)
+        self.e_vr_base.update(s["vol_ratio_mean"])
+        self.w_high10 = _Window(10)
+        self.w_low10 = _Window(10)
+        self.w_cloc10 = _Window(10)
+        self.bs_long = _BarsSince()
+        self.bs_short = _BarsSince()
+
+        # compression_context / temporal_phase_asymmetry
+        self.w_vc7 = _Window(7)
+        self.bs_compression = _BarsSince()
+        self.w_atrx6 = _Window(6)
+        self.w_vc20 = _Window(20)
+        self.w_atrx5 = _Window(5)
+        self.z_tasym = _ZScore()
+
+        # entry_location_filter uses w_high20 / w_low20
+
+        # HTF quality threshold (seeded)
+        self.e_hq = _Ewm(span=200, adjust=True)
+        self.e_hq.update(s["htf_quality_mean"])
+
+        # momentum_continuity / post_breakout_entry
+        self.w_persist20 = _Window(20)
+        self.w_vbl6 = _Window(6)
+        self.w_vbs6 = _Window(6)
+        self.w_high5 = _Window(5)
+        self.w_low5 = _Window(5)
+
+        # one/two-bar lags
+        self.p = None
+
+    def _append(self, ts, bar):
+        raw = self._step(ts, bar)
+        clean = {}
+        last = self._last_clean
+        for k, v in raw.items():
+            if isinstance(v, float) and (v != v or v in (math.inf, -math.inf)):
+                v = last[k] if last is not None and k in last else 0.0
+            clean[k] = v
+        self._last_clean = clean
+        self._rows.append(clean)
+        self._index.append(ts)
+        if self.max_rows is not None and len(self._rows) > self.max_rows:
+            # the pending rows alone fill the window; the cached frame
+            # has nothing left to contribute
+            self._rows.popleft()
+            self._index.popleft()
+            self._frame = None
+        self.last_ts = ts
+        return clean
+
+    def _step(self, ts, bar):
+        o = float(bar['open'])
+        h = float(bar['high'])
+        l = float(bar['low'])
+        c = float(bar['close'])
+        v = float(bar['volume'])
+        p = self.p
+        first = p is None
+        nan = math.nan
+        r = dict(bar)
+
+        # ── positioning_pressure ─────────────────────────────
+        price_move = nan if first else c - p['close']
+        dollar_flow = v * (c - o)
+        self.e_flow_200.update(dollar_flow)
+        ff = self.e_flow_fast.update(dollar_flow)
+        fs = self.e_flow_slow.update(dollar_flow)
+        pf = self.e_price_fast.update(price_move)
+        ps = self.e_price_slow.update(price_move)
+        elast_fast = pf / (abs(ff) + 1e-9)
+        elast_slow = ps / (abs(fs) + 1e-9)
+        r['ELAST_RATIO'] = elast_fast / (abs(elast_slow) + 1e-9)
+        divergent = float(not (_sign(ff) == _sign(pf)))
+        r['POSITION_DIVERGENCE'] = self.e_pos_div.update(divergent)
+        flow_imbalance_norm = _clip(self.z_flow_imb.update(abs(ff - fs)), 0, 3) / 3
+        elast_collapse = 1 - _clip(r['ELAST_RATIO'], 0, 1)
+        r['POSITION_STRESS'] = self.e_pos_stress.update(
+            0.5 * flow_imbalance_norm + 0.3 * elast_collapse + 0.2 * r['POSITION_DIVERGENCE']
+        )
+        r['POSITION_DIRECTION'] = _sign(ff) * r['POSITION_STRESS']
+        r['TREND_QUALITY'] = _clip(self.z_pos_dir.update(r['POSITION_DIRECTION']), -2, 2) / 2
+
+        # ── volume_confirmation / support_resistance ─────────
+        r['VOL_MA'] = self.w_vol20.push(v).mean()
+        r['VOL_RATIO'] = v / (r['VOL_MA'] + 1e-9)
+        r['RESISTANCE'] = self.w_high20.push(h).max()
+        r['SUPPORT'] = self.w_low20.push(l).min()
+
+        # ── ATR (atr_ema, period=14) ─────────────────────────
+        tr = h - l if first else max(h - l, abs(h - p['close']), abs(l - p['close']))
+        atr = self.e_atr14.update(tr)
+        r['ATR'] = atr
+
+        # ── liquidity_displacement ───────────────────────────
+        resistance = nan if first else p['RESISTANCE']
+        support = nan if first else p['SUPPORT']
+        cleared_resistance = _gt(c, resistance + 0.5 * atr)
+        cleared_support = _gt(support - 0.5 * atr, c)
+
+        candle_size = h - l
+        candle_accel = candle_size / (self.e_candle.update(candle_size) + 1e-9)
+        accel_window = self.w_accel2.push(candle_accel).max()
+        acceleration_ok = _gt(accel_window, 1.4)
+
+        vol_spike = v / (self.e_volb.update(v) + 1e-9)
+        vol_spike_baseline = self.e_vspike.update(vol_spike)
+        vol_window = self.w_vspike3.push(vol_spike).max()
+        vol_displaced = _gt(vol_window, vol_spike_baseline * 1.1)
+
+        accel_norm = _clip(accel_window - 1, 0, 3) / 3
+        vol_norm = _clip(vol_window - 1, 0, 3) / 3
+        r['DISPLACEMENT_SCORE'] = self.e_disp.update(0.5 * accel_norm + 0.5 * vol_norm)
+        r['ABSORBED_LONG'] = cleared_resistance and not acceleration_ok and not vol_displaced
+        r['ABSORBED_SHORT'] = cleared_support and not acceleration_ok and not vol_displaced
+        r['BREAK_RESISTANCE'] = cleared_resistance and (acceleration_ok or vol_displaced)
+        r['BREAK_SUPPORT'] = cleared_support and (acceleration_ok or vol_displaced)
+
+        # ── atr_acceleration ─────────────────────────────────
+        r['ATR_ACCEL'] = self.e_atr_fast.update(atr) - self.e_atr_slow.update(atr)
+        r['ATR_ACCEL_NORM'] = _clip(self.z_atr_accel.update(r['ATR_ACCEL']), -3, 3) / 3
+
+        # ── volatility_shock ─────────────────────────────────
+        shock_ratio = atr / (self.w_atr20.push(atr).mean() + 1e-9)
+        r['VOL_SHOCK'] = int(_gt(shock_ratio, 1.8))
+        r['VOL_SHOCK_INTENSITY'] = _clip(shock_ratio - 1, 0, 3)
+        r['ATR_Z'] = _clip(self.z_atr.update(atr), -2, 2)
+        r['DECAY_SPEED'] = float(np.exp(r['ATR_Z'] * 0.35))
+
+        # ── supertrend(10, 3) ────────────────────────────────
+        trend, st_upper, st_lower = self.st.update(tr, h, l, c)
+        r['SUPERTREND'] = trend
+        r['ST_UPPER'] = st_upper
+        r['ST_LOWER'] = st_lower
+        r['LTF_DIRECTION'] = trend
+
+        # ── volatility_expansion / volatility_state ──────────
+        r['ATR_FAST'] = atr
+        r['ATR_SLOW'] = self.e_atr50.update(tr)
+        r['VER'] = self.e_ver.update(atr / (r['ATR_SLOW'] + 1e-9))
+        ver_baseline = self.e_ver_base.update(r['VER'])
+        r['VOL_COMPRESS_TH'] = ver_baseline * 0.90
+        r['VOL_EXPAND_TH'] = ver_baseline * 1.10
+        r['VOL_STATE'] = (
+            -1 if r['VER'] < r['VOL_COMPRESS_TH'] else
+            (1 if r['VER'] > r['VOL_EXPAND_TH'] else 0)
+        )
+
+        # ── trend_efficiency_state ───────────────────────────
+        self.w_close21.push(c)
+        direction = abs(c - self.w_close21.buf[0]) if self.w_close21.ready else nan
+        volatility = self.w_absdiff20.push(nan if first else abs(c - p['close'])).sum()
+        r['ER'] = _clip(direction / (volatility + 1e-9), 0, 1)
+        er_baseline = self.e_er_base.update(r['ER'])
+        r['ER_COMPRESS_TH'] = er_baseline - 0.10
+        r['ER_TREND_TH'] = er_baseline + 0.12
+        r['STRUCT_STATE'] = (
+            -1 if r['ER'] < r['ER_COMPRESS_TH'] else
+            (1 if r['ER'] > r['ER_TREND_TH'] else 0)
+        )
+
+        # ── pressure_state ───────────────────────────────────
+        r['PRESSURE'] = (c - l) / (h - l + 1e-9) - 0.5
+
+        # ── participation_state ──────────────────────────────
+        r['FLOW'] = dollar_flow
+        r['FLOW_Z'] = self.z_flow.update(dollar_flow)
+        r['FLOW_ROLL'] = self.e_flow_roll.update(r['FLOW_Z'])
+        r['ACCUMULATION'] = self.e_accum.update(r['FLOW_Z']) * 10
+        self.w_close11.push(c)
+        price_drift = c / self.w_close11.buf[0] - 1 if self.w_close11.ready else nan
+        ret = nan if first else c / p['close'] - 1
+        vol = self.es_ret50.update(ret)
+        r['PRICE_DRIFT_NORM'] = price_drift / (vol + 1e-9)
+        r['STEALTH_ACCUM'] = _gt(r['ACCUMULATION'], 1.5) and _gt(0.5, abs(r['PRICE_DRIFT_NORM']))
+        r['STEALTH_DISTRIB'] = _gt(-1.5, r['ACCUMULATION']) and _gt(0.5, abs(r['PRICE_DRIFT_NORM']))
+        flow_strength = r['FLOW_ROLL']
+        if r['STEALTH_ACCUM']:
+            flow_strength += 0.5
+        if r['STEALTH_DISTRIB']:
+            flow_strength -= 0.5
+        r['FLOW_STRENGTH'] = flow_strength
+        r['PARTICIPATION'] = 1 if flow_strength > 0.5 else (-1 if flow_strength < -0.5 else 0)
+
+        # ── classify_phase ───────────────────────────────────
+        phase = 0
+        if (r['VOL_STATE'] == -1 and r['STRUCT_STATE'] == -1
+                and (r['PARTICIPATION'] == 1 or r['STEALTH_ACCUM'])):
+            phase = 1
+        if r['VOL_STATE'] == 1 and r['STRUCT_STATE'] == 1 and r['PARTICIPATION'] == 1:
+            phase = 2
+        if r['VOL_STATE'] == 1 and r['PARTICIPATION'] == -1:
+            phase = 3
+        r['PHASE'] = phase
+
+        # ── composite_pressure ───────────────────────────────
+        cp = r['PRESSURE'] * (r['VOL_RATIO'] - 1.0)
+        r['COMPOSITE_PRESSURE'] = cp
+
+        # ── pressure_elasticity_divergence ───────────────────
+        response = ret / (self.w_ret50.push(ret).std() + 1e-9)
+        pressure_change = nan if first else cp - p['COMPOSITE_PRESSURE']
+        elasticity = response / (abs(cp) + 1e-9)
+        elasticity_change = nan if first else elasticity - p['_elasticity']
+        r['PRESS_ELAST_DIV'] = self.w_ped5.push(pressure_change - elasticity_change).mean()
+        r['PRESS_ELAST_DIV_NORM'] = _clip(self.z_ped.update(r['PRESS_ELAST_DIV']), -3, 3)
+
+        # ── vol_compression_slope ────────────────────────────
+        log_c = float(np.log(c))
+        log_ret = nan if first else log_c - p['_log_close']
+        r['REALIZED_VOL'] = float(np.power(self.e_rv.update(log_ret * log_ret), 0.5))
+        r['RV_SLOPE'] = nan if first else r['REALIZED_VOL'] - p['REALIZED_VOL']
+        r['VOL_COMPRESS'] = _gt(0, self.w_rv_slope50.push(r['RV_SLOPE']).mean())
+
+        # ── micro_consolidation ──────────────────────────────
+        local_high = self.w_high12.push(h).max()
+        local_low = self.w_low12.push(l).min()
+        width = local_high - local_low
+        r['MICRO_BOX'] = _gt(0.6, width / (atr + 1e-9))
+        r['MICRO_HIGH'] = nan if first else p['_local_high']
+        r['MICRO_LOW'] = nan if first else p['_local_low']
+        r['MICRO_BREAK_LONG'] = _gt(c, r['MICRO_HIGH'])
+        r['MICRO_BREAK_SHORT'] = _gt(r['MICRO_LOW'], c)
+        expansion_strength = _clip(self.z_width.update(width), 0, 2)
+        r['MICRO_BREAK_SCORE'] = (
+            expansion_strength if r['MICRO_BREAK_LONG'] else
+            (-expansion_strength if r['MICRO_BREAK_SHORT'] else 0.0)
+        )
+
+        # ── dynamic_state_engine ─────────────────────────────
+        state_score = _clip(
+            0.25 * r['VOL_STATE'] + 0.25 * r['STRUCT_STATE']
+            + 0.25 * r['PARTICIPATION'] + 0.25 * _sign(cp), -1, 1
+        )
+        r['STATE_SCORE'] = state_score
+        r['STATE_VELOCITY'] = nan if first else state_score - p['STATE_SCORE']
+        r['STATE_ACCEL'] = nan if first else r['STATE_VELOCITY'] - p['STATE_VELOCITY']
+        prev_vel_sign = nan if first else _sign(p['STATE_VELOCITY'])
+        r['STATE_INFLECT'] = not (_sign(r['STATE_VELOCITY']) == prev_vel_sign)
+        r['PRESSURE_VOL'] = self.es_cp.update(cp)
+        r['PRESSURE_VOL_NORM'] = _clip(self.z_pv.update(r['PRESSURE_VOL']), 0, 3) / 3
+        state_vol = self.w_state10.push(state_score).std()
+        stability = _clip(self.z_stab.update(1 / (state_vol + 1e-9)), -2, 2)
+        stability = (stability + 2) / 4
+        stability *= (1 - 0.5 * r['PRESSURE_VOL_NORM'])
+        r['STATE_STABILITY'] = stability
+        r['STABILITY_DECAY'] = nan if first else stability - p['STATE_STABILITY']
+        transition_force = (
+            abs(r['STATE_VELOCITY']) + abs(r['STATE_ACCEL']) + abs(r['STABILITY_DECAY'])
+        )
+        transition_force *= (1 - 0.5 * r['PRESSURE_VOL_NORM'])
+        transition_force += 0.5 * r['VOL_SHOCK_INTENSITY']
+        r['TRANSITION_FORCE'] = transition_force
+
+        # ── expansion_maturity ───────────────────────────────
+        r['EXPANSION_BARS'] = self.sk_expansion.update(r['VER'] > r['VOL_EXPAND_TH'])
+        # batch reads `(EXPANSION_BARS <= 8) & flow_confirming` — the OR
+        # branch there is commented out, so both legs are required
+        r['EARLY_EXPANSION'] = r['EXPANSION_BARS'] <= 8 and _gt(abs(flow_strength), 0.45)
+        r['EXPANSION_STATE'] = _clip(r['EXPANSION_BARS'] / 8, 0, 1)
+        r['EXPANSION_MATURITY'] = r['EXPANSION_STATE']
+
+        # ── compression_detector ─────────────────────────────
+        r['IS_COMPRESSION'] = _gt(0.95, r['VER']) and _gt(0.45, r['ER'])
+        r['COMPRESSION_BARS'] = self.sk_compression.update(r['IS_COMPRESSION'])
+
+        # ── validated_breakouts ──────────────────────────────
+        r['ATR_EXPAND'] = _gt(atr, self.w_atr20.mean() * 1.2)
+        pressure_z = self.z_press.update(cp)
+        self.w_press20.push(pressure_z)
+        recent_avg = self.w_press20.mean()
+        recent_std = self.w_press20.std()
+        r['PRESSURE_ELEVATED_LONG'] = _gt(pressure_z, recent_avg + recent_std)
+        r['PRESSURE_ELEVATED_SHORT'] = _gt(recent_avg - recent_std, pressure_z)
+        self.e_vr_base.update(r['VOL_RATIO'])
+        displacement_long_ok = r['BREAK_RESISTANCE'] and _gt(r['DISPLACEMENT_SCORE'], 0.5)
+        displacement_short_ok = r['BREAK_SUPPORT'] and _gt(r['DISPLACEMENT_SCORE'], 0.5)
+        r['displacement_long_ok'] = displacement_long_ok
+        r['displacement_short_ok'] = displacement_short_ok
+        comp_high = self.w_high10.push(h).max()
+        comp_low = self.w_low10.push(l).min()
+        close_location = (c - comp_low) / (comp_high - comp_low + 1e-9)
+        close_location_bias = self.w_cloc10.push(close_location).mean()
+        r['close_location_bias'] = close_location_bias
+        r['VALID_BREAK_LONG'] = (
+            r['EARLY_EXPANSION'] and displacement_long_ok and _gt(close_location_bias, 0.5)
+        )
+        r['VALID_BREAK_SHORT'] = (
+            r['EARLY_EXPANSION'] and displacement_short_ok and _gt(0.5, close_location_bias)
+        )
+        r['BARS_SINCE_LONG_BREAK'] = self.bs_long.update(r['VALID_BREAK_LONG'])
+        r['BARS_SINCE_SHORT_BREAK'] = self.bs_short.update(r['VALID_BREAK_SHORT'])
+
+        # ── entry_freshness ──────────────────────────────────
+        r['FRESHNESS_LONG'] = float(np.exp(-r['BARS_SINCE_LONG_BREAK'] / (3 * r['DECAY_SPEED'])))
+        r['FRESHNESS_SHORT'] = float(np.exp(-r['BARS_SINCE_SHORT_BREAK'] / (3 * r['DECAY_SPEED'])))
+
+        # ── compression_context ──────────────────────────────
+        recent_compression = self.w_vc7.push(float(r['VOL_COMPRESS'])).max()
+        freshness = 1 - _clip(self.bs_compression.update(r['VOL_COMPRESS']) / 6, 0, 1)
+        expansion_decay = self.w_atrx6.push(float(r['ATR_EXPAND'])).sum() / 6
+        expansion_ok = float(_gt(0.6, expansion_decay))
+        fl, fs_ = r['FRESHNESS_LONG'], r['FRESHNESS_SHORT']
+        fresh_max = fs_ if fl != fl else (fl if fs_ != fs_ else max(fl, fs_))
+        compression_score = (0.5 * recent_compression + 0.5 * freshness) * expansion_ok
+        compression_score *= fresh_max
+        r['COMPRESSION_SCORE'] = compression_score
+        r['COMPRESSION_OK'] = _gt(compression_score, 0.50)
+
+        # ── temporal_phase_asymmetry ─────────────────────────
+        compression_time = self.w_vc20.push(float(r['VOL_COMPRESS'])).sum()
+        expansion_time = self.w_atrx5.push(float(r['ATR_EXPAND'])).sum()
+        r['TIME_ASYMM'] = expansion_time / (compression_time + 1e-9)
+        r['TIME_ASYMM_NORM'] = _clip(self.z_tasym.update(r['TIME_ASYMM']), 0, 5)
+
+        # ── entry_location_filter ────────────────────────────
+        rolling_range = r['RESISTANCE'] - r['SUPPORT']
+        r['ENTRY_PERCENTILE'] = (c - r['SUPPORT']) / (rolling_range + 1e-9)
+        r['LOCATION_LONG_OK'] = _gt(0.70, r['ENTRY_PERCENTILE'])
+        r['LOCATION_SHORT_OK'] = _gt(r['ENTRY_PERCENTILE'], 0.30)
+
+        # ── HTF stack + quality threshold ────────────────────
+        htf_direction, htf_quality = self._htf_at(ts)
+        r['HTF_DIRECTION'] = htf_direction
+        r['HTF_QUALITY'] = htf_quality
+        r['HTF_QUALITY_TH'] = _clip(self.e_hq.update(htf_quality) * 1.05, 0.30)
+
+        # ── transition_detector ──────────────────────────────
+        r['TRANSITION_LONG'] = r['VOL_COMPRESS']
+        r['TRANSITION_SHORT'] = r['VOL_COMPRESS']
+        r['TRANSITION_SIGNAL'] = -1 if r['VOL_COMPRESS'] else 0
+
+        # ── momentum_continuity ──────────────────────────────
+        mc_ret = ret if (ret == ret and abs(ret) >= 0.001) else 0.0
+        sign_ret = _sign(mc_ret)
+        persistence = float(not first and sign_ret * p['_sign_ret'] > 0)
+        r['MOMENTUM_CONTINUITY'] = self.w_persist20.push(persistence).mean()
+
+        # ── post_breakout_entry ──────────────────────────────
+        # window over VALID_BREAK.shift(1) — bar 0 contributes a NaN
+        self.w_vbl6.push(nan if first else float(p['VALID_BREAK_LONG']))
+        self.w_vbs6.push(nan if first else float(p['VALID_BREAK_SHORT']))
+        bwl = self.w_vbl6.max()
+        bws = self.w_vbs6.max()
+        r['BREAKOUT_WINDOW_LONG'] = bool(bwl == bwl and bwl != 0)
+        r['BREAKOUT_WINDOW_SHORT'] = bool(bws == bws and bws != 0)
+        recent_high = self.w_high5.push(h).max()
+        recent_low = self.w_low5.push(l).min()
+        r['PULLBACK_LONG'] = (recent_high - l) / (atr + 1e-9)
+        r['PULLBACK_SHORT'] = (h - recent_low) / (atr + 1e-9)
+        r['BULL_CONT'] = c > o and not first and c > p['high']
+        r['BEAR_CONT'] = c < o and not first and c < p['low']
+        r['PBPE_PULLBACK_LONG'] = r['BREAKOUT_WINDOW_LONG']
+        r['PBPE_PULLBACK_SHORT'] = r['BREAKOUT_WINDOW_SHORT']
+        r['PBPE_MICRO_LONG'] = r['BREAKOUT_WINDOW_LONG'] and r['MICRO_BREAK_LONG']
+        r['PBPE_MICRO_SHORT'] = r['BREAKOUT_WINDOW_SHORT'] and r['MICRO_BREAK_SHORT']
+        strong_momentum = _gt(r['MOMENTUM_CONTINUITY'], 0.6)
+        vbl_2 = p is not None and p['_prev_vbl']
+        vbs_2 = p is not None and p['_prev_vbs']
+        r['PBPE_DELAY_LONG'] = bool(vbl_2) and strong_momentum and not first and c > p['close']
+        r['PBPE_DELAY_SHORT'] = bool(vbs_2) and strong_momentum and not first and c < p['close']
+        r['ENTRY_LONG'] = r['COMPRESSION_OK']
+        r['ENTRY_SHORT'] = r['COMPRESSION_OK']
+
+        # ── signal / final_signal ────────────────────────────
+        signal = 0
+        if r['VALID_BREAK_LONG']:
+            signal = 1
+        if r['VALID_BREAK_SHORT']:
+            signal = -1
+        r['signal'] = signal
+        if self.live:
+            r['final_signal'] = signal
+        else:
+            r['final_signal'] = 0 if first else p['signal']
+
+        # carry private lags forward — never exposed in the row
+        self.p = {
+            'close': c, 'high': h, 'low': l,
+            'RESISTANCE': r['RESISTANCE'], 'SUPPORT': r['SUPPORT'],
+            'COMPOSITE_PRESSURE': cp, '_elasticity': elasticity,
+            '_log_close': log_c, 'REALIZED_VOL': r['REALIZED_VOL'],
+            '_local_high': local_high, '_local_low': local_low,
+            'STATE_SCORE': state_score, 'STATE_VELOCITY': r['STATE_VELOCITY'],
+            'STATE_STABILITY': stability, '_sign_ret': sign_ret,
+            'VALID_BREAK_LONG': r['VALID_BREAK_LONG'],
+            'VALID_BREAK_SHORT': r['VALID_BREAK_SHORT'],
+            '_prev_vbl': None if first else p['VALID_BREAK_LONG'],
+            '_prev_vbs': None if first else p['VALID_BREAK_SHORT'],
+            'signal': signal,
+        }
+
+        return {k: r[k] for k in self._columns(bar)}
+
+    def _columns(self, bar):
+        if self._input_columns is None:
+            self._input_columns = list(bar.keys())
+        return self._input_columns + [c for c in SIGNAL_COLUMNS if c not in self._input_columns]
@@ -37,7 +37,12 @@ def fetch_binance(symbol, interval, limit):
                 if end_time:
                     params["endTime"] = end_time
 
+                # backtest backfill shares the live bot's weight budget and yields to it
+                rate_limiter.check(weight=rate_limiter.klines_weight(params["limit"]), priority=PRIORITY_BACKFILL)
                 response = requests.get(BINANCE_URL, params=params, timeout=10)
+                used_weight = response.headers.get("X-MBX-USED-WEIGHT-1M", "0")
+                if used_weight.isdigit():
+                    rate_limiter.on_response(int(used_weight))
                 response.raise_for_status()
                 data = response.json()
 
@@ -158,21 +163,29 @@ HTF_LIMIT = 31   # ~120 days of 4h candles
 now_utc = pd.Timestamp.now(tz="UTC")
 
 import os
+from data_pipeline.candle_store import CandleStore
+from data_pipeline.revalidation import RevalidationPlanner
+from data_pipeline.rate_limiter import rate_limiter, PRIORITY_BACKFILL
 
 CACHE_DIR = "data/backtest_cache"
 os.makedirs(CACHE_DIR, exist_ok=True)
+candle_store = CandleStore(CACHE_DIR)
+revalidation_planners = {
+    tf: RevalidationPlanner(CACHE_DIR, horizon=pd.Timedelta(hours=hours), min_age=pd.Timedelta(minutes=30))
+    for tf, hours in {"5m": 3, "1h": 3, "4h": 6}.items()
+}
 
 def load_or_fetch(symbol, interval, limit, now_utc):
-    path = os.path.join(CACHE_DIR, f"{symbol}_{interval}.parquet")
     sentinel_path = os.path.join(CACHE_DIR, f"{symbol}_{interval}.oldest")  # ← new
 
     INTERVAL_SECONDS = {"5m": 300, "1h": 3600, "4h": 14400}
     interval_td = pd.Timedelta(seconds=INTERVAL_SECONDS.get(interval, 3600))
 
-    if os.path.exists(path):
-        cached = pd.read_parquet(path)
-        cached.index = pd.to_datetime(cached.index, utc=True)
-        cached = cached.sort_index()
+    # memory-mapped view of the whole cache — nothing is read into RAM
+    # until touched, and every fetch below goes into the store as an
+    # append that rewrites only the segments it lands in
+    cached = candle_store.mmap(symbol, interval)
+    if cached is not None:
 
         required_start = now_utc - limit * interval_td
         cache_start    = cached.index[0]
@@ -187,9 +200,8 @@ def load_or_fetch(symbol, interval, limit, now_utc):
             print(f"[CACHE] {symbol} {interval} — backward fetch returned {len(old_data)} bars")
 
             if not old_data.empty:
-                cached = pd.concat([old_data, cached])
-                cached = cached[~cached.index.duplicated(keep="last")]
-                cached = cached.sort_index()
+                candle_store.append(symbol, interval, old_data[old_data.index < cache_start])
+                cached = candle_store.mmap(symbol, interval)
                 print(f"[CACHE] {symbol} {interval} — extended backward, now {len(cached)} bars")
             else:
                 # Got nothing — we've hit the listing wall, record it
@@ -220,9 +232,8 @@ def load_or_fetch(symbol, interval, limit, now_utc):
             new_data = fetch_binance_range(symbol, interval, fetch_start, fetch_end)
             print(f"[CACHE] {symbol} {interval} — forward fetch returned {len(new_data)} bars")
             if not new_data.empty:
-                cached = pd.concat([cached, new_data])
-                cached = cached[~cached.index.duplicated(keep="last")]
-                cached = cached.sort_index()
+                candle_store.append(symbol, interval, new_data)
+                cached = candle_store.mmap(symbol, interval)
         else:
             print(f"[CACHE] {symbol} {interval} — cache current at {last_ts}")
 
@@ -235,15 +246,22 @@ def load_or_fetch(symbol, interval, limit, now_utc):
         # reason. Without this, the backtest cache and live cache
         # (data/cache) diverge on any bar that settled after the first
         # narrower revalidation pass touched it.
+        # Only bars in the window that have not settled yet (see
+        # data_pipeline/revalidation.py) are refetched — a rerun shortly
+        # after the last one usually fetches nothing.
         REVALIDATE_WINDOW_HOURS = {"5m": 3, "1h": 3, "4h": 6}.get(interval, 3)
-        revalidate_end   = last_ts
-        revalidate_start = revalidate_end - pd.Timedelta(hours=REVALIDATE_WINDOW_HOURS)
-
-        # Never revalidate further back than the cache actually starts
-        revalidate_start = max(revalidate_start, cached.index[0])
-
-        revalidated = fetch_binance_range(symbol, interval, revalidate_start, revalidate_end)
+        planner = revalidation_planners[interval]
+        _, windows = planner.plan(symbol, interval, cached, now_utc, blind_pages=1)
+
+        # a one-bar window needs the bar before it as the range start
+        fresh = [
+            fetch_binance_range(symbol, interval, start if start < end else start - interval_td, end)
+            for start, end in windows
+        ]
+        fresh = [f for f in fresh if not f.empty]
+        revalidated = pd.concat(fresh) if fresh else pd.DataFrame()
         if not revalidated.empty:
+            planner.observe(symbol, interval, revalidated, now_utc)
             before = cached.loc[cached.index.isin(revalidated.index)]
             changed_count = 0
             for ts in revalidated.index:
@@ -257,23 +275,23 @@ def load_or_fetch(symbol, interval, limit, now_utc):
                         print(f"[REVALIDATE] {symbol} {interval} {ts} close corrected {old_close} → {new_close}, volume {old_vol} → {new_vol}")
             if changed_count:
                 print(f"[REVALIDATE] {symbol} {interval} — {changed_count} bar(s) corrected in trailing {REVALIDATE_WINDOW_HOURS}h window")
-            cached = pd.concat([cached, revalidated])
-            cached = cached[~cached.index.duplicated(keep="last")]
-            cached = cached.sort_index()
+            # unchanged segments are left alone by append()
+            candle_store.append(symbol, interval, revalidated)
+            cached = candle_store.mmap(symbol, interval)
 
-        # ── STEP 3: save the FULL cache (never trim to limit) ──
+        # ── STEP 3: the FULL cache is kept (never trim to limit) ──
         # Trimming to limit is what caused the 2-month test to destroy
-        # the 2-year cache. Save everything, slice on return only.
-        cached.to_parquet(path)
-        print(f"[CACHE] {symbol} {interval} — saved {len(cached)} bars total")
+        # the 2-year cache. Everything stays in the store, slice on
+        # return only.
+        print(f"[CACHE] {symbol} {interval} — {len(cached)} bars total")
 
-        # ── STEP 4: return only the requested window ──
-        return cached.iloc[-limit:].copy()
+        # ── STEP 4: return only the requested window (a view, no copy) ──
+        return cached.iloc[-limit:]
 
     else:
         print(f"[CACHE] {symbol} {interval} — no cache, downloading {limit} bars...")
         df = fetch_binance(symbol, interval, limit)
-        df.to_parquet(path)
+        candle_store.write(symbol, interval, df)
         print(f"[CACHE] {symbol} {interval} — saved {len(df)} bars")
         return df
 
@@ -298,7 +316,12 @@ def fetch_binance_range(symbol, interval, start, end):
                     "endTime":  current_end_ms,
                     # ← NO startTime here; we walk backward and break manually
                 }
+                # backtest backfill shares the live bot's weight budget and yields to it
+                rate_limiter.check(weight=rate_limiter.klines_weight(params["limit"]), priority=PRIORITY_BACKFILL)
                 response = requests.get(BINANCE_URL, params=params, timeout=10)
+                used_weight = response.headers.get("X-MBX-USED-WEIGHT-1M", "0")
+                if used_weight.isdigit():
+                    rate_limiter.on_response(int(used_weight))
                 response.raise_for_status()
                 data = response.json()
 
@@ -367,8 +390,10 @@ current_1h_boundary = now_utc.floor("h")
 current_4h_open = now_utc.floor("4h")
 htf_df = htf_df[htf_df.index < current_4h_open].copy()
 
-# Save raw copies BEFORE any trimming — needed for backtest freeze
-lltf_df_bt_full = lltf_df.copy()
+# Save raw copies BEFORE any trimming — needed for backtest freeze.
+# The 5m frame is a memory-mapped view that nothing below modifies in
+# place, so it is shared rather than copied.
+lltf_df_bt_full = lltf_df
 ltf_df_bt_full  = ltf_df.copy()  # includes current open 1H bar
 
 # Signal generation uses closed bars only
@@ -387,7 +412,12 @@ htf_df.index = pd.to_datetime(htf_df.index, utc=True)
 # HTF alignment is patched afterward directly, so no ghost row
 # pollutes any EWM in the indicator pipeline.
 from indicators.indicators import compute_htf_scores, align_htf_scores
-ltf_df = generate_signal(ltf_df.copy(), htf_df, symbol=SYMBOL)
+from indicators.signal_cache import SignalCache
+
+# Indicator outputs are cached on disk by a hash of the exact inputs, so
+# rerunning to iterate on exit rules skips the indicator stack entirely.
+signal_cache = SignalCache()
+ltf_df = signal_cache.generate_signal(ltf_df.copy(), htf_df, symbol=SYMBOL)
 
 # Patch HTF columns on the real bars directly — same call that
 # generate_signal makes internally, repeated here so the last 1H
@@ -407,17 +437,18 @@ ltf_df = generate_signal(ltf_df.copy(), htf_df, symbol=SYMBOL)
 
 # Freeze backtest at current 5m bar so audit matches live
 FREEZE_AT = pd.Timestamp.now(tz="UTC").floor("5min")
-lltf_df_bt = lltf_df_bt_full[lltf_df_bt_full.index <= FREEZE_AT].copy()
+lltf_df_bt = lltf_df_bt_full.loc[:FREEZE_AT]
 ltf_df_bt  = ltf_df_bt_full[ltf_df_bt_full.index < current_1h_boundary].copy()
 ltf_df_bt.index = pd.to_datetime(ltf_df_bt.index, utc=True)
-ltf_df_bt = generate_signal(ltf_df_bt.copy(), htf_df, symbol=SYMBOL)
+ltf_df_bt = signal_cache.generate_signal(ltf_df_bt.copy(), htf_df, symbol=SYMBOL)
 # _aligned_bt = align_htf_scores(_htf_scores, ltf_df_bt)
 # for _col in ["HTF_DIRECTION", "HTF_QUALITY"]:
 #     if _col in _aligned_bt.columns:
 #         ltf_df_bt[_col] = _aligned_bt[_col]
 print(f"[FREEZE] backtest frozen at {FREEZE_AT} | lltf={len(lltf_df_bt)} bars | ltf={len(ltf_df_bt)} bars")
+print(f"[SIGNAL CACHE] this run: {signal_cache.hits} hits / {signal_cache.misses} misses | {signal_cache.saved_s:.1f}s saved")
 
-backtester = SignalBacktester(ltf_df_bt, htf_df=htf_df, lltf_df=lltf_df_bt, leverage=LEVERAGE)
+backtester = SignalBacktester(ltf_df_bt, htf_df=htf_df, lltf_df=lltf_df_bt, leverage=LEVERAGE, audit=True)
 
 backtest_output = backtester.run()
 
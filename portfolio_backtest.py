@@ -0,0 +1,257 @@
+import contextlib
+import heapq
+import io
+
+import numpy as np
+import pandas as pd
+
+from backtest import SignalBacktester
+
+# ==========================================================
+# MULTI-SYMBOL PORTFOLIO BACKTEST
+# ==========================================================
+# SignalBacktester sizes every trade from a fixed $ risk and never sees
+# another symbol. Live, PositionManager trades the whole universe out of
+# one account: at most MAX_SIMULTANEOUS open positions, each sized as a
+# share of current equity, and account_state refuses new entries once
+# the day's realized loss passes DAILY_LOSS_CAP.
+#
+# PortfolioBacktester replays those rules over every symbol at once. Each
+# symbol keeps its own SignalBacktester (a "leg") for alignment, entry
+# stops and the array exit path, so a trade that is taken behaves bar
+# for bar as it would in the single-symbol run. What the portfolio adds
+# is the ordering: entry candidates and exits of all symbols are merged
+# in timestamp order through one heap, and every entry is gated and
+# sized against the shared account at the moment it happens.
+#
+# A trade's exit path depends only on its own symbol's bars, so it is
+# resolved in full when the trade opens and its exit is pushed back into
+# the heap. The heap therefore only ever holds one event per symbol —
+# the next entry candidate or the pending exit — and a universe of 50+
+# symbols costs a few thousand heap operations, not one per 5m bar.
+#
+# Same-timestamp order: entries (taken at the 5m open) before exits
+# (hit inside the bar), symbols in the order they were passed.
+
+ENTRY, EXIT = 0, 1
+
+
+class _Leg(SignalBacktester):
+    """One symbol inside the portfolio — sized by notional, not fixed $ risk."""
+
+    position_value = 0.0
+
+    def _calc_units(self, entry, stop):
+        if entry <= 0 or entry == stop:
+            return 0
+        return self.position_value / entry
+
+    def _core_arrays(self):
+        # Every leg stays resident for the whole run. The float lists the
+        # single-symbol core builds for fast scalar reads cost ~40 MB per
+        # 2 years of 5m bars; the NumPy columns give the same values for
+        # a small slowdown, which keeps 50+ symbols in memory.
+        a = super()._core_arrays()
+        for key in ("open", "close", "high", "low"):
+            a[key] = a[key + "_a"]
+        a["atr_entry"] = np.asarray(a["atr_entry"], dtype=float)
+        return a
+
+
+class PortfolioBacktester:
+
+    # ==========================================================
+    # ACCOUNT SETTINGS (mirror PositionManager / account_state)
+    # ==========================================================
+    POSITION_VALUE_USDT = 10      # notional floor
+    RISK_PCT_OF_ACCOUNT = 0.10    # share of equity per trade above the threshold
+    ACCOUNT_THRESHOLD   = 25.0
+    MAX_SIMULTANEOUS    = 3
+    DAILY_LOSS_CAP      = -0.03   # of equity, realized, per UTC day
+
+    def __init__(self, frames, initial_balance=1000, leverage=1, fee=0.0005, quiet=True, **leg_kwargs):
+        """
+        frames: {symbol: (1H signal frame with final_signal, 5m OHLCV frame)}
+        leg_kwargs go to every symbol's SignalBacktester (atr_mult, ...).
+        """
+        self.initial_balance = initial_balance
+        self.balance = initial_balance
+        self.leverage = max(1, leverage)
+        self.quiet = quiet
+
+        self.symbols = list(frames)
+        self.legs = {}
+        for symbol, (h1, m5) in frames.items():
+            leg = _Leg(h1, lltf_df=m5, initial_balance=0.0, fee=fee, leverage=leverage, **leg_kwargs)
+            leg._audit_log, leg._disaster_log = [], {}
+            self.legs[symbol] = leg
+
+    # ------------------------
+    # Account gates
+    # ------------------------
+    def _position_value(self):
+        if self.balance >= self.ACCOUNT_THRESHOLD:
+            value = self.balance * self.RISK_PCT_OF_ACCOUNT
+        else:
+            value = self.POSITION_VALUE_USDT
+        return max(value, self.POSITION_VALUE_USDT)
+
+    def _gate(self, open_count, day, day_pnl):
+        if open_count >= self.MAX_SIMULTANEOUS:
+            return "max_simultaneous"
+        if day_pnl.get(day, 0.0) <= self.DAILY_LOSS_CAP * self.balance:
+            return "daily_loss_cap"
+        return None
+
+    # ------------------------
+    # Run
+    # ------------------------
+    def run(self):
+        out = io.StringIO() if self.quiet else None
+        with contextlib.redirect_stdout(out) if self.quiet else contextlib.nullcontext():
+            return self._run()
+
+    def _run(self):
+        arrays, candidates, bufs, counts = {}, {}, {}, {}
+        heap = []
+
+        def push_candidate(k, symbol, start):
+            c = candidates[symbol]
+            j = int(np.searchsorted(c, start))
+            if j < len(c):
+                i = int(c[j])
+                heapq.heappush(heap, (int(arrays[symbol]["ns"][i]), ENTRY, k, i, 0.0, ""))
+
+        for k, symbol in enumerate(self.symbols):
+            a = self.legs[symbol]._core_arrays()
+            sig = a["signal"]
+            c = np.flatnonzero((sig == 1) | (sig == -1))
+            arrays[symbol], candidates[symbol] = a, c[c < a["steps"]]
+            bufs[symbol] = np.zeros(len(candidates[symbol]) + 1, dtype=SignalBacktester.TRADE_DTYPE)
+            counts[symbol] = 0
+            push_candidate(k, symbol, 0)
+
+        open_count, day_pnl = 0, {}
+        net_at_entry = {}
+        equity_rows, rejected = [], []
+
+        while heap:
+            ts, kind, k, i, price, reason = heapq.heappop(heap)
+            symbol = self.symbols[k]
+            leg, a = self.legs[symbol], arrays[symbol]
+            day = ts // 86_400_000_000_000
+
+            if kind == ENTRY:
+                side = 1 if a["signal"][i] == 1 else -1
+                refused = self._gate(open_count, day, day_pnl)
+                if refused is not None:
+                    rejected.append({
+                        "time": a["index"][i], "symbol": symbol, "side": side,
+                        "reason": refused, "open_positions": open_count, "equity": self.balance,
+                    })
+                    push_candidate(k, symbol, i + 1)
+                    continue
+
+                leg.position_value = self._position_value()
+                t = bufs[symbol][counts[symbol]]
+                before = leg.balance
+                if not leg._core_enter(a, t, side, i):
+                    push_candidate(k, symbol, i + 1)
+                    continue
+
+                counts[symbol] += 1
+                open_count += 1
+                self.balance += float(leg.balance - before)
+                net_at_entry[symbol] = before
+
+                result = leg._trade_path(a, t)
+                if result is None:
+                    x, price, reason = a["n"] - 1, float(a["close"][-1]), "end_of_data"
+                else:
+                    x, price, reason = result
+                heapq.heappush(heap, (int(a["ns"][x]), EXIT, k, x, price, reason))
+
+            else:
+                t = bufs[symbol][counts[symbol] - 1]
+                before = leg.balance
+                leg._core_exit(a, t, price, i, reason)
+                self.balance += float(leg.balance - before)
+                open_count -= 1
+                # account_state books the trade's net PnL on the day it closes
+                day_pnl[day] = day_pnl.get(day, 0.0) + leg.balance - net_at_entry.pop(symbol)
+                if reason != "end_of_data":
+                    push_candidate(k, symbol, int(np.searchsorted(a["ltf"], a["ltf"][i], side="right")))
+
+            equity_rows.append((ts, self.balance, open_count))
+
+        return self._report(arrays, bufs, counts, equity_rows, rejected)
+
+    # ------------------------
+    # Report
+    # ------------------------
+    def _report(self, arrays, bufs, counts, equity_rows, rejected):
+        frames = []
+        for symbol in self.symbols:
+            trades = self.legs[symbol]._trades_frame(arrays[symbol], bufs[symbol][:counts[symbol]])
+            if not trades.empty:
+                trades.insert(0, "symbol", symbol)
+                frames.append(trades)
+        trades_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        if not trades_df.empty:
+            trades_df = trades_df.sort_values(["entry_time", "symbol"], kind="stable").reset_index(drop=True)
+            trades_df["truncated"] = trades_df["exit_reason"] == "end_of_data"
+
+        equity = np.array([row[1] for row in equity_rows], dtype=float)
+        equity_df = pd.DataFrame({
+            "timestamp":      pd.to_datetime([row[0] for row in equity_rows], utc=True),
+            "equity":         equity,
+            "open_positions": [row[2] for row in equity_rows],
+        })
+        rejected_df = pd.DataFrame(rejected, columns=["time", "symbol", "side", "reason", "open_positions", "equity"])
+
+        valid = trades_df[~trades_df["truncated"]] if not trades_df.empty else trades_df
+        peak = np.maximum.accumulate(np.r_[self.initial_balance, equity])
+        drawdown = (np.r_[self.initial_balance, equity] - peak) / peak
+
+        summary = {
+            "initial_balance":  self.initial_balance,
+            "final_balance":    round(self.balance, 2),
+            "net_profit":       round(self.balance - self.initial_balance, 2),
+            "return_pct":       round((self.balance / self.initial_balance - 1) * 100, 2),
+            "max_drawdown_pct": round(float(drawdown.min()) * 100, 2),
+            "symbols":          len(self.symbols),
+            "total_trades":     len(valid),
+            "truncated_trades": len(trades_df) - len(valid),
+            "win_rate":         round((valid["pnl"] > 0).mean() * 100, 2) if not valid.empty else 0.0,
+            "rejected_signals": len(rejected_df),
+            "max_open":         int(equity_df["open_positions"].max()) if not equity_df.empty else 0,
+            "leverage":         self.leverage,
+        }
+
+        return {
+            "summary":      summary,
+            "equity_curve": equity_df,
+            "trades":       trades_df,
+            "attribution":  self._attribution(trades_df, rejected_df),
+            "rejected":     rejected_df,
+        }
+
+    def _attribution(self, trades_df, rejected_df):
+        """Per-symbol contribution — net PnL here includes both fees."""
+        rows = []
+        for symbol in self.symbols:
+            leg = self.legs[symbol]
+            t = trades_df[trades_df["symbol"] == symbol] if not trades_df.empty else trades_df
+            n_rej = int((rejected_df["symbol"] == symbol).sum())
+            rows.append({
+                "symbol":      symbol,
+                "trades":      len(t),
+                "win_rate":    round((t["pnl"] > 0).mean() * 100, 2) if len(t) else 0.0,
+                "avg_pnl_r":   round(t["pnl_r"].mean(), 3) if len(t) else 0.0,
+                "net_pnl":     round(leg.balance, 2),
+                "rejected":    n_rej,
+            })
+        attribution = pd.DataFrame(rows).set_index("symbol")
+        total = self.balance - self.initial_balance
+        attribution["share_pct"] = (attribution["net_pnl"] / total * 100).round(2) if total else 0.0
+        return attribution.sort_values("net_pnl", ascending=False)
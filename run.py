@@ -1,6 +1,21 @@
 # run.py
 
+import sys
+
 from execution.hourly_runner import run_hourly
 
 if __name__ == "__main__":
-    run_hourly()
+    if "--resident" in sys.argv[1:]:
+        from execution.scheduler import ResidentScheduler
+        from execution.kline_stream import KLINE_STREAM, start_kline_stream
+        from execution.hourly_runner import SYMBOLS
+
+        if KLINE_STREAM:
+            start_kline_stream(SYMBOLS)
+        scheduler = ResidentScheduler()
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            scheduler.stop()
+    else:
+        run_hourly()
@@ -0,0 +1,83 @@
+import sys
+import os
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from indicators.indicators import rolling_slope, rolling_r2
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+N_BARS  = 50_000
+WINDOWS = [20, 50, 200]
+REPEATS = 3
+
+
+# --------------------------------------------------
+# REFERENCE — per-window Python callback (old implementation)
+# --------------------------------------------------
+def apply_slope(series, window):
+    x = np.arange(window, dtype=float)
+    x_mean = x.mean()
+    x_var = ((x - x_mean) ** 2).sum()
+
+    def _slope(y):
+        if np.any(np.isnan(y)):
+            return np.nan
+        return ((x - x_mean) * (y - y.mean())).sum() / x_var
+
+    return series.rolling(window).apply(_slope, raw=True)
+
+
+def apply_r2(series, window):
+    x = np.arange(window, dtype=float)
+    x_mean = x.mean()
+    x_var = ((x - x_mean) ** 2).sum()
+
+    def _r2(y):
+        if np.any(np.isnan(y)):
+            return np.nan
+        y_mean = y.mean()
+        ss_tot = ((y - y_mean) ** 2).sum()
+        if ss_tot < 1e-12:
+            return 0.0
+        slope = ((x - x_mean) * (y - y_mean)).sum() / x_var
+        y_hat = slope * x + (y_mean - slope * x_mean)
+        return 1.0 - ((y - y_hat) ** 2).sum() / ss_tot
+
+    return series.rolling(window).apply(_r2, raw=True)
+
+
+# --------------------------------------------------
+# HELPER
+# --------------------------------------------------
+def best_of(fn, *args):
+    best = float("inf")
+    for _ in range(REPEATS):
+        t0 = time.perf_counter()
+        out = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    close = pd.Series(
+        60000 * np.exp(np.cumsum(rng.normal(0, 0.004, N_BARS))),
+        index=pd.date_range("2020-01-01", periods=N_BARS, freq="1h", tz="UTC"),
+    )
+
+    print(f"{N_BARS} bars, best of {REPEATS}")
+    print(f"{'fn':<14}{'window':>8}{'apply (s)':>12}{'closed (s)':>12}{'speedup':>10}{'max |err|':>12}")
+
+    for name, fast, slow in (
+        ("rolling_slope", rolling_slope, apply_slope),
+        ("rolling_r2",    rolling_r2,    apply_r2),
+    ):
+        for window in WINDOWS:
+            t_slow, ref = best_of(slow, close, window)
+            t_fast, got = best_of(fast, close, window)
+            err = (got - ref).abs().max()
+            print(f"{name:<14}{window:>8}{t_slow:>12.3f}{t_fast:>12.4f}{t_slow / t_fast:>9.0f}x{err:>12.2e}")
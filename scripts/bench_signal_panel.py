@@ -0,0 +1,84 @@
+import sys
+import os
+import io
+import time
+import contextlib
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from indicators.indicators import generate_signal, compute_htf_scores
+from indicators.panel import generate_signal_panel
+
+# --------------------------------------------------
+# CONFIG
+# --------------------------------------------------
+UNIVERSE_SIZES = [50, 200]
+N_BARS_1H      = 1000          # same window hourly_runner feeds generate_signal
+N_BARS_4H      = 300
+END            = pd.Timestamp("2024-06-01", tz="UTC")
+
+
+# --------------------------------------------------
+# SYNTHETIC UNIVERSE
+# --------------------------------------------------
+def synthetic_ohlcv(rng, n, freq):
+    index = pd.date_range(end=END, periods=n, freq=freq)
+    vol   = np.where(rng.random(n) < 0.1, 0.02, 0.006)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, vol)))
+    open_ = np.r_[close[0], close[:-1]]
+    wick  = np.abs(rng.normal(0, vol)) * close
+    return pd.DataFrame({
+        "open":   open_,
+        "high":   np.maximum(open_, close) + wick,
+        "low":    np.minimum(open_, close) - wick,
+        "close":  close,
+        "volume": rng.lognormal(10, 0.6, n),
+    }, index=index)
+
+
+def build_universe(size, seed=0):
+    rng = np.random.default_rng(seed)
+    frames, htf_4h, scores = {}, {}, {}
+    for k in range(size):
+        symbol = f"SYM{k:03d}USDT"
+        frames[symbol] = synthetic_ohlcv(rng, N_BARS_1H, "1h")
+        htf_4h[symbol] = synthetic_ohlcv(rng, N_BARS_4H, "4h")
+        scores[symbol] = compute_htf_scores(htf_4h[symbol])
+    return frames, htf_4h, scores
+
+
+# --------------------------------------------------
+# RUNNERS
+# --------------------------------------------------
+def run_serial(frames, htf_4h, scores):
+    out = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for symbol, df in frames.items():
+            out[symbol] = generate_signal(df.copy(), htf_4h[symbol], htf_stack_cache=scores[symbol])
+    return out
+
+
+if __name__ == "__main__":
+    import warnings
+    warnings.simplefilter("ignore")
+
+    print(f"{N_BARS_1H} x 1H bars per symbol")
+    print(f"{'symbols':>8}{'serial (s)':>12}{'panel (s)':>12}{'speedup':>10}{'max |err|':>12}")
+
+    for size in UNIVERSE_SIZES:
+        frames, htf_4h, scores = build_universe(size)
+
+        t0 = time.perf_counter()
+        ref = run_serial(frames, htf_4h, scores)
+        t_serial = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        got = generate_signal_panel(frames, scores)
+        t_panel = time.perf_counter() - t0
+
+        err = max(
+            np.nanmax(np.abs(got[s].to_numpy(dtype=float) - ref[s].to_numpy(dtype=float)))
+            for s in frames
+        )
+        print(f"{size:>8}{t_serial:>12.2f}{t_panel:>12.2f}{t_serial / t_panel:>9.1f}x{err:>12.2e}")
@@ -7,7 +7,9 @@ import time
 import requests
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from data_pipeline.candle_store import CandleStore
 from data_pipeline.fetcher import fetch_ohlcv
+from data_pipeline.rate_limiter import request_priority, PRIORITY_BACKFILL
 
 # --------------------------------------------------
 # CONFIG
@@ -29,6 +31,7 @@ HTF_CANDLES = 250
 
 CACHE_DIR = "data/cache"
 os.makedirs(CACHE_DIR, exist_ok=True)
+candle_store = CandleStore(CACHE_DIR)
 
 NOW_UTC = datetime.now(timezone.utc)
 END = pd.Timestamp(NOW_UTC.replace(minute=0, second=0, microsecond=0))
@@ -36,6 +39,7 @@ END = pd.Timestamp(NOW_UTC.replace(minute=0, second=0, microsecond=0))
 # --------------------------------------------------
 # HELPER
 # --------------------------------------------------
+@request_priority(PRIORITY_BACKFILL)
 def fetch_all(symbol, interval, total_limit, end_time):
     all_data = []
     remaining = total_limit
@@ -69,19 +73,22 @@ for symbol in SYMBOLS:
 
     # ---------------- 1H (fetch first — others derive their limits from it) ----------------
     df_1h = fetch_all(symbol, LTF_INTERVAL, LTF_CANDLES, END)
-    df_1h.to_parquet(f"{CACHE_DIR}/{symbol}_1h.parquet")
+    candle_store.write(symbol, LTF_INTERVAL, df_1h)
     print(f"1h candles: {len(df_1h)} | {df_1h.index[0]} → {df_1h.index[-1]}")
 
     # ---------------- 4H (derived from 1H length) ----------------
     htf_needed = ceil(len(df_1h) / 4) + 1
     df_4h = fetch_all(symbol, HTF_INTERVAL, htf_needed, END)
-    df_4h.to_parquet(f"{CACHE_DIR}/{symbol}_4h.parquet")
+    candle_store.write(symbol, HTF_INTERVAL, df_4h)
     print(f"4h candles: {len(df_4h)} | {df_4h.index[0]} → {df_4h.index[-1]}")
 
     # ---------------- 5M (derived from 1H length — 12 five-minute bars per hour) ----------------
     lltf_needed = len(df_1h) * 12
     df_5m = fetch_all(symbol, LLTF_INTERVAL, lltf_needed, END)
-    df_5m.to_parquet(f"{CACHE_DIR}/{symbol}_5m.parquet")
+    candle_store.write(symbol, LLTF_INTERVAL, df_5m)
     print(f"5m candles: {len(df_5m)} | {df_5m.index[0]} → {df_5m.index[-1]}")
 
+    # build the memory-mapped mirror now so the first backtest maps it directly
+    candle_store.mmap(symbol, LLTF_INTERVAL)
+
 print("\nALL CANDLES DOWNLOADED ✅")
\ No newline at end of file
@@ -19,40 +19,52 @@ import numpy as np
 
 
 # ── helpers ──────────────────────────────────────────────────────────────────
+# window_5m is a DataFrame (backtest) or exit_engine BAR_DTYPE rows (live
+# BarRing window); both are read through _column().
+
+_FIELDS = {"ATR_5M": "atr_5m", "ATR": "atr"}
+
+def _column(window, name):
+    """A window column as a float array, or None when it has none."""
+    if isinstance(window, pd.DataFrame):
+        return window[name].to_numpy(dtype=float) if name in window.columns else None
+    return window[_FIELDS.get(name, name)]
+
+def _mean(values):
+    """Series.mean(): NaNs skipped, NaN when none are left."""
+    values = values[~np.isnan(values)]
+    return float(values.mean()) if len(values) else np.nan
 
 def _body(o, c):
     return abs(c - o)
 
 def _two_bar_move(window):
     if len(window) >= 2:
-        return abs(float(window.iloc[-1]["close"]) - float(window.iloc[-2]["close"]))
+        close = _column(window, "close")
+        return abs(float(close[-1]) - float(close[-2]))
     return 0.0
 
 def _oie_atr(window):
-    """Mirrors the ATR resolution logic in opposite_impulse_exit exactly."""
-    if "ATR_5M" in window.columns:
-        atr = window["ATR_5M"].iloc[-3:].mean()
+    """Mirrors the ATR resolution logic in exit_engine.opposite_impulse."""
+    for name, scale in (("ATR_5M", 1.0), ("ATR", 0.20)):
+        values = _column(window, name)
+        if values is None:
+            continue
+        atr = _mean(values[-3:])
         if not (pd.isna(atr) or atr <= 0):
-            return float(atr)
-        atr = window["ATR_5M"].iloc[0]
+            return atr * scale
+        atr = values[0]
         if not (pd.isna(atr) or atr <= 0):
-            return float(atr)
-
-    if "ATR" in window.columns:
-        atr_1h = window["ATR"].iloc[-3:].mean()
-        if not (pd.isna(atr_1h) or atr_1h <= 0):
-            return float(atr_1h) * 0.20
-        atr_1h = window["ATR"].iloc[0]
-        if not (pd.isna(atr_1h) or atr_1h <= 0):
-            return float(atr_1h) * 0.20
+            return float(atr) * scale
 
     return None
 
 def _vol_blocked(window):
-    if "volume" not in window.columns or len(window) < 10:
+    volume = _column(window, "volume")
+    if volume is None or len(window) < 10:
         return False
-    avg_vol = window["volume"].iloc[-10:].mean()
-    last_vol = float(window.iloc[-1]["volume"])
+    avg_vol = _mean(volume[-10:])
+    last_vol = float(volume[-1])
     if pd.isna(avg_vol) or avg_vol <= 0:
         return False
     return last_vol < avg_vol * 0.8
@@ -80,7 +92,7 @@ def format_exit_audit(
     initial_stop,
     R,
     atr_5m,         # 5m ATR (may be None)
-    window_5m,      # pd.DataFrame of 5m bars since entry
+    window_5m,      # 5m bars since entry: DataFrame or BAR_DTYPE rows
     ts=None,
 ):
     if R <= 0:
@@ -217,9 +229,8 @@ def format_exit_audit(
             f"  oie             : SKIP  window too short ({len(window_5m)} bars, need 3)"
         )
     else:
-        last = window_5m.iloc[-1]
-        o_last = float(last["open"])
-        c_last = float(last["close"])
+        o_last = float(_column(window_5m, "open")[-1])
+        c_last = float(_column(window_5m, "close")[-1])
 
         oie_atr = _oie_atr(window_5m)
         if oie_atr is None or oie_atr <= 0:
@@ -0,0 +1,329 @@
+# strategy/exit_engine.py
+import numpy as np
+
+# ==========================================================
+# SHARED EXIT ENGINE
+# ==========================================================
+# The per-bar exit rules of an open position, written once and called by
+# every environment:
+#
+#   live / replay — PositionManager.update(), one closed 5m bar at a time,
+#                   over the symbol's BarRing of recent bars
+#   backtest      — SignalBacktester._trade_path(), stepping the 5m arrays
+#                   of the whole run (the arrays themselves are the window)
+#
+# Live is the reference: these are the rules PositionManager traded with
+# before they moved here, and the backtest now runs them unchanged instead
+# of keeping its own copy "mirrored" by comments.
+#
+# A bar is processed in this order (the caller owns the steps between):
+#
+#   observe(state, h, l, c)        excursions, mfe_r, close-based pnl_r
+#   trail_stop(state, rules, ...)  new trailing stop or None — the caller
+#                                  applies it (live amends it on Binance
+#                                  first and keeps the old stop if that fails)
+#   check_exits(state, ...)        (reason, fill price) or None
+#   state.bars += 1                only when nothing fired
+#
+# `rules` is any object carrying ATR_AFTER_HALF_R, ATR_AFTER_ONE_R and
+# BINANCE_CALLBACK_FLOOR_PCT — PositionManager and SignalBacktester both
+# do, so a sweep can still override them per instance.
+#
+# tests/test_exit_engine.py drives PositionManager and the backtester over
+# the same bars and requires identical exits.
+
+RING_BARS = 200       # bars of history the window checks can see
+
+
+class ExitState:
+    """Running state of one open position (prices in quote units)."""
+
+    __slots__ = (
+        "side", "entry", "initial_stop", "stop", "R", "liq",
+        "bars", "last_trail_bar", "last_mfe_bar",
+        "mfe", "mae", "mfe_price", "mfe_r", "pnl_r",
+    )
+
+    def __init__(self, side, entry, stop, initial_stop=None, liq=None, bars=1,
+                 last_trail_bar=0, last_mfe_bar=1, mfe=0.0, mae=0.0, mfe_price=None):
+        self.side = side
+        self.entry = entry
+        self.stop = stop
+        self.initial_stop = stop if initial_stop is None else initial_stop
+        self.R = abs(entry - self.initial_stop) or 1e-9
+        self.liq = liq                      # backtest leverage only
+        self.bars = bars
+        self.last_trail_bar = last_trail_bar
+        self.last_mfe_bar = last_mfe_bar
+        self.mfe = mfe
+        self.mae = mae
+        self.mfe_price = mfe_price
+        self.mfe_r = mfe / self.R
+        self.pnl_r = 0.0
+
+    # position dict <-> state, for PositionManager
+    @classmethod
+    def from_position(cls, position):
+        return cls(
+            side=position["direction"],
+            entry=position["entry_price"],
+            stop=position["stop_loss"],
+            initial_stop=position.get("initial_stop", position["stop_loss"]),
+            bars=position.get("bars_in_trade", 0),
+            last_trail_bar=position.get("last_trail_bar", 0),
+            last_mfe_bar=position.get("last_mfe_bar", 0),
+            mfe=position.get("MFE", 0.0),
+            mae=position.get("MAE", 0.0),
+            mfe_price=position.get("mfe_price"),
+        )
+
+    def to_position(self, position):
+        position["MFE"], position["MAE"] = self.mfe, self.mae
+        position["mfe_r"], position["pnl_r"] = self.mfe_r, self.pnl_r
+        position["last_mfe_bar"] = self.last_mfe_bar
+        position["last_trail_bar"] = self.last_trail_bar
+        if self.mfe_price is not None:
+            position["mfe_price"] = self.mfe_price
+
+
+# ----------------------------------------------------------
+# Bar window
+# ----------------------------------------------------------
+# The window checks read columns of recent bars, newest last: any mapping
+# of column name -> indexable (dict of arrays / lists, or BAR_DTYPE rows)
+# plus the row range lo:hi. PositionManager hands over its BarRing
+# window; the backtest hands over its whole-run arrays and slides lo:hi.
+BAR_DTYPE = np.dtype([
+    ("ts", "i8"),                       # bar open, ns since epoch (UTC)
+    ("open", "f8"), ("high", "f8"), ("low", "f8"), ("close", "f8"),
+    ("volume", "f8"), ("atr", "f8"), ("atr_5m", "f8"),
+])
+
+
+class BarRing:
+    """
+    The last `capacity` bars as BAR_DTYPE rows. Rows live in a buffer
+    twice the capacity and slide back to the front when it fills, so
+    window() is always a contiguous view (no copy) and push() is O(1)
+    amortized. A window is only valid until the next push.
+    """
+
+    __slots__ = ("capacity", "_buf", "_start", "_end")
+
+    def __init__(self, capacity=RING_BARS, rows=None):
+        self.capacity = capacity
+        self._buf = np.zeros(2 * capacity, dtype=BAR_DTYPE)
+        self._start = self._end = 0
+        if rows is not None and len(rows):
+            rows = rows[-capacity:]
+            self._buf[:len(rows)] = rows
+            self._end = len(rows)
+
+    def __len__(self):
+        return self._end - self._start
+
+    def push(self, ts, open_, high, low, close, volume, atr, atr_5m):
+        if self._end == len(self._buf):
+            keep = self.capacity - 1
+            self._buf[:keep] = self._buf[self._end - keep:self._end]
+            self._start, self._end = 0, keep
+        self._buf[self._end] = (
+            ts, open_, high, low, close, volume,
+            np.nan if atr is None else atr,
+            np.nan if atr_5m is None else atr_5m,
+        )
+        self._end += 1
+        if self._end - self._start > self.capacity:
+            self._start += 1
+
+    def window(self) -> np.ndarray:
+        return self._buf[self._start:self._end]
+
+
+# ----------------------------------------------------------
+# Per-bar steps
+# ----------------------------------------------------------
+def _nanmean(values):
+    """Series.mean() on a float array: NaNs skipped, NaN when none are left."""
+    mask = np.isnan(values)
+    count = len(values) - int(mask.sum())
+    if count == 0:
+        return np.nan
+    return np.where(mask, 0.0, values).sum() / count
+
+
+def observe(s, h, l, c):
+    """Fold a post-entry bar into the excursions. Never called on the entry bar."""
+    entry = s.entry
+    if s.side == 1:
+        up, down, best = h - entry, l - entry, h
+        s.pnl_r = (c - entry) / s.R
+    else:
+        up, down, best = entry - l, entry - h, l
+        s.pnl_r = (entry - c) / s.R
+    # trail anchor: best price ever seen (ties move the peak bar forward)
+    if up >= s.mfe:
+        s.mfe_price, s.last_mfe_bar = best, s.bars
+    if up > s.mfe:
+        s.mfe = up
+    if down < s.mae:
+        s.mae = down
+    s.mfe_r = s.mfe / s.R
+
+
+def trail_atr(s, atr_5m, atr):
+    """5m ATR, else 20% of the 1H ATR, else 20% of R."""
+    if atr_5m is not None and atr_5m > 0:
+        return atr_5m
+    if atr is not None and atr > 0:
+        return atr * 0.20
+    return s.R * 0.20
+
+
+def trail_stop(s, rules, close, atr_5m, atr):
+    """
+    Trailing stop for this bar once 0.5R is secured, or None when the
+    trail does not move. Locks to breakeven, tightens again past 1R and
+    never trails closer than the exchange's minimum callback distance.
+    """
+    mfe_r = s.mfe_r
+    if mfe_r < 0.5 or s.bars - s.last_trail_bar < 1:
+        return None
+    s.last_trail_bar = s.bars
+
+    price = close if s.mfe_price is None else s.mfe_price
+    mult = rules.ATR_AFTER_ONE_R if mfe_r >= 1.0 else rules.ATR_AFTER_HALF_R
+    distance = max(trail_atr(s, atr_5m, atr) * mult, price * rules.BINANCE_CALLBACK_FLOOR_PCT)
+    if s.side == 1:
+        new_stop = max(s.stop, max(price - distance, s.entry))
+    else:
+        new_stop = min(s.stop, min(price + distance, s.entry))
+    return None if new_stop == s.stop else new_stop
+
+
+def opposite_impulse(bars, lo, hi, side, pnl_r, trace=None):
+    """
+    A large candle against the position on rows lo:hi of `bars` (the
+    position's window, newest last). Columns: open, high, low, close,
+    volume, atr_5m, atr — volume / atr may be None. `trace(name, info)`
+    receives the evaluation when given; without it the cheap conditions
+    short-circuit.
+    """
+    if hi - lo < 3:
+        if trace is not None:
+            trace("oie_skip", {"reason": "window too short", "window": hi - lo})
+        return False
+
+    opens, closes = bars["open"], bars["close"]
+    o, c = opens[hi - 1], closes[hi - 1]
+    wrong_direction = c < o if side == 1 else c > o
+    # location guard, anchored to initial_stop: distance to it is pnl_r + 1
+    location_blocked = pnl_r + 1.0 > 1.75 and pnl_r > 0.0
+    if trace is None and (not wrong_direction or location_blocked):
+        return False
+
+    atr = np.nan
+    if bars["atr_5m"] is not None:
+        atr = _nanmean(bars["atr_5m"][hi - 3:hi])
+        if not atr > 0:
+            atr = bars["atr_5m"][lo]
+    if not atr > 0:
+        if bars["atr"] is not None:
+            atr_1h = _nanmean(bars["atr"][hi - 3:hi])
+            if not atr_1h > 0:
+                atr_1h = bars["atr"][lo]
+        else:
+            atr_1h = _nanmean(np.asarray(bars["high"][lo:hi]) - np.asarray(bars["low"][lo:hi]))
+        if not atr_1h > 0:
+            if trace is not None:
+                trace("oie_skip", {"reason": "no valid ATR", "window": hi - lo})
+            return False
+        atr = atr_1h * 0.20
+
+    body = abs(c - o)
+    two_bar_move = abs(c - closes[hi - 2])
+    big_candle = (body > atr * 1.2) or (two_bar_move > atr * 1.5 and body > atr * 0.6)
+    if trace is None and not big_candle:
+        return False
+
+    volume = bars["volume"]
+    vol_blocked, last_vol, avg_vol = False, np.nan, np.nan
+    if volume is not None:
+        last_vol = volume[hi - 1]
+        avg_vol = _nanmean(np.asarray(volume[max(lo, hi - 10):hi]))
+        if hi - lo >= 10 and avg_vol > 0 and last_vol < avg_vol * 0.8:
+            vol_blocked = True
+
+    fired = big_candle and wrong_direction and not location_blocked and not vol_blocked
+    if trace is not None:
+        trace("oie", {
+            "fired": fired, "open": o, "close": c, "body": body, "atr": atr,
+            "big_candle": big_candle, "wrong_direction": wrong_direction,
+            "location_blocked": location_blocked, "vol_blocked": vol_blocked,
+            "last_vol": last_vol, "avg_vol": avg_vol, "window": hi - lo,
+        })
+    return fired
+
+
+def check_exits(s, h, l, c, bars, lo, hi, real_low=None, real_high=None, trace=None):
+    """
+    Exit rules for the bar just observed, in priority order. Returns
+    (reason, fill_price) or None. real_low / real_high are the bar's
+    exchange extremes when they differ from h / l (forming-bar data);
+    only the disaster stop reads them.
+    """
+    side, R = s.side, s.R
+    cp = h if side == 1 else l          # best price this bar
+    mfe_r, pnl_r = s.mfe_r, s.pnl_r
+    mae_r = abs(s.mae) / R
+    n = s.bars
+
+    # ── DISASTER STOP (bars 1–6) ──
+    # A: no edge shown at all. B: real promise that collapsed within 6 bars of its peak.
+    if n <= 6:
+        low = l if real_low is None else real_low
+        high = h if real_high is None else real_high
+        worst_r = (low - s.entry) / R if side == 1 else (s.entry - high) / R
+        since_peak = n - s.last_mfe_bar
+        scenario_a = mfe_r < 0.15 and worst_r <= -0.6
+        scenario_b = 0.15 <= mfe_r < 0.5 and worst_r <= -0.6 and since_peak <= 6
+        fill = low if side == 1 else high
+        if trace is not None:
+            trace("disaster", {
+                "fired": scenario_a or scenario_b, "scenario_a": scenario_a, "scenario_b": scenario_b,
+                "worst_pnl_r": worst_r, "close_pnl_r": pnl_r, "mfe_r": mfe_r,
+                "bars_since_peak": since_peak, "low": low, "high": high, "fill": fill,
+            })
+        if scenario_a or scenario_b:
+            return "disaster_stop", fill
+
+    # ── DOMINANCE: nothing favorable by bar 3 and already half a R against ──
+    if n == 3 and mfe_r == 0.0 and mae_r > 0.50:
+        return "dominance_exit", cp
+
+    # ── TRAP REJECTION: blown through the stop on a spike in bars 1–2 ──
+    if n <= 2 and mae_r > 1.2 and mae_r / max(mfe_r, 0.05) > 4.0:
+        return "trap_rejection", cp
+
+    # ── THESIS INVALIDATION: limited promise, now underwater near the stop ──
+    if 0.15 <= mfe_r < 0.5 and pnl_r < -0.10:
+        prox_r = (cp - s.initial_stop) / R if side == 1 else (s.initial_stop - cp) / R
+        if prox_r < 0.25 and mfe_r - pnl_r > 0.35:
+            return "thesis_invalidation_exit", cp
+
+    # ── STOP PROXIMITY: close within 0.2R of the original stop ──
+    if mfe_r < 0.5 and pnl_r < -0.35:
+        prox_r = (c - s.initial_stop) / R if side == 1 else (s.initial_stop - c) / R
+        if prox_r < 0.20:
+            return "stop_proximity_exit", cp
+
+    if opposite_impulse(bars, lo, hi, side, pnl_r, trace):
+        return "opposite_impulse", cp
+
+    if s.liq is not None and (l <= s.liq if side == 1 else h >= s.liq):
+        return "liquidated", s.liq
+
+    # ── HARD STOP — always last ──
+    if (l <= s.stop) if side == 1 else (h >= s.stop):
+        return "stop_loss", s.stop
+    return None
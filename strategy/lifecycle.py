@@ -2,6 +2,8 @@
 
 import os
 import json
+import time
+import threading
 import numpy as np
 import pandas as pd
 from datetime import datetime
@@ -9,6 +11,7 @@ from typing import Optional
 
 from execution.notifier import TelegramNotifier
 from strategy.account_state import account_state
+from strategy.exit_engine import BAR_DTYPE, BarRing, ExitState, check_exits, observe, trail_stop
 
 # Binance execution — only imported if env vars are set
 _EXECUTION_ENABLED = bool(
@@ -41,9 +44,23 @@ def _update_atr(prev_atr, prev_close, high, low, close, period=14):
     alpha = 2 / (period + 1)
     return tr if prev_atr is None else prev_atr + alpha * (tr - prev_atr)
 
+def _history_rows(bars: pd.DataFrame, atr) -> np.ndarray:
+    """5m bars → BAR_DTYPE rows, ATR falling back to `atr` where missing."""
+    rows = np.zeros(len(bars), dtype=BAR_DTYPE)
+    rows["ts"] = bars.index.as_unit("ns").asi8
+    for name in ("open", "high", "low", "close"):
+        rows[name] = bars[name].to_numpy(dtype=float)
+    if "volume" in bars.columns:
+        rows["volume"] = bars["volume"].fillna(0.0).to_numpy(dtype=float)
+    rows["atr"] = bars["ATR"].to_numpy(dtype=float) if "ATR" in bars.columns else np.nan
+    rows["atr"] = np.where(np.isnan(rows["atr"]), np.nan if atr is None else atr, rows["atr"])
+    rows["atr_5m"] = bars["ATR_5M"].to_numpy(dtype=float) if "ATR_5M" in bars.columns else np.nan
+    return rows
+
 POSITIONS_DIR = "data/positions"
 POSITIONS_FILE   = os.path.join(POSITIONS_DIR, "open_positions.json")
-BAR_HISTORY_FILE = os.path.join(POSITIONS_DIR, "bar_history.json")
+BAR_HISTORY_FILE = os.path.join(POSITIONS_DIR, "bar_history.npz")
+LEGACY_BAR_HISTORY_FILE = os.path.join(POSITIONS_DIR, "bar_history.json")
 ENTRY_TS_FILE    = os.path.join(POSITIONS_DIR, "last_entry_ts.json")
 EXECUTED_SIGNALS_FILE   = os.path.join(POSITIONS_DIR, "executed_signals.json")
 REENTRY_LOCK_FILE = os.path.join(POSITIONS_DIR, "reentry_lock.json")
@@ -91,6 +108,18 @@ class PositionManager:
         self.positions = {}
         os.makedirs(POSITIONS_DIR, exist_ok=True)
 
+        # 5m bar ring per symbol (the exit engine's window). Set before
+        # _load() so a persisted history survives into this instance.
+        self._bar_history: dict[str, BarRing] = {}
+
+        # seconds between routine flushes; None writes on every flush()
+        self.snapshot_interval = None
+        self._last_flush = 0.0
+
+        # held around update()/flush() when symbols share this instance
+        # across run_hourly's worker pool
+        self._lock = threading.RLock()
+
         self.notifier = TelegramNotifier()
 
         if self.persist:
@@ -102,9 +131,6 @@ class PositionManager:
         # Prevent duplicate entries on same candle
         self._last_entry_ts = {}
 
-        # 5m bar cache per symbol
-        self._bar_history: dict[str, list] = {}
-
         # Streaming ATR state per symbol (FAST)
         self._atr_state = {}
         self._executed_signals = set()
@@ -181,17 +207,6 @@ class PositionManager:
             # APPEND BAR FIRST
             atr_5m = float(current_5m_row["ATR_5M"]) if "ATR_5M" in current_5m_row.index and not pd.isna(current_5m_row["ATR_5M"]) else None
 
-            new_bar = {
-                "open": o,
-                "high": h,
-                "low": l,
-                "close": c,
-                "volume": _bar_volume,
-                "ATR": atr,
-                "ATR_5M": atr_5m,
-                "ts": str(current_ts),
-            }
-
             # Guard: if bar_history for this symbol is missing or empty after
             # _load(), rebuild it from lltf_df so OIE always has a real window.
             # This is the stateless-worker fix — each cron tick gets a fresh PM
@@ -226,29 +241,17 @@ class PositionManager:
                     else:
                         _lltf_for_rebuild = lltf_df
 
-                    history_df = _lltf_for_rebuild[_lltf_for_rebuild.index >= entry_ts].copy()
+                    history_df = _lltf_for_rebuild[_lltf_for_rebuild.index >= entry_ts]
                     # exclude the current bar — we append it fresh below
                     history_df = history_df[history_df.index < _current_ts_utc]
-                    rebuilt = []
-                    for ts_h, row_h in history_df.iterrows():
-                        rebuilt.append({
-                            "open":   float(row_h["open"]),
-                            "high":   float(row_h["high"]),
-                            "low":    float(row_h["low"]),
-                            "close":  float(row_h["close"]),
-                            "volume": float(row_h["volume"]) if "volume" in row_h.index and not pd.isna(row_h["volume"]) else 0.0,
-                            "ATR":    float(row_h["ATR"]) if "ATR" in row_h.index and not pd.isna(row_h["ATR"]) else atr,
-                            "ATR_5M": float(row_h["ATR_5M"]) if "ATR_5M" in row_h.index and not pd.isna(row_h["ATR_5M"]) else None,
-                            "ts":     str(ts_h),
-                        })
-                    self._bar_history[symbol] = rebuilt
-                    print(f"[BAR HISTORY REBUILT] {symbol} — {len(rebuilt)} bars from lltf_df")
-
-            self._bar_history.setdefault(symbol, []).append(new_bar)
-
-            # KEEP WINDOW SIZE
-            if len(self._bar_history[symbol]) > 200:
-                self._bar_history[symbol] = self._bar_history[symbol][-200:]
+                    self._bar_history[symbol] = BarRing(rows=_history_rows(history_df, atr))
+                    print(f"[BAR HISTORY REBUILT] {symbol} — {len(history_df)} bars from lltf_df")
+
+            # the ring keeps the last RING_BARS bars
+            ring = self._bar_history.get(symbol)
+            if ring is None:
+                ring = self._bar_history[symbol] = BarRing()
+            ring.push(pd.Timestamp(current_ts).value, o, h, l, c, _bar_volume, atr, atr_5m)
 
             # DEFINE THIS EARLY (BEFORE USING IT)
             _entry_ts = pd.Timestamp(position["entry_5m_ts"])
@@ -262,292 +265,88 @@ class PositionManager:
             else:
                 skip_exit_checks = False
 
-            entry_price = position["entry_price"]
-            stop        = position["stop_loss"]
-            side        = position["direction"]
-            R           = abs(entry_price - position["initial_stop"])  # always original risk
-
-            if R == 0:
-                R = 1e-9   # safety
-
-            # Current price for R calculation (best price this bar)
-            current_price = h if side == 1 else l
-
-            if "MFE" not in position:
-                position["MFE"] = 0.0
-            if "MAE" not in position:
-                position["MAE"] = 0.0
-
-            # Entry-bar candle must NOT contribute to MFE/MAE — matches
-            # backtest, where get_5m_window() drops the entry bar and
-            # _check_intrabar() only runs once (idx - entry_idx) >= 1.
-            # Without this guard, the entry candle's real OHLC (which can
-            # differ from the flat placeholder it overwrites) gets folded
-            # into MFE before the trade has had a single genuine post-entry
-            # bar — silently disabling dominance_exit (which requires
-            # mfe_r == 0.0 exactly) and anything else gated on mfe_r==0.
+            # Exit rules live in strategy/exit_engine — the backtest runs
+            # the same functions over its arrays.
+            side  = position["direction"]
+            state = ExitState.from_position(position)
+            R     = state.R
+
+            # Entry-bar candle must NOT contribute to MFE/MAE. Without this
+            # guard, the entry candle's real OHLC (which can differ from the
+            # flat placeholder it overwrites) gets folded into MFE before
+            # the trade has had a single genuine post-entry bar — silently
+            # disabling dominance_exit (which requires mfe_r == 0.0 exactly)
+            # and anything else gated on mfe_r==0.
             if not skip_exit_checks:
-                # Trail anchored to MFE price (best price ever seen)
-                if side == 1:
-                    if h - entry_price >= position["MFE"]:
-                        position["mfe_price"] = h
-                        position["last_mfe_bar"] = position["bars_in_trade"]
-                else:
-                    if entry_price - l >= position["MFE"]:
-                        position["mfe_price"] = l
-                        position["last_mfe_bar"] = position["bars_in_trade"]
-
-                # per-bar movement (NOT candle-close derived pnl)
-                if side == 1:
-                    move_high = h - entry_price
-                    move_low  = l - entry_price
-
-                    position["MFE"] = max(position["MFE"], move_high)
-                    position["MAE"] = min(position["MAE"], move_low)
-
-                else:
-                    move_high = entry_price - l
-                    move_low  = entry_price - h
-
-                    position["MFE"] = max(position["MFE"], move_high)
-                    position["MAE"] = min(position["MAE"], move_low)
-
-            trail_price = position.get("mfe_price", c)
-
-            # -------------------------------------------------------
-            # BUILD 5M WINDOW (REAL ATR HISTORY — BACKTEST PARITY)
-            # -------------------------------------------------------
-            _raw_history = self._bar_history[symbol]
-            _real_history = [b for b in _raw_history if not (
-                b.get("volume", 0) == 0 and
-                b.get("high") == b.get("low") == b.get("open") == b.get("close")
-            )]
-            window_5m = pd.DataFrame(_real_history if _real_history else _raw_history)
-
-            # convert to R
-            position["mfe_r"] = position["MFE"] / R
-
-            # ONLY for reporting (not exit logic anymore)
-            if side == 1:
-                position["pnl_r"] = (c - entry_price) / R
-            else:
-                position["pnl_r"] = (entry_price - c) / R
-
-            exit_reason = None
-            fill_price  = None
-
-            def try_exit(reason, price=None):
-                nonlocal exit_reason, fill_price
-                if exit_reason is None:
-                    exit_reason = reason
-                    if price is not None:
-                        fill_price = price
-
-            # ===================================================
-            # STAGE 2 — EXPANSION (>90m)
-            # Backtest: opposite_impulse again (labeled momentum_decay)
-            # ===================================================
-            if not skip_exit_checks:
-                atr_for_trail = atr_5m if atr_5m and not pd.isna(atr_5m) and atr_5m > 0 else (atr * 0.20 if atr else None)
-                self._update_dynamic_stop(position, trail_price, atr_for_trail, side)
-
-                # if self._stealth_distribution_exit(window_5m, position, side):
-                #     try_exit("stealth_distrib", current_price)
-
-                # if self._momentum_decay_exit(position):
-                #     try_exit("momentum_decay", current_price)
-
-                # ── DOMINANCE EXIT (was zero_mfe_exit) ──────────────
-                # Backtest uses mae_r > 0.50 and name "dominance_exit".
-                # Threshold and name aligned.
-                _bars = position.get("bars_in_trade", 0)
-                mfe_r_now = position.get("mfe_r", 0.0)
-                _price_mfe = position.get("MFE", 0.0) / position.get("units", 1) if position.get("units", 0) > 0 else position.get("MFE", 0.0)
-                _mae_r = abs(position.get("MAE", 0.0)) / R if R > 0 else 0.0
+                observe(state, h, l, c)
+                state.to_position(position)
+
+                # trail anchored to MFE price (best price ever seen)
+                new_stop = trail_stop(state, self, c, atr_5m, atr)
+                position["last_trail_bar"] = state.last_trail_bar
+                if new_stop is not None:
+                    self._update_dynamic_stop(position, new_stop)
+                    state.stop = position["stop_loss"]
+
+                # -------------------------------------------------------
+                # 5M WINDOW — a view of the ring, no copy unless
+                # flat zero-volume bars have to be dropped
+                # -------------------------------------------------------
+                window = self._bar_history[symbol].window()
+                _flat = (
+                    (window["volume"] == 0)
+                    & (window["high"] == window["low"])
+                    & (window["low"] == window["open"])
+                    & (window["open"] == window["close"])
+                )
+                if _flat.any() and not _flat.all():
+                    window = window[~_flat]
 
                 # ── EXIT FILTER AUDIT (live — every bar) ─────────────
                 from strategy.exit_audit import format_exit_audit
-                _mae_r_live = abs(position.get("MAE", 0.0)) / R if R > 0 else 0.0
                 _atr_5m_live = atr_5m if atr_5m and not pd.isna(atr_5m) and atr_5m > 0 else None
                 _tg_debug(format_exit_audit(
                     symbol=symbol,
                     side=side,
-                    bars=_bars,
-                    mfe_r=mfe_r_now,
-                    pnl_r=position.get("pnl_r", 0.0),
-                    mae_r=_mae_r_live,
+                    bars=state.bars,
+                    mfe_r=state.mfe_r,
+                    pnl_r=state.pnl_r,
+                    mae_r=abs(state.mae) / R,
                     bar_open=o,
                     bar_high=h,
                     bar_low=l,
                     bar_close=c,
                     stop_loss=position["stop_loss"],
-                    initial_stop=position.get("initial_stop", position["stop_loss"]),
+                    initial_stop=state.initial_stop,
                     R=R,
                     atr_5m=_atr_5m_live,
-                    window_5m=window_5m,
+                    window_5m=window,
                 ))
-                
-                # ── DISASTER STOP (bars 1–3, partial-bar aware) ──────────
-                # The only exit that reads real intrabar extremes from the
-                # forming candle. All other exits stay on closed-bar data.
-                # intrabar_high/low are injected by the placeholder in
-                # hourly_runner — on closed bars those columns are absent
-                # so it falls back to the normal h/l (same result).
-                #
-                # Scenario A — pure loser (mfe_r < 0.15):
-                #   No edge shown at all. 0% recovery rate in audit.
-                #
-                # Scenario B — violent rejection (mfe_r 0.15–0.5):
-                #   Had real promise, collapsed hard within 6 bars of peak.
-                #   >6 bars excluded — slow grinds are not violent rejections.
-                if exit_reason is None and _bars <= 6:
-                    _entry        = position["entry_price"]
-                    _initial_stop = position.get("initial_stop", position["stop_loss"])
-                    _R            = abs(_entry - _initial_stop) or 1e-9
-                    _mfe_peak_bar    = position.get("last_mfe_bar", 0)
-                    _bars_since_peak = _bars - _mfe_peak_bar
-
-                    # Detect whether this is a forming bar (placeholder) or
-                    # a closed bar. On a placeholder: volume=0, h==l==o==c,
-                    # but intrabar_high/low carry the real exchange extremes.
-                    # On a closed bar: intrabar columns are absent, falls back
-                    # to h/l which are identical to the real extremes anyway.
-                    _has_intrabar = (
-                        "intrabar_low" in current_5m_row.index
-                        and "intrabar_high" in current_5m_row.index
-                        and not pd.isna(current_5m_row.get("intrabar_low"))
-                        and not pd.isna(current_5m_row.get("intrabar_high"))
-                    )
-                    _raw_intrabar_low  = current_5m_row.get("intrabar_low",  None)
-                    _raw_intrabar_high = current_5m_row.get("intrabar_high", None)
-                    # .get() returns NaN for existing-but-NaN columns — treat NaN as absent
-                    _real_low  = float(_raw_intrabar_low)  if _raw_intrabar_low  is not None and not pd.isna(_raw_intrabar_low)  else l
-                    _real_high = float(_raw_intrabar_high) if _raw_intrabar_high is not None and not pd.isna(_raw_intrabar_high) else h
-                    _data_source = "PARTIAL_BAR" if _has_intrabar and _is_placeholder_bar else "CLOSED_BAR"
-
-                    _intrabar_pnl_r = (
-                        (_real_low  - _entry) / _R if side == 1
-                        else (_entry - _real_high) / _R
-                    )
 
-                    # Close-based pnl_r for comparison — shows exactly how
-                    # much earlier the partial data fires vs waiting for close
-                    _close_pnl_r = (
-                        (c - _entry) / _R if side == 1
-                        else (_entry - c) / _R
-                    )
-
-                    # On placeholder bars, MFE/MAE were computed from flat OHLC
-                    # (h==l==o==c==open), so mfe_r_now is stale. Recompute it
-                    # from real intrabar extremes before evaluating scenarios.
-                    # This is critical for scenario_b's mfe_r range check.
-                    if _is_placeholder_bar and _has_intrabar:
-                        _intrabar_mfe = (
-                            max(0.0, _real_high - _entry) if side == 1
-                            else max(0.0, _entry - _real_low)
-                        )
-                        mfe_r_now = max(mfe_r_now, _intrabar_mfe / _R)
-
-                    _scenario_a = mfe_r_now < 0.15 and _intrabar_pnl_r <= -0.6
-                    _scenario_b = (
-                        0.15 <= mfe_r_now < 0.5
-                        and _intrabar_pnl_r <= -0.6
-                        and _bars_since_peak <= 6
-                    )
-
-                    # Always log disaster stop evaluation on bars 1–3 so we
-                    # can confirm partial data is being read and how far it
-                    # is from the threshold — even when it doesn't fire.
-                    _tg_debug(
-                        f"[DISASTER_STOP_EVAL] {symbol} | bar={_bars} | {_data_source}\n"
-                        f"side={'L' if side == 1 else 'S'} | "
-                        f"entry={_entry:.5f} | "
-                        f"real_low={_real_low:.5f} real_high={_real_high:.5f}\n"
-                        f"intrabar_pnl_r={_intrabar_pnl_r:.3f} | "
-                        f"close_pnl_r={_close_pnl_r:.3f} | "
-                        f"mfe_r={mfe_r_now:.3f}\n"
-                        f"scenario_a={_scenario_a} (need mfe_r<0.15 + pnl_r<=-0.6) | "
-                        f"scenario_b={_scenario_b} (need 0.15<=mfe_r<0.5 + pnl_r<=-0.6 + bars_since_peak<=6)\n"
-                        f"partial_advantage={(_close_pnl_r - _intrabar_pnl_r):.3f}R "
-                        f"({'partial fires, close would NOT' if _intrabar_pnl_r <= -0.6 and _close_pnl_r > -0.6 else 'both same' if abs(_close_pnl_r - _intrabar_pnl_r) < 0.001 else 'both fire' if _intrabar_pnl_r <= -0.6 and _close_pnl_r <= -0.6 else 'neither fires'})"
-                    )
-
-                    if _scenario_a or _scenario_b:
-                        _which = "A_pure_loser" if _scenario_a else "B_violent_rejection"
-                        _fill  = _real_low if side == 1 else _real_high
-                        _tg_debug(
-                            f"[DISASTER_STOP 🔥FIRED] {symbol} | scenario={_which} | {_data_source}\n"
-                            f"mfe_r={mfe_r_now:.3f} intrabar_pnl_r={_intrabar_pnl_r:.3f} "
-                            f"close_pnl_r={_close_pnl_r:.3f}\n"
-                            f"bars={_bars} bars_since_peak={_bars_since_peak} | "
-                            f"fill={_fill:.5f}\n"
-                            f"partial_saved={'YES — would have waited for close' if _close_pnl_r > -0.6 else 'NO — close already past threshold'}"
-                        )
-                        print(
-                            f"[DISASTER_STOP] {symbol} | scenario={_which} | {_data_source} | "
-                            f"mfe_r={mfe_r_now:.3f} intrabar_pnl_r={_intrabar_pnl_r:.3f} "
-                            f"bars={_bars} bars_since_peak={_bars_since_peak} | "
-                            f"fill={_fill:.5f}"
-                        )
-                        try_exit("disaster_stop", _fill)
-
-                if exit_reason is None and _bars == 3 and mfe_r_now == 0.0 and _mae_r > 0.50:
-                    try_exit("dominance_exit", current_price)
-
-                # ── TRAP REJECTION EXIT ──────────────────────────────
-                # Fires in bars 1–2 when price gapped through the stop on
-                # a wick/spike (mae_r > 1.2) and adverse move is at least
-                # 4× the favorable move. Prevents holding blow-through bars.
-                if exit_reason is None and _bars <= 2 and _mae_r > 1.2:
-                    _trap_ratio = _mae_r / max(mfe_r_now, 0.05)
-                    if _trap_ratio > 4.0:
-                        try_exit("trap_rejection", current_price)
-
-                # ── THESIS INVALIDATION EXIT ─────────────────────────
-                # Trade showed real but limited promise (0.15–0.5R MFE),
-                # is now meaningfully underwater, and is within 0.25R of
-                # the original stop. Exit before the stop confirms failure.
-                if exit_reason is None and 0.15 <= mfe_r_now < 0.5:
-                    pnl_r_now = position.get("pnl_r", 0.0)
-                    if side == 1:
-                        stop_proximity_r = (current_price - position.get("initial_stop", position["stop_loss"])) / R
-                    else:
-                        stop_proximity_r = (position.get("initial_stop", position["stop_loss"]) - current_price) / R
-                    drawdown_from_peak = mfe_r_now - pnl_r_now
-                    if pnl_r_now < -0.10 and stop_proximity_r < 0.25 and drawdown_from_peak > 0.35:
-                        try_exit("thesis_invalidation_exit", current_price)
-
-                # ── STOP PROXIMITY EXIT ──────────────────────────────
-                if exit_reason is None and mfe_r_now < 0.5:
-                    pnl_r_now = position.get("pnl_r", 0.0)
-                    if pnl_r_now < -0.35:
-                        # Use close price for proximity — consistent with
-                        # pnl_r which is also close-based. Using current_price
-                        # (bar high for longs) gives a misleadingly comfortable
-                        # reading when close is already near the stop.
-                        initial_stop = position.get("initial_stop", position["stop_loss"])
-                        if side == 1:
-                            prox_r = (c - initial_stop) / R
-                        else:
-                            prox_r = (initial_stop - c) / R
-                        if prox_r < 0.20:
-                            try_exit("stop_proximity_exit", current_price)
-
-                if exit_reason is None and self._opposite_impulse_exit(window_5m, side, position):
-                    try_exit("opposite_impulse", current_price)
-
-                # ===================================================
-                # HARD STOP — always last
-                # ===================================================
-                if side == 1 and l <= position["stop_loss"]:
-                    try_exit("stop_loss", position["stop_loss"])
-                elif side == -1 and h >= position["stop_loss"]:
-                    try_exit("stop_loss", position["stop_loss"])
-
-                if exit_reason:
-                    if fill_price is None:
-                        fill_price = float(current_5m_row["close"])
+                # The disaster stop is the only exit that reads real
+                # intrabar extremes from the forming candle. intrabar_high/low
+                # are injected by the placeholder in hourly_runner — on
+                # closed bars those columns are absent so it falls back to
+                # the normal h/l (same result).
+                _raw_intrabar_low  = current_5m_row.get("intrabar_low",  None)
+                _raw_intrabar_high = current_5m_row.get("intrabar_high", None)
+                # .get() returns NaN for existing-but-NaN columns — treat NaN as absent
+                _has_intrabar = (
+                    _raw_intrabar_low is not None and not pd.isna(_raw_intrabar_low)
+                    and _raw_intrabar_high is not None and not pd.isna(_raw_intrabar_high)
+                )
+                _real_low  = float(_raw_intrabar_low)  if _has_intrabar else None
+                _real_high = float(_raw_intrabar_high) if _has_intrabar else None
+                _data_source = "PARTIAL_BAR" if _has_intrabar and _is_placeholder_bar else "CLOSED_BAR"
+
+                hit = check_exits(
+                    state, h, l, c, window, 0, len(window),
+                    real_low=_real_low, real_high=_real_high,
+                    trace=lambda name, info: self._trace_exit(symbol, position, state, _data_source, name, info),
+                )
 
+                if hit is not None:
+                    exit_reason, fill_price = hit
                     closed = self._close(symbol, fill_price, current_ts, exit_reason)
 
                     return {"state": "CLOSED", "exit": closed}
@@ -559,7 +358,9 @@ class PositionManager:
             # (fresh cron tick or resync) gets the full window.
             # Without this, every new instance rebuilds from lltf_df
             # and gets a 1-2 bar window, permanently breaking OIE.
-            if self.persist:
+            # A resident instance keeps the window in memory, so it
+            # leaves this to the periodic snapshot in flush().
+            if self.persist and not self.snapshot_interval:
                 self._save()
         
         # =====================================================
@@ -679,15 +480,12 @@ class PositionManager:
 
             if new_pos:
                 # initialize bar history with entry candle
-                self._bar_history[symbol] = [{
-                    "open": o,
-                    "high": h,
-                    "low":  l,
-                    "close": c,
-                    "volume": _bar_volume,
-                    "ATR": atr,
-                    "ts": current_ts,
-                }]
+                ring = BarRing()
+                ring.push(
+                    pd.Timestamp(current_ts).value, o, h, l, c, _bar_volume, atr,
+                    float(current_5m_row["ATR_5M"]) if "ATR_5M" in current_5m_row.index and not pd.isna(current_5m_row["ATR_5M"]) else None,
+                )
+                self._bar_history[symbol] = ring
 
                 return {"state": "OPEN", "position": new_pos}
 
@@ -776,97 +574,53 @@ class PositionManager:
 
             return near_low and failing_to_push
 
-    def _opposite_impulse_exit(self, window: pd.DataFrame, side: int, position: dict) -> bool:
-        if len(window) < 3:
-            _tg_debug(f"[OIE] SKIP — window too short ({len(window)})")
-            return False
-
-        last = window.iloc[-1]
-
-        # ══════════════════════════════════════════
-        # 1. ATR
-        # ══════════════════════════════════════════
-        if "ATR_5M" in window.columns:
-            atr = window["ATR_5M"].iloc[-3:].mean()
-            if pd.isna(atr) or atr <= 0:
-                atr = window["ATR_5M"].iloc[0]
-        else:
-            atr = None
-
-        if atr is None or pd.isna(atr) or atr <= 0:
-            atr_1h = window["ATR"].iloc[-3:].mean()
-            if pd.isna(atr_1h) or atr_1h <= 0:
-                atr_1h = window["ATR"].iloc[0]
-            if pd.isna(atr_1h) or atr_1h <= 0:
-                _tg_debug(f"[OIE] SKIP — no valid ATR (window_len={len(window)})")
-                return False
-            atr = atr_1h * 0.20
-
-        # ══════════════════════════════════════════
-        # 2. BODY SIZE
-        # ══════════════════════════════════════════
-        body = abs(last["close"] - last["open"])
-        two_bar_move = abs(window.iloc[-1]["close"] - window.iloc[-2]["close"]) if len(window) >= 2 else 0
-        big_candle = (body > atr * 1.2) or (two_bar_move > atr * 1.5 and body > atr * 0.6)
-
-        # ══════════════════════════════════════════
-        # 3. DIRECTION CHECK
-        # ══════════════════════════════════════════
-        if side == 1:
-            wrong_direction = last["close"] < last["open"]
-        else:
-            wrong_direction = last["close"] > last["open"]
-
-        # ══════════════════════════════════════════
-        # 4. CLOSE LOCATION
-        # Anchored to initial_stop (not the live trailing stop) so the
-        # guard doesn't drift as the trail tightens — mirrors the fix
-        # applied in SignalBacktester.opposite_impulse_exit().
-        # ══════════════════════════════════════════
-        entry        = position["entry_price"]
-        initial_stop = position.get("initial_stop", position["stop_loss"])
-        R            = abs(entry - initial_stop)
-
-        if R == 0:
-            location_blocked = False
-        else:
-            mfe_r    = position.get("mfe_r", 0.0)
-            pnl_r_now = position.get("pnl_r", 0.0)
-            # Distance from initial_stop in R-units — always pnl_r + 1.0
-            # (side-corrected, so this holds for both long and short).
-            close_to_initial_stop_r = pnl_r_now + 1.0
-            location_blocked = (close_to_initial_stop_r > 1.75 and pnl_r_now > 0.0)
-
-        # ══════════════════════════════════════════
-        # 5. VOLUME CONFIRMATION
-        # ══════════════════════════════════════════
-        vol_blocked = False
-        avg_vol = float("nan")
-        last_vol = last.get("volume", float("nan")) if hasattr(last, "get") else last["volume"]
-        if "volume" in window.columns:
-            avg_vol = window["volume"].iloc[-10:].mean()
-            last_vol = last["volume"]
-            if len(window) >= 10 and not pd.isna(avg_vol) and avg_vol > 0:
-                if last_vol < avg_vol * 0.8:
-                    vol_blocked = True
-
-        # ══════════════════════════════════════════
-        # LOG EVERY BAR
-        # ══════════════════════════════════════════
-        fired = big_candle and wrong_direction and not location_blocked and not vol_blocked
-        symbol = position.get("symbol", "?")
-        bars   = position.get("bars_in_trade", "?")
-        mfe_r  = position.get("mfe_r", 0.0)
-
-        _tg_debug(
-            f"[OIE] {symbol} bar={bars} | {'🔥FIRED' if fired else 'miss'}\n"
-            f"o={last['open']:.6f} c={last['close']:.6f} | "
-            f"body={body:.6f} atr={atr:.6f} thr={atr*1.2:.6f} big={big_candle}\n"
-            f"wrong_dir={wrong_direction} | "
-            f"vol: last={last_vol:.0f} avg={avg_vol:.0f} wlen={len(window)} vol_block={vol_blocked}"
-        )
-
-        return fired
+    def _trace_exit(self, symbol, position, state, data_source, name, info):
+        """exit_engine trace callback — the per-bar Telegram debug lines."""
+        side = position["direction"]
+        if name == "disaster":
+            # Always log disaster stop evaluation on bars 1–6 so we can
+            # confirm partial data is being read and how far it is from
+            # the threshold — even when it doesn't fire.
+            worst, close_r = info["worst_pnl_r"], info["close_pnl_r"]
+            _tg_debug(
+                f"[DISASTER_STOP_EVAL] {symbol} | bar={state.bars} | {data_source}\n"
+                f"side={'L' if side == 1 else 'S'} | "
+                f"entry={state.entry:.5f} | "
+                f"real_low={info['low']:.5f} real_high={info['high']:.5f}\n"
+                f"intrabar_pnl_r={worst:.3f} | "
+                f"close_pnl_r={close_r:.3f} | "
+                f"mfe_r={info['mfe_r']:.3f}\n"
+                f"scenario_a={info['scenario_a']} (need mfe_r<0.15 + pnl_r<=-0.6) | "
+                f"scenario_b={info['scenario_b']} (need 0.15<=mfe_r<0.5 + pnl_r<=-0.6 + bars_since_peak<=6)\n"
+                f"partial_advantage={(close_r - worst):.3f}R "
+                f"({'partial fires, close would NOT' if worst <= -0.6 and close_r > -0.6 else 'both same' if abs(close_r - worst) < 0.001 else 'both fire' if worst <= -0.6 and close_r <= -0.6 else 'neither fires'})"
+            )
+            if info["fired"]:
+                which = "A_pure_loser" if info["scenario_a"] else "B_violent_rejection"
+                _tg_debug(
+                    f"[DISASTER_STOP 🔥FIRED] {symbol} | scenario={which} | {data_source}\n"
+                    f"mfe_r={info['mfe_r']:.3f} intrabar_pnl_r={worst:.3f} "
+                    f"close_pnl_r={close_r:.3f}\n"
+                    f"bars={state.bars} bars_since_peak={info['bars_since_peak']} | "
+                    f"fill={info['fill']:.5f}\n"
+                    f"partial_saved={'YES — would have waited for close' if close_r > -0.6 else 'NO — close already past threshold'}"
+                )
+                print(
+                    f"[DISASTER_STOP] {symbol} | scenario={which} | {data_source} | "
+                    f"mfe_r={info['mfe_r']:.3f} intrabar_pnl_r={worst:.3f} "
+                    f"bars={state.bars} bars_since_peak={info['bars_since_peak']} | "
+                    f"fill={info['fill']:.5f}"
+                )
+        elif name == "oie_skip":
+            _tg_debug(f"[OIE] SKIP — {info['reason']} (window_len={info['window']})")
+        elif name == "oie":
+            _tg_debug(
+                f"[OIE] {symbol} bar={state.bars} | {'🔥FIRED' if info['fired'] else 'miss'}\n"
+                f"o={info['open']:.6f} c={info['close']:.6f} | "
+                f"body={info['body']:.6f} atr={info['atr']:.6f} thr={info['atr']*1.2:.6f} big={info['big_candle']}\n"
+                f"wrong_dir={info['wrong_direction']} | "
+                f"vol: last={info['last_vol']:.0f} avg={info['avg_vol']:.0f} wlen={info['window']} vol_block={info['vol_blocked']}"
+            )
 
     def _stop_pressure_exit(
         self, window: pd.DataFrame, stop_price: float, side: int, R: float
@@ -885,92 +639,50 @@ class PositionManager:
             return False
         return mfe_r < self.NO_FOLLOW_MFE
 
-    def _update_dynamic_stop(self, position, current_price, atr, side):
-        mfe_r = position["mfe_r"]
-
-        # Activate at 0.3R — early enough to catch the bar-3 peak,
-        # late enough to survive normal 5m entry noise.
-        if mfe_r < 0.5: # change to 0.5
-            return
-
-        bars = position.get("bars_in_trade", 0)
-        last_trail_bar = position.get("last_trail_bar", 0)
-
-        # Faster cadence once in profit — every 1 bar after 0.5R,
-        # every 2 bars before (avoids instant breakeven stops).
-        cadence = 1 if mfe_r >= 0.5 else 2
-        if bars - last_trail_bar < cadence:
-            return
-        position["last_trail_bar"] = bars
-
-        entry = position["entry_price"]
+    def _update_dynamic_stop(self, position, new_stop):
+        """Apply a trail move from exit_engine.trail_stop()."""
         current_stop = position["stop_loss"]
 
-        if mfe_r >= 1.0:
-            atr_mult = self.ATR_AFTER_ONE_R
-        elif mfe_r >= 0.5:
-            atr_mult = self.ATR_AFTER_HALF_R
-        else:
-            atr_mult = self.ATR_AFTER_ENTRY
-
-        # ATR multipliers stay exactly as configured. We just make sure
-        # the distance we compute is never tighter than what Binance will
-        # actually allow — taking the max means our own number already
-        # respects the exchange floor, so amend_stop's clamp almost never
-        # has to silently override what we send.
-        floor_distance = current_price * self.BINANCE_CALLBACK_FLOOR_PCT
-        atr_distance    = atr * atr_mult
-        trail_distance  = max(atr_distance, floor_distance)
-
-        if side == 1:
-            trail_candidate = current_price - trail_distance
-            # Breakeven lock only once 0.5R is secured
-            if mfe_r >= 0.5:
-                trail_candidate = max(trail_candidate, entry)
-            new_stop = max(current_stop, trail_candidate)
-        else:
-            trail_candidate = current_price + trail_distance
-            if mfe_r >= 0.5:
-                trail_candidate = min(trail_candidate, entry)
-            new_stop = min(current_stop, trail_candidate)
-
-        if new_stop != current_stop:
-            # ── BINANCE STOP AMENDMENT ─────────────────────────────
-            # Attempt the exchange-side amend FIRST. Only update local
-            # state if it actually succeeds — otherwise position["stop_loss"]
-            # would claim the trail moved while the real stop on Binance
-            # is still sitting at the old, looser price. That mismatch
-            # would make the local hard_stop check (which uses
-            # position["stop_loss"]) fire/skip based on a price the
-            # exchange isn't actually protecting against.
-            if _EXECUTION_ENABLED and self._is_live:
-                try:
-                    new_stop_result = _binance_amend_stop(
-                        symbol=position["symbol"],
-                        direction=side,
-                        quantity=position.get("quantity", 0),
-                        new_stop_price=new_stop,
-                        existing_stop_order_id=position.get("binance_stop_order_id"),
-                        trade_id=position.get("trade_id"),
-                    )
-                    position["binance_stop_order_id"] = new_stop_result["order"].get("algoId")
-                    # Use the ACTUAL exchange price, not the value we sent in —
-                    # amend_stop may have clamped it. Writing `new_stop` here
-                    # would desync local state from what's really live.
-                    position["stop_loss"] = new_stop_result["actual_stop_price"]
-                    position["trailing_activated"] = True
-                except BinanceExecutionError as e:
-                    _tg_debug(
-                        f"[BINANCE STOP AMEND FAILED] {position['symbol']} — {e}\n"
-                        f"Local stop_loss NOT updated — staying at {current_stop} "
-                        f"to match what's actually live on the exchange."
-                    )
-            else:
-                # No live execution — paper/backtest-parity mode, just
-                # update local state since there's no exchange order to sync.
-                position["stop_loss"] = new_stop
+        # ── BINANCE STOP AMENDMENT ─────────────────────────────
+        # Attempt the exchange-side amend FIRST. Only update local
+        # state if it actually succeeds — otherwise position["stop_loss"]
+        # would claim the trail moved while the real stop on Binance
+        # is still sitting at the old, looser price. That mismatch
+        # would make the local hard_stop check (which uses
+        # position["stop_loss"]) fire/skip based on a price the
+        # exchange isn't actually protecting against.
+        if _EXECUTION_ENABLED and self._is_live:
+            try:
+                new_stop_result = _binance_amend_stop(
+                    symbol=position["symbol"],
+                    direction=position["direction"],
+                    quantity=position.get("quantity", 0),
+                    new_stop_price=new_stop,
+                    existing_stop_order_id=position.get("binance_stop_order_id"),
+                    trade_id=position.get("trade_id"),
+                )
+                position["binance_stop_order_id"] = new_stop_result["order"].get("algoId")
+                # Use the ACTUAL exchange price, not the value we sent in —
+                # amend_stop may have clamped it. Writing `new_stop` here
+                # would desync local state from what's really live.
+                position["stop_loss"] = new_stop_result["actual_stop_price"]
                 position["trailing_activated"] = True
-            # ────────────────────────────────────────────────────────
+                # the old stop order id is gone on the exchange — never
+                # leave it to a deferred snapshot
+                if self.persist:
+                    self._save()
+            except BinanceExecutionError as e:
+                _tg_debug(
+                    f"[BINANCE STOP AMEND FAILED] {position['symbol']} — {e}\n"
+                    f"Local stop_loss NOT updated — staying at {current_stop} "
+                    f"to match what's actually live on the exchange."
+                )
+        else:
+            # No live execution — paper/backtest-parity mode, just
+            # update local state since there's no exchange order to sync.
+            position["stop_loss"] = new_stop
+            position["trailing_activated"] = True
+        # ────────────────────────────────────────────────────────
 
     # --------------------------------------------------
     # OPEN / CLOSE
@@ -1262,15 +974,26 @@ class PositionManager:
     def has_open_position(self, symbol: str) -> bool:
         return symbol in self.positions
     
-    def flush(self):
-        """Persist state to disk only if something changed."""
+    def flush(self, force=False):
+        """
+        Persist state to disk only if something changed. With
+        snapshot_interval set (the resident scheduler), routine flushes
+        are coalesced into at most one write per interval; force=True
+        writes now. Opens, closes and exchange stop amends call _save()
+        directly and are never deferred.
+        """
         if not self.persist:
             return
-        if not self._dirty:
-            return
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time.time()
+            if not force and self.snapshot_interval and now - self._last_flush < self.snapshot_interval:
+                return
 
-        self._save()
-        self._dirty = False
+            self._save()
+            self._dirty = False
+            self._last_flush = now
 
     # --------------------------------------------------
     # PERSISTENCE
@@ -1289,19 +1012,26 @@ class PositionManager:
         # BAR HISTORY
         if os.path.exists(BAR_HISTORY_FILE):
             try:
-                with open(BAR_HISTORY_FILE, "r") as f:
+                with np.load(BAR_HISTORY_FILE) as saved:
+                    self._bar_history = {
+                        sym: BarRing(rows=saved[sym]) for sym in saved.files if sym in self.positions
+                    }
+            except (OSError, ValueError, KeyError):
+                print(f"[WARN] Corrupted bar history file — starting fresh")
+                self._bar_history = {}
+        elif os.path.exists(LEGACY_BAR_HISTORY_FILE):
+            # one-time migration from the old list-of-dicts JSON
+            try:
+                with open(LEGACY_BAR_HISTORY_FILE, "r") as f:
                     content = f.read().strip()
                 raw = json.loads(content) if content else {}
-                # re-cast ts strings back to pd.Timestamp (lost on JSON round-trip)
                 for sym, bars in raw.items():
-                    for bar in bars:
-                        if "ts" in bar and isinstance(bar["ts"], str):
-                            try:
-                                bar["ts"] = pd.Timestamp(bar["ts"])
-                            except Exception:
-                                pass
-                self._bar_history = raw
-            except (json.JSONDecodeError, ValueError):
+                    if sym not in self.positions:
+                        continue
+                    frame = pd.DataFrame(bars)
+                    frame.index = pd.to_datetime(frame.pop("ts"), utc=True) if bars else pd.DatetimeIndex([], tz="UTC")
+                    self._bar_history[sym] = BarRing(rows=_history_rows(frame, None))
+            except (json.JSONDecodeError, ValueError, KeyError):
                 print(f"[WARN] Corrupted bar history file — starting fresh")
                 self._bar_history = {}
 
@@ -1374,9 +1104,11 @@ class PositionManager:
             json.dump(self.positions, f, indent=2, default=str)
         os.replace(POSITIONS_FILE + ".tmp", POSITIONS_FILE)
 
-        with open(BAR_HISTORY_FILE + ".tmp", "w") as f:
-            json.dump(self._bar_history, f, indent=2, default=str)
+        with open(BAR_HISTORY_FILE + ".tmp", "wb") as f:
+            np.savez(f, **{sym: ring.window() for sym, ring in self._bar_history.items()})
         os.replace(BAR_HISTORY_FILE + ".tmp", BAR_HISTORY_FILE)
+        if os.path.exists(LEGACY_BAR_HISTORY_FILE):
+            os.remove(LEGACY_BAR_HISTORY_FILE)
 
         with open(ENTRY_TS_FILE + ".tmp", "w") as f:
             json.dump(
@@ -0,0 +1,427 @@
+"""
+Parallel parameter sweep for SignalBacktester.
+
+Runs every (configuration × symbol) pair of a parameter sweep in a
+process pool and collects one summary row per run in a columnar results
+table, instead of editing main.py and rerunning one config at a time.
+
+  - configurations come from a full grid, a uniform random sample or a
+    Latin-hypercube sample over value lists / (low, high) ranges.
+  - a parameter is either a SignalBacktester constructor argument the
+    run path uses (atr_mult, leverage, fee, fixed_risk_per_trade) or a
+    trail constant exit_engine.trail_stop reads (ATR_AFTER_HALF_R,
+    ATR_AFTER_ONE_R, BINANCE_CALLBACK_FLOOR_PCT), set on the instance.
+    Anything else is rejected. NO_FOLLOW_MFE and INCUBATION_BARS are
+    not wired into the exit engine, so sweeping them would change
+    nothing.
+  - the 1H signal frame (generate_signal, computed once per symbol, or
+    one generate_signal_panel pass over all missing symbols with
+    --signal-engine panel) and the 5m bars are snapshotted into a
+    FeatureStore under <out>/arrays.
+    Workers open them as memory-mapped views, so every process shares
+    the same page-cache copy and nothing is re-derived per config.
+  - results are appended to <out>/results/part-NNNNN.parquet in batches.
+    Rerunning the same command resumes: finished (config, symbol) pairs
+    are skipped and the arrays snapshot is reused.
+
+Signal-stage thresholds (validated_breakouts and friends) change
+final_signal itself, so they are not sweep parameters here — sweep them
+by snapshotting one arrays directory per signal variant.
+
+USAGE:
+    python sweep.py --symbols ETHUSDT SOLUSDT --grid ATR_AFTER_HALF_R=0.45,0.55,0.65 --grid leverage=1,2
+    python sweep.py --symbols ETHUSDT --lhs 64 --range ATR_AFTER_HALF_R=0.3:0.8 --range atr_mult=1.2:2.0 --seed 7
+    python sweep.py --symbols ETHUSDT --random 32 --range atr_mult=1.0:2.5 --out data/sweeps/atr --workers 4
+    python sweep.py --symbols ETHUSDT SOLUSDT BTCUSDT --signal-engine panel --grid atr_mult=1.2,1.5,1.8
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from backtest import SignalBacktester
+from data_pipeline.feature_store import FeatureStore
+
+DEFAULT_OUT   = "data/sweeps/default"
+SIGNAL_ENGINES = ("serial", "panel")
+CANDLE_CACHE  = "data/backtest_cache"      # what main.py fetches into
+ARRAYS_DIR    = "arrays"
+RESULTS_DIR   = "results"
+MANIFEST_FILE = "sweep.json"
+
+SIGNAL_COLUMNS = ["open", "high", "low", "close", "volume", "final_signal"]
+BAR_COLUMNS    = ["open", "high", "low", "close", "volume"]
+
+# Only parameters SignalBacktester.run() actually reads are sweepable
+CTOR_PARAMS  = ("atr_mult", "leverage", "fee", "fixed_risk_per_trade")
+CLASS_PARAMS = ("ATR_AFTER_HALF_R", "ATR_AFTER_ONE_R", "BINANCE_CALLBACK_FLOOR_PCT")
+
+
+# ==========================================================
+# PARAMETER SPACES
+# ==========================================================
+# space: {name: [v1, v2, ...]}  — discrete values
+#        {name: (low, high)}    — range (ints when both bounds are ints)
+# parameter_grid() only takes value lists.
+
+def parameter_grid(space: dict) -> list:
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+
+def _draw(spec, u):
+    """Map uniforms u in [0, 1) onto a value list or (low, high) range."""
+    if isinstance(spec, tuple):
+        low, high = spec
+        if isinstance(low, int) and isinstance(high, int):
+            return [int(v) for v in np.floor(low + u * (high - low + 1))]
+        return [float(v) for v in low + u * (high - low)]
+    return [spec[int(i)] for i in np.floor(u * len(spec))]
+
+
+def random_sample(space: dict, n: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    columns = {name: _draw(spec, rng.random(n)) for name, spec in space.items()}
+    return [{name: columns[name][i] for name in space} for i in range(n)]
+
+
+def latin_hypercube(space: dict, n: int, seed: int = 0) -> list:
+    """n samples; each parameter's range is cut into n strata, one sample per stratum."""
+    rng = np.random.default_rng(seed)
+    columns = {
+        name: _draw(spec, (rng.permutation(n) + rng.random(n)) / n)
+        for name, spec in space.items()
+    }
+    return [{name: columns[name][i] for name in space} for i in range(n)]
+
+
+def config_id(params: dict) -> str:
+    """Stable id of a configuration — the resume key together with the symbol."""
+    blob = json.dumps(params, sort_keys=True, default=float)
+    return hashlib.sha1(blob.encode()).hexdigest()[:12]
+
+
+def validate_params(params: dict):
+    unknown = [n for n in params if n not in CTOR_PARAMS and n not in CLASS_PARAMS]
+    if unknown:
+        raise ValueError(
+            f"sweep: {unknown} not sweepable — use {list(CTOR_PARAMS) + list(CLASS_PARAMS)}"
+        )
+
+
+def build_backtester(h1: pd.DataFrame, m5: pd.DataFrame, params: dict) -> SignalBacktester:
+    ctor = {n: v for n, v in params.items() if n in CTOR_PARAMS}
+    bt = SignalBacktester(h1, lltf_df=m5, **ctor)
+    for name, value in params.items():
+        if name in CLASS_PARAMS:
+            setattr(bt, name, value)
+    return bt
+
+
+# ==========================================================
+# SHARED ARRAYS
+# ==========================================================
+def snapshot_symbol(arrays: FeatureStore, symbol: str, signals_1h: pd.DataFrame, bars_5m: pd.DataFrame):
+    """Store one symbol's 1H signal frame and 5m bars for the workers."""
+    arrays.write(f"{symbol}_1h", signals_1h[SIGNAL_COLUMNS].astype(float))
+    arrays.write(f"{symbol}_5m", bars_5m[BAR_COLUMNS].astype(float))
+
+
+def _has_snapshot(arrays: FeatureStore, symbol: str) -> bool:
+    return arrays.meta(f"{symbol}_1h") is not None and arrays.meta(f"{symbol}_5m") is not None
+
+
+def _cached_candles(symbol: str, cache_dir: str):
+    """Closed 1H / 4H bars and the stored 5m bars of a symbol."""
+    from data_pipeline.candle_store import CandleStore
+
+    candles = CandleStore(cache_dir)
+    now = pd.Timestamp.now(tz="UTC")
+    ltf = candles.read(symbol, "1h")
+    htf = candles.read(symbol, "4h")
+    m5 = candles.mmap(symbol, "5m")
+    if ltf is None or htf is None or m5 is None:
+        raise ValueError(f"sweep: {symbol} has no 5m/1h/4h candles in {cache_dir}")
+    return ltf[ltf.index < now.floor("h")].copy(), htf[htf.index < now.floor("4h")].copy(), m5
+
+
+def snapshot_from_cache(arrays_root: str, symbol: str, cache_dir: str = CANDLE_CACHE) -> str:
+    """
+    Build a symbol's snapshot from the backtest candle cache: closed
+    1H / 4H bars through generate_signal, 5m bars as stored. Skipped when
+    the snapshot already exists (resume).
+    """
+    from indicators.signal_cache import SignalCache
+
+    arrays = FeatureStore(arrays_root)
+    if _has_snapshot(arrays, symbol):
+        return symbol
+
+    ltf, htf, m5 = _cached_candles(symbol, cache_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        signals = SignalCache().generate_signal(ltf, htf, symbol=symbol)
+    snapshot_symbol(arrays, symbol, signals, m5)
+    return symbol
+
+
+def snapshot_panel_from_cache(arrays_root: str, symbols, cache_dir: str = CANDLE_CACHE) -> list:
+    """
+    snapshot_from_cache() for several symbols at once, with the 1H signal
+    frames from one generate_signals(engine="panel") pass. Symbols that
+    already have a snapshot are skipped.
+    """
+    from indicators.panel import generate_signals
+
+    arrays = FeatureStore(arrays_root)
+    symbols = [s for s in symbols if not _has_snapshot(arrays, s)]
+    candles = {s: _cached_candles(s, cache_dir) for s in symbols}
+    with contextlib.redirect_stdout(io.StringIO()):
+        signals = generate_signals(
+            {s: c[0] for s, c in candles.items()}, {s: c[1] for s, c in candles.items()}, engine="panel",
+        )
+    for symbol, (_, _, m5) in candles.items():
+        snapshot_symbol(arrays, symbol, signals[symbol], m5)
+    return symbols
+
+
+def build_snapshots(pool, arrays_root: str, symbols, cache_dir: str = CANDLE_CACHE,
+                    signal_engine: str = "serial"):
+    """
+    Snapshot every symbol that has none yet, on `pool`. Yields each
+    symbol once its arrays are ready. serial: one generate_signal per
+    symbol, spread over the workers; panel: a single panel pass.
+    """
+    if signal_engine not in SIGNAL_ENGINES:
+        raise ValueError(f"sweep: unknown signal engine {signal_engine!r} (expected one of {SIGNAL_ENGINES})")
+    arrays = FeatureStore(arrays_root)
+    missing = [s for s in symbols if not _has_snapshot(arrays, s)]
+    if not missing:
+        return
+    if signal_engine == "panel":
+        yield from pool.submit(snapshot_panel_from_cache, arrays_root, missing, cache_dir).result()
+    else:
+        yield from pool.map(snapshot_from_cache, [arrays_root] * len(missing), missing,
+                            [cache_dir] * len(missing))
+
+
+# ==========================================================
+# RESULTS TABLE
+# ==========================================================
+class SweepResults:
+    """Append-only parquet parts; (config_id, symbol) rows already present are done."""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._pending = []
+
+    def _parts(self) -> list:
+        return sorted(f for f in os.listdir(self.root) if f.startswith("part-") and f.endswith(".parquet"))
+
+    def read(self) -> pd.DataFrame:
+        parts = [pd.read_parquet(os.path.join(self.root, f)) for f in self._parts()]
+        return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+    def done(self) -> set:
+        parts = [pd.read_parquet(os.path.join(self.root, f), columns=["config_id", "symbol"]) for f in self._parts()]
+        return {(c, s) for part in parts for c, s in zip(part["config_id"], part["symbol"])}
+
+    def add(self, row: dict):
+        self._pending.append(row)
+
+    def flush(self):
+        if not self._pending:
+            return
+        path = os.path.join(self.root, f"part-{len(self._parts()):05d}.parquet")
+        pd.DataFrame(self._pending).to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+        self._pending = []
+
+
+# ==========================================================
+# WORKERS
+# ==========================================================
+_worker = {}
+
+
+def init_worker(arrays_root: str):
+    _worker["arrays"] = FeatureStore(arrays_root)
+    _worker["frames"] = {}
+
+
+def symbol_frames(symbol: str):
+    """(1H signal frame, 5m bars) of a snapshotted symbol, as memmap views."""
+    frames = _worker["frames"]
+    if symbol not in frames:
+        arrays = _worker["arrays"]
+        frames[symbol] = (arrays.view(f"{symbol}_1h"), arrays.view(f"{symbol}_5m"))
+    return frames[symbol]
+
+
+def max_drawdown_pct(equity: np.ndarray) -> float:
+    if len(equity) == 0:
+        return 0.0
+    peak = np.maximum.accumulate(equity)
+    return float(((equity - peak) / peak).min() * 100)
+
+
+def run_one(task) -> dict:
+    cid, symbol, params = task
+    h1, m5 = symbol_frames(symbol)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        out = build_backtester(h1, m5, params).run()
+
+    trades = out["trades"]
+    row = {"config_id": cid, "symbol": symbol}
+    row.update({f"p_{name}": value for name, value in params.items()})
+    row.update({k: v for k, v in out["summary"].items() if k != "initial_balance"})
+    row["max_drawdown_pct"] = max_drawdown_pct(out["equity_curve"]["equity"].to_numpy())
+    row["avg_pnl_r"] = float(trades["pnl_r"].mean()) if not trades.empty else 0.0
+    row["elapsed_s"] = round(time.perf_counter() - started, 3)
+    return row
+
+
+# ==========================================================
+# DRIVER
+# ==========================================================
+def _write_manifest(out_dir: str, symbols, configs: dict):
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    manifest = {"symbols": [], "configs": {}}
+    if os.path.exists(path):
+        with open(path) as f:
+            manifest = json.load(f)
+    manifest["symbols"] = sorted(set(manifest["symbols"]) | set(symbols))
+    manifest["configs"].update(configs)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, default=float)
+    os.replace(path + ".tmp", path)
+
+
+def run_sweep(out_dir: str, symbols, configs, workers: int = None, flush_every: int = 25,
+              cache_dir: str = CANDLE_CACHE, signal_engine: str = "serial") -> pd.DataFrame:
+    """
+    Run every config on every symbol and return the full results table
+    (including rows from earlier, interrupted runs of the same sweep).
+    Symbols without a snapshot under <out_dir>/arrays are built from
+    cache_dir first, with `signal_engine` (see build_snapshots).
+    """
+    for params in configs:
+        validate_params(params)
+    by_id = {config_id(p): p for p in configs}
+    arrays_root = os.path.join(out_dir, ARRAYS_DIR)
+    os.makedirs(arrays_root, exist_ok=True)
+    _write_manifest(out_dir, symbols, by_id)
+
+    results = SweepResults(os.path.join(out_dir, RESULTS_DIR))
+    done = results.done()
+    tasks = [(cid, s, p) for cid, p in by_id.items() for s in symbols if (cid, s) not in done]
+    print(f"[SWEEP] {len(by_id)} configs × {len(symbols)} symbols — "
+          f"{len(tasks)} to run, {len(by_id) * len(symbols) - len(tasks)} already done")
+    if not tasks:
+        return results.read()
+
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=init_worker, initargs=(arrays_root,)) as pool:
+        for symbol in build_snapshots(pool, arrays_root, symbols, cache_dir, signal_engine):
+            print(f"[SWEEP] {symbol} — arrays snapshot ready")
+
+        started, finished = time.perf_counter(), 0
+        futures = {pool.submit(run_one, task): task for task in tasks}
+        try:
+            for future in as_completed(futures):
+                cid, symbol, _ = futures[future]
+                try:
+                    results.add(future.result())
+                except Exception as e:
+                    print(f"[SWEEP] {cid} {symbol} — failed: {e}")
+                    continue
+                finished += 1
+                if finished % flush_every == 0:
+                    results.flush()
+                    print(f"[SWEEP] {finished}/{len(tasks)} runs "
+                          f"({finished / (time.perf_counter() - started):.1f}/s)")
+        finally:
+            # an interrupted sweep keeps everything that finished
+            results.flush()
+            for future in futures:
+                future.cancel()
+
+    return results.read()
+
+
+def _parse_values(text: str) -> list:
+    values = []
+    for item in text.split(","):
+        try:
+            values.append(int(item))
+        except ValueError:
+            values.append(float(item))
+    return values
+
+
+def add_space_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2,...")
+    parser.add_argument("--range", action="append", default=[], metavar="NAME=LOW:HIGH")
+    parser.add_argument("--random", type=int, metavar="N", help="N uniform random configs")
+    parser.add_argument("--lhs", type=int, metavar="N", help="N Latin-hypercube configs")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def add_snapshot_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--cache", default=CANDLE_CACHE)
+    parser.add_argument("--signal-engine", choices=SIGNAL_ENGINES, default="serial",
+                        help="how missing 1H signal snapshots are built (panel: one pass over all symbols)")
+
+
+def configs_from_args(parser: argparse.ArgumentParser, args) -> list:
+    space = {}
+    for item in args.grid:
+        name, values = item.split("=", 1)
+        space[name] = _parse_values(values)
+    for item in args.range:
+        name, bounds = item.split("=", 1)
+        low, high = _parse_values(bounds.replace(":", ","))
+        space[name] = (low, high)
+
+    if args.lhs:
+        configs = latin_hypercube(space, args.lhs, args.seed)
+    elif args.random:
+        configs = random_sample(space, args.random, args.seed)
+    else:
+        if any(isinstance(v, tuple) for v in space.values()):
+            parser.error("--range needs --random or --lhs")
+        configs = parameter_grid(space)
+    return configs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel SignalBacktester parameter sweep")
+    parser.add_argument("--symbols", nargs="+", required=True)
+    add_space_arguments(parser)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    add_snapshot_arguments(parser)
+    args = parser.parse_args(argv)
+
+    configs = configs_from_args(parser, args)
+    table = run_sweep(args.out, [s.upper() for s in args.symbols], configs,
+                      workers=args.workers, cache_dir=args.cache, signal_engine=args.signal_engine)
+    if not table.empty:
+        ranked = table.groupby("config_id")[["net_profit", "max_drawdown_pct", "total_trades"]].mean()
+        print(ranked.sort_values("net_profit", ascending=False).head(10).to_string())
+
+
+if __name__ == "__main__":
+    main()
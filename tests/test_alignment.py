@@ -0,0 +1,125 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import SignalBacktester
+from indicators.alignment import htf_open_signal, inside_htf_bar, map_ltf_to_htf
+
+COLS = ["open", "high", "low", "close", "volume"]
+
+
+def ohlcv(index, seed):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, len(index)))
+    return pd.DataFrame({
+        "open": close, "high": close + 1, "low": close - 1, "close": close,
+        "volume": rng.random(len(index)),
+    }, index=index)
+
+
+@pytest.fixture
+def frames():
+    rng = np.random.default_rng(7)
+    h1 = pd.date_range("2024-03-01", periods=400, freq="h", tz="UTC")
+    h1 = h1.delete(rng.choice(np.arange(1, 399), 12, replace=False))   # exchange gaps
+    m5 = pd.date_range("2024-02-29 22:00", "2024-03-18 05:00", freq="5min", tz="UTC").as_unit("us")
+    m5 = m5.delete(rng.choice(len(m5), 300, replace=False))
+    df = ohlcv(h1, 1)
+    df["final_signal"] = rng.choice([-1.0, 0.0, 1.0], len(h1))
+    return df, ohlcv(m5, 2)
+
+
+# ----------------------------------------------------------
+# The loops the vectorized helpers replaced
+# ----------------------------------------------------------
+def loop_map(lltf_df, ltf_df):
+    ltf_index = []
+    for ts in lltf_df.index:
+        idx = ltf_df.index.searchsorted(ts, side="right") - 1
+        ltf_index.append(max(idx, 0))
+    out = lltf_df.copy()
+    out["ltf_index"] = ltf_index
+    return out
+
+
+def loop_block_mask(lltf_df, ltf_opens):
+    block_mask = pd.Series(False, index=lltf_df.index)
+    for ts, ltf_idx in zip(lltf_df.index, lltf_df["ltf_index"]):
+        idx = int(ltf_idx)
+        if idx < 0 or idx >= len(ltf_opens):
+            continue
+        origin = ltf_opens[idx]
+        if origin <= ts < origin + pd.Timedelta(hours=1):
+            block_mask[ts] = True
+    return block_mask
+
+
+def loop_backtest(df, lltf_df):
+    lltf_df = lltf_df.copy()
+    lltf_df["final_signal"] = np.nan
+    lltf_df["ltf_index"] = np.nan
+    ltf_times = df.index
+    for i in range(len(ltf_times)):
+        start = ltf_times[i]
+        end = ltf_times[i + 1] if i + 1 < len(ltf_times) else lltf_df.index[-1] + pd.Timedelta(seconds=1)
+        mask = (lltf_df.index >= start) & (lltf_df.index < end)
+        lltf_df.loc[mask, "ltf_index"] = i
+        boundary_mask = lltf_df.index == start
+        lltf_df.loc[boundary_mask & mask, "final_signal"] = df["final_signal"].iloc[i]
+        lltf_df.loc[mask & ~boundary_mask, "final_signal"] = 0
+    lltf_df = lltf_df.dropna(subset=["ltf_index"])
+    lltf_df["ltf_index"] = lltf_df["ltf_index"].astype(int)
+    return lltf_df
+
+
+# ----------------------------------------------------------
+# Parity
+# ----------------------------------------------------------
+def test_live_mapping_and_block_mask_match_loops(frames):
+    df, m5 = frames
+    live_df = df.iloc[:-30]                       # 5m bars run past the last closed 1H bar
+
+    mapped = map_ltf_to_htf(m5, live_df)
+    expected = loop_map(m5, live_df)
+    assert (mapped["ltf_index"].to_numpy() == expected["ltf_index"].to_numpy()).all()
+
+    block = inside_htf_bar(mapped.index, live_df.index, mapped["ltf_index"].to_numpy())
+    assert (block == loop_block_mask(expected, live_df.index).to_numpy()).all()
+    assert block.any() and not block.all()
+
+    # 5m bars before the first 1H bar are clamped onto it but never blocked
+    early = mapped.index < live_df.index[0]
+    assert early.any() and not block[early].any()
+
+
+def test_backtest_alignment_matches_loop(frames):
+    df, m5 = frames
+    positions, values = htf_open_signal(m5.index, df.index, df["final_signal"])
+    expected = loop_backtest(df, m5)
+
+    keep = positions >= 0
+    assert (positions[keep] == expected["ltf_index"].to_numpy()).all()
+    np.testing.assert_array_equal(values[keep], expected["final_signal"].to_numpy())
+    assert np.isnan(values[~keep]).all()
+
+
+def test_backtester_constructor_uses_shared_alignment(frames):
+    df, m5 = frames
+    bt = SignalBacktester(df, lltf_df=m5)
+    start = max(df.index[0], m5.index[0])
+    expected = loop_backtest(df[df.index >= start], m5[m5.index >= start])
+    pd.testing.assert_frame_equal(bt.lltf_df[expected.columns], expected, check_freq=False)
+
+
+def test_map_rejects_4h_frame():
+    h4 = pd.date_range("2024-03-01", periods=10, freq="4h", tz="UTC")
+    m5 = pd.date_range("2024-03-01", periods=10, freq="5min", tz="UTC")
+    with pytest.raises(ValueError):
+        map_ltf_to_htf(ohlcv(m5, 0), ohlcv(h4, 0))
@@ -0,0 +1,67 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import SignalBacktester
+
+
+def make_frames(hours, seed):
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range("2023-01-01", periods=hours * 12, freq="5min", tz="UTC")
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.003, len(idx))))
+    open_ = np.r_[100.0, close[:-1]]
+    m5 = pd.DataFrame({
+        "open": open_,
+        "high": np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.002, len(idx)))),
+        "low": np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.002, len(idx)))),
+        "close": close,
+        "volume": rng.random(len(idx)) * 100,
+    }, index=idx)
+    h1 = m5.resample("1h").agg(
+        {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+    )
+    h1["final_signal"] = rng.choice([-1.0, 0.0, 0.0, 0.0, 1.0], len(h1))
+    return h1, m5
+
+
+# Exit parity with PositionManager lives in test_exit_engine.py; these
+# pin the core's own bookkeeping.
+@pytest.mark.parametrize("seed,leverage", [(0, 1), (1, 3), (2, 12)])
+def test_equity_moves_only_on_entries_and_exits(seed, leverage, capsys):
+    h1, m5 = make_frames(600, seed)
+    bt = SignalBacktester(h1, lltf_df=m5, leverage=leverage)
+    out = bt.run()
+    trades, equity = out["trades"], out["equity_curve"]["equity"].to_numpy()
+    assert len(trades) > 50
+
+    moves = set(np.flatnonzero(np.diff(np.r_[bt.initial_balance, equity])))
+    assert moves <= set(trades["entry_idx"]) | set(trades["exit_idx"])
+    assert out["summary"]["final_balance"] == round(bt.balance, 2)
+
+    closed = trades[~trades["truncated"]]
+    assert (closed["exit_idx"] > closed["entry_idx"]).all()
+    assert (trades["entry_idx"].to_numpy()[1:] > trades["exit_idx"].to_numpy()[:-1]).all()
+
+
+def test_audit_is_opt_in_and_stores_row_positions(capsys):
+    h1, m5 = make_frames(200, 4)
+    bt = SignalBacktester(h1, lltf_df=m5)
+    bt.run()
+    assert not getattr(bt, "_audit_log", None)
+
+    bt = SignalBacktester(h1, lltf_df=m5, audit=True)
+    bt._audit_log, bt._disaster_log = [], {}
+    trades = bt._run_core(bt._core_arrays())[1]
+    first = [e for e in bt._audit_log if e["entry_idx"] == trades[0]["entry_idx"]]
+    assert [e["idx"] for e in first] == list(range(trades[0]["entry_idx"] + 1, trades[0]["exit_idx"] + 1))
+    assert all(not isinstance(v, pd.DataFrame) for e in first for v in e.values())
+
+    bt.run()
+    assert "=== EXIT FILTER AUDIT" in capsys.readouterr().out
@@ -0,0 +1,114 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from data_pipeline.candle_store import CandleStore
+
+COLS = ["open", "high", "low", "close", "volume"]
+
+
+def make_bars(start, n, freq="5min", seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        rng.random((n, len(COLS))), columns=COLS,
+        index=pd.date_range(start, periods=n, freq=freq, tz="UTC"),
+    )
+
+
+def segment_mtimes(store, symbol, tf):
+    key_dir = os.path.join(store.root, f"{symbol}_{tf}")
+    return {f: os.stat(os.path.join(key_dir, f)).st_mtime_ns for f in os.listdir(key_dir)}
+
+
+def test_write_rewrites_only_touched_segments(tmp_path):
+    store = CandleStore(str(tmp_path))
+    bars = make_bars("2024-01-01", 12 * 24 * 30)                 # 30 days of 5m
+
+    assert store.write("X", "5m", bars) == 5                     # Monday-aligned weeks
+    assert store.segments("X", "5m")[:2] == ["2024-01-01", "2024-01-08"]
+    pd.testing.assert_frame_equal(store.read("X", "5m"), bars, check_freq=False)
+
+    before = segment_mtimes(store, "X", "5m")
+
+    # next tick: one new bar, one revalidated bar in week 2, lookback trimmed by a week
+    nxt = make_bars(bars.index[-1] + pd.Timedelta("5min"), 1, seed=1)
+    updated = pd.concat([bars, nxt]).loc["2024-01-08":]
+    updated.loc["2024-01-10 12:00", "close"] += 1.0
+
+    assert store.write("X", "5m", updated) == 2
+    after = segment_mtimes(store, "X", "5m")
+    assert "2024-01-01.parquet" not in after
+    changed = {f for f in after if after[f] != before.get(f)}
+    assert changed == {"2024-01-08.parquet", "2024-01-29.parquet"}
+
+    pd.testing.assert_frame_equal(store.read("X", "5m"), updated, check_freq=False)
+    assert store.last_index("X", "5m") == nxt.index[-1]
+    assert store.write("X", "5m", updated) == 0
+
+
+def test_append_merges_into_tail_and_read_start(tmp_path):
+    store = CandleStore(str(tmp_path))
+    bars = make_bars("2024-01-01", 24 * 90, freq="1h")
+    store.write("X", "1h", bars.iloc[:-5])
+
+    # overlapping append: the last stored bar is replaced, four are new
+    tail = bars.iloc[-6:].copy()
+    tail.iloc[0] = 0.5
+    assert store.append("X", "1h", tail) == 1                    # March only
+    expected = pd.concat([bars.iloc[:-6], tail])
+    pd.testing.assert_frame_equal(store.read("X", "1h"), expected, check_freq=False)
+
+    start = pd.Timestamp("2024-02-15", tz="UTC")
+    got = store.read("X", "1h", columns=["close"], start=start)
+    pd.testing.assert_frame_equal(got, expected.loc[start:, ["close"]], check_freq=False)
+
+
+def test_legacy_single_file_is_migrated(tmp_path):
+    bars = make_bars("2024-03-01", 500, freq="4h")
+    bars.to_parquet(tmp_path / "X_4h.parquet")
+
+    store = CandleStore(str(tmp_path))
+    assert store.exists("X", "4h")
+    assert not (tmp_path / "X_4h.parquet").exists()
+    pd.testing.assert_frame_equal(store.read("X", "4h"), bars, check_freq=False)
+
+    assert store.read("Y", "4h") is None
+    store.delete("X", "4h")
+    assert not store.exists("X", "4h")
+
+
+def test_mmap_mirror_follows_the_segments(tmp_path):
+    store = CandleStore(str(tmp_path))
+    bars = make_bars("2024-01-01", 12 * 24 * 20)
+    bars["taker_buy_base"] = bars["volume"] / 2
+    store.write("X", "5m", bars)
+
+    pd.testing.assert_frame_equal(store.mmap("X", "5m"), bars, check_freq=False)
+    gen = store._mirror.meta("X_5m")["gen"]
+
+    # new tail bars are appended to the mirror in place
+    nxt = make_bars(bars.index[-1] + pd.Timedelta("5min"), 6, seed=2)
+    nxt["taker_buy_base"] = 0.0
+    store.append("X", "5m", nxt)
+    view = store.mmap("X", "5m", start=bars.index[-3])
+    pd.testing.assert_frame_equal(view, pd.concat([bars, nxt]).iloc[-9:], check_freq=False)
+    assert store._mirror.meta("X_5m")["gen"] == gen
+
+    # a revision further back rebuilds it
+    fix = bars.iloc[[100]] * 2
+    store.append("X", "5m", fix)
+    assert store.mmap("X", "5m").iloc[100]["close"] == fix["close"].iloc[0]
+    assert store._mirror.meta("X_5m")["gen"] == gen + 1
+
+    # dropping only the newest week leaves nothing to append: rebuilt, not a crash
+    stored = store.read("X", "5m")
+    week = stored[stored.index < pd.Timestamp("2024-01-15", tz="UTC")]
+    store.write("X", "5m", week)
+    pd.testing.assert_frame_equal(store.mmap("X", "5m"), week, check_freq=False)
+    assert store._mirror.meta("X_5m")["gen"] == gen + 2
@@ -0,0 +1,140 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+import data_pipeline.updater as updater
+from data_pipeline.candle_store import CandleStore
+from data_pipeline.rate_limiter import rate_limiter
+from data_pipeline.updater import resample_ohlcv, _derive_frame, _reconcile_derived
+
+COLS = ["open", "high", "low", "close", "volume"]
+
+
+def make_5m(start, n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.1, n))
+    return pd.DataFrame({
+        "open":   open_,
+        "high":   np.maximum(open_, close) + spread,
+        "low":    np.minimum(open_, close) - spread,
+        "close":  close,
+        "volume": rng.random(n) * 100,
+    }, index=pd.date_range(start, periods=n, freq="5min", tz="UTC"))
+
+
+def ref_aggregate(df_5m, start, freq):
+    chunk = df_5m.loc[start:start + pd.Timedelta(freq) - pd.Timedelta("5min")]
+    return [chunk["open"].iloc[0], chunk["high"].max(), chunk["low"].min(),
+            chunk["close"].iloc[-1], chunk["volume"].sum()]
+
+
+def test_resample_keeps_only_complete_bins():
+    df_5m = make_5m("2024-01-01 02:30", 12 * 30)          # starts mid 4H bin
+    df_5m = df_5m.drop(pd.Timestamp("2024-01-01 10:20", tz="UTC"))
+
+    h1 = resample_ohlcv(df_5m, "1h")
+    assert h1.index[0] == pd.Timestamp("2024-01-01 03:00", tz="UTC")
+    assert pd.Timestamp("2024-01-01 10:00", tz="UTC") not in h1.index
+    for ts in h1.index[[0, 5, -1]]:
+        assert np.allclose(h1.loc[ts, COLS].to_numpy(), ref_aggregate(df_5m, ts, "1h"))
+
+    h4 = resample_ohlcv(df_5m, "4h")
+    assert list(h4.index.hour) == [4, 12, 16, 20, 0, 4]     # epoch-aligned, 08:00 has the hole
+    assert np.allclose(h4.iloc[0][COLS].to_numpy(), ref_aggregate(df_5m, h4.index[0], "4h"))
+
+
+def test_derive_frame_fills_only_missing_bins(tmp_path, monkeypatch):
+    df_5m = make_5m("2024-01-01 00:25", 12 * 24)
+    expected = pd.date_range("2024-01-01 00:00", "2024-01-01 23:00", freq="1h", tz="UTC")
+
+    # stale cached copy of an hour the 5m frame fully covers
+    store = CandleStore(str(tmp_path))
+    store.write("X", "1h", resample_ohlcv(df_5m, "1h").iloc[:3] * 1.01)
+    monkeypatch.setattr(updater, "candle_store", store)
+
+    calls = []
+    def fake_fetch(symbol, interval, windows):
+        calls.append(windows)
+        return [pd.DataFrame([[1.0] * 5], columns=COLS, index=pd.DatetimeIndex([w[0]])) for w in windows]
+
+    monkeypatch.setattr(updater, "_fetch_all_many", fake_fetch)
+    monkeypatch.setattr(rate_limiter, "wait_if_needed_for_symbol", lambda **kw: None)
+
+    out = _derive_frame("X", df_5m, "1h", expected)
+    assert out.index.equals(expected)
+    assert calls == [[(expected[0], expected[0])]]          # only the partial first hour
+    assert np.allclose(out.loc[expected[1], COLS].to_numpy(), ref_aggregate(df_5m, expected[1], "1h"))
+
+
+def test_reconcile_refetches_stale_5m(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(updater.CACHE_DIR)
+
+    truth = make_5m("2024-01-01 00:00", 12 * 48, seed=1)
+    stale = truth.copy()
+    bad_ts = pd.Timestamp("2024-01-02 21:55", tz="UTC")
+    stale.loc[bad_ts, "close"] *= 0.98                       # frozen mid-formation
+
+    df, df_htf = resample_ohlcv(stale, "1h"), resample_ohlcv(stale, "4h")
+
+    monkeypatch.setattr(rate_limiter, "wait_if_needed_for_symbol", lambda **kw: None)
+    monkeypatch.setattr(updater, "fetch_ohlcv_many", lambda jobs: [
+        resample_ohlcv(truth, job["interval"]).loc[job["start"]:job["end"]] for job in jobs
+    ])
+    monkeypatch.setattr(updater, "_fetch_all_many", lambda symbol, interval, windows: [
+        truth.loc[a:b] for a, b in windows
+    ])
+
+    now = pd.Timestamp("2024-01-03 00:01", tz="UTC").to_pydatetime()
+    lltf, h1, h4 = _reconcile_derived("X", stale, df, df_htf, now)
+
+    assert lltf.loc[bad_ts, "close"] == truth.loc[bad_ts, "close"]
+    pd.testing.assert_frame_equal(h1, resample_ohlcv(truth, "1h"), check_freq=False)
+    pd.testing.assert_frame_equal(h4, resample_ohlcv(truth, "4h"), check_freq=False)
+
+    # sampled — a second call inside the interval does not hit the exchange
+    monkeypatch.setattr(updater, "fetch_ohlcv_many", None)
+    assert _reconcile_derived("X", lltf, h1, h4, now)[1] is h1
+
+
+def test_exchange_bar_taken_by_reconcile_survives_rederive(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(updater.CACHE_DIR)
+    store = CandleStore(str(tmp_path / "candles"))
+    monkeypatch.setattr(updater, "candle_store", store)
+
+    truth = make_5m("2024-01-01 00:00", 12 * 48, seed=2)
+    stale = truth.copy()
+    bad_ts = pd.Timestamp("2024-01-02 21:55", tz="UTC")
+    stale.loc[bad_ts, "close"] *= 0.98
+    bad_hour = bad_ts.floor("1h")
+
+    monkeypatch.setattr(rate_limiter, "wait_if_needed_for_symbol", lambda **kw: None)
+    monkeypatch.setattr(updater, "fetch_ohlcv_many", lambda jobs: [
+        resample_ohlcv(truth, job["interval"]).loc[job["start"]:job["end"]] for job in jobs
+    ])
+    # the 5m refetch keeps returning the bad bar, so reconcile has to
+    # take the exchange's 1H / 4H bars
+    monkeypatch.setattr(updater, "_fetch_all_many", lambda symbol, interval, windows: [
+        stale.loc[a:b] for a, b in windows
+    ])
+
+    now = pd.Timestamp("2024-01-03 00:01", tz="UTC").to_pydatetime()
+    lltf, h1, h4 = _reconcile_derived("X", stale, resample_ohlcv(stale, "1h"), resample_ohlcv(stale, "4h"), now)
+    exchange_h1 = resample_ohlcv(truth, "1h")
+    assert np.allclose(h1.loc[bad_hour, COLS].to_numpy(), exchange_h1.loc[bad_hour, COLS].to_numpy())
+    store.write("X", "1h", h1)
+
+    # next pass: re-deriving from the same 5m bars keeps the exchange bar
+    out = _derive_frame("X", lltf, "1h", h1.index)
+    assert np.allclose(out.loc[bad_hour, COLS].to_numpy(), exchange_h1.loc[bad_hour, COLS].to_numpy())
+    others = out.index != bad_hour
+    assert np.allclose(out.loc[others, COLS].to_numpy(), resample_ohlcv(stale, "1h").loc[others, COLS].to_numpy())
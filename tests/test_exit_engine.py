@@ -0,0 +1,138 @@
+import json
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import strategy.lifecycle as lifecycle
+from backtest import SignalBacktester
+from strategy.exit_engine import BarRing, ExitState, check_exits, observe, trail_stop
+from test_backtest_core import make_frames
+
+
+@pytest.fixture
+def position_manager(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "test")
+    monkeypatch.setenv("TELEGRAM_CHAT_ID", "test")
+    monkeypatch.setattr(lifecycle, "_tg_debug", lambda msg: None)
+    monkeypatch.setattr(lifecycle.PositionManager, "USE_ACCOUNT_GATES", False)
+    return lambda: lifecycle.PositionManager(persist=False, notify=False)
+
+
+def replay_trade(pm, bt, trade):
+    """Feed one backtest trade's bars through PositionManager.update()."""
+    m5 = bt.lltf_df[["open", "high", "low", "close", "volume", "ATR_5M"]]
+    e = int(trade["entry_idx"])
+    signal_bar = bt.df.index[int(bt.lltf_df["ltf_index"].iloc[e])] - pd.Timedelta(hours=1)
+    external_row = pd.Series({"final_signal": trade["side"]}, name=signal_bar)
+
+    entry_row = m5.iloc[e].copy()
+    entry_row["ATR"] = trade["ATR"]          # the 1H ATR the backtest sized the stop with
+    out = pm.update(bt.df, "TEST", m5, trade["side"], external_row, entry_row)
+    assert out["state"] == "OPEN"
+
+    for i in range(e + 1, len(m5) - 1):
+        out = pm.update(bt.df, "TEST", m5, 0, external_row, m5.iloc[i])
+        if out["state"] == "CLOSED":
+            return i, out["exit"]
+    return None, None
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_backtest_exits_match_position_manager(seed, position_manager, capsys):
+    h1, m5 = make_frames(400, seed)
+    bt = SignalBacktester(h1, lltf_df=m5)
+    trades = bt.run()["trades"]
+    trades = trades[trades["exit_reason"] != "end_of_data"]
+    assert len(trades) > 30
+    assert {"stop_loss", "opposite_impulse", "disaster_stop"} <= set(trades["exit_reason"])
+    assert (trades["last_trail_bar"] > 0).any()          # trail engaged
+
+    for _, trade in trades.iterrows():
+        pm = position_manager()
+        x, closed = replay_trade(pm, bt, trade)
+        reason = "stop_loss" if trade["exit_reason"] == "break_even" else trade["exit_reason"]
+        assert (x, closed["exit"]["reason"]) == (trade["exit_idx"], reason), trade["entry_time"]
+        assert closed["exit"]["price"] == pytest.approx(trade["exit_price"], rel=1e-12)
+        assert closed["stop_loss"] == pytest.approx(trade["stop_loss"], rel=1e-12)
+
+
+def test_trail_locks_breakeven_then_tightens():
+    class Rules:
+        ATR_AFTER_HALF_R, ATR_AFTER_ONE_R, BINANCE_CALLBACK_FLOOR_PCT = 0.55, 0.4, 0.0
+
+    s = ExitState(side=1, entry=100.0, stop=98.0)          # R = 2
+    observe(s, 100.8, 99.5, 100.5)
+    assert s.mfe_r == pytest.approx(0.4) and trail_stop(s, Rules, 100.5, 0.5, None) is None
+
+    s.bars += 1
+    observe(s, 101.2, 100.4, 101.0)                         # 0.6R: breakeven floor
+    assert trail_stop(s, Rules, 101.0, 3.0, None) == 100.0
+    s.stop = 100.0
+
+    s.bars += 1
+    observe(s, 103.0, 101.5, 102.5)                         # 1.5R: tighter multiplier, from the peak
+    assert trail_stop(s, Rules, 102.5, 1.0, None) == pytest.approx(103.0 - 0.4)
+    assert s.last_mfe_bar == 3
+
+
+def test_exit_priority_and_fills():
+    bars = {
+        "open": np.array([100.0, 100.0]), "close": np.array([100.0, 100.0]),
+        "high": np.array([100.0, 100.0]), "low": np.array([100.0, 100.0]),
+        "volume": None, "atr_5m": None, "atr": None,
+    }
+    # bar 1 gaps through the stop: disaster fires first, filled at the low
+    s = ExitState(side=1, entry=100.0, stop=98.0)
+    observe(s, 100.1, 96.0, 97.0)
+    assert check_exits(s, 100.1, 96.0, 97.0, bars, 0, 2) == ("disaster_stop", 96.0)
+
+    # past bar 6 the disaster stop is off and the hard stop fills at the stop
+    s = ExitState(side=-1, entry=100.0, stop=102.0, bars=7, mfe=0.5, last_mfe_bar=2)
+    observe(s, 102.5, 99.9, 100.1)
+    assert check_exits(s, 102.5, 99.9, 100.1, bars, 0, 2) == ("stop_loss", 102.0)
+
+
+def test_bar_ring_window_is_a_view_of_the_last_bars():
+    ring = BarRing(capacity=4)
+    for k in range(11):
+        ring.push(k, 100.0 + k, 101.0 + k, 99.0 + k, 100.5 + k, 1.0, None, 0.5)
+        window = ring.window()
+        assert list(window["ts"]) == list(range(max(0, k - 3), k + 1))
+        assert np.shares_memory(window, ring._buf)
+    assert np.isnan(window["atr"]).all() and (window["atr_5m"] == 0.5).all()
+
+
+def test_bar_history_round_trips_binary_and_migrates_json(position_manager, tmp_path):
+    os.makedirs(tmp_path / "data" / "positions")
+    bars = [
+        {"open": 1.0, "high": 1.2, "low": 0.9, "close": 1.1, "volume": 5.0, "ATR": 0.3,
+         "ts": "2024-01-01 00:00:00+00:00"},
+        {"open": 1.1, "high": 1.3, "low": 1.0, "close": 1.2, "volume": 0.0, "ATR": None,
+         "ATR_5M": 0.05, "ts": "2024-01-01 00:05:00+00:00"},
+    ]
+    with open(lifecycle.LEGACY_BAR_HISTORY_FILE, "w") as f:
+        json.dump({"ABCUSDT": bars, "CLOSEDUSDT": bars}, f)
+    with open(lifecycle.POSITIONS_FILE, "w") as f:
+        json.dump({"ABCUSDT": {"symbol": "ABCUSDT", "direction": 1}}, f)
+
+    pm = lifecycle.PositionManager(persist=True, notify=False)
+    assert list(pm._bar_history) == ["ABCUSDT"]            # only open positions keep a ring
+    window = pm._bar_history["ABCUSDT"].window()
+    assert list(window["close"]) == [1.1, 1.2]
+    assert window["ts"][1] == pd.Timestamp("2024-01-01 00:05", tz="UTC").value
+    assert window["atr"][0] == 0.3 and np.isnan(window["atr"][1])
+    assert np.isnan(window["atr_5m"][0]) and window["atr_5m"][1] == 0.05
+
+    pm._save()
+    assert os.path.exists(lifecycle.BAR_HISTORY_FILE)
+    assert not os.path.exists(lifecycle.LEGACY_BAR_HISTORY_FILE)
+    reloaded = lifecycle.PositionManager(persist=True, notify=False)
+    assert reloaded._bar_history["ABCUSDT"].window().tobytes() == window.tobytes()
@@ -0,0 +1,78 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from data_pipeline.feature_store import FeatureStore
+
+
+def build_frame(n, start="2024-01-01"):
+    rng = np.random.default_rng(0)
+    idx = pd.date_range(start, periods=n, freq="1h", tz="UTC").as_unit("us")
+    return pd.DataFrame({
+        "close":        rng.random(n),
+        "final_signal": rng.integers(-1, 2, n),
+        "SUPERTREND":   rng.choice([-1, 1], n).astype(np.int8),
+        "COMPRESSION_OK": rng.random(n) > 0.5,
+    }, index=idx)
+
+
+def test_roundtrip_subset_and_tail(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    df = build_frame(50)
+    store.write("BTCUSDT", df, hour="2024-01-03T01:00:00+00:00")
+
+    pd.testing.assert_frame_equal(store.read("BTCUSDT"), df, check_freq=False)
+    assert store.meta("BTCUSDT")["extra"]["hour"] == "2024-01-03T01:00:00+00:00"
+
+    tail = store.read("BTCUSDT", columns=["close", "SUPERTREND", "missing"], tail=1)
+    pd.testing.assert_frame_equal(tail, df[["close", "SUPERTREND"]].iloc[-1:], check_freq=False)
+    assert store.last_index("BTCUSDT") == df.index[-1]
+    assert store.read("ETHUSDT") is None
+
+
+def test_append_and_compact(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    df = build_frame(60)
+    store.write("BTCUSDT", df.iloc[:40])
+
+    assert store.append("BTCUSDT", df.iloc[40:55], hour="h1")
+    # overlapping rows and schema changes are refused
+    assert not store.append("BTCUSDT", df.iloc[50:58])
+    assert not store.append("BTCUSDT", df.iloc[55:][["close"]])
+    assert store.append("BTCUSDT", df.iloc[55:], hour="h2")
+
+    pd.testing.assert_frame_equal(store.read("BTCUSDT"), df, check_freq=False)
+    assert store.meta("BTCUSDT")["extra"]["hour"] == "h2"
+
+    store.compact("BTCUSDT", keep=20)
+    pd.testing.assert_frame_equal(store.read("BTCUSDT"), df.iloc[-20:], check_freq=False)
+    assert sorted(os.listdir(tmp_path / "BTCUSDT")) == ["g1", "meta.json"]
+
+    store.wipe()
+    assert store.meta("BTCUSDT") is None
+
+
+def test_view_is_memory_mapped_and_slices_by_time(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    df = build_frame(100)
+    store.write("BTCUSDT", df)
+
+    view = store.view("BTCUSDT", columns=["close", "final_signal"],
+                      start="2024-01-02 00:00", end=pd.Timestamp("2024-01-03 05:00", tz="UTC"))
+    assert view.equals(df.loc["2024-01-02 00:00":"2024-01-03 05:00", ["close", "final_signal"]])
+
+    col = view["close"].to_numpy()
+    while not isinstance(col, np.memmap):
+        col = col.base
+    assert isinstance(col, np.memmap)
+
+    # writes stay in the process, the file is untouched
+    view.iloc[0, 0] = -1.0
+    assert store.read("BTCUSDT", columns=["close"]).loc["2024-01-02 00:00", "close"] == df.loc["2024-01-02 00:00", "close"]
+    assert store.view("BTCUSDT", start="2030-01-01").empty
@@ -0,0 +1,120 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+import data_pipeline.fetcher as fetcher
+from data_pipeline.rate_limiter import rate_limiter
+
+
+# ==========================================================
+# FAKE BINANCE — /fapi/v1/klines over a synthetic bar grid
+# ==========================================================
+ORIGIN_MS   = int(pd.Timestamp("2024-01-01", tz="UTC").timestamp() * 1000)
+INTERVAL_MS = {"5m": 300_000, "1h": 3_600_000, "4h": 14_400_000}
+N_BARS      = 3000
+
+
+def _kline(i, step, seed):
+    open_time = ORIGIN_MS + i * step
+    px = 100.0 + seed + i * 0.01
+    return [open_time, f"{px}", f"{px + 1}", f"{px - 1}", f"{px + 0.5}", "10.0",
+            open_time + step - 1, "0", 1, "0", "0", "0"]
+
+
+class FakeBinance(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.weight += 2
+            server.connections.add(self.client_address)
+            weight = server.weight
+
+        q = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        step = INTERVAL_MS[q["interval"]]
+        limit = int(q.get("limit", 500))
+        seed = sum(map(ord, q["symbol"])) % 50
+
+        last = N_BARS - 1
+        if "endTime" in q:
+            last = min(last, (int(q["endTime"]) - ORIGIN_MS) // step)
+        rows = [_kline(i, step, seed) for i in range(max(0, last - limit + 1), last + 1)]
+
+        body = json.dumps(rows).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-MBX-USED-WEIGHT-1M", str(weight))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_binance(monkeypatch, tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBinance)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.weight = 0
+    server.connections = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    monkeypatch.chdir(tmp_path)     # rate limiter state file
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    monkeypatch.setenv("no_proxy", "127.0.0.1")
+    monkeypatch.setattr(fetcher, "BASE_URL", f"http://127.0.0.1:{server.server_port}/fapi/v1/klines")
+    monkeypatch.setattr(fetcher, "_SESSION", fetcher.requests.Session())
+    for attr in ("banned_until", "rate_limited_until", "current_weight"):
+        monkeypatch.setattr(rate_limiter, attr, 0)
+
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _ts(i, interval):
+    return pd.Timestamp(ORIGIN_MS + i * INTERVAL_MS[interval], unit="ms", tz="UTC")
+
+
+# ==========================================================
+# TESTS
+# ==========================================================
+def test_fetch_ohlcv_paginates_over_one_connection(fake_binance):
+    df = fetcher.fetch_ohlcv("ETHUSDT", start=_ts(100, "5m"), end=_ts(2600, "5m"), interval="5m", verbose=False)
+
+    assert list(df.columns) == ["open", "high", "low", "close", "volume"]
+    assert df.index[0] == _ts(100, "5m") and df.index[-1] == _ts(2600, "5m")
+    assert len(df) == 2501 and df.index.is_monotonic_increasing
+    assert fake_binance.requests == 3
+    assert len(fake_binance.connections) == 1
+    assert rate_limiter.current_weight == fake_binance.weight
+
+
+def test_fetch_ohlcv_many_matches_serial(fake_binance):
+    jobs = [
+        {"symbol": "ETHUSDT", "interval": "5m", "start": _ts(500, "5m"), "end": _ts(1900, "5m")},
+        {"symbol": "SOLUSDT", "interval": "1h", "start": _ts(10, "1h"), "end": _ts(400, "1h")},
+        {"symbol": "ETHUSDT", "interval": "4h", "start": _ts(0, "4h"), "end": _ts(50, "4h")},
+    ]
+    got = fetcher.fetch_ohlcv_many(jobs, max_workers=3)
+    ref = [fetcher.fetch_ohlcv(verbose=False, **job) for job in jobs]
+
+    assert len(got) == len(jobs)
+    for g, r in zip(got, ref):
+        pd.testing.assert_frame_equal(g, r)
+    assert fetcher.fetch_ohlcv_many([]) == []
@@ -0,0 +1,198 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from indicators.kernels import (
+    streak_count, bars_since, supertrend_bands, ewma_zscore,
+    supertrend_bands_2d, ewma_zscore_2d,
+)
+
+
+# ==========================================================
+# REFERENCE LOOPS — the per-row code the kernels replaced
+# ==========================================================
+def ref_streak(flags):
+    s = pd.Series(flags).astype(int)
+    out = pd.Series(0, index=s.index)
+    for idx in range(1, len(s)):
+        if s.iloc[idx] == 1:
+            out.iloc[idx] = out.iloc[idx - 1] + 1
+        else:
+            out.iloc[idx] = 0
+    return out.to_numpy()
+
+
+def ref_bars_since(events):
+    age = pd.Series(999, index=events.index, dtype=int)
+    counter = 999
+    for idx in range(len(events)):
+        if events.iloc[idx]:
+            counter = 0
+        else:
+            if counter < 999:
+                counter += 1
+        age.iloc[idx] = counter
+    return age.to_numpy()
+
+
+def ref_supertrend(upper_raw, lower_raw, close, atr_vals, eps, flip_margin_atr, min_flip_bars):
+    n = len(close)
+    final_upper = upper_raw.copy()
+    final_lower = lower_raw.copy()
+    trend = np.ones(n, dtype=np.int8)
+    bars_since_flip = 0
+    for i in range(1, n):
+        final_upper[i] = (
+            min(upper_raw[i], final_upper[i-1])
+            if close[i-1] <= final_upper[i-1] + eps
+            else upper_raw[i]
+        )
+        final_lower[i] = (
+            max(lower_raw[i], final_lower[i-1])
+            if close[i-1] >= final_lower[i-1] - eps
+            else lower_raw[i]
+        )
+        flip_margin = atr_vals[i] * flip_margin_atr
+        bull_flip = close[i] > final_upper[i-1] + flip_margin
+        bear_flip = close[i] < final_lower[i-1] - flip_margin
+        if bull_flip and trend[i-1] == -1 and bars_since_flip >= min_flip_bars:
+            trend[i] = 1
+            bars_since_flip = 0
+        elif bear_flip and trend[i-1] == 1 and bars_since_flip >= min_flip_bars:
+            trend[i] = -1
+            bars_since_flip = 0
+        else:
+            trend[i] = trend[i-1]
+            bars_since_flip += 1
+    return trend, final_upper, final_lower
+
+
+def ref_zscore(values, alpha, min_periods, adaptive, seed_mean, seed_var):
+    n = len(values)
+    out = np.empty(n)
+    out[:] = np.nan
+    mu = seed_mean if seed_mean is not None else np.nan
+    var = seed_var if seed_var is not None else np.nan
+    recent_var = var
+    alpha_fast = alpha * 4.0
+    weight = 1.0 if seed_mean is not None else 0.0
+    for i, x in enumerate(values):
+        if np.isnan(x):
+            continue
+        if np.isnan(mu):
+            mu = x
+            var = 0.0
+            recent_var = 0.0
+            weight = 1.0
+            continue
+        if adaptive and not np.isnan(recent_var) and var > 1e-12:
+            vol_ratio = np.sqrt(recent_var / var) if var > 1e-12 else 1.0
+            vol_ratio = np.clip(vol_ratio, 0.5, 3.0)
+            effective_alpha = np.clip(alpha * vol_ratio, alpha * 0.5, alpha * 3.0)
+        else:
+            effective_alpha = alpha
+        weight = (1.0 - effective_alpha) * weight + 1.0
+        bias_corrected_alpha = min(1.0 / weight, 1.0)
+        mu = mu + bias_corrected_alpha * (x - mu)
+        var = (1.0 - bias_corrected_alpha) * var + bias_corrected_alpha * (x - mu) ** 2
+        recent_var = (1.0 - alpha_fast) * recent_var + alpha_fast * (x - mu) ** 2
+        if i >= min_periods:
+            std = np.sqrt(var) if var > 1e-12 else 1e-6
+            out[i] = (x - mu) / std
+    return out
+
+
+# ==========================================================
+# TESTS
+# ==========================================================
+def test_streak_count_matches_loop():
+    rng = np.random.default_rng(0)
+    for n in (0, 1, 2, 500):
+        flags = rng.random(n) < 0.6
+        assert np.array_equal(streak_count(flags), ref_streak(flags))
+    assert np.array_equal(streak_count(np.ones(6, bool)), [0, 1, 2, 3, 4, 5])
+
+
+def test_bars_since_matches_loop():
+    rng = np.random.default_rng(1)
+    events = pd.Series(rng.random(3000) < 0.0004)
+    assert np.array_equal(bars_since(events.values), ref_bars_since(events))
+
+    # NaN is truthy in the loop — the kernel must agree
+    mixed = pd.Series([np.nan, 0.0, 0.0, 1.0, 0.0, np.nan, 0.0])
+    assert np.array_equal(bars_since(mixed.values), ref_bars_since(mixed))
+    assert np.array_equal(bars_since(np.zeros(3, bool)), [999, 999, 999])
+
+
+def test_supertrend_bands_match_loop():
+    rng = np.random.default_rng(2)
+    n = 2000
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    atr = np.abs(rng.normal(1.0, 0.3, n))
+    atr[:14] = np.nan
+    upper_raw = close + 3 * atr
+    lower_raw = close - 3 * atr
+
+    for margin, min_bars in ((0.10, 2), (0.15, 3), (0.0, 0)):
+        got = supertrend_bands(upper_raw, lower_raw, close, atr, 1e-6, margin, min_bars)
+        ref = ref_supertrend(upper_raw, lower_raw, close, atr, 1e-6, margin, min_bars)
+        assert np.array_equal(got[0], ref[0])
+        assert np.array_equal(got[1], ref[1], equal_nan=True)
+        assert np.array_equal(got[2], ref[2], equal_nan=True)
+
+
+def test_ewma_zscore_matches_loop():
+    rng = np.random.default_rng(3)
+    values = np.r_[np.full(5, np.nan), rng.standard_t(3, 1500)]
+    values[200:210] = np.nan
+
+    cases = [
+        (0.05, 30, True, None, None),
+        (0.02, 200, False, None, None),
+        (0.05, 30, True, 0.3, 2.0),
+        (0.05, 30, True, 0.3, None),
+    ]
+    for alpha, min_periods, adaptive, seed_mean, seed_var in cases:
+        got = ewma_zscore(values, alpha, min_periods, adaptive, seed_mean, seed_var)
+        ref = ref_zscore(values, alpha, min_periods, adaptive, seed_mean, seed_var)
+        assert np.array_equal(got, ref, equal_nan=True)
+
+
+def test_2d_kernels_match_columns():
+    rng = np.random.default_rng(4)
+    n, m = 800, 5
+    flags = rng.random((n, m)) < 0.5
+    assert np.array_equal(streak_count(flags), np.column_stack([streak_count(flags[:, j]) for j in range(m)]))
+    assert np.array_equal(bars_since(flags), np.column_stack([bars_since(flags[:, j]) for j in range(m)]))
+
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (n, m)), axis=0))
+    atr = np.abs(rng.normal(1.0, 0.3, (n, m)))
+    atr[:14] = np.nan
+    got = supertrend_bands_2d(close + 3 * atr, close - 3 * atr, close, atr)
+    for j in range(m):
+        ref = supertrend_bands(close[:, j] + 3 * atr[:, j], close[:, j] - 3 * atr[:, j], close[:, j], atr[:, j])
+        for g, r in zip(got, ref):
+            assert np.array_equal(g[:, j], r, equal_nan=True)
+
+    values = rng.standard_t(3, (n, m))
+    values[:7, 1] = np.nan
+    values[300:320, 2] = np.nan
+    seed_var = rng.random(m) + 0.5
+    for kwargs in (
+        dict(),
+        dict(alpha=0.05, min_periods=20, adaptive=False, seed_mean=0.0, seed_var=seed_var),
+    ):
+        got = ewma_zscore_2d(values, **kwargs)
+        for j in range(m):
+            col_kwargs = dict(kwargs)
+            if "seed_var" in col_kwargs:
+                col_kwargs["seed_var"] = seed_var[j]
+            ref = ewma_zscore(values[:, j], **col_kwargs)
+            # vector ** 2 is an exact square, scalar ** 2 goes through pow()
+            assert np.allclose(got[:, j], ref, rtol=1e-12, atol=1e-12, equal_nan=True)
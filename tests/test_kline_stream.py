@@ -0,0 +1,136 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import base64
+import hashlib
+import json
+import socket
+import struct
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from data_pipeline.candle_store import CandleStore
+from execution.kline_stream import KlineStream
+
+COLS = ["open", "high", "low", "close", "volume"]
+T0 = pd.Timestamp("2024-01-08 10:00", tz="UTC")
+
+
+# ==========================================================
+# LOCAL WEBSOCKET STAND-IN — one client, text frames only
+# ==========================================================
+class FakeStream:
+    GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.paths = []
+        self.release = threading.Event()
+        self.sock = socket.socket()
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(1)
+        self.url = f"ws://127.0.0.1:{self.sock.getsockname()[1]}"
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        conn, _ = self.sock.accept()
+        request = b""
+        while b"\r\n\r\n" not in request:
+            request += conn.recv(4096)
+        lines = request.decode().split("\r\n")
+        self.paths.append(lines[0].split()[1])
+        key = next(l.split(":", 1)[1].strip() for l in lines if l.lower().startswith("sec-websocket-key"))
+        accept = base64.b64encode(hashlib.sha1((key + self.GUID).encode()).digest()).decode()
+        conn.sendall((
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode())
+        for msg in self.messages:
+            payload = json.dumps(msg).encode()
+            header = bytes([0x81, len(payload)]) if len(payload) < 126 else \
+                bytes([0x81, 126]) + struct.pack(">H", len(payload))
+            conn.sendall(header + payload)
+        self.release.wait(10)
+        conn.sendall(bytes([0x88, 0]))     # close
+        conn.close()
+        self.sock.close()
+
+
+def kline(symbol, t, o, h, l, c, v, closed):
+    return {"stream": f"{symbol.lower()}@kline_5m", "data": {
+        "e": "kline", "s": symbol,
+        "k": {"t": int(t.timestamp() * 1000), "i": "5m", "o": str(o), "h": str(h),
+              "l": str(l), "c": str(c), "v": str(v), "x": closed},
+    }}
+
+
+def wait_for(cond, timeout=5.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if cond():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CandleStore(str(tmp_path))
+    idx = pd.date_range(T0 - pd.Timedelta("1h"), T0 - pd.Timedelta("5min"), freq="5min", tz="UTC")
+    store.write("ETHUSDT", "5m", pd.DataFrame(1.0, index=idx, columns=COLS))
+    store.write("SOLUSDT", "5m", pd.DataFrame(1.0, index=idx[:-3], columns=COLS))
+    return store
+
+
+# ==========================================================
+# TESTS
+# ==========================================================
+def test_closed_bars_land_in_cache_and_forming_bar_is_held(store):
+    t1 = T0 + pd.Timedelta("5min")
+    fake = FakeStream([
+        kline("ETHUSDT", T0, 10, 11, 9.5, 10.5, 100, False),
+        kline("ETHUSDT", T0, 10, 12, 9.0, 11.0, 150, True),
+        kline("ETHUSDT", t1, 11, 11.2, 10.9, 11.1, 5, False),
+        kline("SOLUSDT", T0, 20, 21, 19, 20.5, 7, True),      # cache is 3 bars behind
+    ])
+    stream = KlineStream(["ETHUSDT", "SOL-USDT"], store=store, base_url=fake.url)
+    stream.start()
+    try:
+        assert wait_for(lambda: stream.messages == 4)
+        assert "ethusdt@kline_5m/solusdt@kline_5m" in fake.paths[0]
+
+        eth = store.load("ETHUSDT", "5m")
+        assert eth.index[-1] == T0
+        assert eth.loc[T0, COLS].tolist() == [10, 12, 9.0, 11.0, 150]
+
+        # a bar that would leave a hole is left to the REST path
+        assert store.last_index("SOLUSDT", "5m") == T0 - pd.Timedelta("20min")
+        assert stream.gaps == 1 and stream.closed_bars == 1
+
+        bar = stream.forming_bar("ETHUSDT", t1)
+        assert (bar["open"], bar["high"], bar["low"]) == (11, 11.2, 10.9)
+        assert stream.forming_bar("ETHUSDT", T0) is None
+        assert stream.status()["connected"] == 1
+    finally:
+        fake.release.set()
+
+    # connection gone — held forming bars are no longer trusted
+    assert wait_for(lambda: stream.status()["connected"] == 0)
+    assert stream.forming_bar("ETHUSDT", t1) is None
+    stream.stop()
+
+
+def test_chunks_split_symbols_per_connection(store, monkeypatch):
+    import execution.kline_stream as ks
+    monkeypatch.setattr(ks, "MAX_STREAMS_PER_CONNECTION", 2)
+    stream = KlineStream(["AUSDT", "BUSDT", "CUSDT", "AUSDT"], store=store, base_url="ws://x")
+    chunks = stream.chunks()
+    assert [c for _, c in chunks] == [["AUSDT", "BUSDT"], ["CUSDT"]]
+    assert chunks[1][0] == "ws://x/stream?streams=cusdt@kline_5m"
@@ -0,0 +1,69 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from backtest import SignalBacktester
+from portfolio_backtest import PortfolioBacktester
+from test_backtest_core import make_frames
+
+SAME = ["entry_idx", "entry_price", "units", "exit_idx", "exit_price", "pnl", "pnl_r", "exit_reason"]
+
+
+class FixedNotional(SignalBacktester):
+    def _calc_units(self, entry, stop):
+        return 10 / entry
+
+
+class Uncapped(PortfolioBacktester):
+    ACCOUNT_THRESHOLD = float("inf")      # always the $10 floor
+    MAX_SIMULTANEOUS = 10**6
+    DAILY_LOSS_CAP = -np.inf
+
+
+def universe(n, hours=400):
+    return {f"S{k}USDT": make_frames(hours, 10 + k) for k in range(n)}
+
+
+def test_uncapped_portfolio_is_the_sum_of_single_runs(capsys):
+    frames = universe(4)
+    out = Uncapped(frames, leverage=3).run()
+
+    total = 0.0
+    for symbol, (h1, m5) in frames.items():
+        single = FixedNotional(h1, lltf_df=m5, leverage=3)
+        expected = single.run()["trades"]
+        got = out["trades"][out["trades"]["symbol"] == symbol].reset_index(drop=True)
+        pd.testing.assert_frame_equal(got[SAME], expected[SAME])
+        assert out["attribution"].loc[symbol, "net_pnl"] == round(single.balance - 1000, 2)
+        total += single.balance - 1000
+
+    assert out["rejected"].empty
+    assert np.isclose(out["summary"]["final_balance"], round(1000 + total, 2))
+    assert out["equity_curve"]["timestamp"].is_monotonic_increasing
+
+
+def test_cap_and_shared_sizing(capsys):
+    frames = universe(8)
+    out = PortfolioBacktester(frames, initial_balance=500).run()
+    trades, rejected, curve = out["trades"], out["rejected"], out["equity_curve"]
+
+    assert curve["open_positions"].max() == PortfolioBacktester.MAX_SIMULTANEOUS
+    assert len(rejected) > 0 and set(rejected["reason"]) <= {"max_simultaneous", "daily_loss_cap"}
+    full = rejected[rejected["reason"] == "max_simultaneous"]
+    assert (full["open_positions"] == PortfolioBacktester.MAX_SIMULTANEOUS).all()
+
+    # notional = 10% of the account balance at entry
+    notional = trades["units"] * trades["entry_price"]
+    assert notional.iloc[0] == 50.0
+    assert not np.allclose(notional, 50.0)
+
+    attribution = out["attribution"]
+    assert attribution["trades"].sum() == len(trades)
+    assert attribution["rejected"].sum() == len(rejected)
+    assert np.isclose(attribution["net_pnl"].sum(), out["summary"]["net_profit"], atol=0.05)
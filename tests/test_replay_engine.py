@@ -0,0 +1,39 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from execution.replay_engine import replay_signal_frame
+from test_signal_state import build_ohlcv
+
+
+def test_replay_signal_frame_has_no_lookahead():
+    """
+    Every prefix of the one-pass replay frame must equal the frame built
+    from only the history available at that bar.
+    """
+    warmup = 500
+    df_1h = build_ohlcv(700, seed=3)
+    df_4h = build_ohlcv(200, seed=103, freq="4h", start="2023-12-20")
+
+    full = replay_signal_frame(df_1h, df_4h, warmup)
+    assert len(full) == len(df_1h)
+    assert (full["final_signal"].iloc[warmup:] != 0).any()
+
+    for cut in (warmup + 1, warmup + 37, len(df_1h) - 1):
+        tip = df_1h.index[cut - 1]
+        prefix = replay_signal_frame(
+            df_1h.iloc[:cut],
+            df_4h[df_4h.index <= tip],
+            warmup,
+        )
+        head = full.iloc[:cut]
+        assert prefix.index.equals(head.index)
+        for col in head.columns:
+            a = prefix[col].to_numpy(dtype=float)
+            b = head[col].to_numpy(dtype=float)
+            assert np.allclose(a, b, rtol=1e-9, atol=1e-9, equal_nan=True), (cut, col)
@@ -0,0 +1,105 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+import data_pipeline.updater as updater
+from data_pipeline.rate_limiter import rate_limiter
+from data_pipeline.revalidation import RevalidationPlanner
+
+COLS = ["open", "high", "low", "close", "volume"]
+M5 = pd.Timedelta("5min")
+
+
+def make_5m(end, n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    open_ = np.r_[close[0], close[:-1]]
+    return pd.DataFrame({
+        "open": open_, "high": np.maximum(open_, close) + 0.1,
+        "low": np.minimum(open_, close) - 0.1, "close": close, "volume": rng.random(n) * 100,
+    }, index=pd.date_range(end=end, periods=n, freq="5min", tz="UTC"))
+
+
+def planner(tmp_path):
+    return RevalidationPlanner(
+        str(tmp_path), horizon=pd.Timedelta("45min"), min_age=pd.Timedelta("30min"), slack=M5,
+    )
+
+
+def test_unsettled_bars_are_batched_and_settle_on_confirmation(tmp_path):
+    now = pd.Timestamp("2024-01-08 12:00:10", tz="UTC")
+    df = make_5m(now.floor("5min") - M5, 48)              # last closed bar 11:55
+    p = planner(tmp_path)
+
+    # first look: bars 30..40 min past close are due, the oldest is at the edge
+    due = p.due("X", "5m", df, now)
+    assert list(due) == list(pd.date_range("2024-01-08 11:15", "2024-01-08 11:25", freq="5min", tz="UTC"))
+    assert p.pages(due, "5m") == [(due[0], due[-1])]
+
+    # identical refetch — settled, and no refetch on the next tick
+    assert len(p.observe("X", "5m", df.loc[due], now)) == 0
+    now += M5
+    assert len(p.due("X", "5m", df, now)) == 0
+
+    # 11:30 becomes due but waits until it is one tick from the horizon,
+    # then goes out together with the bars that became due meanwhile
+    now += M5
+    assert len(p.due("X", "5m", df, now)) == 0
+    now += M5
+    assert list(p.due("X", "5m", df, now).strftime("%H:%M")) == ["11:30", "11:35", "11:40"]
+
+    # state survives a restart
+    assert list(planner(tmp_path).due("X", "5m", df, now)) == list(p.due("X", "5m", df, now))
+
+
+def test_changed_bar_is_refetched_next_tick_and_suspicious_always(tmp_path):
+    now = pd.Timestamp("2024-01-08 12:00:10", tz="UTC")
+    df = make_5m(now.floor("5min") - M5, 48)
+    p = planner(tmp_path)
+
+    due = p.due("X", "5m", df, now)
+    revised = df.loc[due].copy()
+    revised.loc[due[-1], "close"] *= 1.01
+    assert list(p.observe("X", "5m", revised, now)) == [due[-1]]
+
+    # the flag triggers a refetch, which takes the newly due 11:30 along
+    now += M5
+    assert list(p.due("X", "5m", df, now)) == [due[-1], due[-1] + M5]
+
+    # gap bars go out even when settled or young, packed into one page
+    gap = pd.DatetimeIndex([df.index[-1], df.index[-30]])
+    due = p.due("X", "5m", df, now, suspicious=gap)
+    assert set(gap) <= set(due)
+    assert len(p.pages(due, "5m")) == 1
+
+    far = pd.DatetimeIndex([df.index[0], df.index[0] + 1000 * M5])
+    assert len(p.pages(far, "5m")) == 2
+
+
+def test_continuity_fix_refetches_gaps_and_due_bars_in_one_page(tmp_path, monkeypatch):
+    monkeypatch.setattr(updater, "revalidation_planner", planner(tmp_path))
+    monkeypatch.setattr(rate_limiter, "wait_if_needed_for_symbol", lambda **kw: None)
+
+    now = pd.Timestamp.now(tz="UTC")
+    truth = make_5m(now.floor("5min") - M5, 200, seed=3)
+    stale = truth.copy()
+    bad_ts = truth.index[-100]
+    stale.loc[bad_ts, "open"] *= 1.02                     # cached mid-formation
+
+    calls = []
+    def fake_fetch(symbol, interval, windows):
+        calls.append(windows)
+        return [truth.loc[a:b] for a, b in windows]
+    monkeypatch.setattr(updater, "_fetch_all_many", fake_fetch)
+
+    out = updater.continuity_fix_5m("X", stale, truth.index[0])
+    assert len(calls) == 1 and len(calls[0]) == 1
+    a, b = calls[0][0]
+    assert a == bad_ts - M5 and b >= now - pd.Timedelta("45min") - M5
+    pd.testing.assert_frame_equal(out, truth, check_freq=False)
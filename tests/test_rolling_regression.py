@@ -0,0 +1,78 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from indicators.indicators import rolling_slope, rolling_r2
+
+
+# ==========================================================
+# REFERENCE — the rolling().apply() versions
+# ==========================================================
+def ref_slope(series, window):
+    x = np.arange(window, dtype=float)
+    x_mean = x.mean()
+    x_var = ((x - x_mean) ** 2).sum()
+
+    def _slope(y):
+        if np.any(np.isnan(y)):
+            return np.nan
+        return ((x - x_mean) * (y - y.mean())).sum() / x_var
+
+    return series.rolling(window).apply(_slope, raw=True)
+
+
+def ref_r2(series, window):
+    x = np.arange(window, dtype=float)
+    x_mean = x.mean()
+    x_var = ((x - x_mean) ** 2).sum()
+
+    def _r2(y):
+        if np.any(np.isnan(y)):
+            return np.nan
+        y_mean = y.mean()
+        ss_tot = ((y - y_mean) ** 2).sum()
+        if ss_tot < 1e-12:
+            return 0.0
+        slope = ((x - x_mean) * (y - y_mean)).sum() / x_var
+        intercept = y_mean - slope * x_mean
+        y_hat = slope * x + intercept
+        ss_res = ((y - y_hat) ** 2).sum()
+        return 1.0 - ss_res / ss_tot
+
+    return series.rolling(window).apply(_r2, raw=True)
+
+
+def build_series(n, seed, level=60000.0):
+    rng = np.random.default_rng(seed)
+    y = level * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+    y[300:320] = np.nan          # data gap
+    y[700:800] = y[699]          # flat stretch
+    return pd.Series(y, index=pd.date_range("2024-01-01", periods=n, freq="1h", tz="UTC"))
+
+
+def test_rolling_slope_matches_apply():
+    for level in (60000.0, 0.05):
+        s = build_series(3000, seed=5, level=level)
+        for window in (2, 20, 50):
+            got, ref = rolling_slope(s, window), ref_slope(s, window)
+            assert got.index.equals(s.index)
+            assert np.array_equal(got.isna(), ref.isna())
+            scale = s.abs().max() / window
+            assert np.allclose(got, ref, rtol=1e-8, atol=1e-11 * scale, equal_nan=True)
+
+
+def test_rolling_r2_matches_apply():
+    for level in (60000.0, 0.05):
+        s = build_series(3000, seed=6, level=level)
+        for window in (3, 20, 50):
+            got, ref = rolling_r2(s, window), ref_r2(s, window)
+            assert np.array_equal(got.isna(), ref.isna())
+            assert np.allclose(got, ref, rtol=1e-6, atol=1e-6, equal_nan=True)
+            # flat stretch is exactly 0, as before
+            assert (got.iloc[700 + window:800] == 0.0).all()
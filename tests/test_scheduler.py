@@ -0,0 +1,66 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from datetime import datetime, timedelta, timezone
+
+from execution.scheduler import next_boundary
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_next_boundary_wakes_after_settle():
+    wake, boundary, frames = next_boundary(utc(2024, 3, 1, 10, 7, 30), settle_seconds=3)
+    assert boundary == utc(2024, 3, 1, 10, 10)
+    assert wake == boundary + timedelta(seconds=3)
+    assert frames == ["5m"]
+
+    # inside the settle window of the boundary just passed — still that one
+    wake, boundary, _ = next_boundary(utc(2024, 3, 1, 10, 10, 1), settle_seconds=3)
+    assert boundary == utc(2024, 3, 1, 10, 10)
+
+    # settle elapsed exactly — move on
+    _, boundary, _ = next_boundary(utc(2024, 3, 1, 10, 10, 3), settle_seconds=3)
+    assert boundary == utc(2024, 3, 1, 10, 15)
+
+
+def test_next_boundary_flags_higher_timeframes():
+    _, boundary, frames = next_boundary(utc(2024, 3, 1, 10, 58), settle_seconds=0)
+    assert boundary == utc(2024, 3, 1, 11, 0)
+    assert frames == ["5m", "1h"]
+
+    _, boundary, frames = next_boundary(utc(2024, 3, 1, 23, 56), settle_seconds=0)
+    assert boundary == utc(2024, 3, 2, 0, 0)
+    assert frames == ["5m", "1h", "4h"]
+
+
+def test_held_cursor_of_an_open_position_is_not_lagging(monkeypatch, tmp_path):
+    import json
+    from types import SimpleNamespace
+
+    import execution.hourly_runner as hourly_runner
+    from execution.scheduler import ResidentScheduler
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(hourly_runner, "SYMBOLS", ["FLATUSDT", "OPENUSDT", "LATEUSDT"])
+    os.makedirs("data/cursors")
+    cursors = {
+        "FLATUSDT": "2024-03-01T10:10:00+00:00",     # advanced onto the forming bar
+        "OPENUSDT": "2024-03-01T10:05:00+00:00",     # held on the last closed bar
+        "LATEUSDT": "2024-03-01T10:05:00+00:00",     # flat and a bar behind
+    }
+    for symbol, ts in cursors.items():
+        with open(hourly_runner._last_5m_file(symbol, True), "w") as f:
+            json.dump(ts, f)
+
+    sched = ResidentScheduler()
+    sched.pm = SimpleNamespace(positions={"OPENUSDT": {}})
+    assert sched._lagging_symbols(utc(2024, 3, 1, 10, 10)) == ["LATEUSDT"]
+
+    # a held cursor that is itself a bar behind still lags
+    assert sched._lagging_symbols(utc(2024, 3, 1, 10, 15)) == ["FLATUSDT", "OPENUSDT", "LATEUSDT"]
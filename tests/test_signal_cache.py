@@ -0,0 +1,85 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import pandas as pd
+import pytest
+
+from indicators.indicators import generate_signal
+from indicators.signal_cache import SignalCache, main as cache_cli
+from test_backtest_core import make_frames
+
+
+@pytest.fixture(scope="module")
+def frames():
+    h1, _ = make_frames(800, 3)
+    h1 = h1.drop(columns="final_signal")
+    h4 = h1.resample("4h").agg({"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"})
+    return h1, h4
+
+
+def test_hit_returns_the_computed_frame(tmp_path, frames, capsys):
+    h1, h4 = frames
+    expected = generate_signal(h1.copy(), h4)
+
+    cache = SignalCache(str(tmp_path))
+    first = cache.generate_signal(h1.copy(), h4, symbol="TEST")
+    again = SignalCache(str(tmp_path)).generate_signal(h1.copy(), h4, symbol="TEST")
+
+    pd.testing.assert_frame_equal(first, expected)
+    pd.testing.assert_frame_equal(again, expected, check_freq=False)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_any_input_change_is_a_new_key(tmp_path, frames, capsys):
+    h1, h4 = frames
+    cache = SignalCache(str(tmp_path))
+    cache.generate_signal(h1.copy(), h4)
+
+    edited = h1.copy()
+    edited.iloc[-1, edited.columns.get_loc("close")] *= 1.001       # revised last candle
+    cache.generate_signal(edited, h4)
+    cache.generate_signal(h1.copy(), h4.iloc[:-1])
+    cache.generate_signal(h1.copy(), h4, atr_mult=2.0)
+    cache.generate_signal(h1.copy(), h4, symbol="OTHER")            # label only
+
+    assert (cache.hits, cache.misses) == (1, 4)
+    assert len(cache.entries()) == 4
+
+
+def test_invalidation(tmp_path, frames, capsys):
+    h1, h4 = frames
+    cache = SignalCache(str(tmp_path))
+    cache.generate_signal(h1.copy(), h4, symbol="AAA")
+    cache.generate_signal(h1.iloc[:-5].copy(), h4, symbol="BBB")
+    cache.generate_signal(h1.iloc[:-10].copy(), h4, symbol="BBB")
+
+    assert cache.invalidate(symbol="AAA") == 1
+    assert cache.invalidate(older_than=pd.Timedelta(days=1)) == 0
+    assert cache.prune(keep=1) == 1
+    assert list(cache.entries()["symbol"]) == ["BBB"]
+
+    cache_cli(["--root", str(tmp_path), "--clear"])
+    assert cache.entries().empty
+    assert "cleared 1 entries" in capsys.readouterr().out
+
+
+def test_foreign_keys_in_the_root_are_left_alone(tmp_path, frames, capsys):
+    from data_pipeline.feature_store import FeatureStore
+
+    h1, h4 = frames
+    live = FeatureStore(str(tmp_path))
+    live.write("ABCUSDT", h1[["close"]], hour="2024-01-01 00:00", window=len(h1), source="state")
+
+    cache = SignalCache(str(tmp_path))
+    assert cache.entries().empty
+    assert cache.prune(keep=0) == 0
+    assert cache.invalidate(older_than=pd.Timedelta(days=1)) == 0
+
+    cache.generate_signal(h1.copy(), h4, symbol="AAA")
+    assert cache.clear() == 1
+    assert live.meta("ABCUSDT") is not None
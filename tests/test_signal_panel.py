@@ -0,0 +1,64 @@
+import contextlib
+import io
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from indicators.indicators import generate_signal, compute_htf_scores
+from indicators.panel import generate_signal_panel, generate_signals
+from test_signal_state import build_ohlcv
+
+
+def test_panel_matches_generate_signal_per_symbol():
+    """
+    One panel pass over several symbols — including one with a shorter
+    history, which has to form its own index group — must reproduce
+    generate_signal() for each symbol: same columns, dtypes and values.
+    """
+    frames, htf_4h, scores = {}, {}, {}
+    for k in range(5):
+        symbol = f"SYM{k}USDT"
+        frames[symbol] = build_ohlcv(800 if k < 4 else 650, seed=3 + k)
+        htf_4h[symbol] = build_ohlcv(220, seed=103 + k, freq="4h", start="2023-12-20")
+        scores[symbol] = compute_htf_scores(htf_4h[symbol])
+
+    for live in (False, True):
+        panel = generate_signal_panel(frames, scores, live=live)
+        assert list(panel) == list(frames)
+
+        fired = 0
+        for symbol, df in frames.items():
+            with contextlib.redirect_stdout(io.StringIO()):
+                ref = generate_signal(df.copy(), htf_4h[symbol], live=live,
+                                      htf_stack_cache=scores[symbol])
+            got = panel[symbol]
+
+            assert got.index.equals(ref.index)
+            assert list(got.columns) == list(ref.columns)
+            assert got.dtypes.equals(ref.dtypes), symbol
+            for col in ref.columns:
+                a = got[col].to_numpy(dtype=float)
+                b = ref[col].to_numpy(dtype=float)
+                assert np.allclose(a, b, rtol=1e-9, atol=1e-9), (symbol, col)
+            fired += int((ref["final_signal"] != 0).sum())
+
+        assert fired > 0
+
+
+def test_generate_signals_engines_agree():
+    frames = {f"SYM{k}USDT": build_ohlcv(600, seed=3 + k) for k in range(3)}
+    htf = {s: build_ohlcv(160, seed=103, freq="4h", start="2023-12-20") for s in frames}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        serial = generate_signals(frames, htf, engine="serial")
+    panel = generate_signals(frames, htf, engine="panel")
+
+    for symbol in frames:
+        a = panel[symbol].to_numpy(dtype=float)
+        b = serial[symbol].to_numpy(dtype=float)
+        assert np.allclose(a, b, rtol=1e-9, atol=1e-9)
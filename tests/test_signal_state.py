@@ -0,0 +1,135 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from indicators.indicators import generate_signal, compute_htf_scores
+from indicators.signal_state import SignalState
+
+
+# ==========================================================
+# HELPERS
+# ==========================================================
+def build_ohlcv(n, seed, freq="1h", start="2024-01-01"):
+    """
+    Regime-switching random walk — quiet / normal / violent blocks of
+    40 bars with volume tied to move size, so breakouts actually fire.
+    """
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range(start, periods=n, freq=freq, tz="UTC")
+
+    regime = np.repeat(rng.choice([0.003, 0.006, 0.02], size=n // 40 + 1), 40)[:n]
+    drift = np.repeat(rng.normal(0, 0.002, n // 40 + 1), 40)[:n]
+    ret = rng.normal(0, 1, n) * regime + drift
+
+    close = 100 * np.exp(np.cumsum(ret))
+    open_ = np.r_[close[0], close[:-1]]
+    wick = np.abs(rng.normal(0, 1, n)) * regime * 0.5
+
+    return pd.DataFrame({
+        "open":   open_,
+        "high":   np.maximum(open_, close) * (1 + wick),
+        "low":    np.minimum(open_, close) * (1 - wick),
+        "close":  close,
+        "volume": rng.lognormal(10, 0.4, n) * (1 + 50 * np.abs(ret)),
+    }, index=idx)
+
+
+def assert_frames_match(stream, batch):
+    assert list(stream.columns) == list(batch.columns)
+    assert stream.index.equals(batch.index)
+    for col in batch.columns:
+        a = stream[col].to_numpy(dtype=float)
+        b = batch[col].to_numpy(dtype=float)
+        assert np.allclose(a, b, rtol=1e-9, atol=1e-9, equal_nan=True), col
+
+
+# ==========================================================
+# TESTS
+# ==========================================================
+def test_bootstrap_matches_generate_signal():
+    df = build_ohlcv(900, seed=3)
+    htf_df = build_ohlcv(300, seed=103, freq="4h", start="2023-12-20")
+
+    state = SignalState(live=False)
+    stream = state.bootstrap(df.copy(), htf_df=htf_df)
+    batch = generate_signal(df.copy(), htf_df.copy())
+
+    assert_frames_match(stream, batch)
+
+
+def test_incremental_update_matches_batch_with_pinned_seeds():
+    df = build_ohlcv(1100, seed=3)
+    htf_df = build_ohlcv(300, seed=103, freq="4h", start="2023-12-20")
+    scores = compute_htf_scores(htf_df)
+
+    for live in (False, True):
+        state = SignalState(live=live)
+        state.bootstrap(df.iloc[:900].copy(), htf_scores=scores)
+        for ts, bar in df.iloc[900:].iterrows():
+            state.update(ts, bar)
+
+        batch = generate_signal(
+            df.copy(), htf_df.copy(), live=live,
+            htf_stack_cache=scores, seeds=state.seeds,
+        )
+        assert_frames_match(state.frame, batch)
+        assert (batch["signal"] != 0).any()
+
+
+def test_extend_rejects_revised_bar():
+    df = build_ohlcv(400, seed=4)
+    htf_df = build_ohlcv(120, seed=104, freq="4h", start="2023-12-20")
+    scores = compute_htf_scores(htf_df)
+
+    state = SignalState(live=True, max_rows=300)
+    state.bootstrap(df.iloc[:300].copy(), htf_scores=scores)
+
+    window = df.iloc[5:305]
+    out = state.extend(window)
+    assert out is not None
+    assert out.index[-300:].equals(window.index)
+
+    revised = df.iloc[10:306].copy()
+    revised.iloc[-2, revised.columns.get_loc("close")] *= 1.01
+    assert state.extend(revised) is None
+
+
+def test_streaming_between_reseeds_keeps_unseeded_batch_entries():
+    """
+    Between re-bootstraps hourly_runner serves the streamed frame for a
+    sliding window whose unseeded generate_signal() differs (seeds,
+    recursion start). Over one reseed interval the entry columns must
+    still match that batch on every row, and ATR / HTF_QUALITY_TH on
+    the rows a live pass reads.
+    """
+    window, reseed_bars = 900, 24          # hourly_runner.SIGNAL_STATE_RESEED_BARS
+    df = build_ohlcv(window + reseed_bars, seed=3)
+    htf_df = build_ohlcv(300, seed=103, freq="4h", start="2023-12-20")
+    scores = compute_htf_scores(htf_df)
+
+    state = SignalState(live=True, max_rows=window)
+    state.bootstrap(df.iloc[:window].copy(), htf_scores=scores)
+
+    fired = 0
+    for k in range(1, reseed_bars + 1):
+        sliding = df.iloc[k:window + k]
+        stream = state.extend(sliding)
+        assert stream.index.equals(sliding.index)
+        if k not in (1, reseed_bars // 2, reseed_bars):
+            continue
+
+        batch = generate_signal(sliding.copy(), htf_df.copy(), live=True, htf_stack_cache=scores)
+        for col in ("ENTRY_LONG", "ENTRY_SHORT", "signal", "final_signal"):
+            assert (stream[col].to_numpy() == batch[col].to_numpy()).all(), (k, col)
+        for col in ("ATR", "HTF_QUALITY_TH"):
+            a = stream[col].to_numpy(dtype=float)[-200:]
+            b = batch[col].to_numpy(dtype=float)[-200:]
+            assert np.allclose(a, b, rtol=1e-3, atol=0), (k, col)
+        fired += int((batch["final_signal"] != 0).sum())
+    assert fired > 0
@@ -0,0 +1,91 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sweep
+from backtest import SignalBacktester
+from data_pipeline.feature_store import FeatureStore
+from test_backtest_core import make_frames
+from test_signal_state import build_ohlcv
+
+
+def test_samplers():
+    grid = sweep.parameter_grid({"atr_mult": [1.2, 1.5], "leverage": [2, 3, 4]})
+    assert len(grid) == 6 and {"atr_mult": 1.5, "leverage": 4} in grid
+
+    space = {"ATR_AFTER_HALF_R": (0.3, 0.8), "leverage": (2, 5), "fee": [0.0004, 0.0006]}
+    lhs = sweep.latin_hypercube(space, 10, seed=3)
+    half_r = np.array([c["ATR_AFTER_HALF_R"] for c in lhs])
+    strata = np.floor((half_r - 0.3) / 0.5 * 10)
+    assert sorted(strata) == list(range(10))                  # one sample per stratum
+    assert all(isinstance(c["leverage"], int) and 2 <= c["leverage"] <= 5 for c in lhs)
+    assert {c["fee"] for c in lhs} == {0.0004, 0.0006}
+    assert lhs == sweep.latin_hypercube(space, 10, seed=3)
+
+    rnd = sweep.random_sample(space, 20, seed=1)
+    assert all(0.3 <= c["ATR_AFTER_HALF_R"] < 0.8 for c in rnd)
+
+    assert sweep.config_id({"a": 1, "b": 2.0}) == sweep.config_id({"b": 2.0, "a": 1})
+    sweep.validate_params({"atr_mult": 1.5, "ATR_AFTER_ONE_R": 0.4})
+    # typos, methods and constants the exit engine never reads
+    for params in ({"atr_mul": 1.5}, {"run": 1}, {"INCUBATION_BARS": 3}, {"be_trigger_r": 1.0}):
+        with pytest.raises(ValueError):
+            sweep.validate_params(params)
+
+
+def test_sweep_matches_direct_runs_and_resumes(tmp_path, capsys):
+    h1, m5 = make_frames(300, 5)
+    out = str(tmp_path / "sweep")
+    arrays = FeatureStore(os.path.join(out, sweep.ARRAYS_DIR))
+    sweep.snapshot_symbol(arrays, "TESTUSDT", h1, m5)
+
+    configs = sweep.parameter_grid({"atr_mult": [1.2, 1.8], "ATR_AFTER_HALF_R": [0.45, 0.65]})
+    first = sweep.run_sweep(out, ["TESTUSDT"], configs[:3], workers=2)
+    assert len(first) == 3
+
+    table = sweep.run_sweep(out, ["TESTUSDT"], configs, workers=2)
+    assert len(table) == 4 and table["config_id"].is_unique
+    assert "3 already done" in capsys.readouterr().out
+
+    params = configs[-1]
+    bt = SignalBacktester(h1, lltf_df=m5, atr_mult=params["atr_mult"])
+    bt.ATR_AFTER_HALF_R = params["ATR_AFTER_HALF_R"]
+    expected = bt.run()["summary"]
+    row = table.set_index("config_id").loc[sweep.config_id(params)]
+    assert row["p_atr_mult"] == params["atr_mult"]
+    assert row["net_profit"] == expected["net_profit"]
+    assert row["total_trades"] == expected["total_trades"]
+
+
+def test_panel_snapshots_match_serial(tmp_path, monkeypatch):
+    from data_pipeline.candle_store import CandleStore
+
+    monkeypatch.chdir(tmp_path)
+    candles = CandleStore(str(tmp_path / "candles"))
+    symbols = ["AAAUSDT", "BBBUSDT"]
+    for k, symbol in enumerate(symbols):
+        candles.write(symbol, "1h", build_ohlcv(600, seed=20 + k))
+        candles.write(symbol, "4h", build_ohlcv(200, seed=120 + k, freq="4h", start="2023-12-20"))
+        candles.write(symbol, "5m", build_ohlcv(600 * 12, seed=220 + k, freq="5min"))
+
+    views = {}
+    for engine in sweep.SIGNAL_ENGINES:
+        root = str(tmp_path / engine)
+        with ThreadPoolExecutor(2) as pool:
+            ready = list(sweep.build_snapshots(pool, root, symbols, str(tmp_path / "candles"), engine))
+            assert sorted(ready) == symbols
+            assert list(sweep.build_snapshots(pool, root, symbols, str(tmp_path / "candles"), engine)) == []
+        views[engine] = {s: FeatureStore(root).view(f"{s}_1h") for s in symbols}
+
+    for symbol in symbols:
+        serial, panel = views["serial"][symbol], views["panel"][symbol]
+        assert serial.index.equals(panel.index)
+        assert np.array_equal(serial.to_numpy(), panel.to_numpy())
@@ -0,0 +1,82 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from data_pipeline.updater import coalesce_windows, upsert_bars
+
+COLS = ["open", "high", "low", "close", "volume"]
+M5 = pd.Timedelta("5min")
+
+
+def frame(index, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.random((len(index), len(COLS))), index=index, columns=COLS)
+
+
+def test_upsert_matches_concat_dedupe_sort():
+    idx = pd.date_range("2024-01-01", periods=10_000, freq="5min", tz="UTC")
+    df = frame(idx, 0)
+
+    rng = np.random.default_rng(1)
+    picked = idx[np.sort(rng.choice(len(idx), 40, replace=False))]
+    fresh = df.loc[picked].copy()
+    fresh.iloc[::4, 3] += 1.0                                 # 10 closes revised
+    tail = frame(pd.date_range(idx[-1] + M5, periods=3, freq="5min", tz="UTC"), 2)
+    fresh = pd.concat([fresh, tail])
+
+    merged, diff = upsert_bars(df, fresh)
+    ref = pd.concat([df, fresh])
+    ref = ref[~ref.index.duplicated(keep="last")].sort_index()
+    pd.testing.assert_frame_equal(merged, ref, check_freq=False)
+
+    assert list(diff.index) == list(picked[::4])
+    assert np.allclose(diff["new_close"] - diff["old_close"], 1.0)
+    assert (df.loc[picked[::4], "close"] == diff["old_close"]).all()   # input untouched
+
+
+def test_upsert_without_changes_returns_input():
+    idx = pd.date_range("2024-01-01", periods=50, freq="5min", tz="UTC")
+    df = frame(idx, 0)
+    merged, diff = upsert_bars(df, df.iloc[10:20].copy())
+    assert merged is df and diff.empty
+
+
+def test_coalesce_windows_merges_adjacent_gaps():
+    t = pd.Timestamp("2024-01-01 10:00", tz="UTC")
+    gaps = [t, t + M5, t + 3 * M5, t + 20 * M5]
+    assert coalesce_windows(gaps, M5) == [
+        (t - M5, t + 4 * M5),                                 # ±1 bar windows touch
+        (t + 19 * M5, t + 21 * M5),
+    ]
+    assert coalesce_windows([], M5) == []
+
+
+def test_changed_bars_merge_keeps_a_bar_appended_meanwhile(tmp_path):
+    from data_pipeline.candle_store import CandleStore
+    from data_pipeline.updater import changed_bars
+
+    store = CandleStore(str(tmp_path))
+    idx = pd.date_range("2024-01-01", periods=600, freq="5min", tz="UTC")
+    store.write("TEST", "5m", frame(idx, 0))
+
+    cached = store.read("TEST", "5m")
+    assert changed_bars(cached, cached).empty
+
+    # the stream closes the next bar while the scan is fetching
+    streamed = frame(pd.DatetimeIndex([idx[-1] + M5]), 1)
+    assert store.extend("TEST", "5m", streamed, M5) == 1
+
+    fixed, _ = upsert_bars(cached, cached.iloc[[10, 400]] + 1.0)
+    corrected = changed_bars(cached, fixed)
+    assert list(corrected.index) == [idx[10], idx[400]]
+
+    store.append("TEST", "5m", corrected)
+    stored = store.read("TEST", "5m")
+    pd.testing.assert_frame_equal(stored.iloc[:-1], fixed, check_freq=False)
+    pd.testing.assert_frame_equal(stored.iloc[-1:], streamed, check_freq=False)
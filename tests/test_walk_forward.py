@@ -0,0 +1,61 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+import sweep
+import walk_forward
+from data_pipeline.feature_store import FeatureStore
+from test_backtest_core import make_frames
+
+DAY = pd.Timedelta(days=1)
+
+
+def test_make_folds():
+    start = pd.Timestamp("2024-01-01", tz="UTC")
+    folds = walk_forward.make_folds(start, start + 100 * DAY, train=40 * DAY, test=25 * DAY)
+    assert [(f[2] - start).days for f in folds] == [40, 65, 90]
+    assert folds[-1][3] == start + 100 * DAY                       # last test window cut at the end
+    assert all(f[1] == f[2] and f[1] - f[0] == 40 * DAY for f in folds)
+
+    anchored = walk_forward.make_folds(start, start + 100 * DAY, 40 * DAY, 25 * DAY, anchored=True)
+    assert all(f[0] == start for f in anchored)
+
+
+def test_walk_forward_selects_on_train_and_stitches_test(tmp_path, capsys):
+    out = str(tmp_path / "wf")
+    arrays = FeatureStore(os.path.join(out, sweep.ARRAYS_DIR))
+    frames = {"AAAUSDT": make_frames(24 * 60, 8), "BBBUSDT": make_frames(24 * 50, 9)}
+    for symbol, (h1, m5) in frames.items():
+        sweep.snapshot_symbol(arrays, symbol, h1, m5)
+
+    configs = sweep.parameter_grid({"atr_mult": [1.0, 2.0]})
+    result = walk_forward.run_walk_forward(out, list(frames), configs, train=20 * DAY, test=10 * DAY,
+                                           min_trades=1, workers=2)
+    folds, equity = result["folds"], result["equity"]
+    assert list(folds.groupby("symbol").size()) == [4, 3]
+    assert os.path.exists(os.path.join(out, walk_forward.FOLDS_FILE))
+
+    # the pick is the train-window winner
+    fold = folds.iloc[1]
+    h1, m5 = frames[fold["symbol"]]
+    scores = []
+    for params in configs:
+        bt = sweep.build_backtester(h1[fold["train_start"]:fold["train_end"] - pd.Timedelta(1)],
+                                    m5[fold["train_start"]:fold["train_end"] - pd.Timedelta(1)], params)
+        scores.append(bt.run()["summary"]["net_profit"])
+    assert fold["p_atr_mult"] == configs[int(np.argmax(scores))]["atr_mult"]
+    assert fold["train_net_profit"] == max(scores)
+
+    # out-of-sample curve: test windows only, chained fold after fold
+    for symbol, curve in equity.groupby("symbol"):
+        rows = folds[folds["symbol"] == symbol]
+        assert curve["timestamp"].min() >= rows["test_start"].min()
+        assert curve["timestamp"].is_monotonic_increasing
+        last_fold = curve[curve["fold"] == rows["fold"].max()]
+        assert np.isclose(last_fold["equity"].iloc[0] - 1000, rows["test_net_profit"].iloc[:-1].sum())
@@ -0,0 +1,216 @@
+"""
+Walk-forward evaluation for SignalBacktester.
+
+main.py backtests one frozen window. This harness rolls a train / test
+split across the whole history of each symbol:
+
+  - on every train window, each candidate configuration is backtested and
+    the best one by --objective is selected (configs with fewer than
+    --min-trades trades only win when nothing else qualifies);
+  - the selected configuration is then backtested on the following,
+    unseen test window;
+  - the test windows' PnL is stitched into one out-of-sample equity curve
+    per symbol, next to a per-fold stats table.
+
+Folds of all symbols run in parallel worker processes. The 1H signal
+frame is computed once per symbol (the same arrays snapshot sweep.py
+uses, see sweep.build_snapshots) and every fold only slices the
+memory-mapped views, so no fold recomputes indicators. As in main.py the
+signal frame covers the whole history; folds differ in which trades and
+which parameter choice they see, not in the indicator warm-up.
+
+Each test window starts from a fresh initial balance; sizing is a fixed
+$ risk, so fold PnL is stitched additively.
+
+USAGE:
+    python walk_forward.py --symbols ETHUSDT SOLUSDT --train-days 120 --test-days 30 --grid ATR_AFTER_HALF_R=0.45,0.55,0.65
+    python walk_forward.py --symbols ETHUSDT --train-days 180 --test-days 30 --anchored --lhs 24 --range atr_mult=1.2:2.0
+    python walk_forward.py --symbols ETHUSDT SOLUSDT --train-days 120 --test-days 30 --signal-engine panel
+"""
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import sweep
+from data_pipeline.feature_store import FeatureStore
+
+DEFAULT_OUT  = "data/walk_forward/default"
+FOLDS_FILE   = "folds.parquet"
+EQUITY_FILE  = "oos_equity.parquet"
+TEST_METRICS = ["net_profit", "return_pct", "total_trades", "win_rate"]
+
+
+def make_folds(start, end, train: pd.Timedelta, test: pd.Timedelta, step: pd.Timedelta = None,
+               anchored: bool = False) -> list:
+    """
+    [(train_start, train_end, test_start, test_end), ...] covering
+    [start, end). Rolling train windows of length `train` (anchored:
+    always from `start`), each followed by a test window of length
+    `test`; windows advance by `step` (default: `test`, so test windows
+    tile without overlap). The last test window is cut at `end`.
+    """
+    step = test if step is None else step
+    folds = []
+    test_start = start + train
+    while test_start < end:
+        train_start = start if anchored else test_start - train
+        folds.append((train_start, test_start, test_start, min(test_start + test, end)))
+        test_start += step
+    return folds
+
+
+def _window(frame: pd.DataFrame, start, end) -> pd.DataFrame:
+    lo, hi = frame.index.searchsorted(start), frame.index.searchsorted(end)
+    return frame.iloc[lo:hi]
+
+
+def _backtest(h1, m5, params):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return sweep.build_backtester(h1, m5, params).run()
+
+
+def run_fold(task) -> dict:
+    """Select on the train window, evaluate on the test window."""
+    symbol, fold, (train_start, train_end, test_start, test_end), configs, objective, min_trades = task
+    h1, m5 = sweep.symbol_frames(symbol)
+
+    h1_train, m5_train = _window(h1, train_start, train_end), _window(m5, train_start, train_end)
+    scored = []
+    for params in configs:
+        summary = _backtest(h1_train, m5_train, params)["summary"]
+        scored.append((summary["total_trades"] >= min_trades, summary[objective], summary["total_trades"], params))
+    # qualifying configs first, then the objective
+    qualified, train_score, train_trades, best = max(scored, key=lambda s: (s[0], s[1]))
+
+    out = _backtest(_window(h1, test_start, test_end), _window(m5, test_start, test_end), best)
+    curve = out["equity_curve"]
+
+    row = {
+        "symbol": symbol, "fold": fold,
+        "train_start": train_start, "train_end": train_end,
+        "test_start": test_start, "test_end": test_end,
+        "config_id": sweep.config_id(best),
+        f"train_{objective}": train_score, "train_trades": train_trades,
+    }
+    row.update({f"p_{name}": value for name, value in best.items()})
+    row.update({f"test_{k}": out["summary"][k] for k in TEST_METRICS})
+    row["test_max_drawdown_pct"] = sweep.max_drawdown_pct(curve["equity"].to_numpy())
+    return {
+        "row": row,
+        "timestamp": curve.index,
+        "pnl": curve["equity"].to_numpy() - out["summary"]["initial_balance"],
+        # includes a trade still open at test_end, closed on the last bar
+        "net": out["summary"]["net_profit"],
+    }
+
+
+def stitch(results: list, initial_balance: float = 1000) -> pd.DataFrame:
+    """Test-window PnL curves chained per symbol, fold after fold."""
+    frames = []
+    for symbol in sorted({r["row"]["symbol"] for r in results}):
+        offset = 0.0
+        for r in sorted((r for r in results if r["row"]["symbol"] == symbol), key=lambda r: r["row"]["fold"]):
+            if len(r["pnl"]) == 0:
+                continue
+            frames.append(pd.DataFrame({
+                "symbol": symbol, "fold": r["row"]["fold"], "timestamp": r["timestamp"],
+                "equity": initial_balance + offset + r["pnl"],
+            }))
+            offset += r["net"]
+    if not frames:
+        return pd.DataFrame(columns=["symbol", "fold", "timestamp", "equity"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def run_walk_forward(out_dir: str, symbols, configs, train: pd.Timedelta, test: pd.Timedelta,
+                     step: pd.Timedelta = None, anchored: bool = False, objective: str = "net_profit",
+                     min_trades: int = 5, workers: int = None, cache_dir: str = sweep.CANDLE_CACHE,
+                     signal_engine: str = "serial") -> dict:
+    """
+    Returns {"folds": per-fold stats, "equity": stitched out-of-sample
+    equity} and writes both under out_dir. An empty config list
+    evaluates the backtester defaults.
+    """
+    configs = configs or [{}]
+    for params in configs:
+        sweep.validate_params(params)
+    arrays_root = os.path.join(out_dir, sweep.ARRAYS_DIR)
+    os.makedirs(arrays_root, exist_ok=True)
+
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=sweep.init_worker, initargs=(arrays_root,)) as pool:
+        arrays = FeatureStore(arrays_root)
+        for symbol in sweep.build_snapshots(pool, arrays_root, symbols, cache_dir, signal_engine):
+            print(f"[WALK-FORWARD] {symbol} — arrays snapshot ready")
+
+        tasks = []
+        for symbol in symbols:
+            index = arrays.view(f"{symbol}_1h", columns=["close"]).index
+            folds = make_folds(index[0], index[-1] + pd.Timedelta(hours=1), train, test, step, anchored)
+            tasks += [(symbol, k, fold, configs, objective, min_trades) for k, fold in enumerate(folds)]
+        print(f"[WALK-FORWARD] {len(tasks)} folds × {len(configs)} configs across {len(symbols)} symbols")
+
+        results = []
+        futures = {pool.submit(run_fold, task): task for task in tasks}
+        for future in as_completed(futures):
+            symbol, k = futures[future][:2]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"[WALK-FORWARD] {symbol} fold {k} — failed: {e}")
+
+    folds_df = pd.DataFrame([r["row"] for r in results])
+    if not folds_df.empty:
+        folds_df = folds_df.sort_values(["symbol", "fold"]).reset_index(drop=True)
+    equity_df = stitch(results)
+
+    folds_df.to_parquet(os.path.join(out_dir, FOLDS_FILE), index=False)
+    equity_df.to_parquet(os.path.join(out_dir, EQUITY_FILE), index=False)
+    return {"folds": folds_df, "equity": equity_df}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Walk-forward SignalBacktester evaluation")
+    parser.add_argument("--symbols", nargs="+", required=True)
+    parser.add_argument("--train-days", type=float, required=True)
+    parser.add_argument("--test-days", type=float, required=True)
+    parser.add_argument("--step-days", type=float, default=None)
+    parser.add_argument("--anchored", action="store_true", help="train windows all start at the first bar")
+    parser.add_argument("--objective", default="net_profit", help="summary key maximized on train windows")
+    parser.add_argument("--min-trades", type=int, default=5)
+    sweep.add_space_arguments(parser)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    sweep.add_snapshot_arguments(parser)
+    args = parser.parse_args(argv)
+
+    configs = sweep.configs_from_args(parser, args)
+    step = None if args.step_days is None else pd.Timedelta(days=args.step_days)
+    result = run_walk_forward(
+        args.out, [s.upper() for s in args.symbols], configs,
+        train=pd.Timedelta(days=args.train_days), test=pd.Timedelta(days=args.test_days),
+        step=step, anchored=args.anchored, objective=args.objective,
+        min_trades=args.min_trades, workers=args.workers, cache_dir=args.cache,
+        signal_engine=args.signal_engine,
+    )
+
+    folds = result["folds"]
+    if folds.empty:
+        return
+    cols = ["symbol", "fold", "test_start", "config_id", f"train_{args.objective}",
+            "test_net_profit", "test_total_trades", "test_max_drawdown_pct"]
+    print(folds[cols].to_string(index=False))
+    oos = folds.groupby("symbol")["test_net_profit"].sum().round(2)
+    print(f"[WALK-FORWARD] out-of-sample net profit: {oos.to_dict()}")
+
+
+if __name__ == "__main__":
+    main()